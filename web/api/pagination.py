@@ -0,0 +1,196 @@
+import hashlib
+import json
+import logging
+
+import redis
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+from rest_framework_datatables.pagination import DatatablesPageNumberPagination
+from rest_framework_datatables.utils import get_param
+
+from reNgine.settings import CELERY_BROKER_URL, DATATABLES_CACHE_TTL, DATATABLES_ESTIMATE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+cache = redis.Redis.from_url(CELERY_BROKER_URL, socket_connect_timeout=1)
+
+
+class DatatablesKeysetPagination(DatatablesPageNumberPagination):
+	"""Datatables pagination seeking pages instead of skipping rows.
+
+	The sort key and id of the last row of each page are cached, so that the
+	next page is fetched with `WHERE (sort_key, id) > (last sort_key, last id)`
+	on the `(sort_key, id)` index instead of an OFFSET scanning all the
+	previous rows. Pages reached without going through the previous one (first
+	request, jump to the last page) fall back to OFFSET, and so do querysets
+	not sorted on a single column of their model.
+
+	The count of rows is cached too, or estimated from the table statistics
+	for unfiltered large tables, instead of counting all rows on every page.
+	"""
+
+	def get_count_and_total_count(self, queryset, view):
+		if hasattr(view, '_datatables_filtered_count'):
+			# Counted by DatatablesFilterBackend
+			return super().get_count_and_total_count(queryset, view)
+		count = get_count(queryset)
+		return count, count
+
+	def paginate_queryset(self, queryset, request, view=None):
+		ordering = get_keyset_ordering(queryset)
+		if request.accepted_renderer.format != 'datatables' or not ordering or get_param(request, 'length') == '-1':
+			return super().paginate_queryset(queryset, request, view)
+
+		self.is_datatable_request = True
+		self.page_size_query_param = 'length'
+		self.count, self.total_count = self.get_count_and_total_count(queryset, view)
+		page_size = self.get_page_size(request)
+		try:
+			start = max(int(get_param(request, 'start', 0)), 0)
+		except ValueError:
+			start = 0
+
+		queryset = queryset.order_by(*[f"{'-' if descending else ''}{name}" for name, descending in ordering])
+		query_key = get_query_key(queryset)
+		last_key = get_page_boundary(query_key, start) if start else None
+		if last_key:
+			rows = list(queryset.filter(get_seek_q(ordering, last_key))[:page_size])
+		else:
+			rows = list(queryset[start:start + page_size])
+		if rows:
+			last_key = [getattr(rows[-1], queryset.model._meta.get_field(name).attname) for name, _ in ordering]
+			set_page_boundary(query_key, start + len(rows), last_key)
+		self.request = request
+		return rows
+
+
+def get_keyset_ordering(queryset):
+	"""Get the ordering pages of a queryset are seeked on: its sort column,
+	if any, followed by the primary key as a tie breaker.
+
+	Args:
+		queryset (django.db.models.QuerySet): Queryset.
+
+	Returns:
+		list: (field name, descending) tuples, or None if the queryset is not
+			sorted on a single column of its model.
+	"""
+	query = queryset.query
+	order_by = query.order_by or (query.get_meta().ordering if query.default_ordering else ())
+	if not order_by or len(order_by) > 2 or query.extra_order_by or query.combinator:
+		return None
+	meta = queryset.model._meta
+	ordering = []
+	for item in order_by:
+		if not isinstance(item, str) or item == '?':
+			return None
+		name = item.lstrip('-')
+		if name in query.annotations:
+			return None
+		try:
+			field = meta.pk if name == 'pk' else meta.get_field(name)
+		except FieldDoesNotExist:
+			return None
+		if field.is_relation or not field.concrete:
+			return None
+		ordering.append((field.name, item.startswith('-')))
+	if ordering[-1][0] != meta.pk.name:
+		if len(ordering) > 1:
+			return None
+		ordering.append((meta.pk.name, ordering[0][1]))
+	if ordering[0][0] == meta.pk.name:
+		ordering = ordering[:1]
+	return ordering
+
+
+def get_seek_q(ordering, last_key):
+	"""Filter rows sorted after a row, NULLs being sorted like PostgreSQL does:
+	last in ascending order, first in descending order.
+
+	Args:
+		ordering (list): (field name, descending) tuples, see
+			`get_keyset_ordering`.
+		last_key (list): Values of the ordering fields of the row.
+
+	Returns:
+		django.db.models.Q: Filter.
+	"""
+	(pk_name, pk_descending), pk_value = ordering[-1], last_key[-1]
+	after_pk = Q(**{f"{pk_name}__{'lt' if pk_descending else 'gt'}": pk_value})
+	if len(ordering) == 1:
+		return after_pk
+	(name, descending), value = ordering[0], last_key[0]
+	if value is None:
+		if descending:
+			return Q(**{f'{name}__isnull': False}) | Q(**{f'{name}__isnull': True}) & after_pk
+		return Q(**{f'{name}__isnull': True}) & after_pk
+	after = Q(**{f"{name}__{'lt' if descending else 'gt'}": value}) | Q(**{name: value}) & after_pk
+	if not descending:
+		after |= Q(**{f'{name}__isnull': True})
+	return after
+
+
+def get_query_key(queryset):
+	"""Get a cache key identifying the SQL query of a queryset."""
+	sql, params = queryset.query.sql_with_params()
+	return hashlib.sha256(repr((sql, params)).encode()).hexdigest()
+
+
+def get_page_boundary(query_key, start):
+	"""Get the sort key of the row before the `start` offset of a query."""
+	try:
+		last_key = cache.get(f'rengine:datatables:{query_key}:{start}')
+		return json.loads(last_key) if last_key else None
+	except redis.exceptions.RedisError as e:
+		logger.debug(f'Could not get page boundary from cache: {e}')
+
+
+def set_page_boundary(query_key, start, last_key):
+	"""Cache the sort key of the row before the `start` offset of a query."""
+	try:
+		cache.set(f'rengine:datatables:{query_key}:{start}', json.dumps(last_key, cls=DjangoJSONEncoder), ex=DATATABLES_CACHE_TTL)
+	except redis.exceptions.RedisError as e:
+		logger.debug(f'Could not cache page boundary: {e}')
+
+
+def get_count(queryset):
+	"""Count the rows of a queryset, or estimate the rows of large unfiltered
+	tables from the PostgreSQL statistics. Counts are cached for
+	DATATABLES_CACHE_TTL seconds.
+
+	Args:
+		queryset (django.db.models.QuerySet): Queryset.
+
+	Returns:
+		int: Count.
+	"""
+	if not queryset.query.where:
+		estimate = get_estimated_count(queryset.model)
+		if estimate >= DATATABLES_ESTIMATE_THRESHOLD:
+			return estimate
+	key = f'rengine:datatables:{get_query_key(queryset.order_by())}:count'
+	try:
+		count = cache.get(key)
+		if count is not None:
+			return int(count)
+	except redis.exceptions.RedisError as e:
+		logger.debug(f'Could not get count from cache: {e}')
+	count = queryset.count()
+	try:
+		cache.set(key, count, ex=DATATABLES_CACHE_TTL)
+	except redis.exceptions.RedisError as e:
+		logger.debug(f'Could not cache count: {e}')
+	return count
+
+
+def get_estimated_count(model):
+	"""Get the number of rows of the table of a model estimated by the last
+	ANALYZE, or -1 if the table was never analyzed."""
+	with connection.cursor() as cursor:
+		cursor.execute(
+			'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+			[connection.ops.quote_name(model._meta.db_table)])
+		row = cursor.fetchone()
+	return row[0] if row else -1
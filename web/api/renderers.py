@@ -0,0 +1,19 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+	"""Render data as a server-sent event, for EventSource clients.
+
+	The event sets the `retry` interval after which clients reconnect once
+	the response ends.
+	"""
+	media_type = 'text/event-stream'
+	format = 'event-stream'
+	charset = 'utf-8'
+	retry = 2000 # milliseconds
+
+	def render(self, data, accepted_media_type=None, renderer_context=None):
+		return f'retry: {self.retry}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'.encode()
@@ -0,0 +1,248 @@
+from collections import namedtuple
+from functools import lru_cache, reduce
+from operator import and_, or_
+
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.constants import LOOKUP_SEP
+
+from reNgine.definitions import NUCLEI_SEVERITY_MAP
+
+# Search query nodes
+Comparison = namedtuple('Comparison', ['field', 'operator', 'value'])
+And = namedtuple('And', ['operands'])
+Or = namedtuple('Or', ['operands'])
+
+# Searchable field: lookup paths matched by a comparison, and value type
+SearchField = namedtuple('SearchField', ['paths', 'type'])
+
+# Comparison operators, two characters operators first
+OPERATORS = ['!=', '>=', '<=', '=', '!', '>', '<']
+
+# Characters of a search query making it a special lookup
+SPECIAL_CHARACTERS = '=&|><!'
+
+# Lookup of each operator, by value type. `None` negates the `=` lookup.
+TEXT_LOOKUPS = {'=': 'icontains', '!': None, '!=': None}
+NUMBER_LOOKUPS = {'=': 'exact', '!': None, '!=': None, '>': 'gt', '>=': 'gte', '<': 'lt', '<=': 'lte'}
+BOOLEAN_LOOKUPS = {'=': 'exact', '!': None, '!=': None}
+TYPE_LOOKUPS = {
+	'text': TEXT_LOOKUPS,
+	'int': NUMBER_LOOKUPS,
+	'float': NUMBER_LOOKUPS,
+	'severity': NUMBER_LOOKUPS,
+	'bool': BOOLEAN_LOOKUPS,
+	'open_status': BOOLEAN_LOOKUPS,
+}
+
+# Value parser of each type, raising ValueError on invalid values
+TYPE_PARSERS = {
+	'text': str,
+	'int': int,
+	'float': float,
+	'severity': lambda value: NUCLEI_SEVERITY_MAP.get(value, -1),
+	'bool': lambda value: 'true' in value,
+	'open_status': lambda value: value == 'open',
+}
+
+# Matches all rows, for comparisons that cannot be compiled
+MATCH_ALL = Q(pk__isnull=False)
+
+# Searchable fields, in the order they are matched against search fields
+SUBDOMAIN_SEARCH_FIELDS = {
+	'name': SearchField(['name'], 'text'),
+	'page_title': SearchField(['page_title'], 'text'),
+	'http_url': SearchField(['http_url'], 'text'),
+	'content_type': SearchField(['content_type'], 'text'),
+	'cname': SearchField(['cname'], 'text'),
+	'webserver': SearchField(['webserver'], 'text'),
+	'ip_addresses': SearchField(['ip_addresses__address'], 'text'),
+	'is_important': SearchField(['is_important'], 'bool'),
+	'port': SearchField([
+		'ip_addresses__ports__number',
+		'ip_addresses__ports__service_name',
+		'ip_addresses__ports__description'], 'text'),
+	'technology': SearchField(['technologies__name'], 'text'),
+	'http_status': SearchField(['http_status'], 'int'),
+	'content_length': SearchField(['content_length'], 'int'),
+}
+ENDPOINT_SEARCH_FIELDS = {
+	'http_url': SearchField(['http_url'], 'text'),
+	'page_title': SearchField(['page_title'], 'text'),
+	'content_type': SearchField(['content_type'], 'text'),
+	'webserver': SearchField(['webserver'], 'text'),
+	'technology': SearchField(['techs__name'], 'text'),
+	'gf_pattern': SearchField(['matched_gf_patterns'], 'text'),
+	'http_status': SearchField(['http_status'], 'int'),
+	'content_length': SearchField(['content_length'], 'int'),
+}
+VULNERABILITY_SEARCH_FIELDS = {
+	'severity': SearchField(['severity'], 'severity'),
+	'name': SearchField(['name'], 'text'),
+	'http_url': SearchField(['http_url'], 'text'),
+	'template': SearchField(['template'], 'text'),
+	'template_id': SearchField(['template_id'], 'text'),
+	'cve_id': SearchField(['cve_ids__name'], 'text'),
+	'cve': SearchField(['cve_ids__name'], 'text'),
+	'cwe_id': SearchField(['cwe_ids__name'], 'text'),
+	'cwe': SearchField(['cwe_ids__name'], 'text'),
+	'cvss_metrics': SearchField(['cvss_metrics'], 'text'),
+	'cvss_score': SearchField(['cvss_score'], 'float'),
+	'type': SearchField(['type'], 'text'),
+	'tag': SearchField(['tags__name'], 'text'),
+	'status': SearchField(['open_status'], 'open_status'),
+	'description': SearchField(['description', 'template', 'extracted_results'], 'text'),
+}
+
+
+def is_special_lookup(search_value):
+	"""Check if a search uses the query syntax, e.g. `http_status=200 & name=admin`."""
+	return any(char in search_value for char in SPECIAL_CHARACTERS)
+
+
+def compile_search_query(search_value, model, fields):
+	"""Compile a search query into a single filter.
+
+	Comparisons on unknown fields, or with values invalid for the field type,
+	match all rows.
+
+	Args:
+		search_value (str): Search query.
+		model (django.db.models.Model): Model searched.
+		fields (dict): Searchable fields of the model, by name.
+
+	Returns:
+		django.db.models.Q: Filter.
+	"""
+	return compile_node(parse_search_query(search_value), model, fields)
+
+
+@lru_cache(maxsize=1024)
+def parse_search_query(search_value):
+	"""Parse a search query.
+
+	Comparisons (`field=value`, `field!value`, `field>value`, ...) are
+	combined with `&`, binding tighter than `|`, and grouped with parentheses.
+	Fields and values are case insensitive.
+
+	Args:
+		search_value (str): Search query.
+
+	Returns:
+		Comparison | And | Or: Root node, or None if the query is empty.
+	"""
+	return SearchQueryParser(search_value).parse()
+
+
+class SearchQueryParser:
+	"""Recursive descent parser of search queries, see `parse_search_query`."""
+
+	def __init__(self, text):
+		self.text = text
+		self.pos = 0
+		self.depth = 0
+
+	def parse(self):
+		return self.parse_or()
+
+	def peek(self):
+		while self.pos < len(self.text) and self.text[self.pos].isspace():
+			self.pos += 1
+		return self.text[self.pos] if self.pos < len(self.text) else None
+
+	def parse_or(self):
+		operands = [self.parse_and()]
+		while self.peek() == '|':
+			self.pos += 1
+			operands.append(self.parse_and())
+		return make_node(Or, operands)
+
+	def parse_and(self):
+		operands = [self.parse_operand()]
+		while self.peek() == '&':
+			self.pos += 1
+			operands.append(self.parse_operand())
+		return make_node(And, operands)
+
+	def parse_operand(self):
+		if self.peek() == '(':
+			self.pos += 1
+			self.depth += 1
+			node = self.parse_or()
+			if self.peek() == ')':
+				self.pos += 1
+			self.depth -= 1
+			return node
+		# Closing parentheses outside of groups are part of values
+		start = self.pos
+		while self.pos < len(self.text):
+			char = self.text[self.pos]
+			if char in '&|' or (char == ')' and self.depth):
+				break
+			self.pos += 1
+		return parse_comparison(self.text[start:self.pos])
+
+
+def make_node(node_type, operands):
+	operands = tuple(operand for operand in operands if operand is not None)
+	if len(operands) > 1:
+		return node_type(operands)
+	return operands[0] if operands else None
+
+
+def parse_comparison(text):
+	"""Parse a `field<operator>value` comparison. The operator is the first
+	one in the text, the value may contain other operators."""
+	if not text.strip():
+		return None
+	for pos, char in enumerate(text):
+		if char not in '=!<>':
+			continue
+		operator = next(operator for operator in OPERATORS if text.startswith(operator, pos))
+		return Comparison(
+			text[:pos].strip().lower(),
+			operator,
+			text[pos + len(operator):].strip().lower())
+	return Comparison(text.strip().lower(), None, '')
+
+
+def compile_node(node, model, fields):
+	if isinstance(node, And):
+		return reduce(and_, [compile_node(operand, model, fields) for operand in node.operands])
+	if isinstance(node, Or):
+		return reduce(or_, [compile_node(operand, model, fields) for operand in node.operands])
+	if isinstance(node, Comparison):
+		return compile_comparison(node, model, fields)
+	return MATCH_ALL
+
+
+def get_search_field(fields, name):
+	"""Get the searchable field named in a comparison, or else the first one
+	whose name is part of it (`subdomain_name` searches `name`)."""
+	if name in fields:
+		return fields[name]
+	return next((field for field_name, field in fields.items() if field_name in name), None)
+
+
+def compile_comparison(comparison, model, fields):
+	field = get_search_field(fields, comparison.field)
+	if not field or comparison.operator not in TYPE_LOOKUPS[field.type]:
+		return MATCH_ALL
+	try:
+		value = TYPE_PARSERS[field.type](comparison.value)
+	except ValueError:
+		return MATCH_ALL
+	lookup = TYPE_LOOKUPS[field.type][comparison.operator]
+	q = reduce(or_, [
+		Q(**{f'{path}{LOOKUP_SEP}{lookup or TYPE_LOOKUPS[field.type]["="]}': value})
+		for path in field.paths
+	])
+	if is_multi_valued(model, field.paths[0]):
+		# Matched in a subquery, so that the comparison neither duplicates
+		# rows nor shares its joins with other comparisons
+		q = Q(Exists(model.objects.filter(q, pk=OuterRef('pk'))))
+	return q if lookup else ~q
+
+
+def is_multi_valued(model, path):
+	field = model._meta.get_field(path.split(LOOKUP_SEP)[0])
+	return field.many_to_many or field.one_to_many
@@ -1,9 +1,9 @@
-from collections import defaultdict
 from dashboard.models import *
 from django.contrib.humanize.templatetags.humanize import (naturalday, naturaltime)
-from django.db.models import F, JSONField, Value
+from django.db.models import Manager, QuerySet, prefetch_related_objects
 from recon_note.models import *
 from reNgine.common_func import *
+from reNgine.definitions import CELERY_TASK_STATUS_MAP
 from rest_framework import serializers
 from scanEngine.models import *
 from startScan.models import *
@@ -17,6 +17,17 @@ class SearchHistorySerializer(serializers.ModelSerializer):
 		fields = ['query']
 
 
+class ToolJobSerializer(serializers.ModelSerializer):
+	status = serializers.SerializerMethodField()
+
+	class Meta:
+		model = ToolJob
+		fields = ['id', 'tool', 'params', 'status', 'result', 'error_message', 'created_at', 'completed_at']
+
+	def get_status(self, job):
+		return CELERY_TASK_STATUS_MAP.get(job.status)
+
+
 class DomainSerializer(serializers.ModelSerializer):
 	vuln_count = serializers.SerializerMethodField()
 	organization = serializers.SerializerMethodField()
@@ -154,11 +165,17 @@ class SubScanSerializer(serializers.ModelSerializer):
 
 
 class CommandSerializer(serializers.ModelSerializer):
+
+	output = serializers.SerializerMethodField('get_output')
+
 	class Meta:
 		model = Command
 		fields = '__all__'
 		depth = 1
 
+	def get_output(self, command):
+		return command.get_output()
+
 
 class ScanHistorySerializer(serializers.ModelSerializer):
 
@@ -257,461 +274,6 @@ class OrganizationTargetsSerializer(serializers.ModelSerializer):
 		]
 
 
-class VisualiseVulnerabilitySerializer(serializers.ModelSerializer):
-
-	description = serializers.SerializerMethodField('get_description')
-
-	class Meta:
-		model = Vulnerability
-		fields = [
-			'description',
-			'http_url'
-		]
-
-	def get_description(self, vulnerability):
-		return vulnerability.name
-
-
-class VisualisePortSerializer(serializers.ModelSerializer):
-
-	description = serializers.SerializerMethodField('get_description')
-	title = serializers.SerializerMethodField('get_title')
-
-	class Meta:
-		model = Port
-		fields = [
-			'description',
-			'is_uncommon',
-			'title',
-		]
-
-	def get_description(self, port):
-		return str(port.number) + "/" + str(port.service_name)
-
-	def get_title(self, port):
-		if port.is_uncommon:
-			return "Uncommon Port"
-
-
-class VisualiseTechnologySerializer(serializers.ModelSerializer):
-
-	description = serializers.SerializerMethodField('get_description')
-
-	class Meta:
-		model = Technology
-		fields = [
-			'description'
-		]
-
-	def get_description(self, tech):
-		return tech.name
-
-
-class VisualiseIpSerializer(serializers.ModelSerializer):
-
-	description = serializers.SerializerMethodField('get_description')
-	children = serializers.SerializerMethodField('get_children')
-
-	class Meta:
-		model = IpAddress
-		fields = [
-			'description',
-			'children'
-		]
-
-	def get_description(self, Ip):
-		return Ip.address
-
-	def get_children(self, ip):
-		port = Port.objects.filter(
-			ports__in=IpAddress.objects.filter(
-				address=ip))
-		serializer = VisualisePortSerializer(port, many=True)
-		return serializer.data
-
-
-class VisualiseEndpointSerializer(serializers.ModelSerializer):
-
-	description = serializers.SerializerMethodField('get_description')
-
-	class Meta:
-		model = EndPoint
-		fields = [
-			'description',
-			'http_url'
-		]
-
-	def get_description(self, endpoint):
-		return endpoint.http_url
-
-
-class VisualiseSubdomainSerializer(serializers.ModelSerializer):
-
-	children = serializers.SerializerMethodField('get_children')
-	description = serializers.SerializerMethodField('get_description')
-	title = serializers.SerializerMethodField('get_title')
-
-	class Meta:
-		model = Subdomain
-		fields = [
-			'description',
-			'children',
-			'http_status',
-			'title',
-		]
-
-	def get_description(self, subdomain):
-		return subdomain.name
-
-	def get_title(self, subdomain):
-		if get_interesting_subdomains(subdomain.scan_history.id).filter(name=subdomain.name).exists():
-			return "Interesting"
-
-	def get_children(self, subdomain_name):
-		scan_history = self.context.get('scan_history')
-		subdomains = (
-			Subdomain.objects
-			.filter(scan_history=scan_history)
-			.filter(name=subdomain_name)
-		)
-
-		ips = IpAddress.objects.filter(ip_addresses__in=subdomains)
-		ip_serializer = VisualiseIpSerializer(ips, many=True)
-
-		# endpoint = EndPoint.objects.filter(
-		#     scan_history=self.context.get('scan_history')).filter(
-		#     subdomain__name=subdomain_name)
-		# endpoint_serializer = VisualiseEndpointSerializer(endpoint, many=True)
-
-		technologies = Technology.objects.filter(technologies__in=subdomains)
-		tech_serializer = VisualiseTechnologySerializer(technologies, many=True)
-
-		vulnerability = (
-			Vulnerability.objects
-			.filter(scan_history=scan_history)
-			.filter(subdomain=subdomain_name)
-		)
-
-		return_data = []
-		if ip_serializer.data:
-			return_data.append({
-				'description': 'IPs',
-				'children': ip_serializer.data
-			})
-		# if endpoint_serializer.data:
-		#     return_data.append({
-		#         'description': 'Endpoints',
-		#         'children': endpoint_serializer.data
-		#     })
-		if tech_serializer.data:
-			return_data.append({
-				'description': 'Technologies',
-				'children': tech_serializer.data
-			})
-
-		if vulnerability:
-			vulnerability_data = []
-			critical = vulnerability.filter(severity=4)
-			if critical:
-				critical_serializer = VisualiseVulnerabilitySerializer(
-					critical,
-					many=True
-				)
-				vulnerability_data.append({
-					'description': 'Critical',
-					'children': critical_serializer.data
-				})
-			high = vulnerability.filter(severity=3)
-			if high:
-				high_serializer = VisualiseVulnerabilitySerializer(
-					high,
-					many=True
-				)
-				vulnerability_data.append({
-					'description': 'High',
-					'children': high_serializer.data
-				})
-			medium = vulnerability.filter(severity=2)
-			if medium:
-				medium_serializer = VisualiseVulnerabilitySerializer(
-					medium,
-					many=True
-				)
-				vulnerability_data.append({
-					'description': 'Medium',
-					'children': medium_serializer.data
-				})
-			low = vulnerability.filter(severity=1)
-			if low:
-				low_serializer = VisualiseVulnerabilitySerializer(
-					low,
-					many=True
-				)
-				vulnerability_data.append({
-					'description': 'Low',
-					'children': low_serializer.data
-				})
-			info = vulnerability.filter(severity=0)
-			if info:
-				info_serializer = VisualiseVulnerabilitySerializer(
-					info,
-					many=True
-				)
-				vulnerability_data.append({
-					'description': 'Informational',
-					'children': info_serializer.data
-				})
-			uknown = vulnerability.filter(severity=-1)
-			if uknown:
-				uknown_serializer = VisualiseVulnerabilitySerializer(
-					uknown,
-					many=True
-				)
-				vulnerability_data.append({
-					'description': 'Unknown',
-					'children': uknown_serializer.data
-				})
-
-			if vulnerability_data:
-				return_data.append({
-					'description': 'Vulnerabilities',
-					'children': vulnerability_data
-				})
-
-		if subdomain_name.screenshot_path:
-			return_data.append({
-				'description': 'Screenshot',
-				'screenshot_path': subdomain_name.screenshot_path
-			})
-		return return_data
-
-
-class VisualiseEmailSerializer(serializers.ModelSerializer):
-	title = serializers.SerializerMethodField('get_title')
-	description = serializers.SerializerMethodField('get_description')
-
-	class Meta:
-		model = Email
-		fields = [
-			'description',
-			'password',
-			'title'
-		]
-
-	def get_description(self, email):
-		if email.password:
-			return email.address + " > " + email.password
-		return email.address
-
-	def get_title(self, email):
-		if email.password:
-			return "Exposed Creds"
-
-
-class VisualiseDorkSerializer(serializers.ModelSerializer):
-
-	title = serializers.SerializerMethodField('get_title')
-	description = serializers.SerializerMethodField('get_description')
-	http_url = serializers.SerializerMethodField('get_http_url')
-
-	class Meta:
-		model = Dork
-		fields = [
-			'title',
-			'description',
-			'http_url'
-		]
-
-	def get_title(self, dork):
-		return dork.type
-
-	def get_description(self, dork):
-		return dork.type
-
-	def get_http_url(self, dork):
-		return dork.url
-
-
-class VisualiseEmployeeSerializer(serializers.ModelSerializer):
-
-	description = serializers.SerializerMethodField('get_description')
-
-	class Meta:
-		model = Employee
-		fields = [
-			'description'
-		]
-
-	def get_description(self, employee):
-		if employee.designation:
-			return employee.name + '--' + employee.designation
-		return employee.name
-
-
-class VisualiseDataSerializer(serializers.ModelSerializer):
-
-	title = serializers.ReadOnlyField(default='Target')
-	description = serializers.SerializerMethodField('get_description')
-	children = serializers.SerializerMethodField('get_children')
-
-	class Meta:
-		model = ScanHistory
-		fields = [
-			'description',
-			'title',
-			'children',
-		]
-
-	def get_description(self, scan_history):
-		return scan_history.domain.name
-
-	def get_children(self, history):
-		scan_history = ScanHistory.objects.filter(id=history.id)
-
-		subdomain = Subdomain.objects.filter(scan_history=history)
-		subdomain_serializer = VisualiseSubdomainSerializer(
-			subdomain,
-			many=True,
-			context={'scan_history': history})
-
-		processed_subdomains = self.process_subdomains(subdomain_serializer.data)
-
-		email = Email.objects.filter(emails__in=scan_history)
-		email_serializer = VisualiseEmailSerializer(email, many=True)
-
-		dork = Dork.objects.filter(dorks__in=scan_history)
-		dork_serializer = VisualiseDorkSerializer(dork, many=True)
-		processed_dorks = self.process_dorks(dork_serializer.data)
-
-		employee = Employee.objects.filter(employees__in=scan_history)
-		employee_serializer = VisualiseEmployeeSerializer(employee, many=True)
-
-		metainfo = MetaFinderDocument.objects.filter(
-			scan_history__id=history.id)
-
-		return_data = []
-
-		if processed_subdomains:
-			return_data.append({
-				'description': 'Subdomains',
-				'children': processed_subdomains})
-
-		osint_data = []
-		if email_serializer.data:
-			osint_data.append({
-				'description': 'Emails',
-				'children': email_serializer.data})
-		if employee_serializer.data:
-			osint_data.append({
-				'description': 'Employees',
-				'children': employee_serializer.data})
-		if processed_dorks:
-			osint_data.append({
-				'description': 'Dorks',
-				'children': processed_dorks})
-
-		if metainfo:
-			metainfo_data = []
-			usernames = (
-				metainfo
-				.annotate(description=F('author'))
-				.values('description')
-				.distinct()
-				.annotate(children=Value([], output_field=JSONField()))
-				.filter(author__isnull=False)
-			)
-
-			if usernames:
-				metainfo_data.append({
-					'description': 'Usernames',
-					'children': usernames})
-
-			software = (
-				metainfo
-				.annotate(description=F('producer'))
-				.values('description')
-				.distinct()
-				.annotate(children=Value([], output_field=JSONField()))
-				.filter(producer__isnull=False)
-			)
-
-			if software:
-				metainfo_data.append({
-					'description': 'Software',
-					'children': software})
-
-			os = (
-				metainfo
-				.annotate(description=F('os'))
-				.values('description')
-				.distinct()
-				.annotate(children=Value([], output_field=JSONField()))
-				.filter(os__isnull=False)
-			)
-
-			if os:
-				metainfo_data.append({
-					'description': 'OS',
-					'children': os})
-
-			if metainfo:
-				osint_data.append({
-					'description':'Metainfo',
-					'children': metainfo_data})
-
-			return_data.append({
-				'description':'OSINT',
-				'children': osint_data})
-
-		if osint_data:
-			return_data.append({
-				'description':'OSINT',
-				'children': osint_data})
-
-		return return_data
-
-	def process_subdomains(self, subdomains):
-		for subdomain in subdomains:
-			if 'children' in subdomain:
-				vuln_dict = defaultdict(list)
-				for child in subdomain['children']:
-					if child.get('description') == 'Vulnerabilities':
-						for vuln_severity in child['children']:
-							severity = vuln_severity['description']
-							for vuln in vuln_severity['children']:
-								vuln_key = (vuln['description'], severity)
-								if vuln_key not in vuln_dict:
-									vuln_dict[vuln_key] = vuln
-
-				# Reconstruct vulnerabilities structure without duplicates
-				new_vuln_structure = []
-				for severity in ['Critical', 'High', 'Medium', 'Low', 'Informational', 'Unknown']:
-					severity_vulns = [v for k, v in vuln_dict.items() if k[1] == severity]
-					if severity_vulns:
-						new_vuln_structure.append({
-							'description': severity,
-							'children': severity_vulns
-						})
-
-				# Replace old structure with new
-				subdomain['children'] = [child for child in subdomain['children'] if child.get('description') != 'Vulnerabilities']
-				if new_vuln_structure:
-					subdomain['children'].append({
-						'description': 'Vulnerabilities',
-						'children': new_vuln_structure
-					})
-
-		return subdomains
-	
-	def process_dorks(self, dorks):
-		unique_dorks = {}
-		for dork in dorks:
-			dork_key = (dork['description'], dork.get('dork_type', ''))
-			if dork_key not in unique_dorks:
-				unique_dorks[dork_key] = dork
-
-		return list(unique_dorks.values())
-
 class SubdomainChangesSerializer(serializers.ModelSerializer):
 
 	change = serializers.SerializerMethodField('get_change')
@@ -861,6 +423,28 @@ class WafSerializer(serializers.ModelSerializer):
 		fields = '__all__'
 
 
+class SubdomainListSerializer(serializers.ListSerializer):
+	"""Serialize subdomains annotated by `annotate_subdomains` with their
+	related objects prefetched, instead of querying them for each subdomain."""
+
+	def to_representation(self, data):
+		if isinstance(data, Manager):
+			data = data.all()
+		if isinstance(data, QuerySet) and not data.query.is_sliced and not data.query.combinator:
+			data = annotate_subdomains(data).prefetch_related(*SUBDOMAIN_RELATED_OBJECTS)
+		else:
+			# Page of subdomains, annotated with one more query
+			data = list(data)
+			counts = annotate_subdomains(Subdomain.objects.filter(id__in=[subdomain.id for subdomain in data]))
+			fields = list(counts.query.annotations)
+			counts = {row['id']: row for row in counts.values('id', *fields)}
+			for subdomain in data:
+				for field in fields:
+					setattr(subdomain, field, counts.get(subdomain.id, {}).get(field))
+			prefetch_related_objects(data, *SUBDOMAIN_RELATED_OBJECTS)
+		return super().to_representation(data)
+
+
 class SubdomainSerializer(serializers.ModelSerializer):
 
 	vuln_count = serializers.SerializerMethodField('get_vuln_count')
@@ -885,8 +469,14 @@ class SubdomainSerializer(serializers.ModelSerializer):
 	class Meta:
 		model = Subdomain
 		fields = '__all__'
+		list_serializer_class = SubdomainListSerializer
+
+	# Subdomains serialized alone are not annotated, their counts are
+	# queried from the Subdomain properties
 
 	def get_is_interesting(self, subdomain):
+		if hasattr(subdomain, 'is_interesting'):
+			return subdomain.is_interesting
 		scan_id = subdomain.scan_history.id if subdomain.scan_history else None
 		return (
 			get_interesting_subdomains(scan_id)
@@ -894,31 +484,38 @@ class SubdomainSerializer(serializers.ModelSerializer):
 			.exists()
 		)
 
+	def get_count(self, subdomain, name):
+		if hasattr(subdomain, name):
+			return getattr(subdomain, name)
+		return getattr(subdomain, f'get_{name}')
+
 	def get_endpoint_count(self, subdomain):
-		return subdomain.get_endpoint_count
+		return self.get_count(subdomain, 'endpoint_count')
 
 	def get_info_count(self, subdomain):
-		return subdomain.get_info_count
+		return self.get_count(subdomain, 'info_count')
 
 	def get_low_count(self, subdomain):
-		return subdomain.get_low_count
+		return self.get_count(subdomain, 'low_count')
 
 	def get_medium_count(self, subdomain):
-		return subdomain.get_medium_count
+		return self.get_count(subdomain, 'medium_count')
 
 	def get_high_count(self, subdomain):
-		return subdomain.get_high_count
+		return self.get_count(subdomain, 'high_count')
 
 	def get_critical_count(self, subdomain):
-		return subdomain.get_critical_count
+		return self.get_count(subdomain, 'critical_count')
 
 	def get_directories_count(self, subdomain):
-		return subdomain.get_directories_count
+		return self.get_count(subdomain, 'directories_count')
 
 	def get_subscan_count(self, subdomain):
-		return subdomain.get_subscan_count
+		return self.get_count(subdomain, 'subscan_count')
 
 	def get_todos_count(self, subdomain):
+		if hasattr(subdomain, 'todos_count'):
+			return subdomain.todos_count
 		return len(subdomain.get_todos.filter(is_done=False))
 
 	def get_vuln_count(self, obj):
@@ -0,0 +1,104 @@
+"""
+This file contains the test cases for the datatables keyset pagination.
+"""
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from api.pagination import get_count, get_keyset_ordering
+from startScan.models import EndPoint, Subdomain
+from utils.test_base import BaseTestCase
+from utils.test_utils import FakeRedis
+
+__all__ = [
+    'TestDatatablesKeysetPagination',
+]
+
+
+class TestDatatablesKeysetPagination(BaseTestCase):
+    """Test datatables pages are seeked after the last row of the previous page."""
+
+    def setUp(self):
+        super().setUp()
+        self.data_generator.create_project_base()
+        patcher = patch('api.pagination.cache', FakeRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Duplicate and NULL sort keys, sorted by id
+        for i in range(20):
+            Subdomain.objects.create(
+                name=f'sub{i}.example.com',
+                scan_history=self.data_generator.scan_history,
+                target_domain=self.data_generator.domain,
+                content_length=None if i % 5 == 0 else i % 3)
+
+    def get_page(self, start, length, direction):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('api:subdomain-datatable-list'),
+                {
+                    'project': self.data_generator.project.slug,
+                    'scan_id': self.data_generator.scan_history.id,
+                    'format': 'datatables',
+                    'draw': 1,
+                    'start': start,
+                    'length': length,
+                    'order[0][column]': 8,
+                    'order[0][dir]': direction,
+                })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, [query['sql'] for query in queries]
+
+    def test_pages_seeked(self):
+        """Test paging through results returns the rows of OFFSET pagination without OFFSET."""
+        subdomains = Subdomain.objects.filter(scan_history=self.data_generator.scan_history)
+        for direction, ordering in [('asc', ('content_length', 'id')), ('desc', ('-content_length', '-id'))]:
+            ids = []
+            for start in range(0, 21, 6):
+                data, queries = self.get_page(start, 6, direction)
+                self.assertEqual(data['recordsTotal'], 21)
+                self.assertEqual(data['recordsFiltered'], 21)
+                ids += [subdomain['id'] for subdomain in data['data']]
+                if start:
+                    self.assertFalse(any('OFFSET' in query for query in queries))
+            self.assertEqual(ids, list(subdomains.order_by(*ordering).values_list('id', flat=True)))
+
+    def test_page_offset_fallback(self):
+        """Test pages reached without the previous one are skipped to."""
+        data, queries = self.get_page(12, 6, 'asc')
+        self.assertTrue(any('OFFSET 12' in query for query in queries))
+        self.assertEqual(
+            [subdomain['id'] for subdomain in data['data']],
+            list(
+                Subdomain.objects
+                .filter(scan_history=self.data_generator.scan_history)
+                .order_by('content_length', 'id')
+                .values_list('id', flat=True)[12:18]))
+
+    def test_count_cached(self):
+        """Test the rows are counted once for all the pages."""
+        _, queries = self.get_page(0, 6, 'asc')
+        self.assertTrue(any(query.startswith('SELECT COUNT(*)') for query in queries))
+        _, queries = self.get_page(6, 6, 'asc')
+        self.assertFalse(any(query.startswith('SELECT COUNT(*)') for query in queries))
+
+    def test_keyset_ordering(self):
+        """Test only querysets sorted on one column of their model are seeked."""
+        self.assertEqual(get_keyset_ordering(Subdomain.objects.order_by('-http_status')), [('http_status', True), ('id', True)])
+        self.assertEqual(get_keyset_ordering(EndPoint.objects.order_by('pk')), [('id', False)])
+        self.assertIsNone(get_keyset_ordering(Subdomain.objects.all()))
+        self.assertIsNone(get_keyset_ordering(EndPoint.objects.order_by('techs')))
+        self.assertIsNone(get_keyset_ordering(Subdomain.objects.order_by('name', 'http_status')))
+
+    def test_estimated_count(self):
+        """Test large unfiltered tables are not counted."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE "startScan_subdomain"')
+        count = Subdomain.objects.count()
+        with patch('api.pagination.DATATABLES_ESTIMATE_THRESHOLD', 10), self.assertNumQueries(1):
+            self.assertGreaterEqual(get_count(Subdomain.objects.all()), 10)
+        with patch('api.pagination.DATATABLES_ESTIMATE_THRESHOLD', 1000), self.assertNumQueries(2):
+            self.assertEqual(get_count(Subdomain.objects.all()), count)
@@ -1,10 +1,19 @@
 """
 This file contains the test cases for the API views.
 """
+import gzip
 import json
+import random
 from unittest.mock import patch
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from reNgine.asset_changes import diff_scans
+from reNgine.definitions import SUCCESS_TASK
+from reNgine.visualisation import build_visualisation
+from startScan.models import ScanVisualisation, SubScan, Subdomain, Vulnerability
 from utils.test_base import BaseTestCase
 
 __all__ = [
@@ -16,6 +25,7 @@ __all__ = [
     'TestInitiateSubTask',
     'TestListEngines',
     'TestVisualiseData',
+    'TestScanDiff',
     'TestListTechnology',
     'TestDirectoryViewSet',
     'TestListSubScans',
@@ -184,6 +194,118 @@ class TestVisualiseData(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreaterEqual(len(response.data), 1)
         self.assertEqual(response.data["description"], self.data_generator.domain.name)
+        subdomains, osint = response.data["children"]
+        subdomain = subdomains["children"][0]
+        self.assertEqual(subdomain["description"], self.data_generator.subdomain.name)
+        self.assertEqual(
+            [child["description"] for child in subdomain["children"]],
+            ["IPs", "Technologies", "Vulnerabilities"])
+        self.assertEqual(
+            [child["description"] for child in osint["children"]],
+            ["Emails", "Employees", "Dorks", "Metainfo"])
+
+    def test_visualise_data_query_count(self):
+        """Test the graph is built with the same number of queries whatever the number of subdomains."""
+        scan = self.data_generator.scan_history
+        with CaptureQueriesContext(connection) as queries:
+            build_visualisation(scan)
+        for i in range(10):
+            subdomain = self.data_generator.create_subdomain(f"sub{i}.example.com")
+            subdomain.ip_addresses.add(self.data_generator.ip_address)
+            subdomain.technologies.add(self.data_generator.technology)
+            Vulnerability.objects.create(
+                name="Common Vulnerability",
+                scan_history=scan,
+                subdomain=subdomain,
+                severity=3,
+                discovered_date=timezone.now())
+        with self.assertNumQueries(len(queries)):
+            visualisation = build_visualisation(scan)
+        self.assertEqual(len(visualisation["children"][0]["children"]), 11)
+
+    def test_visualise_data_etag(self):
+        """Test the stored graph is served with an ETag, and built again when results change."""
+        url = reverse("api:queryAllScanResultVisualise")
+        params = {"scan_id": self.data_generator.scan_history.id}
+        visualisations = ScanVisualisation.objects.filter(scan_history=self.data_generator.scan_history)
+
+        # Not stored while a subscan is running
+        self.client.get(url, params)
+        self.assertFalse(visualisations.exists())
+
+        SubScan.objects.update(status=SUCCESS_TASK)
+        response = self.client.get(url, params)
+        etag = response["ETag"]
+        self.assertTrue(visualisations.exists())
+
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        data = self.client.get(url, params).data
+        response = self.client.get(url, params, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.content)), data)
+
+        self.client.post(
+            reverse("api:delete_subdomain"),
+            {"subdomain_ids": [str(self.data_generator.subdomain.id)]})
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class TestScanDiff(BaseTestCase):
+    """Test case for diffing the assets of two scans."""
+
+    def setUp(self):
+        """Set up test environment."""
+        super().setUp()
+        self.data_generator.create_project_base()
+        self.previous_scan = self.data_generator.scan_history
+        self.scan = self.data_generator.create_scan_history()
+
+    def create_subdomains(self, scan, names):
+        Subdomain.objects.bulk_create([
+            Subdomain(name=name, target_domain=self.data_generator.domain, scan_history=scan)
+            for name in names
+        ])
+
+    def test_diff_scans(self):
+        """Test the sorted merge of the scan assets gives the set differences of their names."""
+        rand = random.Random(0)
+        pool = [f"sub{i}.example.com" for i in range(60)]
+        for _ in range(5):
+            Subdomain.objects.filter(scan_history__in=[self.previous_scan, self.scan]).delete()
+            # Names found twice in a scan are compared once
+            previous_names = rand.sample(pool, rand.randint(0, 40))
+            names = rand.sample(pool, rand.randint(0, 40))
+            self.create_subdomains(self.previous_scan, previous_names + previous_names[:3])
+            self.create_subdomains(self.scan, names + names[:3])
+            self.assertEqual(diff_scans(self.previous_scan.id, self.scan.id, "subdomain"), {
+                "added": sorted(set(names) - set(previous_names)),
+                "removed": sorted(set(previous_names) - set(names)),
+                "unchanged_count": len(set(names) & set(previous_names)),
+            })
+
+    def test_scan_diff_api(self):
+        """Test diffing the endpoints of any two scans through the API."""
+        self.data_generator.create_endpoint("endpoint2")
+        url = reverse("api:scan_diff")
+        response = self.client.get(url, {
+            "scan_id": self.scan.id,
+            "previous_scan_id": self.previous_scan.id,
+            "type": "endpoint"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            "status": True,
+            "added": ["https://admin.example.com/endpoint2"],
+            "removed": ["https://admin.example.com/endpoint"],
+            "unchanged_count": 0})
+
+        response = self.client.get(url, {"scan_id": self.scan.id, "previous_scan_id": self.previous_scan.id, "type": "port"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {"scan_id": self.scan.id, "previous_scan_id": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
 class TestListTechnology(BaseTestCase):
@@ -4,6 +4,7 @@ This file contains the test cases for the API views.
 
 from django.urls import reverse
 from rest_framework import status
+from startScan.models import ScanHistory, Subdomain
 from utils.test_base import BaseTestCase
 
 __all__ = [
@@ -71,3 +72,46 @@ class TestUniversalSearch(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertFalse(response.data["status"])
         self.assertNotIn("users", response.data["results"])
+
+    def test_universal_search_deduplicated(self):
+        """Test subdomains found by several scans are returned once."""
+        other_scan = ScanHistory.objects.get(pk=self.data_generator.scan_history.pk)
+        other_scan.pk = None
+        other_scan.save()
+        latest = Subdomain.objects.create(
+            name="admin.example.com",
+            scan_history=other_scan,
+            target_domain=self.data_generator.domain)
+        api_url = reverse("api:search")
+        response = self.client.get(api_url, {"query": "admin", "type": "subdomains"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["counts"], {"subdomains": 1})
+        self.assertEqual(
+            [(sub["id"], sub["name"]) for sub in response.data["results"]["subdomains"]],
+            [(latest.id, "admin.example.com")])
+        self.assertNotIn("endpoints", response.data["results"])
+
+    def test_universal_search_paginated(self):
+        """Test results are paginated and counted separately."""
+        Subdomain.objects.bulk_create([
+            Subdomain(
+                name=f"paged{i:02}.example.com",
+                scan_history=self.data_generator.scan_history,
+                target_domain=self.data_generator.domain)
+            for i in range(25)
+        ])
+        api_url = reverse("api:search")
+        response = self.client.get(api_url, {"query": "paged", "page": 3, "page_size": 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["status"])
+        self.assertEqual(response.data["counts"]["subdomains"], 25)
+        self.assertEqual(
+            [sub["name"] for sub in response.data["results"]["subdomains"]],
+            [f"paged{i:02}.example.com" for i in range(20, 25)])
+
+    def test_universal_search_invalid_type(self):
+        """Test the universal search with an unknown result type."""
+        api_url = reverse("api:search")
+        response = self.client.get(api_url, {"query": "admin", "type": "users"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.data["status"])
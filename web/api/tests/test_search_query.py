@@ -0,0 +1,356 @@
+"""
+This file contains the test cases for the search query language of the
+subdomain, endpoint and vulnerability tables.
+"""
+import random
+
+from django.urls import reverse
+from rest_framework import status
+
+from api.search_query import (ENDPOINT_SEARCH_FIELDS, SUBDOMAIN_SEARCH_FIELDS,
+                              VULNERABILITY_SEARCH_FIELDS, And, Comparison, Or,
+                              compile_search_query, parse_search_query)
+from reNgine.definitions import NUCLEI_SEVERITY_MAP
+from startScan.models import (CveId, EndPoint, IpAddress, Port, Subdomain,
+                              Technology, Vulnerability, VulnerabilityTags)
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestSearchQueryParser',
+    'TestSearchQueryResults',
+]
+
+
+def legacy_lookup(paths, cast=str, lookup='icontains'):
+    """Legacy clause filtering on paths with a lookup, excluded with `!`."""
+    def apply(queryset, operator, content):
+        value = cast(content)
+        filters = [{f'{path}__{lookup}': value} for path in paths]
+        if operator == '!':
+            results = [queryset.exclude(**kwargs) for kwargs in filters]
+        else:
+            results = [queryset.filter(**kwargs) for kwargs in filters]
+        for result in results[1:]:
+            results[0] = results[0] | result
+        return results[0]
+    return apply
+
+
+def legacy_comparison(path, cast=int):
+    def apply(queryset, operator, content):
+        lookup = {'>': 'gt', '<': 'lt'}[operator]
+        return queryset.filter(**{f'{path}__{lookup}': cast(content)})
+    return apply
+
+
+# Clauses of the search implementation compiled by api.search_query, by
+# operator in the order they were looked for, then by field keyword in the
+# order they were matched against the field of the clause. Clauses it got
+# wrong are left out, see `test_fixed_lookups`.
+LEGACY_LOOKUPS = {
+    Subdomain: {
+        '=': [
+            ('name', legacy_lookup(['name'])),
+            ('page_title', legacy_lookup(['page_title'])),
+            ('http_url', legacy_lookup(['http_url'])),
+            ('webserver', legacy_lookup(['webserver'])),
+            ('ip_addresses', legacy_lookup(['ip_addresses__address'])),
+            ('is_important', legacy_lookup(['is_important'], lambda content: 'true' in content, 'exact')),
+            ('port', legacy_lookup([
+                'ip_addresses__ports__number',
+                'ip_addresses__ports__service_name',
+                'ip_addresses__ports__description'])),
+            ('technology', legacy_lookup(['technologies__name'])),
+            ('http_status', legacy_lookup(['http_status'], int, 'exact')),
+            ('content_length', legacy_lookup(['content_length'], int, 'exact')),
+        ],
+        '>': [
+            ('http_status', legacy_comparison('http_status')),
+            ('content_length', legacy_comparison('content_length')),
+        ],
+        '<': [
+            ('http_status', legacy_comparison('http_status')),
+            ('content_length', legacy_comparison('content_length')),
+        ],
+        '!': [
+            ('name', legacy_lookup(['name'])),
+            ('page_title', legacy_lookup(['page_title'])),
+            ('http_url', legacy_lookup(['http_url'])),
+            ('webserver', legacy_lookup(['webserver'])),
+            ('ip_addresses', legacy_lookup(['ip_addresses__address'])),
+            ('technology', legacy_lookup(['technologies__name'])),
+            ('http_status', legacy_lookup(['http_status'], int, 'exact')),
+            ('content_length', legacy_lookup(['content_length'], int, 'exact')),
+        ],
+    },
+    EndPoint: {
+        '=': [
+            ('http_url', legacy_lookup(['http_url'])),
+            ('page_title', legacy_lookup(['page_title'])),
+            ('webserver', legacy_lookup(['webserver'])),
+            ('technology', legacy_lookup(['techs__name'])),
+            ('gf_pattern', legacy_lookup(['matched_gf_patterns'])),
+            ('http_status', legacy_lookup(['http_status'], int, 'exact')),
+            ('content_length', legacy_lookup(['content_length'], int, 'exact')),
+        ],
+        '>': [
+            ('http_status', legacy_comparison('http_status')),
+            ('content_length', legacy_comparison('content_length')),
+        ],
+        '<': [
+            ('http_status', legacy_comparison('http_status')),
+            ('content_length', legacy_comparison('content_length')),
+        ],
+        '!': [
+            ('http_url', legacy_lookup(['http_url'])),
+            ('page_title', legacy_lookup(['page_title'])),
+            ('webserver', legacy_lookup(['webserver'])),
+            ('technology', legacy_lookup(['techs__name'])),
+            ('gf_pattern', legacy_lookup(['matched_gf_patterns'])),
+            ('http_status', legacy_lookup(['http_status'], int, 'exact')),
+            ('content_length', legacy_lookup(['content_length'], int, 'exact')),
+        ],
+    },
+    Vulnerability: {
+        '=': [
+            ('severity', legacy_lookup(['severity'], lambda content: NUCLEI_SEVERITY_MAP.get(content, -1), 'exact')),
+            ('name', legacy_lookup(['name'])),
+            ('http_url', legacy_lookup(['http_url'])),
+            ('cve', legacy_lookup(['cve_ids__name'])),
+            ('cvss_score', legacy_lookup(['cvss_score'], float, 'exact')),
+            ('type', legacy_lookup(['type'])),
+            ('tag', legacy_lookup(['tags__name'])),
+            ('status', legacy_lookup(['open_status'], lambda content: content == 'open', 'exact')),
+            ('description', legacy_lookup(['description', 'template', 'extracted_results'])),
+        ],
+        '!': [
+            ('name', legacy_lookup(['name'])),
+            ('http_url', legacy_lookup(['http_url'])),
+            ('type', legacy_lookup(['type'])),
+            ('status', legacy_lookup(['open_status'], lambda content: content == 'open', 'exact')),
+        ],
+        '>': [
+            ('cvss_score', legacy_comparison('cvss_score', float)),
+        ],
+    },
+}
+
+
+def legacy_special_lookup(queryset, search_value):
+    """Filter a queryset on a clause like the legacy implementation did."""
+    for operator, lookups in LEGACY_LOOKUPS[queryset.model].items():
+        if operator not in search_value:
+            continue
+        title, content = [part.lower().strip() for part in search_value.split(operator)[:2]]
+        for keyword, apply in lookups:
+            if keyword in title:
+                try:
+                    return apply(queryset, operator, content)
+                except ValueError:
+                    break
+        return queryset.filter()
+    return queryset.filter()
+
+
+def legacy_search(queryset, search_value):
+    """Filter a queryset on a search query like the legacy implementation did."""
+    if '&' in search_value:
+        results = queryset.filter()
+        for query in search_value.split('&'):
+            if query.strip():
+                results = results & legacy_special_lookup(queryset, query.strip())
+    elif '|' in search_value:
+        results = queryset.none()
+        for query in search_value.split('|'):
+            if query.strip():
+                results = legacy_special_lookup(queryset, query.strip()) | results
+    else:
+        results = legacy_special_lookup(queryset, search_value)
+    return results
+
+
+class TestSearchQueryParser(BaseTestCase):
+    """Test search queries are parsed into trees."""
+
+    def test_comparisons(self):
+        """Test the first operator of a comparison splits its field and value."""
+        self.assertEqual(parse_search_query(' Name = Admin '), Comparison('name', '=', 'admin'))
+        self.assertEqual(parse_search_query('content_length>=10'), Comparison('content_length', '>=', '10'))
+        self.assertEqual(parse_search_query('http_url!=a=b'), Comparison('http_url', '!=', 'a=b'))
+        self.assertEqual(parse_search_query('http_url!a'), Comparison('http_url', '!', 'a'))
+        self.assertEqual(parse_search_query('admin'), Comparison('admin', None, ''))
+        self.assertIsNone(parse_search_query(' & | '))
+
+    def test_precedence(self):
+        """Test `&` binds tighter than `|`, and parentheses group comparisons."""
+        a, b, c = [Comparison(field, '=', '1') for field in 'abc']
+        self.assertEqual(parse_search_query('a=1 | b=1 & c=1'), Or((a, And((b, c)))))
+        self.assertEqual(parse_search_query('(a=1 | b=1) & c=1'), And((Or((a, b)), c)))
+        self.assertEqual(parse_search_query('a=1 & & b=1 &'), And((a, b)))
+        self.assertEqual(
+            parse_search_query('page_title=home (1) & a=1'),
+            And((Comparison('page_title', '=', 'home (1)'), a)))
+
+    def test_parse_cached(self):
+        """Test each search query is parsed once."""
+        parse_search_query.cache_clear()
+        for _ in range(3):
+            parse_search_query('http_status=200 & name=admin')
+        self.assertEqual(parse_search_query.cache_info().misses, 1)
+
+
+class TestSearchQueryResults(BaseTestCase):
+    """Test search queries filter the rows the legacy implementation did, with a single query."""
+
+    def setUp(self):
+        super().setUp()
+        self.data_generator.create_project_base()
+        self.scan = self.data_generator.scan_history
+        self.random = random.Random(0)
+        techs = [Technology.objects.create(name=name) for name in ['Nginx', 'PHP', 'React']]
+        ports = [
+            Port.objects.create(number=number, service_name=service, description='open')
+            for number, service in [(80, 'http'), (443, 'https'), (8080, 'http-proxy')]
+        ]
+        cves = [CveId.objects.create(name=name) for name in ['CVE-2021-41773', 'CVE-2023-1234']]
+        tags = [VulnerabilityTags.objects.create(name=name) for name in ['git', 'exposure', 'rce']]
+        for i in range(12):
+            subdomain = Subdomain.objects.create(
+                name=f'{["admin", "api", "dev"][i % 3]}{i}.example.com',
+                scan_history=self.scan,
+                target_domain=self.data_generator.domain,
+                page_title=[None, 'Admin panel', 'Home'][i % 3],
+                http_url=f'https://host{i}.example.com',
+                cname=f'cdn{i % 2}.example.net' if i % 4 else None,
+                webserver=['nginx', 'apache', None][i % 3],
+                http_status=[200, 301, 404, 0][i % 4],
+                content_length=None if i % 5 == 0 else i * 100,
+                is_important=i % 3 == 0)
+            subdomain.technologies.add(*techs[:i % 4])
+            ip = IpAddress.objects.create(address=f'10.0.{i % 3}.{i}')
+            ip.ports.add(*ports[i % 3:])
+            if i % 6:
+                subdomain.ip_addresses.add(ip)
+            endpoint = EndPoint.objects.create(
+                http_url=f'https://host{i}.example.com/{["login", "api/v1", "static"][i % 3]}',
+                subdomain=subdomain,
+                scan_history=self.scan,
+                target_domain=self.data_generator.domain,
+                page_title=['Login', None, 'Static'][i % 3],
+                webserver=['nginx', 'apache'][i % 2],
+                matched_gf_patterns=['xss,lfi', None, 'ssrf'][i % 3],
+                http_status=[200, 403, 500][i % 3],
+                content_length=i * 10)
+            endpoint.techs.add(*techs[i % 3:])
+            vulnerability = Vulnerability.objects.create(
+                name=['Git Config Disclosure', 'Open Redirect', 'SQL Injection'][i % 3],
+                severity=i % 6 - 1,
+                subdomain=subdomain,
+                endpoint=endpoint,
+                scan_history=self.scan,
+                target_domain=self.data_generator.domain,
+                http_url=endpoint.http_url,
+                type=['http', 'dns', None][i % 3],
+                template=['git-config', 'redirect', 'sqli'][i % 3],
+                description=['Exposed git', None, 'Injection in login'][i % 3],
+                cvss_score=[None, 5.3, 7.5, 9.8][i % 4],
+                open_status=i % 2 == 0)
+            vulnerability.cve_ids.add(*cves[:i % 3])
+            vulnerability.tags.add(*tags[i % 3:])
+
+    def get_values(self, model):
+        """Values searched for: fragments of the stored values, and values
+        matching no row or invalid for the field type."""
+        fields = {
+            Subdomain: ['name', 'page_title', 'http_url', 'cname', 'webserver', 'ip_addresses__address',
+                        'ip_addresses__ports__service_name', 'technologies__name', 'http_status', 'content_length'],
+            EndPoint: ['http_url', 'page_title', 'webserver', 'techs__name', 'matched_gf_patterns',
+                       'http_status', 'content_length'],
+            Vulnerability: ['name', 'http_url', 'cve_ids__name', 'cvss_score', 'type', 'tags__name', 'template'],
+        }[model]
+        values = {'true', 'false', 'open', 'closed', 'info', 'high', 'critical', 'missing', '7', '-1'}
+        for row in model.objects.values_list(*fields):
+            for value in row:
+                if value is not None:
+                    value = str(value)
+                    start = self.random.randrange(len(value))
+                    values.update([value, value[start:start + self.random.randint(1, 5)]])
+        return sorted(values)
+
+    def generate_queries(self, model, count):
+        """Generate search queries with random fields, operators, values,
+        case and spacing, combined with `&` or `|`."""
+        lookups = LEGACY_LOOKUPS[model]
+        values = self.get_values(model)
+        for _ in range(count):
+            clauses = []
+            for _ in range(self.random.randint(1, 3)):
+                operator = self.random.choice(list(lookups))
+                field = self.random.choice(lookups[operator])[0]
+                value = self.random.choice(values).strip()
+                if self.random.random() < 0.2:
+                    field, value = field.upper(), value.upper()
+                spaces = ' ' * self.random.randint(0, 1)
+                clauses.append(f'{field}{spaces}{operator}{spaces}{value}')
+            yield f' {self.random.choice("&|")} '.join(clauses)
+
+    def test_legacy_results(self):
+        """Test random search queries match the rows matched by the legacy implementation."""
+        for model, fields in [
+                (Subdomain, SUBDOMAIN_SEARCH_FIELDS),
+                (EndPoint, ENDPOINT_SEARCH_FIELDS),
+                (Vulnerability, VULNERABILITY_SEARCH_FIELDS)]:
+            queryset = model.objects.filter(scan_history=self.scan).distinct()
+            for search_value in self.generate_queries(model, 150):
+                with self.subTest(model=model.__name__, search_value=search_value):
+                    results = queryset.filter(compile_search_query(search_value, model, fields))
+                    self.assertEqual(
+                        sorted(results.values_list('id', flat=True)),
+                        sorted(legacy_search(queryset, search_value).values_list('id', flat=True)))
+
+    def test_fixed_lookups(self):
+        """Test the lookups the legacy implementation got wrong."""
+        vulnerabilities = Vulnerability.objects.filter(scan_history=self.scan)
+
+        def search(search_value):
+            return vulnerabilities.filter(compile_search_query(search_value, Vulnerability, VULNERABILITY_SEARCH_FIELDS))
+
+        self.assertEqual(search('severity!high').count(), vulnerabilities.exclude(severity=3).count())
+        self.assertEqual(search('cve!2021').count(), vulnerabilities.exclude(cve_ids__name__icontains='2021').count())
+        self.assertEqual(search('template_id=x').count(), 0)
+        self.assertEqual(search('cvss_score<7.5').count(), vulnerabilities.filter(cvss_score__lt=7.5).count())
+        self.assertEqual(search('severity>=high').count(), vulnerabilities.filter(severity__gte=3).count())
+        self.assertEqual(search('tag=git & tag=rce').count(), vulnerabilities.filter(tags__name='git').filter(tags__name='rce').count())
+
+        subdomains = Subdomain.objects.filter(scan_history=self.scan)
+
+        def search_ids(search_value):
+            results = subdomains.filter(compile_search_query(search_value, Subdomain, SUBDOMAIN_SEARCH_FIELDS))
+            return sorted(results.values_list('id', flat=True))
+
+        self.assertEqual(
+            search_ids('port!http'),
+            sorted(subdomains.exclude(ip_addresses__ports__service_name__icontains='http').values_list('id', flat=True)))
+        self.assertEqual(search_ids('cname=.net'), sorted(subdomains.filter(cname__icontains='.net').values_list('id', flat=True)))
+        self.assertEqual(search_ids('is_important!true'), sorted(subdomains.filter(is_important=False).values_list('id', flat=True)))
+
+    def test_datatable_search(self):
+        """Test the subdomains table is searched with a single query."""
+        response = self.client.get(
+            reverse('api:subdomain-datatable-list'),
+            {
+                'project': self.data_generator.project.slug,
+                'scan_id': self.scan.id,
+                'format': 'datatables',
+                'draw': 1,
+                'start': 0,
+                'length': 50,
+                'search[value]': 'technology=php & (http_status=200 | http_status>300)',
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(subdomain['id'] for subdomain in response.data['data']),
+            sorted(
+                Subdomain.objects
+                .filter(scan_history=self.scan, technologies__name='PHP', http_status__in=[200, 301, 404])
+                .values_list('id', flat=True)))
@@ -2,9 +2,17 @@
 This file contains the test cases for the API views.
 """
 
+import json
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from startScan.models import Subdomain
+from api.serializers import SubdomainSerializer
+from reNgine.asset_changes import save_asset_changes
+from reNgine.definitions import RUNNING_TASK
+from startScan.models import AssetChange, EndPoint, IpAddress, ScanHistory, Subdomain, Vulnerability
 from utils.test_base import BaseTestCase
 
 __all__ = [
@@ -15,7 +23,8 @@ __all__ = [
     'TestSubdomainChangesViewSet',
     'TestToggleSubdomainImportantStatus',
     'TestSubdomainDatatableViewSet',
-    'TestInterestingSubdomainViewSet'
+    'TestInterestingSubdomainViewSet',
+    'TestSubdomainSerializerQueries'
 ]
 
 class TestQueryInterestingSubdomains(BaseTestCase):
@@ -107,6 +116,7 @@ class TestSubdomainChangesViewSet(BaseTestCase):
         """Set up test environment."""
         super().setUp()
         self.data_generator.create_project_base()
+        self.previous_scan = self.data_generator.scan_history
         self.data_generator.create_scan_history()
         self.data_generator.create_subdomain("admin1.example.com")
 
@@ -123,6 +133,61 @@ class TestSubdomainChangesViewSet(BaseTestCase):
         )
         self.assertEqual(response.data["results"][0]["change"], "added")
 
+    def test_subdomain_changes_stored(self):
+        """Test subdomain changes are read from the AssetChange rows of the scan."""
+        previous_scan = self.previous_scan
+        Subdomain.objects.create(name="www.example.com", target_domain=self.data_generator.domain, scan_history=previous_scan)
+        www = self.data_generator.create_subdomain("www.example.com")
+        save_asset_changes(self.data_generator.scan_history)
+        changes = AssetChange.objects.filter(scan_history=self.data_generator.scan_history, asset_type="subdomain")
+        self.assertEqual(
+            sorted(changes.values_list("subdomain__name", "change")),
+            [("admin.example.com", "removed"), ("admin1.example.com", "added"), ("www.example.com", "unchanged")])
+        self.assertEqual(changes.get(change="unchanged").subdomain, www)
+        self.assertTrue(all(change.previous_scan == previous_scan for change in changes))
+
+        url = reverse("api:subdomain-changes-list")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"scan_id": self.data_generator.scan_history.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(subdomain["name"], subdomain["change"]) for subdomain in response.data["results"]],
+            [("admin.example.com", "removed"), ("admin1.example.com", "added")])
+        self.assertFalse(any("EXCEPT" in query["sql"] for query in queries))
+
+    def test_subdomain_changes_computed_once(self):
+        """Test subdomain changes of scans without AssetChange rows are stored on first request."""
+        url = reverse("api:subdomain-changes-list")
+        self.assertFalse(AssetChange.objects.exists())
+        response = self.client.get(url, {"scan_id": self.data_generator.scan_history.id, "changes": "removed"})
+        self.assertEqual([subdomain["name"] for subdomain in response.data["results"]], ["admin.example.com"])
+        self.assertEqual(AssetChange.objects.filter(asset_type="subdomain").count(), 2)
+        with patch("reNgine.asset_changes.save_asset_changes") as save:
+            self.client.get(url, {"scan_id": self.data_generator.scan_history.id, "changes": "removed"})
+        save.assert_not_called()
+
+    def test_running_scan_changes_not_stored(self):
+        """Test subdomain changes of running scans are computed without being stored."""
+        ScanHistory.objects.filter(id=self.data_generator.scan_history.id).update(scan_status=RUNNING_TASK)
+        url = reverse("api:subdomain-changes-list")
+        response = self.client.get(url, {"scan_id": self.data_generator.scan_history.id})
+        self.assertEqual(
+            sorted((subdomain["name"], subdomain["change"]) for subdomain in response.data["results"]),
+            [("admin.example.com", "removed"), ("admin1.example.com", "added")])
+        self.assertFalse(AssetChange.objects.exists())
+
+    def test_first_scan_changes_stored(self):
+        """Test scans without a previous scan are marked as diffed."""
+        url = reverse("api:subdomain-changes-list")
+        response = self.client.get(url, {"scan_id": self.previous_scan.id})
+        self.assertEqual(response.data["results"], [])
+        marker = AssetChange.objects.get(scan_history=self.previous_scan, asset_type="subdomain")
+        self.assertIsNone(marker.previous_scan)
+        self.assertIsNone(marker.subdomain)
+        with patch("reNgine.asset_changes.save_asset_changes") as save:
+            self.client.get(url, {"scan_id": self.previous_scan.id})
+        save.assert_not_called()
+
 class TestToggleSubdomainImportantStatus(BaseTestCase):
     """Test case for toggling subdomain important status."""
 
@@ -220,3 +285,87 @@ class TestInterestingSubdomainViewSet(BaseTestCase):
         self.assertEqual(
             response.data["results"][0]["name"], self.data_generator.subdomain.name
         )
+
+def normalize(data):
+    """Serialized data with lists sorted, as related objects are unordered."""
+    if isinstance(data, dict):
+        return {key: normalize(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return sorted((normalize(item) for item in data), key=lambda item: json.dumps(item, sort_keys=True))
+    return data
+
+class TestSubdomainSerializerQueries(BaseTestCase):
+    """Test subdomains are serialized with a constant number of queries."""
+
+    def setUp(self):
+        """Set up test environment."""
+        super().setUp()
+        self.data_generator.create_project_full()
+        self.data_generator.create_interesting_lookup_model()
+        self.data_generator.directory_scan.directory_files.add(self.data_generator.directory_file)
+        self.data_generator.subdomain.directories.add(self.data_generator.directory_scan)
+
+    def create_subdomains(self, count):
+        scan = self.data_generator.scan_history
+        domain = self.data_generator.domain
+        for i in range(count):
+            subdomain = Subdomain.objects.create(
+                name=f"sub{i}.example.com",
+                scan_history=scan,
+                target_domain=domain,
+                page_title="Admin panel" if i % 2 else "Home")
+            ip = IpAddress.objects.create(address=f"10.0.0.{i}")
+            ip.ports.add(self.data_generator.port)
+            subdomain.ip_addresses.add(ip)
+            subdomain.technologies.add(*self.data_generator.subdomain.technologies.all())
+            endpoint = EndPoint.objects.create(
+                http_url=f"https://sub{i}.example.com/",
+                subdomain=subdomain,
+                scan_history=scan,
+                target_domain=domain)
+            Vulnerability.objects.create(
+                name="Vulnerability",
+                severity=i % 5,
+                subdomain=subdomain,
+                endpoint=endpoint,
+                scan_history=scan,
+                target_domain=domain)
+
+    def get_page(self, page_size):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("api:subdomain-datatable-list"),
+                {
+                    "project": self.data_generator.project.slug,
+                    "format": "datatables",
+                    "draw": 1,
+                    "start": 0,
+                    "length": page_size,
+                })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["data"], len(queries)
+
+    def test_counts_match_properties(self):
+        """Test annotated counts are the counts of the Subdomain properties."""
+        self.create_subdomains(5)
+        subdomains = Subdomain.objects.order_by("id")
+        annotated = SubdomainSerializer(subdomains, many=True).data
+        for subdomain, data in zip(subdomains, annotated):
+            self.assertEqual(normalize(data), normalize(SubdomainSerializer(subdomain).data))
+        admin = next(data for data in annotated if data["id"] == self.data_generator.subdomain.id)
+        self.assertTrue(admin["is_interesting"])
+        self.assertEqual(admin["low_count"], 1)
+        self.assertEqual(admin["directories_count"], 1)
+        self.assertEqual(admin["todos_count"], 1)
+        self.assertEqual(admin["subscan_count"], 1)
+
+    def test_query_count_per_page(self):
+        """Test the number of queries does not depend on the page size."""
+        self.create_subdomains(5)
+        results, query_count = self.get_page(3)
+        self.assertEqual(len(results), 3)
+        self.create_subdomains(30)
+        results, large_page_query_count = self.get_page(30)
+        self.assertEqual(len(results), 30)
+        self.assertEqual(large_page_query_count, query_count)
+        self.assertLessEqual(query_count, 20)
@@ -2,9 +2,16 @@
 This file contains the test cases for the API views.
 """
 
-from unittest.mock import patch
+import json
+from datetime import timedelta
+from unittest.mock import Mock, patch
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from dashboard.models import ToolJob
+from reNgine.definitions import FAILED_TASK, INITIATED_TASK, RUNNING_TASK
+from reNgine.settings import TOOL_JOB_TIMEOUT
+from reNgine.tasks import run_tool_job
 from startScan.models import SubScan
 from utils.test_base import BaseTestCase
 
@@ -12,6 +19,7 @@ __all__ = [
     'TestOllamaManager',
     'TestWafDetector',
     'TestCMSDetector',
+    'TestToolJobs',
     'TestGfList',
     'TestUpdateTool',
     'TestUninstallTool',
@@ -118,6 +126,142 @@ class TestCMSDetector(BaseTestCase):
         self.assertTrue(response.data["status"])
         self.assertEqual(response.data["cms"], "WordPress")
 
+class TestToolJobs(BaseTestCase):
+    """Test case for toolbox jobs."""
+
+    def setUp(self):
+        """Set up test environment."""
+        super().setUp()
+        patcher = patch("reNgine.tasks.run_tool_job.apply_async")
+        self.mock_apply_async = patcher.start()
+        self.mock_apply_async.return_value.id = "celery-id"
+        self.addCleanup(patcher.stop)
+
+    def post_job(self, data):
+        response = self.client.post(reverse("api:tool_jobs"), data)
+        return response, response.data.get("job")
+
+    def test_job_queued(self):
+        """Test jobs are returned without waiting for their task, and shared by identical lookups."""
+        response, job = self.post_job({"tool": "whois", "ip_domain": "example.com"})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(job["status"], "INITITATED")
+        self.assertEqual(job["params"], {"ip_domain": "example.com", "force_reload_whois": False})
+        self.mock_apply_async.assert_called_once_with(args=(job["id"],), queue="query_whois_queue")
+
+        _, same_job = self.post_job({"tool": "whois", "ip_domain": "example.com"})
+        self.assertEqual(same_job["id"], job["id"])
+        _, other_job = self.post_job({"tool": "whois", "ip_domain": "example.com", "is_reload": "true"})
+        self.assertNotEqual(other_job["id"], job["id"])
+        self.assertEqual(self.mock_apply_async.call_count, 2)
+
+    def test_job_timed_out(self):
+        """Test jobs running for too long are not shared anymore."""
+        _, job = self.post_job({"tool": "cms_detector", "url": "https://example.com"})
+        ToolJob.objects.filter(id=job["id"]).update(
+            status=RUNNING_TASK,
+            created_at=timezone.now() - timedelta(seconds=TOOL_JOB_TIMEOUT + 1))
+        _, new_job = self.post_job({"tool": "cms_detector", "url": "https://example.com"})
+        self.assertNotEqual(new_job["id"], job["id"])
+        self.assertEqual(ToolJob.objects.get(id=job["id"]).error_message, "Timed out")
+
+    @patch("reNgine.tasks.get_domain_historical_ip_address")
+    def test_queued_job_timed_out(self, mock_ip_history):
+        """Test jobs timed out in their queue are not run, and do not replace
+        the job queued again for the same lookup."""
+        _, job = self.post_job({"tool": "domain_ip_history", "domain": "example.com"})
+        ToolJob.objects.filter(id=job["id"]).update(
+            created_at=timezone.now() - timedelta(seconds=TOOL_JOB_TIMEOUT + 1))
+        _, new_job = self.post_job({"tool": "domain_ip_history", "domain": "example.com"})
+        self.assertNotEqual(new_job["id"], job["id"])
+
+        run_tool_job(job["id"])
+        mock_ip_history.assert_not_called()
+        self.assertEqual(ToolJob.objects.get(id=job["id"]).error_message, "Timed out")
+        self.assertEqual(ToolJob.objects.get(id=new_job["id"]).status, INITIATED_TASK)
+
+    @patch("reNgine.tasks.get_domain_historical_ip_address")
+    def test_running_job_timed_out(self, mock_ip_history):
+        """Test results of jobs timed out while running are dropped."""
+        _, job = self.post_job({"tool": "domain_ip_history", "domain": "example.com"})
+        mock_ip_history.side_effect = lambda domain: ToolJob.objects.filter(id=job["id"]).update(
+            status=FAILED_TASK, error_message="Timed out")
+        run_tool_job(job["id"])
+        job = ToolJob.objects.get(id=job["id"])
+        self.assertEqual(job.status, FAILED_TASK)
+        self.assertEqual(job.error_message, "Timed out")
+
+    def test_polled_job_timed_out(self):
+        """Test jobs running for too long are failed when polled."""
+        _, job = self.post_job({"tool": "cms_detector", "url": "https://example.com"})
+        ToolJob.objects.filter(id=job["id"]).update(
+            status=RUNNING_TASK,
+            created_at=timezone.now() - timedelta(seconds=TOOL_JOB_TIMEOUT + 1))
+        url = reverse("api:tool_job", args=[job["id"]])
+        job = self.client.get(url).data["job"]
+        self.assertEqual(job["status"], "FAILED")
+        self.assertEqual(job["error_message"], "Timed out")
+        response = self.client.get(url, {"format": "event-stream"})
+        self.assertEqual(self.get_event(response)["job"]["status"], "FAILED")
+
+    def get_event(self, response):
+        retry, data = response.content.decode().removesuffix("\n\n").split("\n")
+        self.assertEqual(retry, "retry: 2000")
+        return json.loads(data.removeprefix("data: "))
+
+    def test_job_event(self):
+        """Test running jobs are sent as a single event, EventSource clients
+        reconnect to get their updates."""
+        _, job = self.post_job({"tool": "cms_detector", "url": "https://example.com"})
+        response = self.client.get(reverse("api:tool_job", args=[job["id"]]), {"format": "event-stream"})
+        self.assertEqual(response["Content-Type"], "text/event-stream; charset=utf-8")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertEqual(self.get_event(response)["job"], job)
+
+    def test_invalid_job(self):
+        """Test jobs of unknown tools or with invalid params are refused."""
+        for data in [
+                {"tool": "nmap"},
+                {"tool": "whois", "ip_domain": "not a domain"},
+                {"tool": "cms_detector", "url": "example.com; id"},
+                {"tool": "reverse_whois"}]:
+            response, _ = self.post_job(data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertFalse(response.data["status"])
+        self.assertFalse(ToolJob.objects.exists())
+        response = self.client.get(reverse("api:tool_job", args=[1]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch("reNgine.tasks.get_domain_historical_ip_address")
+    def test_job_result(self, mock_ip_history):
+        """Test the result of a job is polled once its task ran."""
+        mock_ip_history.return_value = {"status": True, "data": "IP History data"}
+        _, job = self.post_job({"tool": "domain_ip_history", "domain": "example.com"})
+        url = reverse("api:tool_job", args=[job["id"]])
+        self.assertEqual(self.client.get(url).data["job"]["status"], "INITITATED")
+
+        run_tool_job(job["id"])
+        mock_ip_history.assert_called_once_with("example.com")
+        job = self.client.get(url).data["job"]
+        self.assertEqual(job["status"], "SUCCESS")
+        self.assertEqual(job["result"], {"status": True, "data": "IP History data"})
+
+        response = self.client.get(url, {"format": "event-stream"})
+        self.assertEqual(response["Content-Type"], "text/event-stream; charset=utf-8")
+        self.assertEqual(self.get_event(response)["job"], job)
+        response = self.client.get(url, HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(response["Content-Type"], "text/event-stream; charset=utf-8")
+
+    @patch.dict("reNgine.tasks.TOOL_JOB_TASKS", {"reverse_whois": Mock(side_effect=ValueError("Lookup failed"))})
+    def test_job_failed(self):
+        """Test errors of job tasks are reported."""
+        _, job = self.post_job({"tool": "reverse_whois", "lookup_keyword": "Example Inc"})
+        run_tool_job(job["id"])
+        job = self.client.get(reverse("api:tool_job", args=[job["id"]])).data["job"]
+        self.assertEqual(job["status"], "FAILED")
+        self.assertEqual(job["error_message"], "Lookup failed")
+
+
 class TestGfList(BaseTestCase):
     """Test case for retrieving GF patterns."""
 
@@ -30,6 +30,10 @@ urlpatterns = [
         'add/recon_note/',
         AddReconNote.as_view(),
         name='addReconNote'),
+    path(
+        'queryScanDiff/',
+        ScanDiff.as_view(),
+        name='scan_diff'),
     path(
         'queryTechnologies/',
         ListTechnology.as_view(),
@@ -146,6 +150,14 @@ urlpatterns = [
         'tools/cms_detector/',
         CMSDetector.as_view(),
         name='cms_detector'),
+    path(
+        'tools/jobs/',
+        ToolJobs.as_view(),
+        name='tool_jobs'),
+    path(
+        'tools/jobs/<int:job_id>/',
+        ToolJobDetail.as_view(),
+        name='tool_job'),
     path(
         'tools/cve_details/',
         CVEDetails.as_view(),
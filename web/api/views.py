@@ -4,15 +4,18 @@ import os.path
 from pathlib import Path
 import socket
 from ipaddress import IPv4Network
-from collections import defaultdict
 
 import requests
 import validators
 from django.urls import reverse
-from dashboard.models import OllamaSettings, Project, SearchHistory
-from django.db.models import CharField, Count, F, Q, Value
+from dashboard.models import OllamaSettings, Project, SearchHistory, ToolJob
+from dashboard.statistics import invalidate_project_statistics
+from django.db.models import Count, F, Q
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
 from packaging import version
 from django.template.defaultfilters import slugify
 from rest_framework import viewsets
@@ -20,10 +23,12 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.status import HTTP_400_BAD_REQUEST
+from rest_framework.settings import api_settings
+from rest_framework.status import HTTP_202_ACCEPTED, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND
 from rest_framework.parsers import JSONParser
 
 from recon_note.models import TodoNote
+from reNgine.asset_changes import ASSET_TYPES, diff_scans, get_changed_assets
 from reNgine.celery import app
 from reNgine.common_func import (
 	get_data_from_post_request,
@@ -34,23 +39,28 @@ from reNgine.common_func import (
 )
 from reNgine.definitions import (
 	ABORTED_TASK,
+	INITIATED_TASK,
 	OLLAMA_INSTANCE,
-	NUCLEI_SEVERITY_MAP,
 	DEFAULT_GPT_MODELS,
 	RUNNING_TASK,
 	SUCCESS_TASK
 )
 from reNgine.settings import (
 	RENGINE_CURRENT_VERSION,
-	RENGINE_TOOL_GITHUB_PATH
+	RENGINE_TOOL_GITHUB_PATH,
+	UNIVERSAL_SEARCH_MAX_PAGE_SIZE,
+	UNIVERSAL_SEARCH_PAGE_SIZE
 )
 from reNgine.tasks import (
+	TOOL_JOB_TASKS,
 	create_scan_activity,
+	expire_tool_jobs,
 	gpt_vulnerability_description,
 	initiate_subscan,
 	query_ip_history,
 	query_reverse_whois,
 	query_whois,
+	queue_tool_job,
 	run_cmseek,
 	run_command,
 	run_gf_list,
@@ -59,6 +69,7 @@ from reNgine.tasks import (
 )
 from reNgine.gpt import GPTAttackSuggestionGenerator
 from reNgine.utilities import is_safe_path, remove_lead_and_trail_slash
+from reNgine.visualisation import get_scan_visualisation, load_visualisation
 from scanEngine.models import EngineType, InstalledExternalTool
 from startScan.models import (
 	Command,
@@ -73,6 +84,7 @@ from startScan.models import (
 	Port,
 	ScanActivity,
 	ScanHistory,
+	ScanStatistics,
 	Subdomain,
 	SubScan,
 	Technology,
@@ -80,6 +92,14 @@ from startScan.models import (
 )
 from targetApp.models import Domain, Organization
 
+from .renderers import EventStreamRenderer
+from .search_query import (
+	ENDPOINT_SEARCH_FIELDS,
+	SUBDOMAIN_SEARCH_FIELDS,
+	VULNERABILITY_SEARCH_FIELDS,
+	compile_search_query,
+	is_special_lookup
+)
 from .serializers import (
 	CommandSerializer,
 	DirectoryFileSerializer,
@@ -112,7 +132,7 @@ from .serializers import (
 	SubScanResultSerializer,
 	SubScanSerializer,
 	TechnologyCountSerializer,
-	VisualiseDataSerializer,
+	ToolJobSerializer,
 	VulnerabilitySerializer
 )
 
@@ -368,9 +388,33 @@ class SearchHistoryView(APIView):
 
 
 class UniversalSearch(APIView):
+	# Model, searched fields (trigram indexed), fields the matches of all
+	# scans are deduplicated on and returned fields, by result type
+	search_types = {
+		'subdomains': (
+			Subdomain,
+			['name', 'cname', 'page_title', 'http_url'],
+			['name'],
+			['id', 'name', 'cname', 'page_title', 'http_url', 'http_status']),
+		'endpoints': (
+			EndPoint,
+			['http_url', 'page_title'],
+			['http_url'],
+			['id', 'http_url', 'page_title', 'http_status']),
+		'vulnerabilities': (
+			Vulnerability,
+			['name', 'http_url', 'description'],
+			['name', 'http_url'],
+			['id', 'name', 'severity', 'http_url', 'description']),
+	}
+
 	def get(self, request):
 		req = self.request
 		query = req.query_params.get('query')
+		search_type = req.query_params.get('type')
+		page = max(safe_int_cast(req.query_params.get('page'), 1), 1)
+		page_size = safe_int_cast(req.query_params.get('page_size'), UNIVERSAL_SEARCH_PAGE_SIZE)
+		page_size = min(max(page_size, 1), UNIVERSAL_SEARCH_MAX_PAGE_SIZE)
 
 		response = {}
 		response['status'] = False
@@ -379,41 +423,41 @@ class UniversalSearch(APIView):
 			response['message'] = 'No query parameter provided!'
 			return Response(response)
 
+		if search_type and search_type not in self.search_types:
+			response['message'] = f'Invalid search type {search_type}!'
+			return Response(response, status=HTTP_400_BAD_REQUEST)
+
 		response['results'] = {}
+		response['counts'] = {}
+		response['page'] = page
+		response['page_size'] = page_size
 
 		# search history to be saved
 		SearchHistory.objects.get_or_create(
 			query=query
 		)
 
-		# lookup query in subdomain
-		subdomain = Subdomain.objects.filter(
-			Q(name__icontains=query) |
-			Q(cname__icontains=query) |
-			Q(page_title__icontains=query) |
-			Q(http_url__icontains=query)
-		).distinct('name')
-		subdomain_data = SubdomainSerializer(subdomain, many=True).data
-		response['results']['subdomains'] = subdomain_data
-
-		endpoint = EndPoint.objects.filter(
-			Q(http_url__icontains=query) |
-			Q(page_title__icontains=query)
-		).distinct('http_url')
-		endpoint_data = EndpointSerializer(endpoint, many=True).data
-		response['results']['endpoints'] = endpoint_data
-
-		vulnerability = Vulnerability.objects.filter(
-			Q(http_url__icontains=query) |
-			Q(name__icontains=query) |
-			Q(description__icontains=query)
-		).distinct()
-		vulnerability_data = VulnerabilitySerializer(vulnerability, many=True).data
-		response['results']['vulnerabilities'] = vulnerability_data
+		for name, (model, search_fields, distinct_fields, fields) in self.search_types.items():
+			if search_type and name != search_type:
+				continue
+			lookup = Q()
+			for field in search_fields:
+				lookup |= Q(**{f'{field}__icontains': query})
+			matches = model.objects.filter(lookup)
+
+			# Latest match of each name, with DISTINCT ON
+			results = (
+				matches
+				.order_by(*distinct_fields, '-id')
+				.distinct(*distinct_fields)
+				.values(*fields)
+			)
+			response['results'][name] = list(results[(page - 1) * page_size:page * page_size])
+			response['counts'][name] = matches.values(*distinct_fields).distinct().count()
 
 		response['results']['others'] = {}
 
-		if subdomain_data or endpoint_data or vulnerability_data:
+		if any(response['counts'].values()):
 			response['status'] = True
 
 		return Response(response)
@@ -909,7 +953,13 @@ class DeleteSubdomain(APIView):
 		subdomain_ids = get_data_from_post_request(request, 'subdomain_ids')
 		try:
 			subdomain_ids = [int(id) for id in subdomain_ids]
-			Subdomain.objects.filter(id__in=subdomain_ids).delete()
+			subdomains = Subdomain.objects.filter(id__in=subdomain_ids)
+			scans = set(subdomains.values_list('scan_history_id', 'scan_history__domain__project_id'))
+			subdomains.delete()
+			for scan_id, _ in scans:
+				if scan_id:
+					ScanStatistics.reconcile(scan_id)
+			invalidate_project_statistics(*(project_id for _, project_id in scans))
 			return Response({'status': True})
 		except ValueError:
 			return Response({'status': False, 'message': 'Invalid subdomain ID provided'}, status=400)
@@ -927,8 +977,14 @@ class DeleteVulnerability(APIView):
 		try:
 			# Convert to integers
 			vulnerability_ids = [int(id) for id in vulnerability_ids]
-			# Delete vulnerabilities
-			Vulnerability.objects.filter(id__in=vulnerability_ids).delete()
+			# Delete vulnerabilities, then recount their scans results
+			vulnerabilities = Vulnerability.objects.filter(id__in=vulnerability_ids)
+			scans = set(vulnerabilities.values_list('scan_history_id', 'scan_history__domain__project_id'))
+			vulnerabilities.delete()
+			for scan_id, _ in scans:
+				if scan_id:
+					ScanStatistics.reconcile(scan_id)
+			invalidate_project_statistics(*(project_id for _, project_id in scans))
 			return Response({'status': True})
 		except ValueError:
 			return Response({'status': False, 'message': 'Invalid vulnerability ID provided'}, status=400)
@@ -1131,18 +1187,21 @@ class ScanStatus(APIView):
 		recently_completed_scans = (
 			ScanHistory.objects
 			.filter(domain__project__slug=slug)
+			.select_related('domain', 'scan_type', 'statistics')
 			.order_by('-start_scan_date')
 			.filter(Q(scan_status=0) | Q(scan_status=2) | Q(scan_status=3))[:10]
 		)
 		current_scans = (
 			ScanHistory.objects
 			.filter(domain__project__slug=slug)
+			.select_related('domain', 'scan_type', 'statistics')
 			.order_by('-start_scan_date')
 			.filter(scan_status=1)
 		)
 		pending_scans = (
 			ScanHistory.objects
 			.filter(domain__project__slug=slug)
+			.select_related('domain', 'scan_type', 'statistics')
 			.filter(scan_status=-1)
 		)
 
@@ -1229,6 +1288,78 @@ class CMSDetector(APIView):
 			logger.error(f"Error in CMSDetector: {str(e)}")
 			return Response({'status': False, 'message': 'An unexpected error occurred.'}, status=500)
 
+
+def get_tool_job_params(tool, data):
+	"""Get the task params of a toolbox job from the request data, which has
+	the query params of the tool API view.
+
+	Returns:
+		tuple: Task params, or None and an error message.
+	"""
+	if tool == 'whois':
+		ip_domain = data.get('ip_domain')
+		if not (validators.domain(ip_domain) or validators.ipv4(ip_domain) or validators.ipv6(ip_domain)):
+			return None, 'Invalid domain or IP'
+		is_force_update = str(data.get('is_reload', '')).lower() == 'true'
+		return {'ip_domain': ip_domain, 'force_reload_whois': is_force_update}, None
+	elif tool == 'reverse_whois':
+		lookup_keyword = data.get('lookup_keyword')
+		if not lookup_keyword:
+			return None, 'Lookup keyword is missing'
+		return {'lookup_keyword': lookup_keyword}, None
+	elif tool == 'domain_ip_history':
+		domain = data.get('domain')
+		if not validators.domain(domain):
+			return None, 'Invalid domain'
+		return {'domain': domain}, None
+	url = data.get('url')
+	if not (url and validators.url(url)):
+		return None, 'Invalid URL'
+	return {'url': url}, None
+
+
+class ToolJobs(APIView):
+	'''
+		Queue a toolbox lookup (whois, reverse_whois, domain_ip_history or
+		cms_detector) and return its job straight away, instead of waiting
+		for its result like the tool API views. The result is polled with
+		ToolJobDetail. Identical lookups share the same running job.
+	'''
+	def post(self, request):
+		data = request.data
+		tool = data.get('tool')
+		if tool not in TOOL_JOB_TASKS:
+			return Response({'status': False, 'message': f'Invalid tool {tool}'}, status=HTTP_400_BAD_REQUEST)
+		params, message = get_tool_job_params(tool, data)
+		if params is None:
+			return Response({'status': False, 'message': message}, status=HTTP_400_BAD_REQUEST)
+		job = queue_tool_job(tool, params)
+		return Response({'status': True, 'job': ToolJobSerializer(job).data}, status=HTTP_202_ACCEPTED)
+
+
+class ToolJobDetail(APIView):
+	'''
+		Get a toolbox job, with its result once completed.
+		With `format=event-stream`, or an `Accept: text/event-stream` header,
+		the job is sent as a single server-sent event and the response ends
+		right away, so that no web worker waits for the lookup. EventSource
+		clients reconnect after the `retry` interval of the event, and close
+		once the job is completed. Jobs running for more than TOOL_JOB_TIMEOUT
+		seconds are marked failed.
+	'''
+	renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+
+	def get(self, request, job_id, format=None):
+		jobs = ToolJob.objects.filter(pk=job_id)
+		expire_tool_jobs(jobs)
+		job = jobs.first()
+		if not job:
+			return Response({'status': False, 'message': 'Job not found'}, status=HTTP_404_NOT_FOUND)
+		response = Response({'status': True, 'job': ToolJobSerializer(job).data})
+		if request.accepted_renderer.format == EventStreamRenderer.format:
+			response['Cache-Control'] = 'no-cache'
+		return response
+
 class IPToDomain(APIView):
 	def get(self, request):
 		req = self.request
@@ -1414,7 +1545,11 @@ class ListTodoNotes(APIView):
 class ListScanHistory(APIView):
 	def get(self, request, format=None):
 		req = self.request
-		scan_history = ScanHistory.objects.all().order_by('-start_scan_date')
+		scan_history = (
+			ScanHistory.objects
+			.select_related('domain', 'scan_type', 'statistics')
+			.order_by('-start_scan_date')
+		)
 		project = req.query_params.get('project')
 		if project:
 			scan_history = scan_history.filter(domain__project__slug=project)
@@ -1460,44 +1595,37 @@ class VisualiseData(APIView):
 	def get(self, request, format=None):
 		req = self.request
 		if scan_id := safe_int_cast(req.query_params.get('scan_id')):
-			mitch_data = ScanHistory.objects.filter(id=scan_id)
-			serializer = VisualiseDataSerializer(mitch_data, many=True)
-			
-			# Data processing to remove duplicates
-			processed_data = self.process_visualisation_data(serializer.data)
-			
-			return Response(processed_data)
+			scan = ScanHistory.objects.filter(id=scan_id).select_related('domain', 'statistics').first()
+			if not scan:
+				return Response([])
+			visualisation = get_scan_visualisation(scan)
+			etag = quote_etag(visualisation.etag)
+			if etag in parse_etags(req.META.get('HTTP_IF_NONE_MATCH', '')):
+				response = HttpResponseNotModified()
+			elif 'gzip' in req.META.get('HTTP_ACCEPT_ENCODING', ''):
+				# Stored compressed, sent as is
+				response = HttpResponse(bytes(visualisation.data), content_type='application/json')
+				response['Content-Encoding'] = 'gzip'
+			else:
+				response = Response(load_visualisation(visualisation))
+			response['ETag'] = etag
+			patch_vary_headers(response, ['Accept-Encoding'])
+			return response
 		else:
 			return Response()
 
-	def process_visualisation_data(self, data):
-		if not data:
-			return []
-
-		processed_data = data[0]  # Assuming there's only one element in data
-		subdomains = processed_data.get('subdomains', [])
-
-		# Use a dictionary to group vulnerabilities by subdomain
-		vuln_by_subdomain = defaultdict(list)
-
-		for subdomain in subdomains:
-			subdomain_name = subdomain['name']
-			vulnerabilities = subdomain.get('vulnerabilities', [])
-
-			# Group unique vulnerabilities
-			unique_vulns = {}
-			for vuln in vulnerabilities:
-				vuln_key = (vuln['name'], vuln['severity'])
-				if vuln_key not in unique_vulns:
-					unique_vulns[vuln_key] = vuln
-
-			vuln_by_subdomain[subdomain_name].extend(unique_vulns.values())
-
-		# Update subdomains with unique vulnerabilities
-		for subdomain in subdomains:
-			subdomain['vulnerabilities'] = vuln_by_subdomain[subdomain['name']]
+class ScanDiff(APIView):
+	def get(self, request, format=None):
+		req = self.request
+		scan_id = safe_int_cast(req.query_params.get('scan_id'))
+		previous_scan_id = safe_int_cast(req.query_params.get('previous_scan_id'))
+		asset_type = req.query_params.get('type', 'subdomain')
+		if asset_type not in ASSET_TYPES:
+			return Response({'status': False, 'message': f'Invalid asset type {asset_type}'}, status=HTTP_400_BAD_REQUEST)
+		if ScanHistory.objects.filter(id__in=[scan_id, previous_scan_id]).count() != len({scan_id, previous_scan_id}):
+			return Response({'status': False, 'message': 'Scan not found'}, status=HTTP_400_BAD_REQUEST)
+		return Response({'status': True, **diff_scans(previous_scan_id, scan_id, asset_type)})
 
-		return processed_data
 
 class ListTechnology(APIView):
 	def get(self, request, format=None):
@@ -1772,9 +1900,9 @@ class SubdomainsViewSet(viewsets.ModelViewSet):
 class SubdomainChangesViewSet(viewsets.ModelViewSet):
 	'''
 		This viewset will return the Subdomain changes
-		To get the new subdomains, we will look for ScanHistory with
-		subdomain_discovery = True and the status of the last scan has to be
-		successful and calculate difference
+		Changes since the last completed scan with subdomain_discovery are
+		stored as AssetChange rows when the scan ends, see
+		reNgine.asset_changes
 	'''
 	queryset = Subdomain.objects.none()
 	serializer_class = SubdomainChangesSerializer
@@ -1784,66 +1912,10 @@ class SubdomainChangesViewSet(viewsets.ModelViewSet):
 		req = self.request
 		scan_id = safe_int_cast(req.query_params.get('scan_id'))
 		changes = req.query_params.get('changes')
-		domain_id = safe_int_cast(ScanHistory.objects.filter(id=safe_int_cast(scan_id)).first().domain.id)
-		scan_history_query = (
-			ScanHistory.objects
-			.filter(domain=domain_id)
-			.filter(tasks__overlap=['subdomain_discovery'])
-			.filter(id__lte=scan_id)
-			.exclude(Q(scan_status=-1) | Q(scan_status=1))
-		)
-		if scan_history_query.count() > 1:
-			last_scan = scan_history_query.order_by('-start_scan_date')[1]
-			scanned_host_q1 = (
-				Subdomain.objects
-				.filter(scan_history__id=scan_id)
-				.values('name')
-			)
-			scanned_host_q2 = (
-				Subdomain.objects
-				.filter(scan_history__id=last_scan.id)
-				.values('name')
-			)
-			added_subdomain = scanned_host_q1.difference(scanned_host_q2)
-			removed_subdomains = scanned_host_q2.difference(scanned_host_q1)
-			if changes == 'added':
-				return (
-					Subdomain.objects
-					.filter(scan_history=scan_id)
-					.filter(name__in=added_subdomain)
-					.annotate(
-						change=Value('added', output_field=CharField())
-					)
-				)
-			elif changes == 'removed':
-				return (
-					Subdomain.objects
-					.filter(scan_history=last_scan)
-					.filter(name__in=removed_subdomains)
-					.annotate(
-						change=Value('removed', output_field=CharField())
-					)
-				)
-			else:
-				added_subdomain = (
-					Subdomain.objects
-					.filter(scan_history=scan_id)
-					.filter(name__in=added_subdomain)
-					.annotate(
-						change=Value('added', output_field=CharField())
-					)
-				)
-				removed_subdomains = (
-					Subdomain.objects
-					.filter(scan_history=last_scan)
-					.filter(name__in=removed_subdomains)
-					.annotate(
-						change=Value('removed', output_field=CharField())
-					)
-				)
-				changes = added_subdomain.union(removed_subdomains)
-				return changes
-		return self.queryset
+		scan = ScanHistory.objects.filter(id=scan_id).first()
+		if not scan:
+			return self.queryset
+		return get_changed_assets(scan, 'subdomain', [changes] if changes in ('added', 'removed') else None)
 
 	def paginate_queryset(self, queryset, view=None):
 		if 'no_page' in self.request.query_params:
@@ -1854,7 +1926,8 @@ class SubdomainChangesViewSet(viewsets.ModelViewSet):
 
 class EndPointChangesViewSet(viewsets.ModelViewSet):
 	'''
-		This viewset will return the EndPoint changes
+		This viewset will return the EndPoint changes, see
+		reNgine.asset_changes
 	'''
 	queryset = EndPoint.objects.none()
 	serializer_class = EndPointChangesSerializer
@@ -1864,58 +1937,10 @@ class EndPointChangesViewSet(viewsets.ModelViewSet):
 		req = self.request
 		scan_id = safe_int_cast(req.query_params.get('scan_id'))
 		changes = req.query_params.get('changes')
-		domain_id = safe_int_cast(ScanHistory.objects.filter(id=scan_id).first().domain.id)
-		scan_history = (
-			ScanHistory.objects
-			.filter(domain=domain_id)
-			.filter(tasks__overlap=['fetch_url'])
-			.filter(id__lte=scan_id)
-			.filter(scan_status=2)
-		)
-		if scan_history.count() > 1:
-			last_scan = scan_history.order_by('-start_scan_date')[1]
-			scanned_host_q1 = (
-				EndPoint.objects
-				.filter(scan_history__id=scan_id)
-				.values('http_url')
-			)
-			scanned_host_q2 = (
-				EndPoint.objects
-				.filter(scan_history__id=last_scan.id)
-				.values('http_url')
-			)
-			added_endpoints = scanned_host_q1.difference(scanned_host_q2)
-			removed_endpoints = scanned_host_q2.difference(scanned_host_q1)
-			if changes == 'added':
-				return (
-					EndPoint.objects
-					.filter(scan_history=scan_id)
-					.filter(http_url__in=added_endpoints)
-					.annotate(change=Value('added', output_field=CharField()))
-				)
-			elif changes == 'removed':
-				return (
-					EndPoint.objects
-					.filter(scan_history=last_scan)
-					.filter(http_url__in=removed_endpoints)
-					.annotate(change=Value('removed', output_field=CharField()))
-				)
-			else:
-				added_endpoints = (
-					EndPoint.objects
-					.filter(scan_history=scan_id)
-					.filter(http_url__in=added_endpoints)
-					.annotate(change=Value('added', output_field=CharField()))
-				)
-				removed_endpoints = (
-					EndPoint.objects
-					.filter(scan_history=last_scan)
-					.filter(http_url__in=removed_endpoints)
-					.annotate(change=Value('removed', output_field=CharField()))
-				)
-				changes = added_endpoints.union(removed_endpoints)
-				return changes
-		return self.queryset
+		scan = ScanHistory.objects.filter(id=scan_id).first()
+		if not scan:
+			return self.queryset
+		return get_changed_assets(scan, 'endpoint', [changes] if changes in ('added', 'removed') else None)
 
 	def paginate_queryset(self, queryset, view=None):
 		if 'no_page' in self.request.query_params:
@@ -2075,24 +2100,11 @@ class SubdomainDatatableViewSet(viewsets.ModelViewSet):
 			order_col = 'response_time'
 		if _order_direction == 'desc':
 			order_col = f'-{order_col}'
-		# if the search query is separated by = means, it is a specific lookup
-		# divide the search query into two half and lookup
+		# Search queries such as `http_status=200 & name=admin` are compiled into
+		# a single filter, see api.search_query
 		if search_value:
-			operators = ['=', '&', '|', '>', '<', '!']
-			if any(x in search_value for x in operators):
-				if '&' in search_value:
-					complex_query = search_value.split('&')
-					for query in complex_query:
-						if query.strip():
-							qs = qs & self.special_lookup(query.strip())
-				elif '|' in search_value:
-					qs = Subdomain.objects.none()
-					complex_query = search_value.split('|')
-					for query in complex_query:
-						if query.strip():
-							qs = self.special_lookup(query.strip()) | qs
-				else:
-					qs = self.special_lookup(search_value)
+			if is_special_lookup(search_value):
+				qs = self.queryset.filter(compile_search_query(search_value, Subdomain, SUBDOMAIN_SEARCH_FIELDS))
 			else:
 				qs = self.general_lookup(search_value)
 		return qs.order_by(order_col)
@@ -2119,148 +2131,6 @@ class SubdomainDatatableViewSet(viewsets.ModelViewSet):
 
 		return qs
 
-	def special_lookup(self, search_value):
-		qs = self.queryset.filter()
-		if '=' in search_value:
-			search_param = search_value.split("=")
-			title = search_param[0].lower().strip()
-			content = search_param[1].lower().strip()
-			if 'name' in title:
-				qs = self.queryset.filter(name__icontains=content)
-			elif 'page_title' in title:
-				qs = self.queryset.filter(page_title__icontains=content)
-			elif 'http_url' in title:
-				qs = self.queryset.filter(http_url__icontains=content)
-			elif 'content_type' in title:
-				qs = self.queryset.filter(content_type__icontains=content)
-			elif 'cname' in title:
-				qs = self.queryset.filter(cname__icontains=content)
-			elif 'webserver' in title:
-				qs = self.queryset.filter(webserver__icontains=content)
-			elif 'ip_addresses' in title:
-				qs = self.queryset.filter(
-					ip_addresses__address__icontains=content)
-			elif 'is_important' in title:
-				if 'true' in content.lower():
-					qs = self.queryset.filter(is_important=True)
-				else:
-					qs = self.queryset.filter(is_important=False)
-			elif 'port' in title:
-				qs = (
-					self.queryset
-					.filter(ip_addresses__ports__number__icontains=content)
-					|
-					self.queryset
-					.filter(ip_addresses__ports__service_name__icontains=content)
-					|
-					self.queryset
-					.filter(ip_addresses__ports__description__icontains=content)
-				)
-			elif 'technology' in title:
-				qs = (
-					self.queryset
-					.filter(technologies__name__icontains=content)
-				)
-			elif 'http_status' in title:
-				try:
-					int_http_status = int(content)
-					qs = self.queryset.filter(http_status=int_http_status)
-				except Exception as e:
-					print(e)
-			elif 'content_length' in title:
-				try:
-					int_http_status = int(content)
-					qs = self.queryset.filter(content_length=int_http_status)
-				except Exception as e:
-					print(e)
-
-		elif '>' in search_value:
-			search_param = search_value.split(">")
-			title = search_param[0].lower().strip()
-			content = search_param[1].lower().strip()
-			if 'http_status' in title:
-				try:
-					int_val = int(content)
-					qs = self.queryset.filter(http_status__gt=int_val)
-				except Exception as e:
-					print(e)
-			elif 'content_length' in title:
-				try:
-					int_val = int(content)
-					qs = self.queryset.filter(content_length__gt=int_val)
-				except Exception as e:
-					print(e)
-
-		elif '<' in search_value:
-			search_param = search_value.split("<")
-			title = search_param[0].lower().strip()
-			content = search_param[1].lower().strip()
-			if 'http_status' in title:
-				try:
-					int_val = int(content)
-					qs = self.queryset.filter(http_status__lt=int_val)
-				except Exception as e:
-					print(e)
-			elif 'content_length' in title:
-				try:
-					int_val = int(content)
-					qs = self.queryset.filter(content_length__lt=int_val)
-				except Exception as e:
-					print(e)
-
-		elif '!' in search_value:
-			search_param = search_value.split("!")
-			title = search_param[0].lower().strip()
-			content = search_param[1].lower().strip()
-			if 'name' in title:
-				qs = self.queryset.exclude(name__icontains=content)
-			elif 'page_title' in title:
-				qs = self.queryset.exclude(page_title__icontains=content)
-			elif 'http_url' in title:
-				qs = self.queryset.exclude(http_url__icontains=content)
-			elif 'content_type' in title:
-				qs = (
-					self.queryset
-					.exclude(content_type__icontains=content)
-				)
-			elif 'cname' in title:
-				qs = self.queryset.exclude(cname__icontains=content)
-			elif 'webserver' in title:
-				qs = self.queryset.exclude(webserver__icontains=content)
-			elif 'ip_addresses' in title:
-				qs = self.queryset.exclude(
-					ip_addresses__address__icontains=content)
-			elif 'port' in title:
-				qs = (
-					self.queryset
-					.exclude(ip_addresses__ports__number__icontains=content)
-					|
-					self.queryset
-					.exclude(ip_addresses__ports__service_name__icontains=content)
-					|
-					self.queryset
-					.exclude(ip_addresses__ports__description__icontains=content)
-				)
-			elif 'technology' in title:
-				qs = (
-					self.queryset
-					.exclude(technologies__name__icontains=content)
-				)
-			elif 'http_status' in title:
-				try:
-					int_http_status = int(content)
-					qs = self.queryset.exclude(http_status=int_http_status)
-				except Exception as e:
-					print(e)
-			elif 'content_length' in title:
-				try:
-					int_http_status = int(content)
-					qs = self.queryset.exclude(content_length=int_http_status)
-				except Exception as e:
-					print(e)
-
-		return qs
-
 
 class ListActivityLogsViewSet(viewsets.ModelViewSet):
 	serializer_class = CommandSerializer
@@ -2268,7 +2138,7 @@ class ListActivityLogsViewSet(viewsets.ModelViewSet):
 	def get_queryset(self):
 		req = self.request
 		activity_id = safe_int_cast(req.query_params.get('activity_id'))
-		self.queryset = Command.objects.filter(activity__id=activity_id).order_by('id')
+		self.queryset = Command.objects.filter(activity__id=activity_id).prefetch_related('output_chunks').order_by('id')
 		return self.queryset
 
 
@@ -2278,7 +2148,7 @@ class ListScanLogsViewSet(viewsets.ModelViewSet):
 	def get_queryset(self):
 		req = self.request
 		scan_id = safe_int_cast(req.query_params.get('scan_id'))
-		self.queryset = Command.objects.filter(scan_history__id=scan_id).order_by('id')
+		self.queryset = Command.objects.filter(scan_history__id=scan_id).prefetch_related('output_chunks').order_by('id')
 		return self.queryset
 
 
@@ -2407,22 +2277,10 @@ class EndPointViewSet(viewsets.ModelViewSet):
 				order_col = 'response_time'
 			if _order_direction == 'desc':
 				order_col = f'-{order_col}'
-			# if the search query is separated by = means, it is a specific lookup
-			# divide the search query into two half and lookup
-			if '=' in search_value or '&' in search_value or '|' in search_value or '>' in search_value or '<' in search_value or '!' in search_value:
-				if '&' in search_value:
-					complex_query = search_value.split('&')
-					for query in complex_query:
-						if query.strip():
-							qs = qs & self.special_lookup(query.strip())
-				elif '|' in search_value:
-					qs = Subdomain.objects.none()
-					complex_query = search_value.split('|')
-					for query in complex_query:
-						if query.strip():
-							qs = self.special_lookup(query.strip()) | qs
-				else:
-					qs = self.special_lookup(search_value)
+			# Search queries such as `http_status=200 & name=admin` are compiled into
+			# a single filter, see api.search_query
+			if is_special_lookup(search_value):
+				qs = self.queryset.filter(compile_search_query(search_value, EndPoint, ENDPOINT_SEARCH_FIELDS))
 			else:
 				qs = self.general_lookup(search_value)
 			return qs.order_by(order_col)
@@ -2439,131 +2297,6 @@ class EndPointViewSet(viewsets.ModelViewSet):
 								Q(content_type__icontains=search_value) |
 								Q(matched_gf_patterns__icontains=search_value))
 
-	def special_lookup(self, search_value):
-		qs = self.queryset.filter()
-		if '=' in search_value:
-			search_param = search_value.split("=")
-			lookup_title = search_param[0].lower().strip()
-			lookup_content = search_param[1].lower().strip()
-			if 'http_url' in lookup_title:
-				qs = self.queryset.filter(http_url__icontains=lookup_content)
-			elif 'page_title' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(page_title__icontains=lookup_content)
-				)
-			elif 'content_type' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(content_type__icontains=lookup_content)
-				)
-			elif 'webserver' in lookup_title:
-				qs = self.queryset.filter(webserver__icontains=lookup_content)
-			elif 'technology' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(techs__name__icontains=lookup_content)
-				)
-			elif 'gf_pattern' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(matched_gf_patterns__icontains=lookup_content)
-				)
-			elif 'http_status' in lookup_title:
-				try:
-					int_http_status = int(lookup_content)
-					qs = self.queryset.filter(http_status=int_http_status)
-				except Exception as e:
-					print(e)
-			elif 'content_length' in lookup_title:
-				try:
-					int_http_status = int(lookup_content)
-					qs = self.queryset.filter(content_length=int_http_status)
-				except Exception as e:
-					print(e)
-		elif '>' in search_value:
-			search_param = search_value.split(">")
-			lookup_title = search_param[0].lower().strip()
-			lookup_content = search_param[1].lower().strip()
-			if 'http_status' in lookup_title:
-				try:
-					int_val = int(lookup_content)
-					qs = (
-						self.queryset
-						.filter(http_status__gt=int_val)
-					)
-				except Exception as e:
-					print(e)
-			elif 'content_length' in lookup_title:
-				try:
-					int_val = int(lookup_content)
-					qs = self.queryset.filter(content_length__gt=int_val)
-				except Exception as e:
-					print(e)
-		elif '<' in search_value:
-			search_param = search_value.split("<")
-			lookup_title = search_param[0].lower().strip()
-			lookup_content = search_param[1].lower().strip()
-			if 'http_status' in lookup_title:
-				try:
-					int_val = int(lookup_content)
-					qs = self.queryset.filter(http_status__lt=int_val)
-				except Exception as e:
-					print(e)
-			elif 'content_length' in lookup_title:
-				try:
-					int_val = int(lookup_content)
-					qs = self.queryset.filter(content_length__lt=int_val)
-				except Exception as e:
-					print(e)
-		elif '!' in search_value:
-			search_param = search_value.split("!")
-			lookup_title = search_param[0].lower().strip()
-			lookup_content = search_param[1].lower().strip()
-			if 'http_url' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(http_url__icontains=lookup_content)
-				)
-			elif 'page_title' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(page_title__icontains=lookup_content)
-				)
-			elif 'content_type' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(content_type__icontains=lookup_content)
-				)
-			elif 'webserver' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(webserver__icontains=lookup_content)
-				)
-			elif 'technology' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(techs__name__icontains=lookup_content)
-				)
-			elif 'gf_pattern' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(matched_gf_patterns__icontains=lookup_content)
-				)
-			elif 'http_status' in lookup_title:
-				try:
-					int_http_status = int(lookup_content)
-					qs = self.queryset.exclude(http_status=int_http_status)
-				except Exception as e:
-					print(e)
-			elif 'content_length' in lookup_title:
-				try:
-					int_http_status = int(lookup_content)
-					qs = self.queryset.exclude(content_length=int_http_status)
-				except Exception as e:
-					print(e)
-		return qs
-
 class DirectoryViewSet(viewsets.ModelViewSet):
     queryset = DirectoryFile.objects.none()
     serializer_class = DirectoryFileSerializer
@@ -2675,23 +2408,10 @@ class VulnerabilityViewSet(viewsets.ModelViewSet):
 
 			if _order_direction == 'desc':
 				order_col = f'-{order_col}'
-			# if the search query is separated by = means, it is a specific lookup
-			# divide the search query into two half and lookup
-			operators = ['=', '&', '|', '>', '<', '!']
-			if any(x in search_value for x in operators):
-				if '&' in search_value:
-					complex_query = search_value.split('&')
-					for query in complex_query:
-						if query.strip():
-							qs = qs & self.special_lookup(query.strip())
-				elif '|' in search_value:
-					qs = Subdomain.objects.none()
-					complex_query = search_value.split('|')
-					for query in complex_query:
-						if query.strip():
-							qs = self.special_lookup(query.strip()) | qs
-				else:
-					qs = self.special_lookup(search_value)
+			# Search queries such as `http_status=200 & name=admin` are compiled into
+			# a single filter, see api.search_query
+			if is_special_lookup(search_value):
+				qs = self.queryset.filter(compile_search_query(search_value, Vulnerability, VULNERABILITY_SEARCH_FIELDS))
 			else:
 				qs = self.general_lookup(search_value)
 			return qs.order_by(order_col)
@@ -2719,176 +2439,3 @@ class VulnerabilityViewSet(viewsets.ModelViewSet):
 					Q(tags__name__icontains=search_value))
 		)
 		return qs
-
-	def special_lookup(self, search_value):
-		qs = self.queryset.filter()
-		if '=' in search_value:
-			search_param = search_value.split("=")
-			lookup_title = search_param[0].lower().strip()
-			lookup_content = search_param[1].lower().strip()
-			if 'severity' in lookup_title:
-				severity_value = NUCLEI_SEVERITY_MAP.get(lookup_content, -1)
-				qs = (
-					self.queryset
-					.filter(severity=severity_value)
-				)
-			elif 'name' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(name__icontains=lookup_content)
-				)
-			elif 'http_url' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(http_url__icontains=lookup_content)
-				)
-			elif 'template' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(template__icontains=lookup_content)
-				)
-			elif 'template_id' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(template_id__icontains=lookup_content)
-				)
-			elif 'cve_id' in lookup_title or 'cve' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(cve_ids__name__icontains=lookup_content)
-				)
-			elif 'cwe_id' in lookup_title or 'cwe' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(cwe_ids__name__icontains=lookup_content)
-				)
-			elif 'cvss_metrics' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(cvss_metrics__icontains=lookup_content)
-				)
-			elif 'cvss_score' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(cvss_score__exact=lookup_content)
-				)
-			elif 'type' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(type__icontains=lookup_content)
-				)
-			elif 'tag' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(tags__name__icontains=lookup_content)
-				)
-			elif 'status' in lookup_title:
-				open_status = lookup_content == 'open'
-				qs = (
-					self.queryset
-					.filter(open_status=open_status)
-				)
-			elif 'description' in lookup_title:
-				qs = (
-					self.queryset
-					.filter(Q(description__icontains=lookup_content) |
-							Q(template__icontains=lookup_content) |
-							Q(extracted_results__icontains=lookup_content))
-				)
-		elif '!' in search_value:
-			search_param = search_value.split("!")
-			lookup_title = search_param[0].lower().strip()
-			lookup_content = search_param[1].lower().strip()
-			if 'severity' in lookup_title:
-				severity_value = NUCLEI_SEVERITY_MAP.get(lookup_title, -1)
-				qs = (
-					self.queryset
-					.exclude(severity=severity_value)
-				)
-			elif 'name' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(name__icontains=lookup_content)
-				)
-			elif 'http_url' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(http_url__icontains=lookup_content)
-				)
-			elif 'template' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(template__icontains=lookup_content)
-				)
-			elif 'template_id' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(template_id__icontains=lookup_content)
-				)
-			elif 'cve_id' in lookup_title or 'cve' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(cve_ids__icontains=lookup_content)
-				)
-			elif 'cwe_id' in lookup_title or 'cwe' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(cwe_ids__icontains=lookup_content)
-				)
-			elif 'cvss_metrics' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(cvss_metrics__icontains=lookup_content)
-				)
-			elif 'cvss_score' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(cvss_score__exact=lookup_content)
-				)
-			elif 'type' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(type__icontains=lookup_content)
-				)
-			elif 'tag' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(tags__icontains=lookup_content)
-				)
-			elif 'status' in lookup_title:
-				open_status = lookup_content == 'open'
-				qs = (
-					self.queryset
-					.exclude(open_status=open_status)
-				)
-			elif 'description' in lookup_title:
-				qs = (
-					self.queryset
-					.exclude(Q(description__icontains=lookup_content) |
-							Q(template__icontains=lookup_content) |
-							Q(extracted_results__icontains=lookup_content))
-				)
-
-		elif '>' in search_value:
-			search_param = search_value.split(">")
-			lookup_title = search_param[0].lower().strip()
-			lookup_content = search_param[1].lower().strip()
-			if 'cvss_score' in lookup_title:
-				try:
-					val = float(lookup_content)
-					qs = self.queryset.filter(cvss_score__gt=val)
-				except Exception as e:
-					print(e)
-
-		elif '<' in search_value:
-			search_param = search_value.split("<")
-			lookup_title = search_param[0].lower().strip()
-			lookup_content = search_param[1].lower().strip()
-			if 'cvss_score' in lookup_title:
-				try:
-					val = int(lookup_content)
-					qs = self.queryset.filter(cvss_score__lt=val)
-				except Exception as e:
-					print(e)
-
-		return qs
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:11
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0016_project_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ToolJob',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('tool', models.CharField(max_length=50)),
+                ('params', models.JSONField(default=dict)),
+                ('params_hash', models.CharField(max_length=64)),
+                ('status', models.IntegerField(choices=[(-1, -1), (0, 0), (1, 1), (2, 2), (3, 3)], default=-1)),
+                ('result', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('error_message', models.CharField(blank=True, max_length=300, null=True)),
+                ('celery_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='tooljob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', [-1, 1])), fields=('tool', 'params_hash'), name='unique_active_tool_job'),
+        ),
+    ]
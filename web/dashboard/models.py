@@ -1,6 +1,9 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import User
 
+from reNgine.definitions import CELERY_TASK_STATUSES, INITIATED_TASK, RUNNING_TASK
+
 class SearchHistory(models.Model):
 	query = models.CharField(max_length=1000)
 
@@ -45,4 +48,35 @@ class NetlasAPIKey(models.Model):
 	key = models.CharField(max_length=500)
 
 	def __str__(self):
-		return self.key
\ No newline at end of file
+		return self.key
+
+
+class ToolJob(models.Model):
+	"""Toolbox lookup (WHOIS, CMS detection, ...) run by the `run_tool_job`
+	task, polled by the client instead of waiting for its result in the web
+	request.
+
+	Identical lookups share the job running them: only one job per tool and
+	params can be initiated or running at a time.
+	"""
+	id = models.AutoField(primary_key=True)
+	tool = models.CharField(max_length=50)
+	params = models.JSONField(default=dict)
+	params_hash = models.CharField(max_length=64)
+	status = models.IntegerField(choices=CELERY_TASK_STATUSES, default=INITIATED_TASK)
+	result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+	error_message = models.CharField(max_length=300, blank=True, null=True)
+	celery_id = models.CharField(max_length=100, blank=True, null=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	completed_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(
+				fields=['tool', 'params_hash'],
+				condition=models.Q(status__in=[INITIATED_TASK, RUNNING_TASK]),
+				name='unique_active_tool_job'),
+		]
+
+	def __str__(self):
+		return f'{self.tool} {self.id}'
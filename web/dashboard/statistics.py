@@ -0,0 +1,192 @@
+import json
+import logging
+from datetime import timedelta
+
+import redis
+from django.db.models import CharField, Count, Exists, OuterRef, Q, Value
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from reNgine.settings import CELERY_BROKER_URL, DASHBOARD_CACHE_TTL
+from startScan.models import (CountryISO, CveId, CweId, EndPoint, IpAddress,
+                              Port, ScanHistory, Subdomain, Technology,
+                              Vulnerability, VulnerabilityTags)
+from targetApp.models import Domain
+
+logger = logging.getLogger(__name__)
+
+cache = redis.Redis.from_url(CELERY_BROKER_URL, socket_connect_timeout=1)
+
+# Number of items in the dashboard "most used" charts
+TOP_COUNT = 7
+
+
+def get_last_7_dates():
+    return [(timezone.now() - timedelta(days=i)).date() for i in range(0, 7)]
+
+
+def get_version_key(project_id):
+    return f'rengine:dashboard:{project_id}:version'
+
+
+def get_project_statistics(project):
+    """Get the dashboard statistics of a project.
+
+    Statistics are cached in Redis until the project cache version is bumped
+    by `invalidate_project_statistics`, or at most DASHBOARD_CACHE_TTL
+    seconds as results saved by running scans do not bump it.
+
+    Args:
+        project (dashboard.models.Project): Project.
+
+    Returns:
+        dict: Dashboard statistics.
+    """
+    key = None
+    try:
+        version = int(cache.get(get_version_key(project.id)) or 0)
+        key = f'rengine:dashboard:{project.id}:{version}:{timezone.now().date()}'
+        cached = cache.get(key)
+        if cached:
+            return json.loads(cached)
+    except redis.exceptions.RedisError as e:
+        logger.debug(f'Could not get dashboard statistics from cache: {e}')
+    statistics = count_project_statistics(project)
+    if key:
+        try:
+            cache.set(key, json.dumps(statistics), ex=DASHBOARD_CACHE_TTL)
+        except redis.exceptions.RedisError as e:
+            logger.debug(f'Could not cache dashboard statistics: {e}')
+    return statistics
+
+
+def invalidate_project_statistics(*project_ids):
+    """Drop the cached dashboard statistics of projects.
+
+    Args:
+        project_ids (int): Project ids.
+    """
+    for project_id in set(project_ids):
+        if not project_id:
+            continue
+        try:
+            cache.incr(get_version_key(project_id))
+        except redis.exceptions.RedisError as e:
+            logger.debug(f'Could not invalidate dashboard statistics: {e}')
+
+
+def count_project_statistics(project):
+    """Count the assets of a project with grouped queries.
+
+    Args:
+        project (dashboard.models.Project): Project.
+
+    Returns:
+        dict: Dashboard statistics, JSON serializable.
+    """
+    domains = Domain.objects.filter(project=project)
+    scan_histories = ScanHistory.objects.filter(domain__project=project)
+    subdomains = Subdomain.objects.filter(scan_history__domain__project=project)
+    endpoints = EndPoint.objects.filter(scan_history__domain__project=project)
+    vulnerabilities = Vulnerability.objects.filter(scan_history__domain__project=project)
+
+    statistics = {
+        'domain_count': domains.count(),
+        'scan_count': scan_histories.count(),
+    }
+    subdomain_ips = Subdomain.ip_addresses.through.objects.filter(subdomain_id=OuterRef('id'))
+    statistics.update(
+        subdomains
+        .annotate(has_ip=Exists(subdomain_ips))
+        .aggregate(
+            subdomain_count=Count('id'),
+            subdomain_with_ip_count=Count('id', filter=Q(has_ip=True)),
+            alive_count=Count('id', filter=~Q(http_status=0))))
+    statistics.update(endpoints.aggregate(
+        endpoint_count=Count('id'),
+        endpoint_alive_count=Count('id', filter=Q(http_status__gt=0))))
+    severity_counts = vulnerabilities.aggregate(**{
+        f'{name}_count': Count('id', filter=Q(severity=severity))
+        for severity, name in [(0, 'info'), (1, 'low'), (2, 'medium'), (3, 'high'), (4, 'critical'), (-1, 'unknown')]
+    })
+    statistics.update(severity_counts)
+    statistics['total_vul_count'] = sum(severity_counts.values())
+    statistics['total_vul_ignore_info_count'] = (
+        statistics['total_vul_count']
+        - severity_counts['info_count']
+        - severity_counts['unknown_count'])
+    statistics.update(count_last_week(domains, scan_histories, subdomains, endpoints, vulnerabilities))
+
+    ips = IpAddress.objects.filter(ip_addresses__scan_history__domain__project=project)
+    statistics['total_ips'] = ips.aggregate(count=Count('id', distinct=True))['count']
+    statistics['most_used_ip'] = list(
+        ips
+        .annotate(count=Count('ip_addresses'))
+        .order_by('-count')
+        .values('address', 'count')
+        [:TOP_COUNT])
+    statistics['most_used_port'] = list(
+        Port.objects
+        .filter(ports__ip_addresses__scan_history__domain__project=project)
+        .annotate(count=Count('ports', distinct=True))
+        .order_by('-count')
+        .values('number', 'service_name', 'count')
+        [:TOP_COUNT])
+    statistics['most_used_tech'] = list(
+        Technology.objects
+        .filter(technologies__scan_history__domain__project=project)
+        .annotate(count=Count('technologies'))
+        .order_by('-count')
+        .values('name', 'count')
+        [:TOP_COUNT])
+    for name, model, related_name in [
+            ('most_common_cve', CveId, 'cve_ids'),
+            ('most_common_cwe', CweId, 'cwe_ids'),
+            ('most_common_tags', VulnerabilityTags, 'vuln_tags')]:
+        statistics[name] = list(
+            model.objects
+            .filter(**{f'{related_name}__scan_history__domain__project': project})
+            .annotate(nused=Count(related_name))
+            .order_by('-nused')
+            .values('name', 'nused')
+            [:TOP_COUNT])
+    statistics['asset_countries'] = list(
+        CountryISO.objects
+        .filter(ipaddress__ip_addresses__scan_history__domain__project=project)
+        .annotate(count=Count('ipaddress', distinct=True))
+        .order_by('-count')
+        .values('iso', 'name', 'count'))
+    return statistics
+
+
+def count_last_week(domains, scan_histories, subdomains, endpoints, vulnerabilities):
+    """Count the assets created each day of the last 7 days, in one query.
+
+    Returns:
+        dict: Counts of each day, from the oldest, by chart name.
+    """
+    last_week = timezone.now() - timedelta(days=7)
+    charts = [
+        ('targets_in_last_week', domains, 'insert_date'),
+        ('scans_in_last_week', scan_histories, 'start_scan_date'),
+        ('subdomains_in_last_week', subdomains, 'discovered_date'),
+        ('endpoints_in_last_week', endpoints, 'discovered_date'),
+        ('vulns_in_last_week', vulnerabilities, 'discovered_date'),
+    ]
+    querysets = [
+        queryset
+        .filter(**{f'{field}__gte': last_week})
+        .values(chart=Value(name, output_field=CharField()), date=TruncDay(field))
+        .annotate(count=Count('id'))
+        .order_by()
+        for name, queryset, field in charts
+    ]
+    counts = {
+        (row['chart'], timezone.localtime(row['date']).date()): row['count']
+        for row in querysets[0].union(*querysets[1:], all=True)
+    }
+    last_7_dates = get_last_7_dates()
+    return {
+        name: [counts.get((name, date), 0) for date in reversed(last_7_dates)]
+        for name, _, _ in charts
+    }
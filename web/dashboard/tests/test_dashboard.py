@@ -5,13 +5,20 @@ import json
 from unittest.mock import patch, MagicMock
 from django.urls import reverse
 from utils.test_base import BaseTestCase
+from utils.test_utils import FakeRedis
 from django.contrib.auth.models import User
 from rolepermissions.checkers import has_role
 from reNgine.roles import SysAdmin, PenetrationTester
 from django.utils import timezone
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from dashboard.statistics import count_project_statistics, get_project_statistics, invalidate_project_statistics
+from startScan.models import Subdomain
+from targetApp.models import Domain
 
 __all__ = [
-    'TestDashboardViews'
+    'TestDashboardViews',
+    'TestDashboardStatistics',
 ]
 
 class TestDashboardViews(BaseTestCase):
@@ -159,3 +166,49 @@ class AdminInterfaceUpdateTests(BaseTestCase):
         response = self.client.put(reverse('admin_interface_update') + f'?user={self.user_to_test.id}')
         self.assertEqual(response.status_code, 302)
 
+
+
+class TestDashboardStatistics(BaseTestCase):
+    """Test the dashboard statistics are counted with a few grouped queries."""
+
+    def setUp(self):
+        super().setUp()
+        self.data_generator.create_project_full()
+        self.project = self.data_generator.project
+        patcher = patch('dashboard.statistics.cache', FakeRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_counts(self):
+        """Test counts match the project assets."""
+        subdomains = Subdomain.objects.filter(scan_history__domain__project=self.project)
+        subdomains.update(discovered_date=timezone.now())
+        statistics = count_project_statistics(self.project)
+        self.assertEqual(statistics['domain_count'], Domain.objects.filter(project=self.project).count())
+        self.assertEqual(statistics['subdomain_count'], subdomains.count())
+        self.assertEqual(statistics['subdomains_in_last_week'], [0] * 6 + [subdomains.count()])
+        self.assertEqual(statistics['low_count'], 1)
+        self.assertEqual(statistics['total_vul_count'], 1)
+        self.assertEqual(statistics['total_vul_ignore_info_count'], 1)
+        json.dumps(statistics)
+
+    def test_query_count(self):
+        """Test the number of queries does not depend on the number of assets."""
+        with CaptureQueriesContext(connection) as few_assets:
+            count_project_statistics(self.project)
+        for i in range(20):
+            self.data_generator.create_subdomain(f'sub{i}.example.com')
+            self.data_generator.create_vulnerability()
+        with CaptureQueriesContext(connection) as more_assets:
+            count_project_statistics(self.project)
+        self.assertEqual(len(few_assets.captured_queries), len(more_assets.captured_queries))
+        self.assertLessEqual(len(more_assets.captured_queries), 15)
+
+    def test_cached(self):
+        """Test statistics are cached until they are invalidated."""
+        statistics = get_project_statistics(self.project)
+        self.data_generator.create_vulnerability()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_project_statistics(self.project), statistics)
+        invalidate_project_statistics(self.project.id)
+        self.assertEqual(get_project_statistics(self.project)['low_count'], statistics['low_count'] + 1)
@@ -0,0 +1,217 @@
+import hashlib
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Case, CharField, F, Value, When
+
+from reNgine.common_func import is_scan_running
+from reNgine.definitions import ABORTED_TASK, FAILED_TASK, SUCCESS_TASK
+from startScan.models import AssetChange, EndPoint, ScanHistory, Subdomain
+
+# Assets diffed between scans: model, name field, scan task finding them, and
+# status of the scans they are compared with
+AssetType = namedtuple('AssetType', ['model', 'name_field', 'task', 'statuses'])
+ASSET_TYPES = {
+	'subdomain': AssetType(Subdomain, 'name', 'subdomain_discovery', [FAILED_TASK, SUCCESS_TASK, ABORTED_TASK]),
+	'endpoint': AssetType(EndPoint, 'http_url', 'fetch_url', [SUCCESS_TASK]),
+}
+
+# Changes listed when none are asked for
+DEFAULT_CHANGES = [AssetChange.ADDED, AssetChange.REMOVED]
+
+# Rows of a scan asset: name hash, id and name
+AssetRow = namedtuple('AssetRow', ['name_hash', 'id', 'name'])
+
+
+def get_name_hash(name):
+	return hashlib.sha256((name or '').encode()).hexdigest()
+
+
+def get_previous_scan(scan, asset_type):
+	"""Get the scan the assets of a scan are compared with: the last completed
+	scan of the same target running the task finding the assets.
+
+	Args:
+		scan (startScan.models.ScanHistory): Scan.
+		asset_type (str): Asset type, one of ASSET_TYPES.
+
+	Returns:
+		startScan.models.ScanHistory: Previous scan, or None.
+	"""
+	config = ASSET_TYPES[asset_type]
+	if config.task not in (scan.tasks or []):
+		return None
+	return (
+		ScanHistory.objects
+		.filter(domain_id=scan.domain_id)
+		.filter(tasks__overlap=[config.task])
+		.filter(scan_status__in=config.statuses)
+		.filter(id__lt=scan.id)
+		.order_by('-start_scan_date', '-id')
+		.first()
+	)
+
+
+def get_asset_rows(scan_id, asset_type):
+	"""Get the assets of a scan sorted by name hash, one per name.
+
+	Args:
+		scan_id (int): ScanHistory id.
+		asset_type (str): Asset type, one of ASSET_TYPES.
+
+	Returns:
+		list: AssetRow tuples.
+	"""
+	config = ASSET_TYPES[asset_type]
+	assets = (
+		config.model.objects
+		.filter(scan_history_id=scan_id)
+		.order_by('id')
+		.values_list('id', config.name_field)
+	)
+	rows = {}
+	for asset_id, name in assets.iterator():
+		name_hash = get_name_hash(name)
+		if name_hash not in rows:
+			rows[name_hash] = AssetRow(name_hash, asset_id, name)
+	return sorted(rows.values())
+
+
+def diff_asset_rows(previous_rows, rows):
+	"""Diff the assets of two scans with a merge of their rows sorted by name
+	hash, in a single pass over both.
+
+	Args:
+		previous_rows (list): AssetRow tuples of the previous scan, see
+			`get_asset_rows`.
+		rows (list): AssetRow tuples of the scan.
+
+	Yields:
+		tuple: Change, and AssetRow of the asset in the scan, or in the
+			previous scan for removed assets.
+	"""
+	i = j = 0
+	while i < len(previous_rows) or j < len(rows):
+		if j == len(rows) or (i < len(previous_rows) and previous_rows[i].name_hash < rows[j].name_hash):
+			yield AssetChange.REMOVED, previous_rows[i]
+			i += 1
+		elif i == len(previous_rows) or rows[j].name_hash < previous_rows[i].name_hash:
+			yield AssetChange.ADDED, rows[j]
+			j += 1
+		else:
+			yield AssetChange.UNCHANGED, rows[j]
+			i += 1
+			j += 1
+
+
+def diff_scans(previous_scan_id, scan_id, asset_type):
+	"""Diff the assets of any two scans.
+
+	Args:
+		previous_scan_id (int): ScanHistory id of the scan compared with.
+		scan_id (int): ScanHistory id.
+		asset_type (str): Asset type, one of ASSET_TYPES.
+
+	Returns:
+		dict: Sorted names of the added and removed assets, and number of
+			unchanged assets.
+	"""
+	changes = {AssetChange.ADDED: [], AssetChange.REMOVED: [], AssetChange.UNCHANGED: []}
+	for change, row in diff_asset_rows(get_asset_rows(previous_scan_id, asset_type), get_asset_rows(scan_id, asset_type)):
+		changes[change].append(row.name)
+	return {
+		'added': sorted(changes[AssetChange.ADDED]),
+		'removed': sorted(changes[AssetChange.REMOVED]),
+		'unchanged_count': len(changes[AssetChange.UNCHANGED]),
+	}
+
+
+def save_asset_changes(scan, asset_types=None):
+	"""Diff the assets of a scan with the previous scan of its target, and
+	store the changes as AssetChange rows replacing the previous ones. Scans
+	without a previous scan get a marker row, see AssetChange.
+
+	Args:
+		scan (startScan.models.ScanHistory): Scan.
+		asset_types (list, optional): Asset types to diff, all by default.
+	"""
+	for asset_type in asset_types or ASSET_TYPES:
+		previous_scan = get_previous_scan(scan, asset_type)
+		changes = [AssetChange(scan_history=scan, asset_type=asset_type, change=AssetChange.UNCHANGED, name_hash='')]
+		if previous_scan:
+			rows = diff_asset_rows(get_asset_rows(previous_scan.id, asset_type), get_asset_rows(scan.id, asset_type))
+			changes = [
+				AssetChange(
+					scan_history=scan,
+					previous_scan=previous_scan,
+					asset_type=asset_type,
+					change=change,
+					name_hash=row.name_hash,
+					**{f'{asset_type}_id': row.id})
+				for change, row in rows
+			]
+		with transaction.atomic():
+			AssetChange.objects.filter(scan_history=scan, asset_type=asset_type).delete()
+			AssetChange.objects.bulk_create(changes, batch_size=1000)
+
+
+def get_changed_assets(scan, asset_type, changes=None):
+	"""Get the assets of a scan changed since the previous scan of its target.
+
+	Changes are read from the AssetChange rows of the scan, which are stored
+	first if the scan has none, e.g. for scans run before they existed. Changes
+	of running scans are computed without being stored, as their assets are
+	not all found yet.
+
+	Args:
+		scan (startScan.models.ScanHistory): Scan.
+		asset_type (str): Asset type, one of ASSET_TYPES.
+		changes (list, optional): Changes listed, added and removed assets
+			by default.
+
+	Returns:
+		django.db.models.QuerySet: Subdomains or endpoints, annotated with
+			their `change`.
+	"""
+	changes = changes or DEFAULT_CHANGES
+	if not AssetChange.objects.filter(scan_history=scan, asset_type=asset_type).exists():
+		if is_scan_running(scan):
+			return get_unsaved_changed_assets(scan, asset_type, changes)
+		save_asset_changes(scan, [asset_type])
+	return (
+		ASSET_TYPES[asset_type].model.objects
+		.filter(asset_changes__scan_history=scan, asset_changes__change__in=changes)
+		.annotate(change=F('asset_changes__change'))
+	)
+
+
+def get_unsaved_changed_assets(scan, asset_type, changes):
+	"""Get the assets of a scan changed since the previous scan of its target,
+	diffing both scans without storing the changes, e.g. while the scan runs.
+
+	Args:
+		scan (startScan.models.ScanHistory): Scan.
+		asset_type (str): Asset type, one of ASSET_TYPES.
+		changes (list): Changes listed.
+
+	Returns:
+		django.db.models.QuerySet: Subdomains or endpoints, annotated with
+			their `change`.
+	"""
+	ids_by_change = {change: [] for change in changes}
+	previous_scan = get_previous_scan(scan, asset_type)
+	if previous_scan:
+		for change, row in diff_asset_rows(get_asset_rows(previous_scan.id, asset_type), get_asset_rows(scan.id, asset_type)):
+			if change in ids_by_change:
+				ids_by_change[change].append(row.id)
+	ids_by_change = {change: ids for change, ids in ids_by_change.items() if ids}
+	model = ASSET_TYPES[asset_type].model
+	if not ids_by_change:
+		return model.objects.none()
+	return (
+		model.objects
+		.filter(id__in=[asset_id for ids in ids_by_change.values() for asset_id in ids])
+		.annotate(change=Case(
+			*[When(id__in=ids, then=Value(change)) for change, ids in ids_by_change.items()],
+			output_field=CharField()))
+	)
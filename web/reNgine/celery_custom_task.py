@@ -1,16 +1,19 @@
 import json
+import time
 
-from celery import Task
+from celery import Task, chain, chord
+from celery.exceptions import Ignore
 from celery.utils.log import get_task_logger
 from celery.worker.request import Request
 from django.utils import timezone
 from redis import Redis
 from reNgine.common_func import (fmt_traceback, get_output_file_name,
-								 get_task_cache_key, get_traceback_path)
+								 get_task_cache_key, get_traceback_path,
+								 truncate_discord_field)
 from reNgine.definitions import *
 from reNgine.settings import *
-from scanEngine.models import EngineType
-from startScan.models import ScanActivity, ScanHistory, SubScan
+from scanEngine.models import EngineType, Notification
+from startScan.models import ScanActivity, ScanHistory, ScanStatistics, SubScan
 
 logger = get_task_logger(__name__)
 
@@ -24,6 +27,27 @@ class RengineRequest(Request):
 	retry_msg = ''
 
 
+class ChordSafeTask(Task):
+	"""A Celery task that can run in the header of a chord, e.g. one started
+	by `RengineTask.replace_with_chord`.
+
+	An exception raised in a chord header prevents the chord callback from
+	running, which would leave the scan stuck. When the task is part of a
+	chord, exceptions are logged instead and the task returns None.
+	"""
+
+	def __call__(self, *args, **kwargs):
+		try:
+			return super().__call__(*args, **kwargs)
+		except Ignore:
+			raise
+		except Exception as exc:
+			if not self.request.chord:
+				raise
+			logger.exception(exc)
+			return None
+
+
 class RengineTask(Task):
 	"""A Celery task that is tracked by reNgine. Save task output files and
 	tracebacks to RENGINE_RESULTS.
@@ -40,7 +64,11 @@ class RengineTask(Task):
 	- Set result to cache after a task if no exceptions occured.
 
 	RENGINE_RAISE_ON_ERROR:
-	- Raise the actual exception when task fails instead of just logging it.
+	- Raise the actual exception when task fails instead of just logging it,
+	unless the task is part of a chord (see `ChordSafeTask`).
+
+	Notification fields sent by a task while it is running are merged and sent
+	at most every NOTIFICATION_FLUSH_INTERVAL seconds, and when the task ends.
 	"""
 	Request = RengineRequest
 
@@ -80,6 +108,10 @@ class RengineTask(Task):
 		self.subdomain = self.subscan.subdomain if self.subscan else None
 		self.subdomain_id = self.subdomain.id if self.subdomain else None
 		self.activity_id = None
+		self.notification = None
+		self.pending_fields = {}
+		self.pending_meta_info = False
+		self.last_notify_flush = time.time()
 
 		# Set file self.task_name if not already set
 		if not self.filename:
@@ -129,6 +161,11 @@ class RengineTask(Task):
 			self.result = self.run(*args, **kwargs)
 			self.status = SUCCESS_TASK
 
+		except Ignore:
+			# Task was replaced by a chord (see `replace_with_chord`), the chord
+			# callback will update the ScanActivity once the sub-tasks are done.
+			raise
+
 		except Exception as exc:
 			self.status = FAILED_TASK
 			self.error = repr(exc)
@@ -141,7 +178,7 @@ class RengineTask(Task):
 				self.subscan_id)
 			os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
 
-			if RENGINE_RAISE_ON_ERROR:
+			if RENGINE_RAISE_ON_ERROR and not self.request.chord:
 				raise exc
 
 			logger.exception(exc)
@@ -149,12 +186,15 @@ class RengineTask(Task):
 		finally:
 			self.write_results()
 
-			if RENGINE_RECORD_ENABLED and self.track:
+			if RENGINE_RECORD_ENABLED and self.track and self.status != RUNNING_TASK:
 				msg = f'Task {self.task_name} status is {self.status_str}'
 				msg += f' | Error: {self.error}' if self.error else ''
 				logger.warning(msg)
 				self.update_scan_activity()
 
+			# Send remaining notification fields
+			self.flush_notifications()
+
 		# Set task result in cache if task was successful
 		if RENGINE_CACHE_ENABLED and self.status == SUCCESS_TASK and result:
 			cache.set(record_key, json.dumps(result))
@@ -162,6 +202,35 @@ class RengineTask(Task):
 
 		return self.result
 
+	def replace_with_chord(self, tasks, callbacks=None, result=None):
+		"""Replace this task by a chord running `tasks` in parallel, followed
+		by `callbacks` and a final callback marking this task's ScanActivity as
+		successful.
+
+		The task returns immediately instead of waiting on its sub-tasks, so
+		the worker slot is released while they run. Tasks chained after this
+		one in the scan workflow will only start once the chord has finished.
+
+		Tasks that are not RengineTasks must use `ChordSafeTask` as their base,
+		so that one of them failing does not stop the chord.
+
+		Args:
+			tasks (list): Signatures to run in parallel.
+			callbacks (list, optional): Signatures to run after all tasks.
+			result (optional): Result returned by the chord.
+		"""
+		# Import here to avoid Celery circular import
+		from reNgine.tasks import finish_task
+		callback = finish_task.si(
+			self.task_name,
+			activity_id=self.activity_id,
+			result=result,
+			scan_history_id=self.scan_id,
+			engine_id=self.engine_id,
+			subscan_id=self.subscan_id)
+		body = chain(*callbacks, callback) if callbacks else callback
+		return self.replace(chord(tasks, body))
+
 	def write_results(self):
 		if not self.result:
 			return False
@@ -191,6 +260,7 @@ class RengineTask(Task):
 		if self.scan:
 			self.activity.scan_of = self.scan
 			self.activity.save()
+			ScanStatistics.increment(self.scan.id, activity_count=1)
 			self.scan.celery_ids.append(celery_id)
 			self.scan.save()
 		if self.subscan:
@@ -217,12 +287,53 @@ class RengineTask(Task):
 		self.notify()
 
 	def notify(self, name=None, severity=None, fields={}, add_meta_info=True):
+		# Merge field updates of the task notification while it is running,
+		# they are sent with the next flush.
+		if fields and not name and not severity and self.status == RUNNING_TASK:
+			for key, value in fields.items():
+				values = self.pending_fields.setdefault(key, [])
+				if value not in values:
+					values.append(value)
+			self.pending_meta_info = self.pending_meta_info or add_meta_info
+			if time.time() - self.last_notify_flush >= NOTIFICATION_FLUSH_INTERVAL:
+				self.flush_notifications()
+			return
+
+		# Send pending fields along with the task notification
+		if not name and self.pending_fields:
+			fields = {**self.get_pending_fields(), **fields}
+		return self.send_notif(name, severity, fields, add_meta_info)
+
+	def flush_notifications(self):
+		if not self.pending_fields:
+			return
+		add_meta_info = self.pending_meta_info
+		fields = self.get_pending_fields()
+		self.send_notif(fields=fields, add_meta_info=add_meta_info)
+
+	def get_pending_fields(self):
+		fields = {
+			key: truncate_discord_field('\n'.join(str(value) for value in values))
+			for key, values in self.pending_fields.items()
+		}
+		self.pending_fields = {}
+		self.pending_meta_info = False
+		self.last_notify_flush = time.time()
+		return fields
+
+	def send_notif(self, name=None, severity=None, fields={}, add_meta_info=True):
+		# Skip sending if task notifications are disabled
+		if self.notification is None:
+			self.notification = Notification.objects.first() or False
+		if not (self.notification and self.notification.send_scan_status_notif):
+			return None
+
 		# Import here to avoid Celery circular import and be able to use `delay`
 		from reNgine.tasks import send_task_notif
 		return send_task_notif.delay(
 			name or self.task_name,
 			status=self.status_str,
-			result=self.result,
+			result=bool(self.result),
 			traceback=self.traceback,
 			output_path=self.output_path,
 			scan_history_id=self.scan_id,
@@ -1,11 +1,15 @@
+import gzip
+import hashlib
 import json
 import os
 import pickle
 import random
 import shutil
+import signal
 import traceback
 import shlex
 import subprocess
+import time
 from time import sleep
 
 import humanize
@@ -17,24 +21,32 @@ import validators
 import ipaddress
 
 from bs4 import BeautifulSoup
+from pathlib import Path
 from urllib.parse import urlparse
 from celery.utils.log import get_task_logger
 from discord_webhook import DiscordEmbed, DiscordWebhook
-from django.db.models import Q
+from pycvesearch import CVESearch
+from django.db.models import (BooleanField, Exists, F, Func, IntegerField,
+							  OuterRef, Q, Subquery, Value)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
 
 from reNgine.common_serializers import *
 from reNgine.definitions import *
 from reNgine.settings import *
+from reNgine.utilities import LRUCache, chunked
 from scanEngine.models import *
 from dashboard.models import *
+from recon_note.models import TodoNote
 from startScan.models import *
 from targetApp.models import *
 
 
 logger = get_task_logger(__name__)
 DISCORD_WEBHOOKS_CACHE = redis.Redis.from_url(CELERY_BROKER_URL)
+REDIS_LOCKS = redis.Redis.from_url(REDIS_LOCKS_URL)
 
 #------------------#
 # EngineType utils #
@@ -151,80 +163,6 @@ def get_subdomains(write_filepath=None, exclude_subdomains=False, ctx={}):
 
 	return subdomains
 
-def get_new_added_subdomain(scan_id, domain_id):
-	"""Find domains added during the last scan.
-
-	Args:
-		scan_id (int): startScan.models.ScanHistory ID.
-		domain_id (int): startScan.models.Domain ID.
-
-	Returns:
-		django.models.querysets.QuerySet: query of newly added subdomains.
-	"""
-	scan = (
-		ScanHistory.objects
-		.filter(domain=domain_id)
-		.filter(tasks__overlap=['subdomain_discovery'])
-		.filter(id__lte=scan_id)
-	)
-	if not scan.count() > 1:
-		return
-	last_scan = scan.order_by('-start_scan_date')[1]
-	scanned_host_q1 = (
-		Subdomain.objects
-		.filter(scan_history__id=scan_id)
-		.values('name')
-	)
-	scanned_host_q2 = (
-		Subdomain.objects
-		.filter(scan_history__id=last_scan.id)
-		.values('name')
-	)
-	added_subdomain = scanned_host_q1.difference(scanned_host_q2)
-	return (
-		Subdomain.objects
-		.filter(scan_history=scan_id)
-		.filter(name__in=added_subdomain)
-	)
-
-
-def get_removed_subdomain(scan_id, domain_id):
-	"""Find domains removed during the last scan.
-
-	Args:
-		scan_id (int): startScan.models.ScanHistory ID.
-		domain_id (int): startScan.models.Domain ID.
-
-	Returns:
-		django.models.querysets.QuerySet: query of newly added subdomains.
-	"""
-	scan_history = (
-		ScanHistory.objects
-		.filter(domain=domain_id)
-		.filter(tasks__overlap=['subdomain_discovery'])
-		.filter(id__lte=scan_id)
-	)
-	if not scan_history.count() > 1:
-		return
-	last_scan = scan_history.order_by('-start_scan_date')[1]
-	scanned_host_q1 = (
-		Subdomain.objects
-		.filter(scan_history__id=scan_id)
-		.values('name')
-	)
-	scanned_host_q2 = (
-		Subdomain.objects
-		.filter(scan_history__id=last_scan.id)
-		.values('name')
-	)
-	removed_subdomains = scanned_host_q2.difference(scanned_host_q1)
-	return (
-		Subdomain.objects
-		.filter(scan_history=last_scan)
-		.filter(name__in=removed_subdomains)
-	)
-
-
 def get_interesting_subdomains(scan_history=None, domain_id=None):
 	"""Get Subdomain objects matching InterestingLookupModel conditions.
 
@@ -275,6 +213,116 @@ def get_interesting_subdomains(scan_history=None, domain_id=None):
 	return url_lookup_query | title_lookup_query
 
 
+def count_subquery(queryset, distinct=False):
+	"""Subquery counting the rows of a queryset referencing the outer query.
+
+	Args:
+		queryset (django.db.models.QuerySet): QuerySet filtered with OuterRef.
+		distinct (bool): Count distinct ids.
+
+	Returns:
+		django.db.models.Subquery: Count subquery.
+	"""
+	template = '%(function)s(DISTINCT %(expressions)s)' if distinct else '%(function)s(%(expressions)s)'
+	count = Func(F('id'), function='COUNT', template=template, output_field=IntegerField())
+	return Subquery(queryset.order_by().annotate(count=count).values('count'), output_field=IntegerField())
+
+
+def get_scan_data_version(scan, **data):
+	"""Get a stamp of the results of a scan, to reuse what is built from them.
+
+	The stamp changes when results are added or removed (see
+	`startScan.models.ScanStatistics`) and when the scan or its subscans
+	status changes.
+
+	Args:
+		scan (startScan.models.ScanHistory): Scan.
+		data (dict): Other data the stamp depends on, JSON serializable.
+
+	Returns:
+		str: Data version.
+	"""
+	statistics = scan.get_statistics()
+	data.update({
+		'statistics': [
+			getattr(statistics, field.attname)
+			for field in statistics._meta.concrete_fields
+			if field.attname not in ('scan_history_id', 'reconciled_at')
+		],
+		'scan_status': scan.scan_status,
+		'stop_scan_date': scan.stop_scan_date,
+		'subscans': list(
+			SubScan.objects
+			.filter(scan_history=scan)
+			.order_by('id')
+			.values_list('id', 'status', 'stop_scan_date')),
+	})
+	return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+def is_scan_running(scan):
+	"""Check if a scan or one of its subscans is still running, so that what
+	is built from its results is not stored yet.
+
+	Args:
+		scan (startScan.models.ScanHistory): Scan.
+
+	Returns:
+		bool: True if the scan is running.
+	"""
+	running_statuses = [INITIATED_TASK, RUNNING_TASK]
+	return (
+		scan.scan_status in running_statuses
+		or SubScan.objects.filter(scan_history=scan, status__in=running_statuses).exists())
+
+
+# Related objects serialized with subdomains
+SUBDOMAIN_RELATED_OBJECTS = [
+	'ip_addresses__ports',
+	'ip_addresses__ip_subscan_ids',
+	'waf',
+	'technologies',
+	'directories__directory_files',
+	'directories__dir_subscan_ids',
+]
+
+
+def annotate_subdomains(queryset):
+	"""Annotate subdomains with the counts shown in subdomain tables, to
+	serialize them with a constant number of queries.
+
+	Like the Subdomain count properties, endpoints and vulnerabilities are
+	counted for all subdomains having the same name in the same scan.
+
+	Args:
+		queryset (django.db.models.QuerySet): Subdomain queryset.
+
+	Returns:
+		django.db.models.QuerySet: Annotated queryset.
+	"""
+	same_scan = Coalesce(OuterRef('scan_history'), F('scan_history'))
+	endpoints = EndPoint.objects.filter(subdomain__name=OuterRef('name'), scan_history=same_scan)
+	vulns = Vulnerability.objects.filter(subdomain__name=OuterRef('name'), scan_history=same_scan)
+	todos = TodoNote.objects.filter(subdomain=OuterRef('id'), scan_history=same_scan, is_done=False)
+	directory_files = DirectoryFile.objects.filter(directory_files__directories=OuterRef('id'))
+	subscans = SubScan.objects.filter(subdomain=OuterRef('id'))
+	interesting = get_interesting_subdomains(scan_history=OuterRef('scan_history'))
+	if interesting.query.is_empty():
+		is_interesting = Value(False, output_field=BooleanField())
+	else:
+		is_interesting = Exists(interesting.filter(name=OuterRef('name')))
+	return queryset.annotate(
+		endpoint_count=count_subquery(endpoints),
+		info_count=count_subquery(vulns.filter(severity=0)),
+		low_count=count_subquery(vulns.filter(severity=1)),
+		medium_count=count_subquery(vulns.filter(severity=2)),
+		high_count=count_subquery(vulns.filter(severity=3)),
+		critical_count=count_subquery(vulns.filter(severity=4)),
+		todos_count=count_subquery(todos),
+		directories_count=count_subquery(directory_files, distinct=True),
+		subscan_count=count_subquery(subscans),
+		is_interesting=is_interesting)
+
+
 #------------------#
 # EndPoint queries #
 #------------------#
@@ -320,7 +368,9 @@ def get_http_urls(
 		query = query.filter(subdomain__id=subdomain_id)
 	elif exclude_subdomains and domain:
 		logger.debug(f'Excluding subdomains')
-		query = query.filter(http_url=domain.http_url)
+		query = query.filter(
+			http_url_hash=EndPoint.get_http_url_hash(domain.http_url),
+			http_url=domain.http_url)
 	if get_only_default_urls:
 		logger.debug(f'Searching only for default URL')
 		query = query.filter(is_default=True)
@@ -335,7 +385,7 @@ def get_http_urls(
 	if url_filter and domain:
 		url = f'{domain.name}{url_filter}'
 		if strict:
-			query = query.filter(http_url=url)
+			query = query.filter(http_url_hash=EndPoint.get_http_url_hash(url), http_url=url)
 		else:
 			query = query.filter(http_url__contains=url)
 
@@ -731,14 +781,12 @@ def send_discord_message(
 					if value not in existing_val:
 						value = f'{existing_val}\n{value}'
 
-					if len(value) > 1024: # character limit for embed field
-						value = value[0:1016] + '\n[...]'
-
 				# Update existing embed
 				ix = embed.fields.index(field)
-				embed.fields[ix]['value'] = value
+				embed.fields[ix]['value'] = truncate_discord_field(value)
 
 			else:
+				new_field['value'] = truncate_discord_field(value)
 				embed.add_embed_field(**new_field)
 
 		webhook.add_embed(embed)
@@ -783,6 +831,21 @@ def send_discord_message(
 			f'\n\tDetails: {response.content}')
 
 
+def truncate_discord_field(value):
+	"""Truncate a Discord embed field value to the character limit of
+	embed fields.
+
+	Args:
+		value (str): Field value.
+
+	Returns:
+		str: Field value, truncated if too long.
+	"""
+	if len(value) > DISCORD_FIELD_MAX_LENGTH:
+		value = value[:DISCORD_FIELD_MAX_LENGTH - 8] + '\n[...]'
+	return value
+
+
 def enrich_notification(message, scan_history_id, subscan_id):
 	"""Add scan id / subscan id to notification message.
 
@@ -1187,6 +1250,7 @@ def create_scan_object(host_id, engine_id, initiated_by_id=None):
         user = User.objects.get(pk=initiated_by_id)
         scan.initiated_by = user
     scan.save()
+    ScanStatistics.objects.create(scan_history=scan)
     # save last scan date for domain model
     domain.start_scan_date = current_scan_time
     domain.save()
@@ -1224,6 +1288,49 @@ def create_command_object(cmd, scan_id, activity_id):
         activity_id=activity_id
     )
 
+class CommandOutputBuffer:
+    """
+    Buffer the output of a streamed command and flush it to CommandOutputChunk
+    rows every `flush_lines` lines or `flush_interval` seconds, instead of
+    saving the whole Command.output field after each line.
+
+    Args:
+        command_obj (Command): The Command object the output belongs to.
+        flush_lines (int, optional): Max number of buffered lines before a flush.
+        flush_interval (int, optional): Max number of seconds between two flushes.
+    """
+
+    def __init__(self, command_obj, flush_lines=COMMAND_OUTPUT_FLUSH_LINES, flush_interval=COMMAND_OUTPUT_FLUSH_INTERVAL):
+        self.command_obj = command_obj
+        self.flush_lines = flush_lines
+        self.flush_interval = flush_interval
+        self.lines = []
+        self.seq = 0
+        self.last_flush = time.monotonic()
+
+    def write(self, line):
+        """
+        Append a line to the buffer, flushing it if a threshold is reached.
+
+        Args:
+            line (str): The raw output line.
+        """
+        self.lines.append(line)
+        if len(self.lines) >= self.flush_lines or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write buffered lines as a new CommandOutputChunk."""
+        if self.lines:
+            CommandOutputChunk.objects.create(
+                command=self.command_obj,
+                seq=self.seq,
+                data=''.join(self.lines)
+            )
+            self.seq += 1
+            self.lines = []
+        self.last_flush = time.monotonic()
+
 def process_line(line, trunc_char=None):
     """
     Process a line of output from the command.
@@ -1260,7 +1367,7 @@ def write_history(history_file, cmd, return_code, output):
     with open(history_file, mode) as f:
         f.write(f'\n{cmd}\n{return_code}\n{output}\n------------------\n')
 
-def execute_command(command, shell, cwd):
+def execute_command(command, shell, cwd, new_session=False):
     """
     Execute a command using subprocess.
 
@@ -1268,6 +1375,7 @@ def execute_command(command, shell, cwd):
         command (str or list): The command to execute.
         shell (bool): Whether to use shell execution.
         cwd (str): The working directory for the command.
+        new_session (bool, optional): Whether to run the command in its own process group. Defaults to False.
 
     Returns:
         subprocess.Popen: The Popen object for the executed command.
@@ -1278,9 +1386,23 @@ def execute_command(command, shell, cwd):
         stderr=subprocess.STDOUT,
         universal_newlines=True,
         shell=shell,
-        cwd=cwd
+        cwd=cwd,
+        start_new_session=new_session
     )
 
+def kill_process_group(process):
+    """
+    Kill a command started in its own process group, along with the processes it spawned.
+
+    Args:
+        process (subprocess.Popen): The Popen object of the command.
+    """
+    logger.warning(f'Killing command {process.args} (pid {process.pid})')
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
 def get_data_from_post_request(request, field):
     """
     Get data from a POST request.
@@ -1352,4 +1474,211 @@ def get_ips_from_cidr_range(target):
         return [str(ip) for ip in ipaddress.IPv4Network(target)]
     except ValueError:
         logger.error(f'{target} is not a valid CIDR range. Skipping.')
-        return []
\ No newline at end of file
+        return []
+
+#-----------#
+# CVE utils #
+#-----------#
+CVE_CACHE = LRUCache(CVE_CACHE_SIZE)
+
+# Cached for CVEs the remote CVESearch API does not know
+CVE_NOT_FOUND = object()
+
+def get_cves_info(cve_ids):
+    """Get CVE details for a list of CVE ids.
+
+    CVEs are looked up in an in-process LRU cache first, then in the local
+    CveDetail table with a single query, and finally from the remote CVESearch
+    API if CVE_REMOTE_LOOKUP is enabled. Remote results are saved to the local
+    table, and CVEs the remote API does not know are cached as such so that
+    they are not fetched again.
+
+    Args:
+        cve_ids (list): CVE ids in the form CVE-*
+
+    Returns:
+        dict: CVE details in the CVESearch format by CVE id. CVEs that could
+            not be found are omitted.
+    """
+    results = {}
+    missing = []
+    for cve_id in dict.fromkeys(cve_ids):
+        cve_info = CVE_CACHE.get(cve_id)
+        if cve_info is CVE_NOT_FOUND:
+            continue
+        if cve_info:
+            results[cve_id] = cve_info
+        else:
+            missing.append(cve_id)
+
+    # Local CVE store
+    if missing:
+        for cve in CveDetail.objects.filter(cve_id__in=missing):
+            results[cve.cve_id] = cve.data
+            CVE_CACHE.set(cve.cve_id, cve.data)
+        missing = [cve_id for cve_id in missing if cve_id not in results]
+
+    # Remote fallback
+    if missing and CVE_REMOTE_LOOKUP:
+        fetched = []
+        for cve_id in missing:
+            try:
+                cve_info = CVESearch(CVE_SEARCH_URL).id(cve_id)
+            except Exception as e:
+                logger.error(f'Could not fetch CVE info for cve {cve_id}: {e}')
+                continue
+            if not cve_info:
+                CVE_CACHE.set(cve_id, CVE_NOT_FOUND)
+                continue
+            results[cve_id] = cve_info
+            CVE_CACHE.set(cve_id, cve_info)
+            fetched.append(CveDetail(cve_id=cve_id, data=cve_info))
+        CveDetail.objects.bulk_create(fetched, ignore_conflicts=True)
+    elif missing:
+        logger.warning(f'CVEs not found in local CVE store: {", ".join(missing)}')
+
+    return results
+
+def parse_nvd_cve_item(item):
+    """Convert a CVE item from a NVD JSON feed (1.1 feeds or 2.0 API) to the
+    CVESearch format.
+
+    Args:
+        item (dict): NVD CVE item.
+
+    Returns:
+        dict: CVE details in the CVESearch format.
+    """
+    cve = item['cve']
+
+    # NVD API 2.0
+    if 'id' in cve:
+        descriptions = cve.get('descriptions', [])
+        metrics = cve.get('metrics', {})
+        cvss_metrics = (
+            metrics.get('cvssMetricV31') or
+            metrics.get('cvssMetricV30') or
+            metrics.get('cvssMetricV2') or
+            [{}])
+        weaknesses = cve.get('weaknesses', [{}])[0].get('description', [])
+        return {
+            'id': cve['id'],
+            'summary': next((d['value'] for d in descriptions if d.get('lang') == 'en'), ''),
+            'cvss': cvss_metrics[0].get('cvssData', {}).get('baseScore'),
+            'cwe': weaknesses[0]['value'] if weaknesses else '',
+            'references': [ref['url'] for ref in cve.get('references', [])],
+        }
+
+    # NVD JSON 1.1 feeds
+    impact = item.get('impact', {})
+    cvss = (
+        impact.get('baseMetricV3', {}).get('cvssV3', {}).get('baseScore') or
+        impact.get('baseMetricV2', {}).get('cvssV2', {}).get('baseScore'))
+    descriptions = cve.get('description', {}).get('description_data', [])
+    problem_types = cve.get('problemtype', {}).get('problemtype_data', [{}])[0].get('description', [])
+    return {
+        'id': cve['CVE_data_meta']['ID'],
+        'summary': next((d['value'] for d in descriptions if d.get('lang') == 'en'), ''),
+        'cvss': cvss,
+        'cwe': problem_types[0]['value'] if problem_types else '',
+        'references': [ref['url'] for ref in cve.get('references', {}).get('reference_data', [])],
+    }
+
+def load_cve_feed(path, batch_size=1000):
+    """Load CVE details from an offline feed into the local CVE store.
+
+    Supported feeds (can be gzipped):
+    - NVD JSON 1.1 feeds (`CVE_Items` list).
+    - NVD API 2.0 dumps (`vulnerabilities` list).
+    - CVESearch dumps (JSON list or JSON lines of CVE objects).
+
+    Args:
+        path (str): Feed file path.
+        batch_size (int, optional): Number of CVEs saved per query.
+
+    Returns:
+        int: Number of CVEs loaded.
+    """
+    open_func = gzip.open if path.endswith('.gz') else open
+    with open_func(path, 'rt', encoding='utf8') as f:
+        content = f.read()
+    try:
+        feed = json.loads(content)
+    except json.JSONDecodeError:
+        feed = [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    if isinstance(feed, dict) and 'CVE_Items' in feed:
+        cves = (parse_nvd_cve_item(item) for item in feed['CVE_Items'])
+    elif isinstance(feed, dict) and 'vulnerabilities' in feed:
+        cves = (parse_nvd_cve_item(item) for item in feed['vulnerabilities'])
+    elif isinstance(feed, list):
+        cves = (cve for cve in feed if cve.get('id'))
+    else:
+        raise ValueError(f'Unsupported CVE feed format in {path}')
+
+    count = 0
+    for batch in chunked(cves, batch_size):
+        batch = {cve['id']: cve for cve in batch}
+        existing = CveDetail.objects.in_bulk(list(batch), field_name='cve_id')
+        for cve_id, cve in existing.items():
+            cve.data = batch[cve_id]
+            cve.updated_at = timezone.now()
+            CVE_CACHE.set(cve_id, cve.data)
+        CveDetail.objects.bulk_update(existing.values(), ['data', 'updated_at'])
+        CveDetail.objects.bulk_create(
+            [CveDetail(cve_id=cve_id, data=data) for cve_id, data in batch.items() if cve_id not in existing],
+            ignore_conflicts=True)
+        count += len(batch)
+    logger.info(f'Loaded {count} CVEs from {path}')
+    return count
+
+
+#------------------------#
+# Nuclei templates utils #
+#------------------------#
+def nuclei_templates_need_update():
+    """Check if nuclei templates were not checked for updates since
+    NUCLEI_TEMPLATES_UPDATE_TTL seconds.
+
+    Returns:
+        bool: True if templates should be updated.
+    """
+    if not os.path.isdir(NUCLEI_DEFAULT_TEMPLATES_PATH):
+        return True
+    templates_update = NucleiTemplatesUpdate.objects.first()
+    if not templates_update or not templates_update.checked_at:
+        return True
+    age = (timezone.now() - templates_update.checked_at).total_seconds()
+    return age > NUCLEI_TEMPLATES_UPDATE_TTL
+
+def get_nuclei_templates_checksum(path=None):
+    """Compute a checksum of nuclei templates names and contents.
+
+    Args:
+        path (str, optional): Templates directory. Defaults to
+            NUCLEI_DEFAULT_TEMPLATES_PATH.
+
+    Returns:
+        str: SHA256 hex digest, or None if the directory does not exist.
+    """
+    path = path or NUCLEI_DEFAULT_TEMPLATES_PATH
+    if not os.path.isdir(path):
+        return None
+    checksum = hashlib.sha256()
+    for template_path in sorted(Path(path).rglob('*.yaml')):
+        checksum.update(str(template_path.relative_to(path)).encode())
+        checksum.update(template_path.read_bytes())
+    return checksum.hexdigest()
+
+def get_redis_lock(name, timeout):
+    """Get a lock shared by all workers.
+
+    Args:
+        name (str): Lock name.
+        timeout (int): Seconds after which the lock is released if its owner
+            did not release it.
+
+    Returns:
+        redis.lock.Lock: Lock.
+    """
+    return REDIS_LOCKS.lock(f'rengine:lock:{name}', timeout=timeout)
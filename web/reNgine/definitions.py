@@ -14,6 +14,7 @@ logger = logging.getLogger('django')
 ###############################################################################
 
 EMAIL_REGEX = re.compile(r'[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+')
+CVE_REGEX = re.compile(r'CVE-\d{4}-\d+')
 
 ###############################################################################
 # YAML CONFIG DEFINITIONS
@@ -222,6 +223,9 @@ DISCORD_SEVERITY_COLORS = {
     'success': DISCORD_SUCCESS_COLOR
 }
 
+# Discord embed field value character limit
+DISCORD_FIELD_MAX_LENGTH = 1024
+
 STATUS_TO_SEVERITIES = {
     'RUNNING': 'info',
     'SUCCESS': 'success',
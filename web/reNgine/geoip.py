@@ -0,0 +1,151 @@
+import bisect
+import csv
+import ipaddress
+import logging
+import os
+import subprocess
+
+from reNgine.settings import GEOIP_CACHE_SIZE, GEOIP_DATABASE, GEOIP_LOOKUP_COMMAND
+from reNgine.utilities import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class GeoIPDatabase:
+	"""In-process country lookups from a local GeoIP database.
+
+	Supported databases:
+	- MaxMind .mmdb files (GeoLite2-Country / GeoIP2-Country), requires the
+	  `maxminddb` package.
+	- Legacy MaxMind CSV (GeoIPCountryWhois.csv): "start_ip","end_ip",
+	  "start_num","end_num","iso","name".
+	- CIDR CSV: network,iso,name.
+
+	The database is read once, results are kept in an LRU cache. If no
+	database is found, lookups fail unless `lookup_command` is set, in which
+	case they fall back to running the `geoiplookup` command for each IP.
+	"""
+
+	def __init__(self, path=GEOIP_DATABASE, cache_size=GEOIP_CACHE_SIZE, lookup_command=GEOIP_LOOKUP_COMMAND):
+		self.path = path
+		self.cache = LRUCache(cache_size)
+		self.lookup_command = lookup_command
+		self.reader = None
+		self.ranges = {4: ([], []), 6: ([], [])}
+		if not path or not os.path.exists(path):
+			if lookup_command:
+				logger.warning(f'GeoIP database {path} not found. Falling back to geoiplookup.')
+			else:
+				logger.error(f'GeoIP database {path} not found. IP addresses will not be geo-localized.')
+		elif path.endswith('.mmdb'):
+			self.load_mmdb(path)
+		else:
+			self.load_csv(path)
+
+	@property
+	def loaded(self):
+		return bool(self.reader or self.ranges[4][0] or self.ranges[6][0])
+
+	def load_mmdb(self, path):
+		try:
+			import maxminddb
+		except ImportError:
+			logger.error(f'maxminddb is not installed, cannot read GeoIP database {path}.')
+			return
+		self.reader = maxminddb.open_database(path)
+
+	def load_csv(self, path):
+		rows = []
+		with open(path, newline='', encoding='utf8') as f:
+			for row in csv.reader(f):
+				if len(row) < 3 or row[0].startswith('#'):
+					continue
+				try:
+					if '/' in row[0]:
+						network = ipaddress.ip_network(row[0], strict=False)
+						start, end = network[0], network[-1]
+					else:
+						start, end = ipaddress.ip_address(row[0]), ipaddress.ip_address(row[1])
+				except ValueError: # header
+					continue
+				rows.append((start.version, int(start), int(end), row[-2], row[-1]))
+		for version, start, end, iso, name in sorted(rows):
+			starts, entries = self.ranges[version]
+			starts.append(start)
+			entries.append((end, iso, name))
+		logger.info(f'Loaded {len(rows)} GeoIP ranges from {path}')
+
+	def lookup(self, address):
+		"""Get the country of an IP address.
+
+		Args:
+			address (str): IP address.
+
+		Returns:
+			tuple: (iso, name) or None if not found.
+		"""
+		if address in self.cache:
+			return self.cache.get(address)
+		if self.loaded:
+			country = self._lookup_database(address)
+		elif self.lookup_command:
+			country = self._lookup_command(address)
+		else:
+			country = None
+		self.cache.set(address, country)
+		return country
+
+	def _lookup_database(self, address):
+		try:
+			ip = ipaddress.ip_address(address)
+		except ValueError:
+			return None
+		if self.reader:
+			record = self.reader.get(address) or {}
+			country = record.get('country') or record.get('registered_country')
+			if not country:
+				return None
+			return country.get('iso_code'), country.get('names', {}).get('en', '')
+		starts, entries = self.ranges[ip.version]
+		index = bisect.bisect_right(starts, int(ip)) - 1
+		if index < 0:
+			return None
+		end, iso, name = entries[index]
+		if int(ip) > end:
+			return None
+		return iso, name
+
+	def _lookup_command(self, address):
+		if ipaddress.ip_address(address).version == 6:
+			return None
+		try:
+			out = subprocess.run(['geoiplookup', address], capture_output=True, text=True).stdout
+		except FileNotFoundError:
+			return None
+		if ':' not in out or 'IP Address not found' in out or "can't resolve hostname" in out:
+			return None
+		iso, _, name = out.split(':', 1)[1].strip().partition(',')
+		return iso.strip(), name.strip()
+
+
+geoip_database = None
+
+def get_countries(addresses):
+	"""Get countries of IP addresses. The GeoIP database is loaded on first
+	call and kept for the worker lifetime.
+
+	Args:
+		addresses (list): IP addresses.
+
+	Returns:
+		dict: (iso, name) by IP address, for IP addresses found.
+	"""
+	global geoip_database
+	if geoip_database is None:
+		geoip_database = GeoIPDatabase()
+	countries = {}
+	for address in addresses:
+		country = geoip_database.lookup(address)
+		if country:
+			countries[address] = country
+	return countries
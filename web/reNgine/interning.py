@@ -0,0 +1,176 @@
+import logging
+import time
+
+import redis
+from django.db import transaction
+from django.db.models.signals import post_delete
+
+from reNgine.definitions import UNCOMMON_WEB_PORTS
+from reNgine.settings import CELERY_BROKER_URL, INTERN_VERSION_CHECK_INTERVAL
+from startScan.models import (CountryISO, CveId, CweId, Port, Technology,
+							  VulnerabilityReference, VulnerabilityTags, Waf)
+
+logger = logging.getLogger(__name__)
+
+cache = redis.Redis.from_url(CELERY_BROKER_URL, socket_connect_timeout=1)
+
+
+class InternTable:
+	"""Process-wide map of the rows of a small lookup table to their ids.
+
+	The table is loaded once, and missing rows are created in bulk. Rows are
+	identified by the value of `fields`, or by a tuple of values if there are
+	several fields. Lookup tables have no unique constraints, so when several
+	rows have the same values, the oldest one is used.
+
+	Processes drop their map when the table version stored in Redis changes.
+	The version is bumped once rows deletions are committed, and checked at
+	most every INTERN_VERSION_CHECK_INTERVAL seconds.
+	"""
+
+	def __init__(self, model, fields, defaults=None):
+		self.model = model
+		self.fields = (fields,) if isinstance(fields, str) else tuple(fields)
+		self.defaults = defaults
+		self.version_key = f'rengine:intern:{model._meta.label_lower}'
+		self.version = None
+		self.last_version_check = 0
+		self.pending_version_bump = False
+		self.ids = None
+
+	def get_key(self, values):
+		return values[0] if len(self.fields) == 1 else tuple(values)
+
+	def load(self):
+		self.ids = {}
+		self.select(self.model.objects.all())
+		logger.debug(f'Loaded {len(self.ids)} {self.model.__name__} ids')
+
+	def select(self, queryset):
+		for row in queryset.order_by('id').values_list('id', *self.fields):
+			self.ids.setdefault(self.get_key(row[1:]), row[0])
+
+	def filter_missing(self, keys):
+		values = keys if len(self.fields) == 1 else {key[0] for key in keys}
+		return self.model.objects.filter(**{f'{self.fields[0]}__in': values})
+
+	def get_ids(self, keys):
+		"""Get ids of rows, creating the missing ones.
+
+		Args:
+			keys (iterable): Field values, or tuples of field values.
+
+		Returns:
+			dict: Row ids by key.
+		"""
+		self.check_version()
+		loaded = self.ids is None
+		if loaded:
+			self.load()
+		keys = {key for key in keys if key}
+		missing = keys - self.ids.keys()
+		if missing and not loaded:
+			# Rows created by other processes
+			self.select(self.filter_missing(missing))
+			missing -= self.ids.keys()
+		if missing:
+			rows = []
+			for key in missing:
+				values = dict(zip(self.fields, (key,) if len(self.fields) == 1 else key))
+				if self.defaults:
+					values.update(self.defaults(key))
+				rows.append(self.model(**values))
+			self.model.objects.bulk_create(rows, ignore_conflicts=True)
+			self.select(self.filter_missing(missing))
+		return {key: self.ids[key] for key in keys if key in self.ids}
+
+	def get_id(self, key):
+		return self.get_ids([key]).get(key)
+
+	def check_version(self):
+		now = time.monotonic()
+		if now - self.last_version_check < INTERN_VERSION_CHECK_INTERVAL:
+			return
+		self.last_version_check = now
+		try:
+			version = int(cache.get(self.version_key) or 0)
+		except redis.exceptions.RedisError as e:
+			logger.debug(f'Could not get {self.model.__name__} ids version: {e}')
+			return
+		if version != self.version:
+			self.version = version
+			self.ids = None
+
+	def invalidate(self):
+		"""Drop the map of this process, and of the other processes once the
+		current transaction is committed."""
+		self.ids = None
+		if not self.pending_version_bump:
+			self.pending_version_bump = True
+			transaction.on_commit(self.bump_version)
+
+	def bump_version(self):
+		self.pending_version_bump = False
+		try:
+			self.version = cache.incr(self.version_key)
+		except redis.exceptions.RedisError as e:
+			logger.debug(f'Could not bump {self.model.__name__} ids version: {e}')
+
+	def clear(self):
+		self.ids = None
+		self.version = None
+		self.last_version_check = 0
+		self.pending_version_bump = False
+
+
+intern_tables = {
+	table.model: table
+	for table in [
+		InternTable(Technology, 'name'),
+		InternTable(CveId, 'name'),
+		InternTable(CweId, 'name'),
+		InternTable(VulnerabilityTags, 'name'),
+		InternTable(VulnerabilityReference, 'url'),
+		InternTable(Waf, ('name', 'manufacturer')),
+		InternTable(CountryISO, ('iso', 'name')),
+		InternTable(
+			Port,
+			('number', 'service_name', 'description'),
+			defaults=lambda key: {'is_uncommon': key[0] in UNCOMMON_WEB_PORTS}),
+	]
+}
+
+def intern_ids(model, keys):
+	"""Get ids of lookup table rows, creating the missing ones.
+
+	Args:
+		model (django.db.models.Model): Lookup table model.
+		keys (iterable): Field values, or tuples of field values.
+
+	Returns:
+		dict: Row ids by key.
+	"""
+	return intern_tables[model].get_ids(keys)
+
+def intern_id(model, key):
+	"""Get the id of a lookup table row, creating it if needed.
+
+	Args:
+		model (django.db.models.Model): Lookup table model.
+		key (str | tuple): Field value, or tuple of field values.
+
+	Returns:
+		int: Row id, or None if the key is empty.
+	"""
+	return intern_tables[model].get_id(key)
+
+def clear_intern_tables():
+	for table in intern_tables.values():
+		table.clear()
+
+
+def invalidate_intern_table(sender, **kwargs):
+	intern_tables[sender].invalidate()
+
+for model in intern_tables:
+	post_delete.connect(invalidate_intern_table, sender=model, dispatch_uid=f'intern_{model.__name__}')
@@ -0,0 +1,147 @@
+import os
+
+import markdown
+from django.db.models import Count
+from django.template.loader import get_template
+from weasyprint import HTML
+
+from reNgine.common_func import get_interesting_subdomains, get_scan_data_version
+from reNgine.settings import RENGINE_RESULTS
+from scanEngine.models import VulnerabilityReportSetting
+from startScan.models import IpAddress, Subdomain, Vulnerability
+
+DEFAULT_PRIMARY_COLOR = '#FFB74D'
+DEFAULT_SECONDARY_COLOR = '#212121'
+
+# Report type: (report name, show recon, show vulnerabilities)
+REPORT_TYPES = {
+	'full': ('Full Scan Report', True, True),
+	'recon': ('Reconnaissance Report', True, False),
+	'vulnerability': ('Vulnerability Report', False, True),
+}
+
+
+def get_report_data_version(scan):
+	"""Get a stamp of the data a report of the scan is rendered from, see
+	`reNgine.common_func.get_scan_data_version`. The stamp also changes when
+	the report settings change.
+
+	Args:
+		scan (startScan.models.ScanHistory): Scan.
+
+	Returns:
+		str: Data version.
+	"""
+	return get_scan_data_version(scan, settings=VulnerabilityReportSetting.objects.values().first())
+
+
+def get_report_path(report):
+	"""Get the path of the PDF file of a report, in the scan results directory."""
+	results_dir = report.scan_history.results_dir or RENGINE_RESULTS
+	return os.path.join(results_dir, 'reports', f'report_{report.id}.pdf')
+
+
+def render_report(scan, report_type, ignore_info_vuln=False, set_progress=None):
+	"""Render the PDF report of a scan.
+
+	Args:
+		scan (startScan.models.ScanHistory): Scan.
+		report_type (str): Report type, one of REPORT_TYPES.
+		ignore_info_vuln (bool): Leave informational vulnerabilities out.
+		set_progress (callable, optional): Called with the percentage of the
+			report rendered.
+
+	Returns:
+		bytes: PDF document.
+	"""
+	set_progress = set_progress or (lambda progress: None)
+	report_name, show_recon, show_vuln = REPORT_TYPES.get(report_type, REPORT_TYPES['full'])
+	scan_vulns = Vulnerability.objects.filter(scan_history=scan)
+	if ignore_info_vuln:
+		scan_vulns = scan_vulns.exclude(severity=0)
+	vulns = (
+		scan_vulns
+		.prefetch_related('cve_ids', 'cwe_ids', 'references')
+		.order_by('-severity')
+	)
+	unique_vulns = (
+		scan_vulns
+		.values('name', 'severity')
+		.annotate(count=Count('name'))
+		.order_by('-severity', '-count')
+	)
+	subdomains = (
+		Subdomain.objects
+		.filter(scan_history=scan)
+		.prefetch_related('ip_addresses__ports')
+		.order_by('-content_length')
+	)
+	subdomain_alive_count = (
+		Subdomain.objects
+		.filter(scan_history=scan)
+		.values('name')
+		.distinct()
+		.filter(http_status__gt=0)
+		.count()
+	)
+	ip_addresses = (
+		IpAddress.objects
+		.filter(ip_addresses__in=subdomains)
+		.prefetch_related('ports')
+		.distinct()
+	)
+	data = {
+		'scan_object': scan,
+		'unique_vulnerabilities': unique_vulns,
+		'all_vulnerabilities': vulns,
+		'all_vulnerabilities_count': vulns.count(),
+		'subdomain_alive_count': subdomain_alive_count,
+		'interesting_subdomains': get_interesting_subdomains(scan_history=scan.id),
+		'subdomains': subdomains,
+		'ip_addresses': ip_addresses,
+		'show_recon': show_recon,
+		'show_vuln': show_vuln,
+		'report_name': report_name,
+		'is_ignore_info_vuln': ignore_info_vuln,
+		'primary_color': DEFAULT_PRIMARY_COLOR,
+		'secondary_color': DEFAULT_SECONDARY_COLOR,
+	}
+
+	# Get report related config
+	report = VulnerabilityReportSetting.objects.first()
+	if report:
+		data['company_name'] = report.company_name
+		data['company_address'] = report.company_address
+		data['company_email'] = report.company_email
+		data['company_website'] = report.company_website
+		data['show_rengine_banner'] = report.show_rengine_banner
+		data['show_footer'] = report.show_footer
+		data['footer_text'] = report.footer_text
+		data['show_executive_summary'] = report.show_executive_summary
+		data['primary_color'] = report.primary_color
+		data['secondary_color'] = report.secondary_color
+
+		# Replace executive_summary_description with template syntax
+		statistics = scan.get_statistics()
+		description = report.executive_summary_description or ''
+		description = description.replace('{scan_date}', scan.start_scan_date.strftime('%d %B, %Y'))
+		description = description.replace('{company_name}', report.company_name or '')
+		description = description.replace('{target_name}', scan.domain.name)
+		description = description.replace('{subdomain_count}', str(statistics.subdomain_count))
+		description = description.replace('{vulnerability_count}', str(data['all_vulnerabilities_count']))
+		description = description.replace('{critical_count}', str(statistics.critical_vulnerability_count))
+		description = description.replace('{high_count}', str(statistics.high_vulnerability_count))
+		description = description.replace('{medium_count}', str(statistics.medium_vulnerability_count))
+		description = description.replace('{low_count}', str(statistics.low_vulnerability_count))
+		description = description.replace('{info_count}', str(0 if ignore_info_vuln else statistics.info_vulnerability_count))
+		description = description.replace('{unknown_count}', str(statistics.unknown_vulnerability_count))
+		if scan.domain.description:
+			description = description.replace('{target_description}', scan.domain.description)
+
+		# Convert to Markdown
+		data['executive_summary_description'] = markdown.markdown(description)
+	set_progress(20)
+
+	html = get_template('report/template.html').render(data)
+	set_progress(60)
+	return HTML(string=html).write_pdf()
@@ -0,0 +1,144 @@
+import logging
+
+from celery.signals import task_prerun
+
+from reNgine.utilities import LRUCache
+from startScan.models import ScanHistory, Subdomain
+from targetApp.models import Domain
+
+logger = logging.getLogger(__name__)
+
+
+class ScanCache:
+	"""Domain and ScanHistory rows of a scan, and ids of its subdomains by
+	name, looked up once while a task saves its results.
+
+	Subdomain ids of the scan are preloaded in one query on first lookup.
+	Names missing from the scan are queried once and remembered, and
+	subdomains created by the task must be registered with `add_subdomain` so
+	that later lookups see them.
+
+	Only subdomain ids are kept: subdomain rows are updated by concurrent
+	tasks, so they are read when needed and written column by column.
+
+	Caches are dropped before each task runs, so rows are never kept longer
+	than a task.
+	"""
+
+	def __init__(self, scan_id=None, domain_id=None):
+		self.scan_id = scan_id
+		self.domain_id = domain_id
+		self.subdomain_ids = None
+		self._scan = None
+		self._domain = None
+
+	@property
+	def scan(self):
+		if self._scan is None and self.scan_id:
+			self._scan = ScanHistory.objects.select_related('domain').filter(pk=self.scan_id).first()
+		return self._scan
+
+	@property
+	def domain(self):
+		if self._domain is None and self.domain_id:
+			self._domain = Domain.objects.filter(pk=self.domain_id).first()
+		return self._domain
+
+	def load_subdomains(self):
+		self.subdomain_ids = {}
+		if not self.scan_id:
+			return
+		subdomains = (
+			Subdomain.objects
+			.filter(scan_history_id=self.scan_id)
+			.order_by('-id')
+			.values_list('name', 'id')
+		)
+		for name, subdomain_id in subdomains:
+			self.subdomain_ids.setdefault(name, subdomain_id)
+		logger.debug(f'Loaded {len(self.subdomain_ids)} subdomains of scan {self.scan_id}')
+
+	def get_subdomain(self, name):
+		"""Get a subdomain of the scan by name, read from the database.
+
+		Args:
+			name (str): Subdomain name.
+
+		Returns:
+			startScan.models.Subdomain: Subdomain object, or None if not found.
+		"""
+		subdomain_id = self.get_subdomain_id(name)
+		if subdomain_id is None:
+			return None
+		return Subdomain.objects.filter(pk=subdomain_id).first()
+
+	def get_subdomain_id(self, name):
+		"""Get the id of a subdomain of the scan by name.
+
+		Args:
+			name (str): Subdomain name.
+
+		Returns:
+			int: Subdomain id, or None if not found.
+		"""
+		return self.get_subdomain_ids([name]).get(name)
+
+	def get_subdomain_ids(self, names):
+		"""Get ids of subdomains of the scan by name, with at most one query for
+		names that were not looked up yet.
+
+		Args:
+			names (iterable): Subdomain names.
+
+		Returns:
+			dict: Subdomain ids by name, for subdomains found.
+		"""
+		if self.subdomain_ids is None:
+			self.load_subdomains()
+		missing = {name for name in names if name not in self.subdomain_ids}
+		if missing:
+			for name in missing:
+				self.subdomain_ids[name] = None
+			subdomains = (
+				Subdomain.objects
+				.filter(scan_history_id=self.scan_id, name__in=missing)
+				.order_by('id')
+				.values_list('name', 'id')
+			)
+			for name, subdomain_id in subdomains:
+				self.subdomain_ids[name] = subdomain_id
+		return {
+			name: self.subdomain_ids[name]
+			for name in names
+			if self.subdomain_ids[name] is not None
+		}
+
+	def add_subdomain(self, subdomain):
+		"""Register a subdomain created while the task is running."""
+		if self.subdomain_ids is None:
+			self.load_subdomains()
+		self.subdomain_ids[subdomain.name] = subdomain.id
+
+
+scan_caches = LRUCache(16)
+
+def get_scan_cache(ctx):
+	"""Get the cache of the scan a task context belongs to.
+
+	Args:
+		ctx (dict): Scan context.
+
+	Returns:
+		ScanCache: Scan cache.
+	"""
+	key = (ctx.get('scan_history_id'), ctx.get('domain_id'))
+	scan_cache = scan_caches.get(key)
+	if scan_cache is None:
+		scan_cache = ScanCache(*key)
+		scan_caches.set(key, scan_cache)
+	return scan_cache
+
+
+@task_prerun.connect
+def clear_scan_caches(**kwargs):
+	scan_caches.clear()
@@ -51,6 +51,29 @@ DEFAULT_HTTP_TIMEOUT = env.int('DEFAULT_HTTP_TIMEOUT', default=5) # seconds
 DEFAULT_RETRIES = env.int('DEFAULT_RETRIES', default=1)
 DEFAULT_THREADS = env.int('DEFAULT_THREADS', default=30)
 DEFAULT_GET_GPT_REPORT = env.bool('DEFAULT_GET_GPT_REPORT', default=True)
+COMMAND_OUTPUT_FLUSH_LINES = env.int('COMMAND_OUTPUT_FLUSH_LINES', default=1000)
+COMMAND_OUTPUT_FLUSH_INTERVAL = env.int('COMMAND_OUTPUT_FLUSH_INTERVAL', default=5) # seconds
+HTTP_CRAWL_BATCH_SIZE = env.int('HTTP_CRAWL_BATCH_SIZE', default=1000)
+CVE_CACHE_SIZE = env.int('CVE_CACHE_SIZE', default=10000)
+CVE_REMOTE_LOOKUP = env.bool('CVE_REMOTE_LOOKUP', default=True)
+CVE_SEARCH_URL = env('CVE_SEARCH_URL', default='https://cve.circl.lu')
+GEOIP_DATABASE = env('GEOIP_DATABASE', default='/usr/share/GeoIP/dbip-country-lite.mmdb')
+GEOIP_LOOKUP_COMMAND = env.bool('GEOIP_LOOKUP_COMMAND', default=False)
+GEOIP_CACHE_SIZE = env.int('GEOIP_CACHE_SIZE', default=100000)
+NOTIFICATION_FLUSH_INTERVAL = env.int('NOTIFICATION_FLUSH_INTERVAL', default=5) # seconds
+SUBDOMAIN_DISCOVERY_CONCURRENCY = env.int('SUBDOMAIN_DISCOVERY_CONCURRENCY', default=8)
+SUBDOMAIN_DISCOVERY_TOOL_TIMEOUT = env.int('SUBDOMAIN_DISCOVERY_TOOL_TIMEOUT', default=3600) # seconds
+NUCLEI_TEMPLATES_UPDATE_TTL = env.int('NUCLEI_TEMPLATES_UPDATE_TTL', default=86400) # seconds
+NUCLEI_TEMPLATES_UPDATE_LOCK_TIMEOUT = env.int('NUCLEI_TEMPLATES_UPDATE_LOCK_TIMEOUT', default=900) # seconds
+INTERN_VERSION_CHECK_INTERVAL = env.int('INTERN_VERSION_CHECK_INTERVAL', default=10) # seconds
+UNIVERSAL_SEARCH_PAGE_SIZE = env.int('UNIVERSAL_SEARCH_PAGE_SIZE', default=50)
+UNIVERSAL_SEARCH_MAX_PAGE_SIZE = env.int('UNIVERSAL_SEARCH_MAX_PAGE_SIZE', default=500)
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=2000)
+DASHBOARD_CACHE_TTL = env.int('DASHBOARD_CACHE_TTL', default=300) # seconds
+PRERENDER_SCAN_REPORTS = env.bool('PRERENDER_SCAN_REPORTS', default=False)
+DATATABLES_CACHE_TTL = env.int('DATATABLES_CACHE_TTL', default=120) # seconds
+DATATABLES_ESTIMATE_THRESHOLD = env.int('DATATABLES_ESTIMATE_THRESHOLD', default=100000)
+TOOL_JOB_TIMEOUT = env.int('TOOL_JOB_TIMEOUT', default=900) # seconds
 
 # Globals
 ALLOWED_HOSTS = ['*']
@@ -136,7 +159,7 @@ REST_FRAMEWORK = {
         'rest_framework_datatables.filters.DatatablesFilterBackend',
     ),
     'DEFAULT_PAGINATION_CLASS':(
-        'rest_framework_datatables.pagination.DatatablesPageNumberPagination'
+        'api.pagination.DatatablesKeysetPagination'
     ),
     'PAGE_SIZE': 500,
 }
@@ -191,6 +214,8 @@ LOGOUT_REDIRECT_URL = 'login'
 
 # Number of endpoints that have the same content_length
 DELETE_DUPLICATES_THRESHOLD = 10
+# Number of duplicate endpoints deleted at once
+DELETE_DUPLICATES_BATCH_SIZE = 5000
 
 '''
 CELERY settings
@@ -203,6 +228,8 @@ CELERY_IGNORE_RESULTS = False
 CELERY_EAGER_PROPAGATES_EXCEPTIONS = True
 CELERY_TRACK_STARTED = True
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+# Redis database of the locks shared by workers
+REDIS_LOCKS_URL = env('REDIS_LOCKS_URL', default=CELERY_BROKER_URL)
 '''
 ROLES and PERMISSIONS
 '''
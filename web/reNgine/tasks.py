@@ -1,9 +1,10 @@
 import csv
+import hashlib
 import json
 import os
 import pprint
 import subprocess
-import time
+import threading
 import validators
 import whatportis
 import xmltodict
@@ -15,27 +16,36 @@ import uuid
 import shutil
 from pathlib import Path
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from urllib.parse import urlparse
 from api.serializers import SubdomainSerializer
-from celery import chain, chord, group
-from celery.result import allow_join_result
+from celery import chain, group
 from celery.utils.log import get_task_logger
-from django.db.models import Count
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import FirstValue, RowNumber
+from dashboard.models import ToolJob
+from dashboard.statistics import invalidate_project_statistics
 from dotted_dict import DottedDict
 from django.utils import timezone, html
-from pycvesearch import CVESearch
 from metafinder.extractor import extract_metadata_from_google_search
+from redis.exceptions import LockError
 
+from reNgine.asset_changes import get_unsaved_changed_assets, save_asset_changes
 from reNgine.celery import app
+from reNgine.geoip import get_countries
 from reNgine.gpt import GPTVulnerabilityReportGenerator
-from reNgine.celery_custom_task import RengineTask
+from reNgine.celery_custom_task import ChordSafeTask, RengineTask
+from reNgine.interning import intern_id, intern_ids
+from reNgine.reports import get_report_data_version, get_report_path, render_report
+from reNgine.visualisation import save_scan_visualisation
+from reNgine.scan_cache import get_scan_cache
 from reNgine.common_func import *
 from reNgine.definitions import *
 from reNgine.settings import *
 from reNgine.gpt import *
 from reNgine.utilities import *
-from scanEngine.models import (EngineType, InstalledExternalTool, Notification, Proxy)
+from scanEngine.models import (EngineType, InstalledExternalTool, Notification, NucleiTemplatesUpdate, Proxy)
 from startScan.models import *
 from startScan.models import EndPoint, Subdomain, Vulnerability
 from targetApp.models import Domain
@@ -356,6 +366,20 @@ def report(ctx={}, description=None):
     scan.stop_scan_date = timezone.now()
     scan.save()
 
+    # Recount the scan results, fixing counters drift
+    ScanStatistics.reconcile(scan.id)
+    invalidate_project_statistics(scan.domain.project_id)
+
+    # Store the visualisation graph of the scan results
+    save_scan_visualisation(scan)
+
+    # Store the subdomains and endpoints changed since the previous scan
+    save_asset_changes(scan)
+
+    # Render the full report ahead of its download
+    if PRERENDER_SCAN_REPORTS and not subscan and status == SUCCESS_TASK:
+        queue_report(scan, 'full')
+
     # Send scan status notif
     send_scan_notif.delay(
         scan_history_id=scan_id,
@@ -364,6 +388,135 @@ def report(ctx={}, description=None):
         status=status_h)
 
 
+@app.task(name='generate_report', bind=False, queue='generate_report_queue')
+def generate_report(report_id):
+    """Render the PDF file of a ScanReport, tracking its progress.
+
+    Args:
+        report_id (int): ScanReport id.
+    """
+    report = ScanReport.objects.select_related('scan_history__domain').filter(pk=report_id).first()
+    if not report:
+        return
+    reports = ScanReport.objects.filter(pk=report_id)
+    reports.update(status=RUNNING_TASK, progress=0)
+    try:
+        pdf = render_report(
+            report.scan_history,
+            report.report_type,
+            report.ignore_info_vuln,
+            set_progress=lambda progress: reports.update(progress=progress))
+        path = get_report_path(report)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.tmp', 'wb') as f:
+            f.write(pdf)
+        os.replace(f'{path}.tmp', path)
+    except Exception as e:
+        logger.exception(f'Report {report_id} could not be generated')
+        reports.update(status=FAILED_TASK, error_message=str(e)[:300])
+        return
+    reports.update(status=SUCCESS_TASK, progress=100, file_path=path, completed_at=timezone.now())
+
+
+def queue_report(scan, report_type, ignore_info_vuln=False, retry=True):
+    """Get the report of a scan for its current data, and queue its rendering
+    if it has not been rendered yet. Reports of older data are removed, except
+    those still being rendered.
+
+    Args:
+        scan (startScan.models.ScanHistory): Scan.
+        report_type (str): Report type.
+        ignore_info_vuln (bool): Leave informational vulnerabilities out.
+        retry (bool): Queue the report again if its rendering failed, or if
+            its file was removed.
+
+    Returns:
+        startScan.models.ScanReport: Scan report.
+    """
+    report, created = ScanReport.objects.get_or_create(
+        scan_history=scan,
+        report_type=report_type,
+        ignore_info_vuln=ignore_info_vuln,
+        data_version=get_report_data_version(scan))
+    if created:
+        prune_reports(report)
+    missing_file = report.status == SUCCESS_TASK and not os.path.exists(report.file_path or '')
+    if created or (retry and (report.status == FAILED_TASK or missing_file)):
+        report.status = INITIATED_TASK
+        report.progress = 0
+        report.error_message = None
+        report.save()
+        celery_id = generate_report.apply_async(args=(report.id,)).id
+        ScanReport.objects.filter(pk=report.id).update(celery_id=celery_id)
+        report.refresh_from_db()
+    return report
+
+
+def prune_reports(report):
+    """Remove the reports superseded by a report, and their PDF files.
+
+    Reports still being rendered are kept for the clients polling them, and
+    removed once a newer report is queued.
+
+    Args:
+        report (startScan.models.ScanReport): Latest scan report.
+    """
+    superseded = (
+        ScanReport.objects
+        .filter(
+            scan_history_id=report.scan_history_id,
+            report_type=report.report_type,
+            ignore_info_vuln=report.ignore_info_vuln)
+        .exclude(pk=report.pk)
+        .exclude(status__in=[INITIATED_TASK, RUNNING_TASK]))
+    for file_path in superseded.exclude(file_path=None).values_list('file_path', flat=True):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+    superseded.delete()
+
+
+@app.task(name='finish_task', bind=False, queue='report_queue')
+def finish_task(
+        task_name,
+        activity_id=None,
+        result=None,
+        scan_history_id=None,
+        engine_id=None,
+        subscan_id=None):
+    """Chord callback of a task replaced by its sub-tasks (see
+    RengineTask.replace_with_chord). Mark the task ScanActivity as successful
+    and send task status notification.
+
+    Args:
+        task_name (str): Name of the replaced task.
+        activity_id (int, optional): ScanActivity id of the replaced task.
+        result (optional): Result of the replaced task.
+        scan_history_id (int, optional): ScanHistory id.
+        engine_id (int, optional): EngineType id.
+        subscan_id (int, optional): SubScan id.
+
+    Returns:
+        object: Result of the replaced task.
+    """
+    logger.info(f'Task {task_name} sub-tasks finished')
+    activity = ScanActivity.objects.filter(pk=activity_id).first()
+    if not activity:
+        return result
+    activity.status = SUCCESS_TASK
+    activity.time = timezone.now()
+    activity.save()
+    logger.warning(f'Task {task_name} status is SUCCESS')
+    send_task_notif.delay(
+        task_name,
+        status=CELERY_TASK_STATUS_MAP[SUCCESS_TASK],
+        scan_history_id=scan_history_id,
+        engine_id=engine_id,
+        subscan_id=subscan_id)
+    return result
+
+
 #------------------------- #
 # Tracked reNgine tasks    #
 #--------------------------#
@@ -413,30 +566,34 @@ def subdomain_discovery(
     default_subdomain_tools.append('amass-passive')
     default_subdomain_tools.append('amass-active')
 
-    # Run tools
+    # Build tools commands
+    commands = {}
     for tool in tools:
-        cmd = None
-        logger.info(f'Scanning subdomains for {host} with {tool}')
+        cmd, results_file = None, None
         proxy = get_random_proxy()
         if tool in default_subdomain_tools:
             if tool == 'amass-passive':
                 use_amass_config = config.get(USE_AMASS_CONFIG, False)
-                cmd = f'amass enum -passive -d {host} -o ' + str(Path(self.results_dir) / 'subdomains_amass.txt')
+                results_file = str(Path(self.results_dir) / 'subdomains_amass.txt')
+                cmd = f'amass enum -passive -d {host} -o {results_file}'
                 cmd += (' -config ' + str(Path.home() / '.config' / 'amass.ini')) if use_amass_config else ''
 
             elif tool == 'amass-active':
                 use_amass_config = config.get(USE_AMASS_CONFIG, False)
                 amass_wordlist_name = config.get(AMASS_WORDLIST, AMASS_DEFAULT_WORDLIST_NAME)
                 wordlist_path = str(Path(AMASS_DEFAULT_WORDLIST_PATH) / f'{amass_wordlist_name}.txt')
-                cmd = f'amass enum -active -d {host} -o ' + str(Path(self.results_dir) / 'subdomains_amass_active.txt')
+                results_file = str(Path(self.results_dir) / 'subdomains_amass_active.txt')
+                cmd = f'amass enum -active -d {host} -o {results_file}'
                 cmd += (' -config ' + str(Path.home() / '.config' / 'amass.ini')) if use_amass_config else ''
                 cmd += f' -brute -w {wordlist_path}'
 
             elif tool == 'sublist3r':
-                cmd = f'sublist3r -d {host} -t {threads} -o ' + str(Path(self.results_dir) / 'subdomains_sublister.txt')
+                results_file = str(Path(self.results_dir) / 'subdomains_sublister.txt')
+                cmd = f'sublist3r -d {host} -t {threads} -o {results_file}'
 
             elif tool == 'subfinder':
-                cmd = f'subfinder -d {host} -o ' + str(Path(self.results_dir) / 'subdomains_subfinder.txt')
+                results_file = str(Path(self.results_dir) / 'subdomains_subfinder.txt')
+                cmd = f'subfinder -d {host} -o {results_file}'
                 use_subfinder_config = config.get(USE_SUBFINDER_CONFIG, False)
                 cmd += (' -config ' + str(Path.home() / '.config' / 'subfinder' / 'config.yaml')) if use_subfinder_config else ''
                 cmd += f' -proxy {proxy}' if proxy else ''
@@ -445,8 +602,9 @@ def subdomain_discovery(
                 cmd += f' -silent'
 
             elif tool == 'oneforall':
+                results_file = str(Path(self.results_dir) / 'subdomains_oneforall.txt')
                 cmd = f'oneforall --target {host} run'
-                cmd_extract = f'cut -d\',\' -f6 ' + str(Path(RENGINE_TOOL_GITHUB_PATH) / 'OneForAll' / 'results' / f'{host}.csv') + ' | tail -n +2 > ' + str(Path(self.results_dir) / 'subdomains_oneforall.txt')
+                cmd_extract = f'cut -d\',\' -f6 ' + str(Path(RENGINE_TOOL_GITHUB_PATH) / 'OneForAll' / 'results' / f'{host}.csv') + f' | tail -n +2 > {results_file}'
                 cmd_rm = f'rm -rf ' + str(Path(RENGINE_TOOL_GITHUB_PATH) / 'OneForAll' / 'results'/ f'{host}.csv')
                 cmd += f' && {cmd_extract} && {cmd_rm}'
 
@@ -485,44 +643,65 @@ def subdomain_discovery(
                 continue
 
             
+            results_file = str(Path(self.results_dir) / f'subdomains_{tool}.txt')
             cmd = cmd.replace('{TARGET}', host)
-            cmd = cmd.replace('{OUTPUT}', str(Path(self.results_dir) / f'subdomains_{tool}.txt'))
+            cmd = cmd.replace('{OUTPUT}', results_file)
             cmd = cmd.replace('{PATH}', custom_tool.github_clone_path) if '{PATH}' in cmd else cmd
         else:
             logger.warning(
                 f'Subdomain discovery tool "{tool}" is not supported by reNgine. Skipping.')
             continue
 
-        # Run tool
+        if not cmd:
+            logger.warning(
+                f'Subdomain discovery tool "{tool}" has no command. Skipping.')
+            continue
+        commands[tool] = (cmd, results_file)
+
+    def run_tool(tool, cmd):
+        logger.info(f'Scanning subdomains for {host} with {tool}')
         try:
-            run_command(
+            return run_command(
                 cmd,
                 shell=True,
                 history_file=self.history_file,
                 scan_id=self.scan_id,
-                activity_id=self.activity_id)
-        except Exception as e:
-            logger.error(
-                f'Subdomain discovery tool "{tool}" raised an exception')
-            logger.exception(e)
-
-    # Gather all the tools' results in one single file. Write subdomains into
-    # separate files, and sort all subdomains.
-    run_command(
-        f'cat ' + str(Path(self.results_dir) / 'subdomains_*.txt') + f' > {self.output_path}',
-        shell=True,
-        history_file=self.history_file,
-        scan_id=self.scan_id,
-        activity_id=self.activity_id)
-    run_command(
-        f'sort -u {self.output_path} -o {self.output_path}',
-        shell=True,
-        history_file=self.history_file,
-        scan_id=self.scan_id,
-        activity_id=self.activity_id)
+                activity_id=self.activity_id,
+                timeout=SUBDOMAIN_DISCOVERY_TOOL_TIMEOUT)
+        finally:
+            # Close the DB connection opened by this thread
+            connection.close()
+
+    # Run tools concurrently, and merge each tool's results as soon as it
+    # finishes.
+    names = set()
+    max_workers = max(min(len(commands), SUBDOMAIN_DISCOVERY_CONCURRENCY), 1)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_tool = {
+            executor.submit(run_tool, tool, cmd): tool
+            for tool, (cmd, _) in commands.items()
+        }
+        for future in concurrent.futures.as_completed(future_to_tool):
+            tool = future_to_tool[future]
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(
+                    f'Subdomain discovery tool "{tool}" raised an exception')
+                logger.exception(e)
+            results_file = commands[tool][1]
+            if not os.path.isfile(results_file):
+                logger.warning(f'Subdomain discovery tool "{tool}" did not write {results_file}')
+                continue
+            with open(results_file) as f:
+                tool_names = {line.strip() for line in f if line.strip()}
+            logger.info(f'Found {len(tool_names - names)} new subdomains with {tool}')
+            names.update(tool_names)
 
-    with open(self.output_path) as f:
-        lines = f.readlines()
+    # Gather all the tools' results in one single file
+    lines = sorted(names)
+    with open(self.output_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n' if lines else '')
 
     # Parse the output_file file and store Subdomain and EndPoint objects found
     # in db.
@@ -585,8 +764,9 @@ def subdomain_discovery(
         'Subdomains': subdomains_str,
     })
     if send_subdomain_changes and self.scan_id and self.domain_id:
-        added = get_new_added_subdomain(self.scan_id, self.domain_id)
-        removed = get_removed_subdomain(self.scan_id, self.domain_id)
+        # Changes are stored when the scan ends
+        added = get_unsaved_changed_assets(self.scan, 'subdomain', [AssetChange.ADDED])
+        removed = get_unsaved_changed_assets(self.scan, 'subdomain', [AssetChange.REMOVED])
 
         if added:
             subdomains_str = '\n'.join([f'• `{subdomain}`' for subdomain in added])
@@ -643,16 +823,14 @@ def osint(self, host=None, ctx={}, description=None):
         )
         grouped_tasks.append(_task)
 
-    celery_group = group(grouped_tasks)
-    job = celery_group.apply_async()
-    while not job.ready():
-        # wait for all jobs to complete
-        time.sleep(5)
+    if not grouped_tasks:
+        return results
 
-    logger.info('OSINT Tasks finished...')
+    # Release the worker while OSINT tasks are running
+    return self.replace_with_chord(grouped_tasks, result=results)
 
-@app.task(name='osint_discovery', queue='osint_discovery_queue', bind=False)
-def osint_discovery(config, host, scan_history_id, activity_id, results_dir, ctx={}):
+@app.task(name='osint_discovery', queue='osint_discovery_queue', base=ChordSafeTask, bind=True)
+def osint_discovery(self, config, host, scan_history_id, activity_id, results_dir, ctx={}):
     """Run OSINT discovery.
 
     Args:
@@ -726,11 +904,9 @@ def osint_discovery(config, host, scan_history_id, activity_id, results_dir, ctx
         )
         grouped_tasks.append(_task)
 
-    celery_group = group(grouped_tasks)
-    job = celery_group.apply_async()
-    while not job.ready():
-        # wait for all jobs to complete
-        time.sleep(5)
+    if grouped_tasks:
+        # Release the worker while h8mail / theHarvester are running
+        return self.replace(group(grouped_tasks))
 
     # results['emails'] = results.get('emails', []) + emails
     # results['creds'] = creds
@@ -738,7 +914,7 @@ def osint_discovery(config, host, scan_history_id, activity_id, results_dir, ctx
     return results
 
 
-@app.task(name='dorking', bind=False, queue='dorking_queue')
+@app.task(name='dorking', bind=False, queue='dorking_queue', base=ChordSafeTask)
 def dorking(config, host, scan_history_id, results_dir):
     """Run Google dorks.
 
@@ -1007,7 +1183,7 @@ def dorking(config, host, scan_history_id, results_dir):
     return results
 
 
-@app.task(name='theHarvester', queue='theHarvester_queue', bind=False)
+@app.task(name='theHarvester', queue='theHarvester_queue', base=ChordSafeTask, bind=False)
 def theHarvester(config, host, scan_history_id, activity_id, results_dir, ctx={}):
     """Run theHarvester to get save emails, hosts, employees found in domain.
 
@@ -1125,7 +1301,7 @@ def theHarvester(config, host, scan_history_id, activity_id, results_dir, ctx={}
     return data
 
 
-@app.task(name='h8mail', queue='h8mail_queue', bind=False)
+@app.task(name='h8mail', queue='h8mail_queue', base=ChordSafeTask, bind=False)
 def h8mail(config, host, scan_history_id, activity_id, results_dir, ctx={}):
     """Run h8mail.
 
@@ -1220,6 +1396,7 @@ def screenshot(self, ctx={}, description=None):
 
     # Loop through results and save objects in DB
     screenshot_paths = []
+    scan_cache = get_scan_cache(ctx)
     with open(output_path, 'r') as file:
         reader = csv.reader(file)
         header = next(reader)  # Skip header row
@@ -1227,15 +1404,12 @@ def screenshot(self, ctx={}, description=None):
         for row in reader:
             protocol, port, subdomain_name, status, screenshot_path, source_path = extract_columns(row, indices)
             logger.info(f'{protocol}:{port}:{subdomain_name}:{status}')
-            subdomain_query = Subdomain.objects.filter(name=subdomain_name)
-            if self.scan:
-                subdomain_query = subdomain_query.filter(scan_history=self.scan)
-            if status == 'Successful' and subdomain_query.exists():
-                subdomain = subdomain_query.first()
+            subdomain_id = scan_cache.get_subdomain_id(subdomain_name)
+            if status == 'Successful' and subdomain_id:
                 screenshot_paths.append(screenshot_path)
-                subdomain.screenshot_path = screenshot_path.replace(RENGINE_RESULTS, '')
-                subdomain.save()
-                logger.warning(f'Added screenshot for {subdomain.name} to DB')
+                Subdomain.objects.filter(id=subdomain_id).update(
+                    screenshot_path=screenshot_path.replace(RENGINE_RESULTS, ''))
+                logger.warning(f'Added screenshot for {subdomain_name} to DB')
 
     # Remove all db, html extra files in screenshot results
     run_command(
@@ -1332,6 +1506,8 @@ def port_scan(self, hosts=[], ctx={}, description=None):
     results = []
     urls = []
     ports_data = {}
+    new_ips = []
+    scan_cache = get_scan_cache(ctx)
     for line in stream_command(
             cmd,
             shell=True,
@@ -1349,14 +1525,16 @@ def port_scan(self, hosts=[], ctx={}, description=None):
             continue
 
         # Grab subdomain
-        subdomain = Subdomain.objects.filter(
-            name=host,
-            target_domain=self.domain,
-            scan_history=self.scan
-        ).first()
+        subdomain_id = scan_cache.get_subdomain_id(host)
 
         # Add IP DB
-        ip, _ = save_ip_address(ip_address, subdomain, subscan=self.subscan)
+        ip, created = save_ip_address(ip_address, subscan=self.subscan)
+        if created:
+            new_ips.append(ip)
+        if subdomain_id:
+            Subdomain.ip_addresses.through.objects.bulk_create([
+                Subdomain.ip_addresses.through(subdomain_id=subdomain_id, ipaddress_id=ip.id)
+            ], ignore_conflicts=True)
         if self.subscan:
             ip.ip_subscan_ids.add(self.subscan)
             ip.save()
@@ -1369,7 +1547,7 @@ def port_scan(self, hosts=[], ctx={}, description=None):
                 http_url,
                 crawl=enable_http_crawl,
                 ctx=ctx,
-                subdomain=subdomain)
+                subdomain_id=subdomain_id)
             if endpoint:
                 http_url = endpoint.http_url
             urls.append(http_url)
@@ -1380,16 +1558,7 @@ def port_scan(self, hosts=[], ctx={}, description=None):
         description = port_details[0].description if len(port_details) > 0 else ''
 
         # get or create port
-        port, created = Port.objects.get_or_create(
-            number=port_number,
-            service_name=service_name,
-            description=description
-        )
-        if port_number in UNCOMMON_WEB_PORTS:
-            port.is_uncommon = True
-            port.save()
-        ip.ports.add(port)
-        ip.save()
+        ip.ports.add(intern_id(Port, (port_number, service_name, description)))
         if host in ports_data:
             ports_data[host].append(port_number)
         else:
@@ -1398,6 +1567,9 @@ def port_scan(self, hosts=[], ctx={}, description=None):
         # Send notification
         logger.warning(f'Found opened port {port_number} on {ip_address} ({host})')
 
+    # Geo-localize new IPs
+    geo_localize_ips(new_ips)
+
     if len(ports_data) == 0:
         logger.info('Finished running naabu port scan - No open ports found.')
         if nmap_enabled:
@@ -1436,9 +1608,9 @@ def port_scan(self, hosts=[], ctx={}, description=None):
                 max_rate=rate_limit,
                 ctx=ctx_nmap)
             sigs.append(sig)
-        task = group(sigs).apply_async()
-        with allow_join_result():
-            results = task.get()
+
+        # Release the worker while nmap scans are running
+        return self.replace_with_chord(sigs, result=ports_data)
 
     return ports_data
 
@@ -1564,6 +1736,7 @@ def waf_detection(self, ctx={}, description=None):
     with open(self.output_path) as file:
         wafs = file.readlines()
 
+    scan_cache = get_scan_cache(ctx)
     for line in wafs:
         line = " ".join(line.split())
         splitted = line.split(' ', 1)
@@ -1575,26 +1748,20 @@ def waf_detection(self, ctx={}, description=None):
             continue
 
         # Add waf to db
-        waf, _ = Waf.objects.get_or_create(
-            name=waf_name,
-            manufacturer=waf_manufacturer
-        )
+        waf_id = intern_id(Waf, (waf_name, waf_manufacturer))
 
         # Add waf info to Subdomain in DB
         subdomain_name = get_subdomain_from_url(http_url)
         logger.info(f'Wafw00f Subdomain : {subdomain_name}')
 
-        try:
-            subdomain = Subdomain.objects.get(
-                name=subdomain_name,
-                scan_history=self.scan,
-            )
-        except:
+        subdomain_id = scan_cache.get_subdomain_id(subdomain_name)
+        if not subdomain_id:
             logger.warning(f'Subdomain {subdomain_name} was not found in the db, skipping waf detection for this domain.')
             continue
 
-        subdomain.waf.add(waf)
-        subdomain.save()
+        Subdomain.waf.through.objects.bulk_create([
+            Subdomain.waf.through(subdomain_id=subdomain_id, waf_id=waf_id)
+        ], ignore_conflicts=True)
     return wafs
 
 
@@ -1761,12 +1928,16 @@ def dir_file_fuzz(self, ctx={}, description=None):
 
             # Get subdomain and add dirscan
             if ctx.get('subdomain_id') and ctx['subdomain_id'] > 0:
-                subdomain = Subdomain.objects.get(id=ctx['subdomain_id'])
+                subdomain_id = ctx['subdomain_id']
             else:
                 subdomain_name = get_subdomain_from_url(endpoint.http_url)
-                subdomain = Subdomain.objects.get(name=subdomain_name, scan_history=self.scan)
-            subdomain.directories.add(dirscan)
-            subdomain.save()
+                subdomain_id = get_scan_cache(ctx).get_subdomain_id(subdomain_name)
+            if not subdomain_id:
+                logger.warning(f'Subdomain {subdomain_name} was not found in the db, skipping directory scan results for this subdomain.')
+                continue
+            Subdomain.directories.through.objects.bulk_create([
+                Subdomain.directories.through(subdomain_id=subdomain_id, directoryscan_id=dirscan.id)
+            ], ignore_conflicts=True)
 
     # Crawl discovered URLs
     if enable_http_crawl:
@@ -1789,10 +1960,7 @@ def fetch_url(self, urls=[], ctx={}, description=None):
 
     # Config
     config = self.yaml_configuration.get(FETCH_URL) or {}
-    should_remove_duplicate_endpoints = config.get(REMOVE_DUPLICATE_ENDPOINTS, True)
-    duplicate_removal_fields = config.get(DUPLICATE_REMOVAL_FIELDS, ENDPOINT_SCAN_DEFAULT_DUPLICATE_FIELDS)
     enable_http_crawl = config.get(ENABLE_HTTP_CRAWL, DEFAULT_ENABLE_HTTP_CRAWL)
-    gf_patterns = config.get(GF_PATTERNS, DEFAULT_GF_PATTERNS)
     ignore_file_extension = config.get(IGNORE_FILE_EXTENSION, DEFAULT_IGNORE_FILE_EXTENSIONS)
     tools = config.get(USES_TOOLS, ENDPOINT_SCAN_DEFAULT_TOOLS)
     threads = config.get(THREADS) or self.yaml_configuration.get(THREADS, DEFAULT_THREADS)
@@ -1881,9 +2049,6 @@ def fetch_url(self, urls=[], ctx={}, description=None):
                 )
                 logger.debug(f'Generated command for tool {tool}: {tool_cmd}')
 
-    # Group the tasks
-    task_group = group(tasks)
-
     # Cleanup task
     sort_output = [
         f'cat ' + str(Path(self.results_dir) / 'urls_*') + f' > {self.output_path}',
@@ -1906,10 +2071,42 @@ def fetch_url(self, urls=[], ctx={}, description=None):
         for cmd in sort_output
     )
 
-    # Run all commands
-    task = chord(task_group)(cleanup)
-    with allow_join_result():
-        task.get()
+    # Run all commands, then process their results. Release the worker while
+    # the tools are running.
+    ctx_results = ctx.copy()
+    ctx_results['track'] = False
+    ctx_results['filename'] = self.filename
+    process = process_fetched_urls.si(
+        urls=urls,
+        tools=tools,
+        host_regex=host_regex,
+        activity_id=self.activity_id,
+        ctx=ctx_results,
+        description='Process fetched URLs')
+    return self.replace_with_chord(tasks, callbacks=[cleanup, process])
+
+
+@app.task(name='process_fetched_urls', queue='main_scan_queue', base=RengineTask, bind=True)
+def process_fetched_urls(self, urls=[], tools=[], host_regex=None, activity_id=None, ctx={}, description=None):
+    """Save URLs found by fetch_url tools, crawl them and run gf patterns
+    on them.
+
+    Args:
+        urls (list): List of URLs fetch_url started from.
+        tools (list): List of tools that were run.
+        host_regex (str): Regex used to filter gf patterns results.
+        activity_id (int, optional): ScanActivity id of the fetch_url task.
+        description (str, optional): Task description shown in UI.
+
+    Returns:
+        list: URLs found.
+    """
+    config = self.yaml_configuration.get(FETCH_URL) or {}
+    should_remove_duplicate_endpoints = config.get(REMOVE_DUPLICATE_ENDPOINTS, True)
+    duplicate_removal_fields = config.get(DUPLICATE_REMOVAL_FIELDS, ENDPOINT_SCAN_DEFAULT_DUPLICATE_FIELDS)
+    enable_http_crawl = config.get(ENABLE_HTTP_CRAWL, DEFAULT_ENABLE_HTTP_CRAWL)
+    gf_patterns = config.get(GF_PATTERNS, DEFAULT_GF_PATTERNS)
+    activity_id = activity_id or self.activity_id
 
     # Store all the endpoints and run httpx
     all_urls = []
@@ -1998,7 +2195,7 @@ def fetch_url(self, urls=[], ctx={}, description=None):
             shell=True,
             history_file=self.history_file,
             scan_id=self.scan_id,
-            activity_id=self.activity_id)
+            activity_id=activity_id)
 
         # Check output file
         if not os.path.exists(gf_output_file):
@@ -2095,31 +2292,33 @@ def vulnerability_scan(self, urls=[], ctx={}, description=None):
         )
         grouped_tasks.append(_task)
 
-    celery_group = group(grouped_tasks)
-    job = celery_group.apply_async()
-
-    while not job.ready():
-        # wait for all jobs to complete
-        time.sleep(5)
-
-    logger.info('Vulnerability scan completed...')
+    if not grouped_tasks:
+        logger.info('No vulnerability scan to run.')
+        return None
 
-    # return results
-    return None
+    # Release the worker while vulnerability scans are running
+    return self.replace_with_chord(grouped_tasks)
 
 @app.task(name='nuclei_individual_severity_module', queue='main_scan_queue', base=RengineTask, bind=True)
-def nuclei_individual_severity_module(self, cmd, severity, enable_http_crawl, should_fetch_gpt_report, ctx={}, description=None):
+def nuclei_individual_severity_module(self, cmd, severities, enable_http_crawl, should_fetch_gpt_report, ctx={}, description=None):
     '''
-        This celery task will run vulnerability scan in parallel.
-        All severities supplied should run in parallel as grouped tasks.
+        This celery task runs nuclei once with all the supplied severities and
+        demultiplexes the streamed results by their `info.severity`.
     '''
-    results = []
-    logger.info(f'Running vulnerability scan with severity: {severity}')
-    cmd += f' -severity {severity}'
+    if isinstance(severities, str):
+        severities = [severities]
+    results = {severity: [] for severity in severities}
+    logger.info(f'Running vulnerability scan with severities: {severities}')
+    cmd += f' -severity {",".join(severities)}'
     # Send start notification
     notif = Notification.objects.first()
     send_status = notif.send_scan_status_notif if notif else False
 
+    scan_cache = get_scan_cache(ctx)
+    fingerprints = set(
+        Vulnerability.objects
+        .filter(scan_history_id=self.scan_id)
+        .values_list('fingerprint', flat=True))
     for line in stream_command(
             cmd,
             history_file=self.history_file,
@@ -2129,36 +2328,34 @@ def nuclei_individual_severity_module(self, cmd, severity, enable_http_crawl, sh
         if not isinstance(line, dict):
             continue
 
-        results.append(line)
+        # Demultiplex results by severity
+        severity = line.get('info', {}).get('severity', 'unknown')
+        if severity not in results:
+            logger.warning(f'Nuclei result with severity {severity} was not requested. Skipping.')
+            continue
+        results[severity].append(line)
 
         # Gather nuclei results
         vuln_data = parse_nuclei_result(line)
 
-        # Get corresponding subdomain
+        # Skip vulnerabilities the scan already found, before any endpoint
+        # lookup or crawl
         http_url = sanitize_url(line.get('matched-at'))
         subdomain_name = get_subdomain_from_url(http_url)
-
-        try:
-            subdomain = Subdomain.objects.get(
-                name=subdomain_name,
-                scan_history=self.scan,
-                target_domain=self.domain
-            )
-        except:
-            logger.warning(f'Subdomain {subdomain_name} was not found in the db, skipping vulnerability scan for this subdomain.')
+        fingerprint = Vulnerability.get_fingerprint(
+            self.scan_id,
+            vuln_data['template_id'] or vuln_data['name'],
+            http_url,
+            vuln_data['matcher_name'])
+        if fingerprint in fingerprints:
+            logger.warning(f'Nuclei vulnerability of severity {severity} : {vuln_data["name"]} for {subdomain_name} already exists')
             continue
+        fingerprints.add(fingerprint)
 
-        # Look for duplicate vulnerabilities by excluding records that might change but are irrelevant.
-        object_comparison_exclude = ['response', 'curl_command', 'tags', 'references', 'cve_ids', 'cwe_ids']
-
-        # Add subdomain and target domain to the duplicate check
-        vuln_data_copy = vuln_data.copy()
-        vuln_data_copy['subdomain'] = subdomain
-        vuln_data_copy['target_domain'] = self.domain
-
-        # Check if record exists, if exists do not save it
-        if record_exists(Vulnerability, data=vuln_data_copy, exclude_keys=object_comparison_exclude):
-            logger.warning(f'Nuclei vulnerability of severity {severity} : {vuln_data_copy["name"]} for {subdomain_name} already exists')
+        # Get corresponding subdomain
+        subdomain_id = scan_cache.get_subdomain_id(subdomain_name)
+        if not subdomain_id:
+            logger.warning(f'Subdomain {subdomain_name} was not found in the db, skipping vulnerability scan for this subdomain.')
             continue
 
         # Get or create EndPoint object
@@ -2167,7 +2364,7 @@ def nuclei_individual_severity_module(self, cmd, severity, enable_http_crawl, sh
         endpoint, _ = save_endpoint(
             http_url,
             crawl=httpx_crawl,
-            subdomain=subdomain,
+            subdomain_id=subdomain_id,
             ctx=ctx)
         if endpoint:
             http_url = endpoint.http_url
@@ -2177,18 +2374,19 @@ def nuclei_individual_severity_module(self, cmd, severity, enable_http_crawl, sh
                 endpoint.save()
 
         # Get or create Vulnerability object
-        vuln, _ = save_vulnerability(
+        vuln, created = save_vulnerability(
             target_domain=self.domain,
             http_url=http_url,
             scan_history=self.scan,
             subscan=self.subscan,
-            subdomain=subdomain,
+            subdomain_id=subdomain_id,
+            fingerprint=fingerprint,
             **vuln_data)
-        if not vuln:
+        if not created:
+            logger.warning(f'Nuclei vulnerability of severity {severity} : {vuln.name} for {subdomain_name} already exists')
             continue
 
         # Print vuln
-        severity = line['info'].get('severity', 'unknown')
         logger.warning(str(vuln))
 
 
@@ -2245,6 +2443,9 @@ def nuclei_individual_severity_module(self, cmd, severity, enable_http_crawl, sh
     with open(self.output_path, 'w') as f:
         json.dump(results, f, indent=4)
 
+    for severity, severity_results in results.items():
+        logger.info(f'Nuclei found {len(severity_results)} results with severity {severity}')
+
     # Send finish notif
     if send_status:
         vulns = Vulnerability.objects.filter(scan_history__id=self.scan_id)
@@ -2341,11 +2542,7 @@ def get_vulnerability_gpt_report(vuln):
         vuln.remediation = response.get('remediation')
         vuln.is_gpt_used = True
         vuln.save()
-
-        for url in response.get('references', []):
-            ref, created = VulnerabilityReference.objects.get_or_create(url=url)
-            vuln.references.add(ref)
-            vuln.save()
+        vuln.references.add(*intern_ids(VulnerabilityReference, response.get('references', [])).values())
 
 
 def add_gpt_description_db(title, path, description, impact, remediation, references):
@@ -2356,11 +2553,7 @@ def add_gpt_description_db(title, path, description, impact, remediation, refere
     gpt_report.impact = impact
     gpt_report.remediation = remediation
     gpt_report.save()
-
-    for url in references:
-        ref, created = VulnerabilityReference.objects.get_or_create(url=url)
-        gpt_report.references.add(ref)
-        gpt_report.save()
+    gpt_report.references.add(*intern_ids(VulnerabilityReference, references).values())
 
 @app.task(name='nuclei_scan', queue='main_scan_queue', base=RengineTask, bind=True)
 def nuclei_scan(self, urls=[], ctx={}, description=None):
@@ -2395,7 +2588,6 @@ def nuclei_scan(self, urls=[], ctx={}, description=None):
     tags = ','.join(tags)
     nuclei_templates = nuclei_specific_config.get(NUCLEI_TEMPLATE)
     custom_nuclei_templates = nuclei_specific_config.get(NUCLEI_CUSTOM_TEMPLATE)
-    # severities_str = ','.join(severities)
 
     # Get alive endpoints
     if urls and is_iterable(urls):
@@ -2425,14 +2617,18 @@ def nuclei_scan(self, urls=[], ctx={}, description=None):
             activity_id=self.activity_id)
         input_path = unfurl_filter
 
+    # Update templates in the background if they are outdated, and scan with
+    # the current templates meanwhile. Templates are downloaded before the
+    # scan if there are none yet, or the scan waits for the worker already
+    # downloading them.
+    if not os.path.isdir(NUCLEI_DEFAULT_TEMPLATES_PATH):
+        update_nuclei_templates(wait=True)
+        if not os.path.isdir(NUCLEI_DEFAULT_TEMPLATES_PATH):
+            raise FileNotFoundError(f'Nuclei templates could not be downloaded to {NUCLEI_DEFAULT_TEMPLATES_PATH}')
+    elif nuclei_templates_need_update():
+        update_nuclei_templates.delay()
+
     # Build templates
-    # logger.info('Updating Nuclei templates ...')
-    run_command(
-        'nuclei -update-templates',
-        shell=True,
-        history_file=self.history_file,
-        scan_id=self.scan_id,
-        activity_id=self.activity_id)
     templates = []
     if not (nuclei_templates or custom_nuclei_templates):
         templates.append(NUCLEI_DEFAULT_TEMPLATES_PATH)
@@ -2458,7 +2654,6 @@ def nuclei_scan(self, urls=[], ctx={}, description=None):
     cmd += f' -proxy {proxy} ' if proxy else ''
     cmd += f' -retries {retries}' if retries > 0 else ''
     cmd += f' -rl {rate_limit}' if rate_limit > 0 else ''
-    # cmd += f' -severity {severities_str}'
     cmd += f' -timeout {str(timeout)}' if timeout and timeout > 0 else ''
     cmd += f' -tags {tags}' if tags else ''
     cmd += f' -silent'
@@ -2466,30 +2661,21 @@ def nuclei_scan(self, urls=[], ctx={}, description=None):
         cmd += f' -t {tpl}'
 
 
-    grouped_tasks = []
+    # Run nuclei once for all severities, results are split by severity
+    # when they are ingested.
     custom_ctx = ctx
-    for severity in severities:
-        custom_ctx['track'] = True
-        _task = nuclei_individual_severity_module.si(
-            cmd,
-            severity,
-            enable_http_crawl,
-            should_fetch_gpt_report,
-            ctx=custom_ctx,
-            description=f'Nuclei Scan with severity {severity}'
-        )
-        grouped_tasks.append(_task)
-
-    celery_group = group(grouped_tasks)
-    job = celery_group.apply_async()
-
-    while not job.ready():
-        # wait for all jobs to complete
-        time.sleep(5)
-
-    logger.info('Vulnerability scan with all severities completed...')
+    custom_ctx['track'] = True
+    job = nuclei_individual_severity_module.si(
+        cmd,
+        severities,
+        enable_http_crawl,
+        should_fetch_gpt_report,
+        ctx=custom_ctx,
+        description=f'Nuclei Scan with severities {", ".join(severities)}'
+    )
 
-    return None
+    # Release the worker while nuclei is running
+    return self.replace_with_chord([job])
 
 @app.task(name='dalfox_xss_scan', queue='main_scan_queue', base=RengineTask, bind=True)
 def dalfox_xss_scan(self, urls=[], ctx={}, description=None):
@@ -2545,6 +2731,7 @@ def dalfox_xss_scan(self, urls=[], ctx={}, description=None):
     cmd += f' --format json'
 
     results = []
+    scan_cache = get_scan_cache(ctx)
     for line in stream_command(
             cmd,
             history_file=self.history_file,
@@ -2562,20 +2749,15 @@ def dalfox_xss_scan(self, urls=[], ctx={}, description=None):
         http_url = sanitize_url(line.get('data'))
         subdomain_name = get_subdomain_from_url(http_url)
 
-        try:
-            subdomain = Subdomain.objects.get(
-                name=subdomain_name,
-                scan_history=self.scan,
-                target_domain=self.domain
-            )
-        except:
+        subdomain_id = scan_cache.get_subdomain_id(subdomain_name)
+        if not subdomain_id:
             logger.warning(f'Subdomain {subdomain_name} was not found in the db, skipping dalfox scan for this subdomain.')
             continue
 
         endpoint, _ = save_endpoint(
             http_url,
             crawl=True,
-            subdomain=subdomain,
+            subdomain_id=subdomain_id,
             ctx=ctx
         )
         if endpoint:
@@ -2680,6 +2862,7 @@ def crlfuzz_scan(self, urls=[], ctx={}, description=None):
     with open(output_path, 'r') as file:
         crlfs = file.readlines()
 
+    scan_cache = get_scan_cache(ctx)
     for crlf in crlfs:
         url = crlf.strip()
 
@@ -2688,20 +2871,15 @@ def crlfuzz_scan(self, urls=[], ctx={}, description=None):
         http_url = sanitize_url(url)
         subdomain_name = get_subdomain_from_url(http_url)
 
-        try:
-            subdomain = Subdomain.objects.get(
-                name=subdomain_name,
-                scan_history=self.scan,
-                target_domain=self.domain
-            )
-        except:
+        subdomain_id = scan_cache.get_subdomain_id(subdomain_name)
+        if not subdomain_id:
             logger.warning(f'Subdomain {subdomain_name} was not found in the db, skipping crlfuzz scan for this subdomain.')
             continue
 
         endpoint, _ = save_endpoint(
             http_url,
             crawl=True,
-            subdomain=subdomain,
+            subdomain_id=subdomain_id,
             ctx=ctx
         )
         if endpoint:
@@ -2873,122 +3051,56 @@ def http_crawl(
         cmd += ' -fr'
     results = []
     endpoint_ids = []
-    for line in stream_command(
-            cmd,
-            history_file=history_file,
-            scan_id=self.scan_id,
-            activity_id=self.activity_id):
-
-        if not line or not isinstance(line, dict):
-            continue
-        
-        # Check if the http request has an error
-        if 'error' in line:
-            logger.error(line)
-            continue
-
-        logger.debug(line)
-        
-        # No response from endpoint
-        if line.get('failed', False):
-            continue
-
-        # Parse httpx output
-        host = line.get('host', '')
-        content_length = line.get('content_length', 0)
-        http_status = line.get('status_code')
-        http_url, is_redirect = extract_httpx_url(line, follow_redirect)
-        page_title = line.get('title')
-        webserver = line.get('webserver')
-        cdn = line.get('cdn', False)
-        rt = line.get('time')
-        techs = line.get('tech', [])
-        cname = line.get('cname', '')
-        content_type = line.get('content_type', '')
-        response_time = -1
-        if rt:
-            response_time = float(''.join(ch for ch in rt if not ch.isalpha()))
-            if rt[-2:] == 'ms':
-                response_time = response_time / 1000
-
-        # Create/get Subdomain object in DB
-        subdomain_name = get_subdomain_from_url(http_url)
-        subdomain, _ = save_subdomain(subdomain_name, ctx=ctx)
-        if not isinstance(subdomain, Subdomain):
-            logger.error(f"Invalid subdomain encountered: {subdomain}")
-            continue
+    lines = stream_command(
+        cmd,
+        history_file=history_file,
+        scan_id=self.scan_id,
+        activity_id=self.activity_id)
 
-        # Save default HTTP URL to endpoint object in DB
-        endpoint, created = save_endpoint(
-            http_url,
-            crawl=False,
+    # Save results by chunks to keep the number of DB queries bounded
+    for chunk in chunked(lines, HTTP_CRAWL_BATCH_SIZE):
+        records = [parse_httpx_result(line, follow_redirect) for line in chunk]
+        records = [record for record in records if record]
+        saved = save_httpx_results(
+            records,
             ctx=ctx,
-            subdomain=subdomain,
-            is_default=update_subdomain_metadatas
-        )
-        if not endpoint:
-            continue
-        endpoint.http_status = http_status
-        endpoint.page_title = page_title
-        endpoint.content_length = content_length
-        endpoint.webserver = webserver
-        endpoint.response_time = response_time
-        endpoint.content_type = content_type
-        endpoint.save()
-        endpoint_str = f'{http_url} [{http_status}] `{content_length}B` `{webserver}` `{rt}`'
-        logger.warning(endpoint_str)
-        if endpoint and endpoint.is_alive and endpoint.http_status != 403:
+            is_default=update_subdomain_metadatas,
+            update_subdomain_metadatas=update_subdomain_metadatas)
+
+        for record, endpoint, created in saved:
+            line = record['line']
+            http_url = record['http_url']
+            endpoint_data = record['endpoint_data']
+            endpoint_str = f"{http_url} [{endpoint_data['http_status']}] `{endpoint_data['content_length']}B` `{endpoint_data['webserver']}` `{record['rt']}`"
+            logger.warning(endpoint_str)
+            if endpoint.is_alive and endpoint.http_status != 403:
+                self.notify(
+                    fields={'Alive endpoint': f'• {endpoint_str}'},
+                    add_meta_info=False)
+
+            # Add endpoint to results
+            line['_cmd'] = cmd
+            line['final_url'] = http_url
+            line['endpoint_id'] = endpoint.id
+            line['endpoint_created'] = created
+            line['is_redirect'] = record['is_redirect']
+            results.append(line)
+
+            techs_str = ', '.join([f'`{tech}`' for tech in record['techs']])
             self.notify(
-                fields={'Alive endpoint': f'• {endpoint_str}'},
+                fields={'Technologies': techs_str},
                 add_meta_info=False)
 
-        # Add endpoint to results
-        line['_cmd'] = cmd
-        line['final_url'] = http_url
-        line['endpoint_id'] = endpoint.id
-        line['endpoint_created'] = created
-        line['is_redirect'] = is_redirect
-        results.append(line)
-
-        # Add technology objects to DB
-        for technology in techs:
-            tech, _ = Technology.objects.get_or_create(name=technology)
-            endpoint.techs.add(tech)
-            endpoint.save()
-        techs_str = ', '.join([f'`{tech}`' for tech in techs])
-        self.notify(
-            fields={'Technologies': techs_str},
-            add_meta_info=False)
-
-        # Add IP objects for 'a' records to DB
-        a_records = line.get('a', [])
-        for ip_address in a_records:
-            ip, created = save_ip_address(
-                ip_address,
-                subdomain,
-                subscan=self.subscan,
-                cdn=cdn)
-        ips_str = '• ' + '\n• '.join([f'`{ip}`' for ip in a_records])
-        self.notify(
-            fields={'IPs': ips_str},
-            add_meta_info=False)
-
-        # Add IP object for host in DB
-        if host:
-            ip, created = save_ip_address(
-                host,
-                subdomain,
-                subscan=self.subscan,
-                cdn=cdn)
+            ips_str = '• ' + '\n• '.join([f'`{ip}`' for ip in record['a_records']])
             self.notify(
-                fields={'IPs': f'• `{ip.address}`'},
+                fields={'IPs': ips_str},
                 add_meta_info=False)
+            if record['host']:
+                self.notify(
+                    fields={'IPs': f"• `{record['host']}`"},
+                    add_meta_info=False)
 
-        # Save subdomain metadatas
-        if update_subdomain_metadatas:
-            save_subdomain_metadata(subdomain, endpoint, line)
-
-        endpoint_ids.append(endpoint.id)
+            endpoint_ids.append(endpoint.id)
 
     if should_remove_duplicate_endpoints:
         # Remove 'fake' alive endpoints that are just redirects to the same page
@@ -3097,7 +3209,7 @@ def send_task_notif(
     Args:
         task_name (str): Task name.
         status (str, optional): Task status.
-        result (str, optional): Task result.
+        result (bool, optional): Whether the task returned a result.
         output_path (str, optional): Task output path.
         traceback (str, optional): Task traceback.
         scan_history_id (int, optional): ScanHistory id.
@@ -3281,6 +3393,10 @@ def parse_nmap_results(xml_file, output_file=None):
             logger.error(f'Cannot parse {xml_file} to valid JSON. Skipping.')
             return []
 
+    # Fetch all CVEs found in nmap results at once, they are then read from
+    # cache when parsing scripts outputs.
+    get_cves_info(CVE_REGEX.findall(content))
+
     # Write JSON to output file
     if output_file:
         with open(output_file, 'w') as f:
@@ -3414,10 +3530,12 @@ def parse_nmap_vulscan_output(script_output):
             pass
         elif provider_name == 'MITRE CVE':
             logger.error(f'Provider {provider_name} is not supported YET.')
-            for entry in data[provider_name]['entries']:
-                cve_id = entry['id']
-                vuln = cve_to_vuln(cve_id)
-                vulns.append(vuln)
+            cve_ids = [entry['id'] for entry in data[provider_name]['entries']]
+            cves_info = get_cves_info(cve_ids)
+            for cve_id in cve_ids:
+                vuln = cve_to_vuln(cve_id, cve_info=cves_info.get(cve_id))
+                if vuln:
+                    vulns.append(vuln)
         elif provider_name == 'OSVDB':
             logger.error(f'Provider {provider_name} is not supported YET.')
             pass
@@ -3449,26 +3567,29 @@ def parse_nmap_vulners_output(script_output, url=''):
     """
     vulns = []
     # Check for CVE in script output
-    CVE_REGEX = re.compile(r'.*(CVE-\d\d\d\d-\d+).*')
     matches = CVE_REGEX.findall(script_output)
     matches = list(dict.fromkeys(matches))
+    cves_info = get_cves_info(matches)
     for cve_id in matches: # get CVE info
-        vuln = cve_to_vuln(cve_id, vuln_type='nmap-vulners-nse')
+        vuln = cve_to_vuln(cve_id, vuln_type='nmap-vulners-nse', cve_info=cves_info.get(cve_id))
         if vuln:
             vulns.append(vuln)
     return vulns
 
 
-def cve_to_vuln(cve_id, vuln_type=''):
-    """Search for a CVE using CVESearch and return Vulnerability data.
+def cve_to_vuln(cve_id, vuln_type='', cve_info=None):
+    """Search for a CVE in the local CVE store (or CVESearch) and return
+    Vulnerability data.
 
     Args:
         cve_id (str): CVE ID in the form CVE-*
+        cve_info (dict, optional): CVE details if already fetched.
 
     Returns:
         dict: Vulnerability dict.
     """
-    cve_info = CVESearch('https://cve.circl.lu').id(cve_id)
+    if cve_info is None:
+        cve_info = get_cves_info([cve_id]).get(cve_id)
     if not cve_info:
         logger.error(f'Could not fetch CVE info for cve {cve_id}. Skipping.')
         return None
@@ -3625,59 +3746,56 @@ def parse_crlfuzz_result(url):
     }
 
 
-def record_exists(model, data, exclude_keys=[]):
-    """
-    Check if a record already exists in the database based on the given data.
+@app.task(name='geo_localize', bind=False, queue='geo_localize_queue')
+def geo_localize(host, ip_id=None):
+    """Uses the local GeoIP database to find location associated with host.
 
     Args:
-        model (django.db.models.Model): The Django model to check against.
-        data (dict): Data dictionary containing fields and values.
-        exclude_keys (list): List of keys to exclude from the lookup.
+        host (str): Hostname.
+        ip_id (int): IpAddress object id.
 
     Returns:
-        bool: True if the record exists, False otherwise.
+        dict: Country iso and name or None.
     """
+    country = get_countries([host]).get(host)
+    if not country:
+        logger.info(f'Geo IP lookup failed for host "{host}"')
+        return None
+    if ip_id:
+        geo_localize_ips(IpAddress.objects.filter(pk=ip_id))
+    country_iso, country_name = country
+    return {
+        'iso': country_iso,
+        'name': country_name
+    }
 
-    # Extract the keys that will be used for the lookup
-    lookup_fields = {key: data[key] for key in data if key not in exclude_keys}
-
-    # Return True if a record exists based on the lookup fields, False otherwise
-    return model.objects.filter(**lookup_fields).exists()
 
-@app.task(name='geo_localize', bind=False, queue='geo_localize_queue')
-def geo_localize(host, ip_id=None):
-    """Uses geoiplookup to find location associated with host.
+def geo_localize_ips(ips):
+    """Find and save the country of a batch of IP addresses using the local
+    GeoIP database.
 
     Args:
-        host (str): Hostname.
-        ip_id (int): IpAddress object id.
+        ips (list): IpAddress objects.
 
     Returns:
-        startScan.models.CountryISO: CountryISO object from DB or None.
+        int: Number of IP addresses localized.
     """
-    if validators.ipv6(host):
-        logger.info(f'Ipv6 "{host}" is not supported by geoiplookup. Skipping.')
-        return None
-    cmd = f'geoiplookup {host}'
-    _, out = run_command(cmd)
-    if 'IP Address not found' not in out and "can't resolve hostname" not in out:
-        country_iso = out.split(':')[1].strip().split(',')[0]
-        country_name = out.split(':')[1].strip().split(',')[1].strip()
-        geo_object, _ = CountryISO.objects.get_or_create(
-            iso=country_iso,
-            name=country_name
-        )
-        geo_json = {
-            'iso': country_iso,
-            'name': country_name
-        }
-        if ip_id:
-            ip = IpAddress.objects.get(pk=ip_id)
-            ip.geo_iso = geo_object
-            ip.save()
-        return geo_json
-    logger.info(f'Geo IP lookup failed for host "{host}"')
-    return None
+    ips = list(ips)
+    countries = get_countries([ip.address for ip in ips])
+    if not countries:
+        return 0
+
+    # Get or create CountryISO objects
+    geo_ids = intern_ids(CountryISO, countries.values())
+
+    # Update IPs
+    localized = []
+    for ip in ips:
+        if ip.address in countries:
+            ip.geo_iso_id = geo_ids[countries[ip.address]]
+            localized.append(ip)
+    IpAddress.objects.bulk_update(localized, ['geo_iso'])
+    return len(localized)
 
 
 @app.task(name='query_whois', bind=False, queue='query_whois_queue')
@@ -4153,38 +4271,106 @@ def remove_duplicate_endpoints(
     if filter_ids:
         endpoints = endpoints.filter(id__in=filter_ids)
 
-    # Group by all duplicate removal fields combined
-    fields_combined = duplicate_removal_fields[:]
-    fields_combined.append('id')  # Add ID to ensure unique identification
-
-    cl_query = (
+    # Rank endpoints in groups having the same values for all duplicate
+    # removal fields. The first discovered endpoint of each group is kept.
+    partition_by = [F(field) for field in duplicate_removal_fields]
+    order_by = [F('discovered_date').asc(), F('id').asc()]
+    ranked = (
         endpoints
-        .values(*duplicate_removal_fields)
-        .annotate(mc=Count('id'))
-        .order_by('-mc')
+        .order_by()
+        .annotate(
+            dup_rank=Window(RowNumber(), partition_by=partition_by, order_by=order_by),
+            dup_count=Window(Count('id'), partition_by=partition_by),
+            keep_id=Window(FirstValue('id'), partition_by=partition_by, order_by=order_by))
+        .values('id', 'keep_id', 'dup_rank', 'dup_count', 'http_url')
     )
+    ranked_sql, params = ranked.query.sql_with_params()
+
+    # Ensure not to delete the original page that other pages redirect to
+    url_path = "COALESCE(SUBSTRING(http_url FROM '^[^:/?#]+://[^/?#]*([^?#]*)'), '')"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT id, keep_id, http_url FROM ({ranked_sql}) AS ranked '
+            f'WHERE dup_rank > 1 AND dup_count > %s '
+            f"AND {url_path} NOT IN ('', '/', '/login')",
+            (*params, DELETE_DUPLICATES_THRESHOLD))
+        duplicates = cursor.fetchall()
+
+    # Merge M2M references onto the kept endpoints, then delete duplicates
+    techs_through = EndPoint.techs.through
+    subscans_through = EndPoint.endpoint_subscan_ids.through
+    for batch in chunked(duplicates, DELETE_DUPLICATES_BATCH_SIZE):
+        kept_by_duplicate = {endpoint_id: keep_id for endpoint_id, keep_id, _ in batch}
+        techs_through.objects.bulk_create([
+            techs_through(endpoint_id=kept_by_duplicate[endpoint_id], technology_id=technology_id)
+            for endpoint_id, technology_id in (
+                techs_through.objects
+                .filter(endpoint_id__in=kept_by_duplicate)
+                .values_list('endpoint_id', 'technology_id'))
+        ], ignore_conflicts=True)
+        subscans_through.objects.bulk_create([
+            subscans_through(endpoint_id=kept_by_duplicate[endpoint_id], subscan_id=subscan_id)
+            for endpoint_id, subscan_id in (
+                subscans_through.objects
+                .filter(endpoint_id__in=kept_by_duplicate)
+                .values_list('endpoint_id', 'subscan_id'))
+        ], ignore_conflicts=True)
+        EndPoint.objects.filter(id__in=kept_by_duplicate).delete()
+        logger.warning(f'Deleted {len(batch)} endpoints [reason: same {", ".join(duplicate_removal_fields)}]')
+        logger.debug('\n'.join(f'\t {http_url}' for _, _, http_url in batch))
+
+    # Deleted endpoints cascade to their vulnerabilities, recount them
+    if duplicates:
+        ScanStatistics.reconcile(scan_history_id)
+
+
+@app.task(name='update_nuclei_templates', bind=False, queue='run_command_queue')
+def update_nuclei_templates(force=False, wait=False):
+    """Update nuclei templates, at most once every NUCLEI_TEMPLATES_UPDATE_TTL
+    seconds. Only one worker updates them at a time, other calls return
+    straight away unless `wait` is set.
 
-    for field_values in cl_query:
-        if field_values['mc'] > DELETE_DUPLICATES_THRESHOLD:
-            filter_criteria = {field: field_values[field] for field in duplicate_removal_fields}
-            eps_to_delete = (
-                endpoints
-                .filter(**filter_criteria)
-                .order_by('discovered_date')
-                .all()[1:]
-            )
-            msg = f'Deleting {len(eps_to_delete)} endpoints [reason: same {filter_criteria}]'
-            for ep in eps_to_delete:
-                url = urlparse(ep.http_url)
-                if url.path in ['', '/', '/login']:  # Ensure not to delete the original page that other pages redirect to
-                    continue
-                msg += f'\n\t {ep.http_url} [{ep.http_status}] {filter_criteria}'
-                ep.delete()
-            logger.warning(msg)
+    Args:
+        force (bool): Update even if templates were checked recently.
+        wait (bool): Wait for another worker updating templates to finish,
+            then update them if they still need it.
+
+    Returns:
+        bool: True if templates changed.
+    """
+    lock = get_redis_lock('update_nuclei_templates', timeout=NUCLEI_TEMPLATES_UPDATE_LOCK_TIMEOUT)
+    if wait:
+        acquired = lock.acquire(blocking=True, blocking_timeout=NUCLEI_TEMPLATES_UPDATE_LOCK_TIMEOUT)
+    else:
+        acquired = lock.acquire(blocking=False)
+    if not acquired:
+        logger.info('Nuclei templates are being updated by another worker. Skipping.')
+        return False
+    try:
+        if not force and not nuclei_templates_need_update():
+            return False
+        logger.info('Updating Nuclei templates ...')
+        run_command('nuclei -update-templates', shell=True)
+        checksum = get_nuclei_templates_checksum()
+        now = timezone.now()
+        templates_update = NucleiTemplatesUpdate.objects.first() or NucleiTemplatesUpdate()
+        changed = checksum != templates_update.checksum
+        if changed:
+            logger.warning(f'Nuclei templates changed [checksum: {checksum}]')
+            templates_update.checksum = checksum
+            templates_update.updated_at = now
+        templates_update.checked_at = now
+        templates_update.save()
+        return changed
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning('Nuclei templates update lock expired before the update finished.')
 
 
-@app.task(name='run_command', bind=False, queue='run_command_queue')
-def run_command(cmd, cwd=None, shell=False, history_file=None, scan_id=None, activity_id=None, remove_ansi_sequence=False):
+@app.task(name='run_command', bind=False, queue='run_command_queue', base=ChordSafeTask)
+def run_command(cmd, cwd=None, shell=False, history_file=None, scan_id=None, activity_id=None, remove_ansi_sequence=False, timeout=None):
     """
     Execute a command and return its output.
 
@@ -4196,6 +4382,7 @@ def run_command(cmd, cwd=None, shell=False, history_file=None, scan_id=None, act
         scan_id (int, optional): ID of the associated scan. Defaults to None.
         activity_id (int, optional): ID of the associated activity. Defaults to None.
         remove_ansi_sequence (bool, optional): Whether to remove ANSI escape sequences from output. Defaults to False.
+        timeout (int, optional): Seconds after which the command and its child processes are killed. Defaults to None.
 
     Returns:
         tuple: A tuple containing the return code and output of the command.
@@ -4205,7 +4392,11 @@ def run_command(cmd, cwd=None, shell=False, history_file=None, scan_id=None, act
     command = prepare_command(cmd, shell)
     logger.debug(f"Prepared run command: {command}")
 
-    process = execute_command(command, shell, cwd)
+    process = execute_command(command, shell, cwd, new_session=bool(timeout))
+    timer = None
+    if timeout:
+        timer = threading.Timer(timeout, kill_process_group, args=(process,))
+        timer.start()
     output = ''
     for stdout_line in iter(process.stdout.readline, ""):
         item = stdout_line.strip()
@@ -4214,6 +4405,8 @@ def run_command(cmd, cwd=None, shell=False, history_file=None, scan_id=None, act
     
     process.stdout.close()
     process.wait()
+    if timer:
+        timer.cancel()
     return_code = process.returncode
     command_obj.output = output
     command_obj.return_code = return_code
@@ -4250,16 +4443,17 @@ def stream_command(cmd, cwd=None, shell=False, history_file=None, encoding='utf-
     logger.debug(f"Prepared stream command: {command}")
     
     process = execute_command(command, shell, cwd)
-    output = ""
+    output_buffer = CommandOutputBuffer(command_obj)
 
-    for line in iter(process.stdout.readline, b''):
-        if not line:
-            break
-        item = process_line(line, trunc_char)
-        yield item
-        output += line
-        command_obj.output = output
-        command_obj.save()
+    try:
+        for line in iter(process.stdout.readline, b''):
+            if not line:
+                break
+            item = process_line(line, trunc_char)
+            yield item
+            output_buffer.write(line)
+    finally:
+        output_buffer.flush()
 
     process.wait()
     return_code = process.returncode
@@ -4268,12 +4462,64 @@ def stream_command(cmd, cwd=None, shell=False, history_file=None, encoding='utf-
     logger.info(f'Command returned exit code: {return_code}')
 
     if history_file:
-        write_history(history_file, cmd, return_code, output)
+        write_history(history_file, cmd, return_code, command_obj.get_output())
 
 def process_httpx_response(line):
     """TODO: implement this"""
 
 
+def parse_httpx_result(line, follow_redirect):
+    """Parse results from httpx JSON output.
+
+    Args:
+        line (dict): httpx JSON line output.
+        follow_redirect (bool): Whether httpx followed redirects.
+
+    Returns:
+        dict: Endpoint data, or None if the line has no usable result.
+    """
+    if not line or not isinstance(line, dict):
+        return None
+
+    # Check if the http request has an error
+    if 'error' in line:
+        logger.error(line)
+        return None
+
+    logger.debug(line)
+
+    # No response from endpoint
+    if line.get('failed', False):
+        return None
+
+    http_url, is_redirect = extract_httpx_url(line, follow_redirect)
+    rt = line.get('time')
+    response_time = -1
+    if rt:
+        response_time = float(''.join(ch for ch in rt if not ch.isalpha()))
+        if rt[-2:] == 'ms':
+            response_time = response_time / 1000
+
+    return {
+        'line': line,
+        'http_url': http_url,
+        'is_redirect': is_redirect,
+        'subdomain_name': get_subdomain_from_url(http_url),
+        'host': line.get('host', ''),
+        'a_records': line.get('a', []),
+        'techs': line.get('tech', []),
+        'rt': rt,
+        'endpoint_data': {
+            'http_status': line.get('status_code'),
+            'page_title': line.get('title'),
+            'content_length': line.get('content_length', 0),
+            'webserver': line.get('webserver'),
+            'response_time': response_time,
+            'content_type': line.get('content_type', ''),
+        },
+    }
+
+
 def extract_httpx_url(line, follow_redirect):
     """Extract final URL from httpx results.
 
@@ -4485,6 +4731,7 @@ def create_scan_activity(scan_history_id, message, status):
     scan_activity.time = timezone.now()
     scan_activity.status = status
     scan_activity.save()
+    ScanStatistics.increment(scan_history_id, activity_count=1)
     return scan_activity.id
 
 
@@ -4493,55 +4740,91 @@ def create_scan_activity(scan_history_id, message, status):
 #--------------------#
 
 
+def insert_vulnerability(vuln):
+    """Insert a vulnerability unless one with the same fingerprint exists,
+    with INSERT ... ON CONFLICT DO NOTHING RETURNING id.
+
+    Args:
+        vuln (startScan.models.Vulnerability): Unsaved vulnerability.
+
+    Returns:
+        bool: True if the vulnerability was inserted, its pk is set then.
+    """
+    fields = [field for field in Vulnerability._meta.local_concrete_fields if not field.primary_key]
+    values = [field.get_db_prep_save(field.pre_save(vuln, add=True), connection) for field in fields]
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote_name(Vulnerability._meta.db_table)} '
+            f'({", ".join(quote_name(field.column) for field in fields)}) '
+            f'VALUES ({", ".join(["%s"] * len(fields))}) '
+            f'ON CONFLICT ({quote_name("fingerprint")}) DO NOTHING RETURNING {quote_name("id")}',
+            values)
+        row = cursor.fetchone()
+    if not row:
+        return False
+    vuln.pk = row[0]
+    vuln._state.adding = False
+    vuln._state.db = connection.alias
+    return True
+
+
 def save_vulnerability(**vuln_data):
+    """Save a vulnerability, unless the scan already found it.
+
+    Vulnerabilities are identified by their fingerprint (see
+    `Vulnerability.get_fingerprint`), computed from `vuln_data` unless a
+    `fingerprint` is given, and inserted with INSERT ... ON CONFLICT DO
+    NOTHING so that concurrent tasks do not create duplicates.
+
+    First seen wins: the fields of a vulnerability already found are not
+    updated, only its tags, CVEs, CWEs, references and subscans are added.
+
+    Returns:
+        tuple: (startScan.models.Vulnerability, created) where `created` is a
+            boolean indicating if the object has been created in DB.
+    """
     references = vuln_data.pop('references', [])
     cve_ids = vuln_data.pop('cve_ids', [])
     cwe_ids = vuln_data.pop('cwe_ids', [])
     tags = vuln_data.pop('tags', [])
     subscan = vuln_data.pop('subscan', None)
+    fingerprint = vuln_data.pop('fingerprint', None)
 
     # remove nulls
     vuln_data = replace_nulls(vuln_data)
 
     # Create vulnerability
-    vuln, created = Vulnerability.objects.get_or_create(**vuln_data)
-    if created:
-        vuln.discovered_date = timezone.now()
-        vuln.open_status = True
-        vuln.save()
-
-    # Save vuln tags
-    for tag_name in tags or []:
-        tag, created = VulnerabilityTags.objects.get_or_create(name=tag_name)
-        if tag:
-            vuln.tags.add(tag)
-            vuln.save()
-
-    # Save CVEs
-    for cve_id in cve_ids or []:
-        cve, created = CveId.objects.get_or_create(name=cve_id)
-        if cve:
-            vuln.cve_ids.add(cve)
-            vuln.save()
-
-    # Save CWEs
-    for cve_id in cwe_ids or []:
-        cwe, created = CweId.objects.get_or_create(name=cve_id)
-        if cwe:
-            vuln.cwe_ids.add(cwe)
-            vuln.save()
-
-    # Save vuln reference
-    for url in references or []:
-        ref, created = VulnerabilityReference.objects.get_or_create(url=url)
+    scan = vuln_data.get('scan_history')
+    fingerprint = fingerprint or Vulnerability.get_fingerprint(
+        scan.id if scan else None,
+        vuln_data.get('template_id') or vuln_data.get('name'),
+        vuln_data.get('http_url'),
+        vuln_data.get('matcher_name'))
+    vuln = Vulnerability.objects.filter(fingerprint=fingerprint).first()
+    created = False
+    if vuln is None:
+        vuln = Vulnerability(
+            fingerprint=fingerprint,
+            discovered_date=timezone.now(),
+            open_status=True,
+            **vuln_data)
+        # Only the task inserting the row handles the new vulnerability
+        created = insert_vulnerability(vuln)
         if created:
-            vuln.references.add(ref)
-            vuln.save()
+            ScanStatistics.increment_vulnerabilities(vuln.scan_history_id, vuln.severity)
+        else:
+            vuln = Vulnerability.objects.get(fingerprint=fingerprint)
+
+    # Save vuln tags, CVEs, CWEs and references
+    vuln.tags.add(*intern_ids(VulnerabilityTags, tags or []).values())
+    vuln.cve_ids.add(*intern_ids(CveId, cve_ids or []).values())
+    vuln.cwe_ids.add(*intern_ids(CweId, cwe_ids or []).values())
+    vuln.references.add(*intern_ids(VulnerabilityReference, references or []).values())
 
     # Save subscan id in vuln object
     if subscan:
         vuln.vuln_subscan_ids.add(subscan)
-        vuln.save()
 
     return vuln, created
 
@@ -4576,8 +4859,9 @@ def save_endpoint(
     scheme = urlparse(http_url).scheme
     endpoint = None
     created = False
+    scan_cache = get_scan_cache(ctx)
     if ctx.get('domain_id'):
-        domain = Domain.objects.get(id=ctx.get('domain_id'))
+        domain = scan_cache.domain
         if domain.name not in http_url:
             logger.error(f"{http_url} is not a URL of domain {domain.name}. Skipping.")
             return None, False
@@ -4594,8 +4878,8 @@ def save_endpoint(
     elif not scheme:
         return None, False
     else: # add dumb endpoint without probing it
-        scan = ScanHistory.objects.filter(pk=ctx.get('scan_history_id')).first()
-        domain = Domain.objects.filter(pk=ctx.get('domain_id')).first()
+        scan = scan_cache.scan
+        domain = scan_cache.domain
         if not validators.url(http_url):
             return None, False
         http_url = sanitize_url(http_url)
@@ -4604,6 +4888,7 @@ def save_endpoint(
         endpoints = EndPoint.objects.filter(
             scan_history=scan,
             target_domain=domain,
+            http_url_hash=EndPoint.get_http_url_hash(http_url),
             http_url=http_url,
             **endpoint_data
         )
@@ -4620,6 +4905,7 @@ def save_endpoint(
                 **endpoint_data
             )
             created = True
+            ScanStatistics.increment(endpoint.scan_history_id, endpoint_count=1)
 
     if created:
         endpoint.is_default = is_default
@@ -4661,26 +4947,37 @@ def save_subdomain(subdomain_name, ctx={}):
         logger.error(f'{subdomain_name} is out-of-scope. Skipping.')
         return None, False
 
+    scan_cache = get_scan_cache(ctx)
     if ctx.get('domain_id'):
-        domain = Domain.objects.get(id=ctx.get('domain_id'))
+        domain = scan_cache.domain
         if domain.name not in subdomain_name:
             logger.error(f"{subdomain_name} is not a subdomain of domain {domain.name}. Skipping.")
             return None, False
 
-    scan = ScanHistory.objects.filter(pk=scan_id).first()
+    subdomain = scan_cache.get_subdomain(subdomain_name)
+    if subdomain:
+        return subdomain, False
+    scan = scan_cache.scan
     domain = scan.domain if scan else None
     subdomain, created = Subdomain.objects.get_or_create(
         scan_history=scan,
         target_domain=domain,
         name=subdomain_name)
+    scan_cache.add_subdomain(subdomain)
     if created:
         logger.info(f'Found new subdomain {subdomain_name}')
+        ScanStatistics.increment(subdomain.scan_history_id, subdomain_count=1)
         subdomain.discovered_date = timezone.now()
         if subscan_id:
             subdomain.subdomain_subscan_ids.add(subscan_id)
-        subdomain.save()
+        subdomain.save(update_fields=['discovered_date'])
     return subdomain, created
 
+# Subdomain columns copied from their alive endpoints
+SUBDOMAIN_METADATA_FIELDS = [
+    'http_url', 'http_status', 'response_time', 'page_title', 'content_type',
+    'content_length', 'webserver']
+
 def save_subdomain_metadata(subdomain, endpoint, extra_datas={}):
     if endpoint and endpoint.is_alive:
         logger.info(f'Saving HTTP metadatas from {endpoint.http_url}')
@@ -4691,16 +4988,251 @@ def save_subdomain_metadata(subdomain, endpoint, extra_datas={}):
         subdomain.content_type = endpoint.content_type
         subdomain.content_length = endpoint.content_length
         subdomain.webserver = endpoint.webserver
+        update_fields = SUBDOMAIN_METADATA_FIELDS.copy()
         cname = extra_datas.get('cname')
         if cname and is_iterable(cname):
             subdomain.cname = ','.join(cname)
+            update_fields.append('cname')
         cdn = extra_datas.get('cdn')
         if cdn and is_iterable(cdn):
             subdomain.is_cdn = ','.join(cdn)
             subdomain.cdn_name = extra_datas.get('cdn_name')
+            update_fields.extend(['is_cdn', 'cdn_name'])
         for tech in endpoint.techs.all():
             subdomain.technologies.add(tech)
-        subdomain.save()	
+        subdomain.save(update_fields=update_fields)
+
+
+def save_httpx_results(records, ctx={}, is_default=False, update_subdomain_metadatas=False):
+    """Save a chunk of parsed httpx results with a bounded number of queries.
+
+    This is the batched equivalent of calling `save_subdomain`, `save_endpoint`,
+    `save_ip_address` and `save_subdomain_metadata` for each record: rows are
+    looked up with one query per model, missing rows are created with
+    `bulk_create`, existing endpoints are updated with `bulk_update` and M2M
+    relations are inserted directly in their through tables.
+
+    Args:
+        records (list): Records returned by `parse_httpx_result`.
+        ctx (dict): Scan context.
+        is_default (bool): If the endpoints are default URLs for their subdomain.
+        update_subdomain_metadatas (bool): Copy alive endpoints metadatas to
+            their subdomain.
+
+    Returns:
+        list: (record, endpoint, created) tuples for each saved record.
+    """
+    scan_cache = get_scan_cache(ctx)
+    scan = scan_cache.scan
+    domain = scan_cache.domain
+    subscan_id = ctx.get('subscan_id')
+    out_of_scope_subdomains = ctx.get('out_of_scope_subdomains', [])
+    now = timezone.now()
+
+    # Validate records
+    valid_records = []
+    for record in records:
+        subdomain_name = (record['subdomain_name'] or '').lower()
+        http_url = record['http_url']
+        valid_domain = (
+            validators.domain(subdomain_name) or
+            validators.ipv4(subdomain_name) or
+            validators.ipv6(subdomain_name)
+        )
+        if not valid_domain:
+            logger.error(f'{subdomain_name} is not a valid domain. Skipping.')
+            continue
+        if subdomain_name in out_of_scope_subdomains:
+            logger.error(f'{subdomain_name} is out-of-scope. Skipping.')
+            continue
+        if domain and domain.name not in subdomain_name:
+            logger.error(f'{subdomain_name} is not a subdomain of domain {domain.name}. Skipping.')
+            continue
+        if domain and domain.name not in http_url:
+            logger.error(f'{http_url} is not a URL of domain {domain.name}. Skipping.')
+            continue
+        if not urlparse(http_url).scheme or not validators.url(http_url):
+            continue
+        record['subdomain_name'] = subdomain_name
+        record['http_url'] = replace_nulls(sanitize_url(http_url))
+        record['endpoint_data'] = replace_nulls(record['endpoint_data'])
+        record['ip_addresses'] = []
+        for ip_address in record['a_records'] + [record['host']]:
+            if not ip_address:
+                continue
+            if not (validators.ipv4(ip_address) or validators.ipv6(ip_address)):
+                logger.info(f'IP {ip_address} is not a valid IP. Skipping.')
+                continue
+            record['ip_addresses'].append(ip_address)
+        valid_records.append(record)
+
+    if not valid_records:
+        return []
+
+    # Get or create subdomains
+    subdomain_domain = scan.domain if scan else None
+    subdomain_names = {record['subdomain_name'] for record in valid_records}
+    subdomain_ids = scan_cache.get_subdomain_ids(subdomain_names)
+    new_subdomains = Subdomain.objects.bulk_create([
+        Subdomain(
+            scan_history=scan,
+            target_domain=subdomain_domain,
+            name=name,
+            discovered_date=now)
+        for name in sorted(subdomain_names - subdomain_ids.keys())
+    ])
+    for subdomain in new_subdomains:
+        logger.info(f'Found new subdomain {subdomain.name}')
+        subdomain_ids[subdomain.name] = subdomain.id
+        scan_cache.add_subdomain(subdomain)
+    ScanStatistics.increment(scan and scan.id, subdomain_count=len(new_subdomains))
+    if subscan_id and new_subdomains:
+        SubScan.subdomain_subscan_ids.through.objects.bulk_create([
+            SubScan.subdomain_subscan_ids.through(subscan_id=subscan_id, subdomain_id=subdomain.id)
+            for subdomain in new_subdomains
+        ], ignore_conflicts=True)
+
+    # Get or create endpoints
+    endpoint_fields = list(valid_records[0]['endpoint_data'].keys())
+    endpoints = {}
+    http_urls = {record['http_url'] for record in valid_records}
+    existing_endpoints = (
+        EndPoint.objects
+        .filter(
+            scan_history=scan,
+            target_domain=domain,
+            http_url_hash__in={EndPoint.get_http_url_hash(http_url) for http_url in http_urls})
+        .order_by('-id')
+    )
+    for endpoint in existing_endpoints:
+        if endpoint.http_url in http_urls:
+            endpoints[(endpoint.http_url, endpoint.subdomain_id)] = endpoint
+    saved = []
+    new_endpoints = []
+    updated_endpoints = {}
+    for record in valid_records:
+        subdomain_id = subdomain_ids[record['subdomain_name']]
+        key = (record['http_url'], subdomain_id)
+        endpoint = endpoints.get(key)
+        created = endpoint is None
+        if created:
+            endpoint = EndPoint(
+                scan_history=scan,
+                target_domain=domain,
+                subdomain_id=subdomain_id,
+                http_url=record['http_url'],
+                http_url_hash=EndPoint.get_http_url_hash(record['http_url']),
+                is_default=is_default,
+                discovered_date=now)
+            endpoints[key] = endpoint
+            new_endpoints.append(endpoint)
+        elif endpoint.pk:
+            updated_endpoints[endpoint.pk] = endpoint
+        for field, value in record['endpoint_data'].items():
+            setattr(endpoint, field, value)
+        saved.append((record, endpoint, created))
+    EndPoint.objects.bulk_create(new_endpoints)
+    EndPoint.objects.bulk_update(updated_endpoints.values(), endpoint_fields)
+    ScanStatistics.increment(scan and scan.id, endpoint_count=len(new_endpoints))
+    if subscan_id and new_endpoints:
+        EndPoint.endpoint_subscan_ids.through.objects.bulk_create([
+            EndPoint.endpoint_subscan_ids.through(endpoint_id=endpoint.id, subscan_id=subscan_id)
+            for endpoint in new_endpoints
+        ], ignore_conflicts=True)
+
+    # Get or create technologies and link them to endpoints
+    tech_names = {tech for record in valid_records for tech in record['techs']}
+    if tech_names:
+        techs = intern_ids(Technology, tech_names)
+        EndPoint.techs.through.objects.bulk_create([
+            EndPoint.techs.through(endpoint_id=endpoint_id, technology_id=technology_id)
+            for endpoint_id, technology_id in {
+                (endpoint.id, techs[name])
+                for record, endpoint, _ in saved
+                for name in record['techs']
+                if name in techs
+            }
+        ], ignore_conflicts=True)
+
+    # Get or create IP addresses and link them to subdomains
+    addresses = {address for record in valid_records for address in record['ip_addresses']}
+    if addresses:
+        ips = {}
+        for ip in IpAddress.objects.filter(address__in=addresses).order_by('-id'):
+            ips[ip.address] = ip.id
+        new_ips = IpAddress.objects.bulk_create([
+            IpAddress(address=address)
+            for address in sorted(addresses - ips.keys())
+        ])
+        for ip in new_ips:
+            logger.warning(f'Found new IP {ip.address}')
+            ips[ip.address] = ip.id
+        Subdomain.ip_addresses.through.objects.bulk_create([
+            Subdomain.ip_addresses.through(subdomain_id=subdomain_id, ipaddress_id=ipaddress_id)
+            for subdomain_id, ipaddress_id in {
+                (subdomain_ids[record['subdomain_name']], ips[address])
+                for record in valid_records
+                for address in record['ip_addresses']
+            }
+        ], ignore_conflicts=True)
+        if subscan_id:
+            IpAddress.ip_subscan_ids.through.objects.bulk_create([
+                IpAddress.ip_subscan_ids.through(ipaddress_id=ipaddress_id, subscan_id=subscan_id)
+                for ipaddress_id in ips.values()
+            ], ignore_conflicts=True)
+
+        # Geo-localize new IPs
+        geo_localize_ips(new_ips)
+
+    # Save subdomain metadatas from alive endpoints
+    if update_subdomain_metadatas:
+        # Subdomains are not read: their rows only get the columns found by
+        # the crawl, grouped by the set of columns updated.
+        alive_subdomains = {}
+        endpoint_subdomains = {}
+        for record, endpoint, _ in saved:
+            if not endpoint.is_alive:
+                continue
+            subdomain_id = subdomain_ids[record['subdomain_name']]
+            subdomain = Subdomain(id=subdomain_id)
+            update_fields = SUBDOMAIN_METADATA_FIELDS.copy()
+            subdomain.http_url = endpoint.http_url
+            subdomain.http_status = endpoint.http_status
+            subdomain.response_time = endpoint.response_time
+            subdomain.page_title = endpoint.page_title
+            subdomain.content_type = endpoint.content_type
+            subdomain.content_length = endpoint.content_length
+            subdomain.webserver = endpoint.webserver
+            cname = record['line'].get('cname')
+            if cname and is_iterable(cname):
+                subdomain.cname = ','.join(cname)
+                update_fields.append('cname')
+            cdn = record['line'].get('cdn')
+            if cdn and is_iterable(cdn):
+                subdomain.is_cdn = ','.join(cdn)
+                subdomain.cdn_name = record['line'].get('cdn_name')
+                update_fields.extend(['is_cdn', 'cdn_name'])
+            alive_subdomains[subdomain_id] = (subdomain, tuple(update_fields))
+            endpoint_subdomains[endpoint.id] = subdomain_id
+        if alive_subdomains:
+            subdomains_by_fields = {}
+            for subdomain, update_fields in alive_subdomains.values():
+                subdomains_by_fields.setdefault(update_fields, []).append(subdomain)
+            for update_fields, subdomains in subdomains_by_fields.items():
+                Subdomain.objects.bulk_update(subdomains, list(update_fields))
+            endpoint_techs = (
+                EndPoint.techs.through.objects
+                .filter(endpoint_id__in=endpoint_subdomains.keys())
+                .values_list('endpoint_id', 'technology_id')
+            )
+            Subdomain.technologies.through.objects.bulk_create([
+                Subdomain.technologies.through(
+                    subdomain_id=endpoint_subdomains[endpoint_id],
+                    technology_id=technology_id)
+                for endpoint_id, technology_id in endpoint_techs
+            ], ignore_conflicts=True)
+
+    return saved
 
 def save_email(email_address, scan_history=None):
     if not validators.email(email_address):
@@ -4749,16 +5281,11 @@ def save_ip_address(ip_address, subdomain=None, subscan=None, **kwargs):
     # Add IP to subdomain
     if subdomain:
         subdomain.ip_addresses.add(ip)
-        subdomain.save()
 
     # Add subscan to IP
     if subscan:
         ip.ip_subscan_ids.add(subscan)
 
-    # Geo-localize IP asynchronously
-    if created:
-        geo_localize.delay(ip_address, ip.id)
-
     return ip, created
 
 
@@ -4795,7 +5322,7 @@ def save_imported_subdomains(subdomains, ctx={}):
                 logger.error(f"Invalid subdomain encountered: {subdomain}")
                 continue
             subdomain.is_imported_subdomain = True
-            subdomain.save()
+            subdomain.save(update_fields=['is_imported_subdomain'])
             output_file.write(f'{subdomain}\n')
 
             # Create base endpoint (for scan)
@@ -5004,6 +5531,89 @@ def run_gf_list():
             'message': str(e)
         }
 
+
+# Tasks run as toolbox jobs, by tool name
+TOOL_JOB_TASKS = {
+    'whois': query_whois,
+    'reverse_whois': query_reverse_whois,
+    'domain_ip_history': query_ip_history,
+    'cms_detector': run_cmseek,
+}
+
+
+@app.task(name='run_tool_job', bind=False, queue='run_command_queue')
+def run_tool_job(job_id):
+    """Run the task of a ToolJob and store its result.
+
+    Jobs timed out while waiting in their queue are not run, and results of
+    jobs timed out while running are dropped, so that they do not replace
+    the job queued since for the same lookup.
+
+    Args:
+        job_id (int): ToolJob id.
+    """
+    job = ToolJob.objects.filter(pk=job_id).first()
+    if not job:
+        return
+    if not ToolJob.objects.filter(pk=job_id, status=INITIATED_TASK).update(status=RUNNING_TASK):
+        logger.warning(f'Tool job {job_id} is not queued anymore, skipping')
+        return
+    jobs = ToolJob.objects.filter(pk=job_id, status=RUNNING_TASK)
+    try:
+        result = TOOL_JOB_TASKS[job.tool](**job.params)
+    except Exception as e:
+        logger.exception(f'Tool job {job_id} failed')
+        jobs.update(status=FAILED_TASK, error_message=str(e)[:300], completed_at=timezone.now())
+        return
+    jobs.update(status=SUCCESS_TASK, result=result, completed_at=timezone.now())
+
+
+def expire_tool_jobs(jobs):
+    """Mark the jobs running for more than TOOL_JOB_TIMEOUT seconds failed.
+
+    Args:
+        jobs (QuerySet): ToolJob queryset.
+    """
+    jobs.filter(
+        status__in=[INITIATED_TASK, RUNNING_TASK],
+        created_at__lt=timezone.now() - timedelta(seconds=TOOL_JOB_TIMEOUT)
+    ).update(
+        status=FAILED_TASK,
+        error_message='Timed out',
+        completed_at=timezone.now())
+
+
+def queue_tool_job(tool, params):
+    """Get the job running a toolbox task with the given params, and queue a
+    new one if there is none. Jobs running for more than TOOL_JOB_TIMEOUT
+    seconds are marked failed and not shared anymore.
+
+    Args:
+        tool (str): Tool name, one of TOOL_JOB_TASKS.
+        params (dict): Keyword arguments of the tool task.
+
+    Returns:
+        dashboard.models.ToolJob: Job.
+    """
+    params_hash = hashlib.sha256(json.dumps([tool, params], sort_keys=True).encode()).hexdigest()
+    active_jobs = ToolJob.objects.filter(tool=tool, params_hash=params_hash, status__in=[INITIATED_TASK, RUNNING_TASK])
+    expire_tool_jobs(active_jobs)
+    job = active_jobs.first()
+    if job:
+        return job
+    try:
+        with transaction.atomic():
+            job = ToolJob.objects.create(tool=tool, params=params, params_hash=params_hash)
+    except IntegrityError:
+        # Queued concurrently
+        return active_jobs.first()
+    task = TOOL_JOB_TASKS[tool]
+    celery_id = run_tool_job.apply_async(args=(job.id,), queue=task.queue).id
+    ToolJob.objects.filter(pk=job.id).update(celery_id=celery_id)
+    job.celery_id = celery_id
+    return job
+
+
 #----------------------#
 #     Remote debug     #
 #----------------------#
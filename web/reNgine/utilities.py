@@ -1,4 +1,5 @@
 import os
+from collections import OrderedDict
 
 from celery._state import get_current_task
 from celery.utils.log import ColorFormatter
@@ -45,6 +46,46 @@ def return_iterable(string):
 	return string
 
 
+# Split an iterable into lists of at most `size` items
+def chunked(iterable, size):
+	chunk = []
+	for item in iterable:
+		chunk.append(item)
+		if len(chunk) >= size:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+
+# In-process least recently used cache with at most `maxsize` entries
+class LRUCache:
+	def __init__(self, maxsize):
+		self.maxsize = maxsize
+		self.data = OrderedDict()
+
+	def __contains__(self, key):
+		return key in self.data
+
+	def __len__(self):
+		return len(self.data)
+
+	def get(self, key, default=None):
+		if key not in self.data:
+			return default
+		self.data.move_to_end(key)
+		return self.data[key]
+
+	def set(self, key, value):
+		self.data[key] = value
+		self.data.move_to_end(key)
+		while len(self.data) > self.maxsize:
+			self.data.popitem(last=False)
+
+	def clear(self):
+		self.data.clear()
+
+
 # Logging formatters
 
 class RengineTaskFormatter(ColorFormatter):
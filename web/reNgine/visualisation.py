@@ -0,0 +1,275 @@
+import gzip
+import hashlib
+import json
+from collections import defaultdict
+
+from reNgine.common_func import get_interesting_subdomains, get_lookup_keywords, get_scan_data_version, is_scan_running
+from scanEngine.models import InterestingLookupModel
+from startScan.models import (Dork, Email, Employee, IpAddress,
+							  MetaFinderDocument, Port, ScanVisualisation,
+							  Subdomain, Technology, Vulnerability)
+
+# Vulnerability nodes, from the most severe
+SEVERITY_NAMES = {
+	4: 'Critical',
+	3: 'High',
+	2: 'Medium',
+	1: 'Low',
+	0: 'Informational',
+	-1: 'Unknown',
+}
+
+
+def get_visualisation_data_version(scan):
+	"""Get a stamp of the data the visualisation graph of a scan is built from,
+	see `reNgine.common_func.get_scan_data_version`. The stamp also changes
+	when the interesting lookups change.
+
+	Args:
+		scan (startScan.models.ScanHistory): Scan.
+
+	Returns:
+		str: Data version.
+	"""
+	return get_scan_data_version(
+		scan,
+		lookups=list(InterestingLookupModel.objects.order_by('id').values()),
+		lookup_keywords=get_lookup_keywords())
+
+
+def get_scan_visualisation(scan):
+	"""Get the visualisation graph of a scan.
+
+	The stored graph is returned if the scan results did not change since it
+	was built. Otherwise the graph is built again, and stored unless the scan
+	or one of its subscans is still running.
+
+	Args:
+		scan (startScan.models.ScanHistory): Scan.
+
+	Returns:
+		startScan.models.ScanVisualisation: Graph, unsaved if the scan is running.
+	"""
+	data_version = get_visualisation_data_version(scan)
+	visualisation = ScanVisualisation.objects.filter(scan_history=scan, data_version=data_version).first()
+	if visualisation:
+		return visualisation
+	if is_scan_running(scan):
+		return make_visualisation(scan, data_version)
+	return save_scan_visualisation(scan, data_version)
+
+
+def save_scan_visualisation(scan, data_version=None):
+	"""Build the visualisation graph of a scan and store it.
+
+	Args:
+		scan (startScan.models.ScanHistory): Scan.
+		data_version (str, optional): Data version, computed if not given.
+
+	Returns:
+		startScan.models.ScanVisualisation: Graph.
+	"""
+	visualisation = make_visualisation(scan, data_version or get_visualisation_data_version(scan))
+	visualisation, _ = ScanVisualisation.objects.update_or_create(
+		scan_history=scan,
+		defaults={
+			'data_version': visualisation.data_version,
+			'etag': visualisation.etag,
+			'data': visualisation.data,
+		})
+	return visualisation
+
+
+def make_visualisation(scan, data_version):
+	"""Build the visualisation graph of a scan, without storing it."""
+	content = json.dumps(build_visualisation(scan), separators=(',', ':')).encode()
+	return ScanVisualisation(
+		scan_history=scan,
+		data_version=data_version,
+		etag=hashlib.sha256(content).hexdigest(),
+		data=gzip.compress(content, mtime=0))
+
+
+def load_visualisation(visualisation):
+	"""Get the graph of a ScanVisualisation as a dict."""
+	return json.loads(gzip.decompress(bytes(visualisation.data)))
+
+
+def build_visualisation(scan):
+	"""Build the visualisation graph of a scan: the scan target, its subdomains
+	with their IPs, ports, technologies and vulnerabilities, and the OSINT
+	results.
+
+	Results are fetched with one query per kind of node, whatever the number of
+	subdomains, and joined by id.
+
+	Args:
+		scan (startScan.models.ScanHistory): Scan.
+
+	Returns:
+		dict: Graph, JSON serializable.
+	"""
+	children = []
+	subdomains = build_subdomain_nodes(scan)
+	if subdomains:
+		children.append({
+			'description': 'Subdomains',
+			'children': subdomains})
+	osint = build_osint_nodes(scan)
+	if osint:
+		children.append({
+			'description': 'OSINT',
+			'children': osint})
+	return {
+		'description': scan.domain.name,
+		'title': 'Target',
+		'children': children,
+	}
+
+
+def build_subdomain_nodes(scan):
+	"""Build the nodes of the subdomains of a scan."""
+	ports_by_ip = defaultdict(list)
+	ports = (
+		Port.objects
+		.filter(ports__ip_addresses__scan_history=scan)
+		.values('ports', 'number', 'service_name', 'is_uncommon')
+		.distinct()
+		.order_by('ports', 'number', 'service_name'))
+	for port in ports:
+		ports_by_ip[port['ports']].append({
+			'description': f"{port['number']}/{port['service_name']}",
+			'is_uncommon': port['is_uncommon'],
+			'title': 'Uncommon Port' if port['is_uncommon'] else None,
+		})
+
+	ips_by_subdomain = defaultdict(list)
+	ips = (
+		IpAddress.objects
+		.filter(ip_addresses__scan_history=scan)
+		.values('ip_addresses', 'id', 'address')
+		.order_by('ip_addresses', 'id'))
+	for ip in ips:
+		ips_by_subdomain[ip['ip_addresses']].append({
+			'description': ip['address'],
+			'children': ports_by_ip[ip['id']],
+		})
+
+	techs_by_subdomain = defaultdict(list)
+	techs = (
+		Technology.objects
+		.filter(technologies__scan_history=scan)
+		.values('technologies', 'name')
+		.order_by('technologies', 'id'))
+	for tech in techs:
+		techs_by_subdomain[tech['technologies']].append({'description': tech['name']})
+
+	# Vulnerabilities found again on other URLs are shown once
+	vulns_by_subdomain = defaultdict(lambda: defaultdict(dict))
+	vulns = (
+		Vulnerability.objects
+		.filter(scan_history=scan, subdomain__isnull=False)
+		.values('subdomain_id', 'name', 'severity', 'http_url')
+		.order_by('id'))
+	for vuln in vulns:
+		severity_vulns = vulns_by_subdomain[vuln['subdomain_id']][vuln['severity']]
+		severity_vulns.setdefault(vuln['name'], {
+			'description': vuln['name'],
+			'http_url': vuln['http_url'],
+		})
+
+	interesting_names = set(get_interesting_subdomains(scan.id).values_list('name', flat=True))
+	nodes = []
+	subdomains = (
+		Subdomain.objects
+		.filter(scan_history=scan)
+		.values('id', 'name', 'http_status', 'screenshot_path')
+		.order_by('id'))
+	for subdomain in subdomains:
+		children = []
+		if ips_by_subdomain[subdomain['id']]:
+			children.append({
+				'description': 'IPs',
+				'children': ips_by_subdomain[subdomain['id']]})
+		if techs_by_subdomain[subdomain['id']]:
+			children.append({
+				'description': 'Technologies',
+				'children': techs_by_subdomain[subdomain['id']]})
+		if subdomain['screenshot_path']:
+			children.append({
+				'description': 'Screenshot',
+				'screenshot_path': subdomain['screenshot_path']})
+		severity_vulns = vulns_by_subdomain[subdomain['id']]
+		vuln_nodes = [
+			{'description': name, 'children': list(severity_vulns[severity].values())}
+			for severity, name in SEVERITY_NAMES.items()
+			if severity_vulns[severity]
+		]
+		if vuln_nodes:
+			children.append({
+				'description': 'Vulnerabilities',
+				'children': vuln_nodes})
+		nodes.append({
+			'description': subdomain['name'],
+			'children': children,
+			'http_status': subdomain['http_status'],
+			'title': 'Interesting' if subdomain['name'] in interesting_names else None,
+		})
+	return nodes
+
+
+def build_osint_nodes(scan):
+	"""Build the nodes of the OSINT results of a scan."""
+	nodes = []
+	emails = [
+		{
+			'description': f"{email['address']} > {email['password']}" if email['password'] else email['address'],
+			'password': email['password'],
+			'title': 'Exposed Creds' if email['password'] else None,
+		}
+		for email in Email.objects.filter(emails=scan).values('address', 'password').order_by('id')
+	]
+	if emails:
+		nodes.append({
+			'description': 'Emails',
+			'children': emails})
+
+	employees = [
+		{'description': f"{employee['name']}--{employee['designation']}" if employee['designation'] else employee['name']}
+		for employee in Employee.objects.filter(employees=scan).values('name', 'designation').order_by('id')
+	]
+	if employees:
+		nodes.append({
+			'description': 'Employees',
+			'children': employees})
+
+	# Dorks are shown once per type
+	dorks = {}
+	for dork in Dork.objects.filter(dorks=scan).values('type', 'url').order_by('id'):
+		dorks.setdefault(dork['type'], {
+			'title': dork['type'],
+			'description': dork['type'],
+			'http_url': dork['url'],
+		})
+	if dorks:
+		nodes.append({
+			'description': 'Dorks',
+			'children': list(dorks.values())})
+
+	documents = list(
+		MetaFinderDocument.objects
+		.filter(scan_history=scan)
+		.values('author', 'producer', 'os')
+		.order_by('id'))
+	if documents:
+		metainfo = []
+		for name, field in [('Usernames', 'author'), ('Software', 'producer'), ('OS', 'os')]:
+			values = dict.fromkeys(document[field] for document in documents if document[field] is not None)
+			if values:
+				metainfo.append({
+					'description': name,
+					'children': [{'description': value, 'children': []} for value in values]})
+		nodes.append({
+			'description': 'Metainfo',
+			'children': metainfo})
+	return nodes
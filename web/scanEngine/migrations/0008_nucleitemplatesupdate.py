@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanEngine', '0007_lark_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NucleiTemplatesUpdate',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('checksum', models.CharField(blank=True, max_length=64, null=True)),
+                ('checked_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -139,3 +139,13 @@ class InstalledExternalTool(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class NucleiTemplatesUpdate(models.Model):
+    id = models.AutoField(primary_key=True)
+    checksum = models.CharField(max_length=64, null=True, blank=True)
+    checked_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.checksum} ({self.updated_at})'
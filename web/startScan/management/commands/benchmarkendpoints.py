@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from scanEngine.models import EngineType
+from startScan.models import EndPoint, ScanHistory
+from targetApp.models import Domain
+
+BENCHMARK_DOMAIN = 'benchmark.example.com'
+
+INSERT_ENDPOINTS = '''
+INSERT INTO "startScan_endpoint" (
+    scan_history_id, target_domain_id, http_url, http_url_hash,
+    http_status, content_length, is_default, discovered_date)
+SELECT
+    scan_ids[1 + i %% cardinality(scan_ids)], %s, url,
+    ('x' || left(encode(sha256(convert_to(url, 'UTF8')), 'hex'), 16))::bit(64)::bigint,
+    200, 0, false, now()
+FROM (
+    SELECT i, %s::int[] AS scan_ids, 'https://' || %s || '/' || md5(i::text) || '/page' || i AS url
+    FROM generate_series(1, %s) AS i
+) AS endpoints
+'''
+
+
+class Command(BaseCommand):
+    help = 'Compares the query plans of endpoint URL lookups, by URL and by URL hash, on a synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoints', type=int, default=2000000, help='Number of synthetic endpoints')
+        parser.add_argument('--scans', type=int, default=4, help='Number of scans the endpoints are spread over')
+
+    def handle(self, *args, **options):
+        # Nothing is kept, the dataset is rolled back
+        with transaction.atomic():
+            self.benchmark(options['endpoints'], options['scans'])
+            transaction.set_rollback(True)
+
+    def benchmark(self, endpoint_count, scan_count):
+        domain = Domain.objects.create(name=BENCHMARK_DOMAIN, insert_date=timezone.now())
+        engine = EngineType.objects.first() or EngineType.objects.create(engine_name='Benchmark')
+        scans = [
+            ScanHistory.objects.create(domain=domain, scan_type=engine, start_scan_date=timezone.now(), scan_status=2)
+            for _ in range(scan_count)
+        ]
+        start = time.monotonic()
+        with connection.cursor() as cursor:
+            cursor.execute(INSERT_ENDPOINTS, [domain.id, [scan.id for scan in scans], BENCHMARK_DOMAIN, endpoint_count])
+            cursor.execute('ANALYZE "startScan_endpoint"')
+        self.stdout.write(f'Created {endpoint_count} endpoints in {time.monotonic() - start:.1f}s')
+
+        http_url = EndPoint.objects.filter(scan_history=scans[-1]).order_by('-id').values_list('http_url', flat=True)[0]
+        lookups = {
+            'By URL': EndPoint.objects.filter(scan_history=scans[-1], target_domain=domain, http_url=http_url),
+            'By URL hash': EndPoint.objects.filter(
+                scan_history=scans[-1],
+                target_domain=domain,
+                http_url_hash=EndPoint.get_http_url_hash(http_url),
+                http_url=http_url),
+        }
+        for name, queryset in lookups.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain(analyze=True))
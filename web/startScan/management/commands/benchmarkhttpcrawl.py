@@ -0,0 +1,79 @@
+import json
+import os
+import pathlib
+import stat
+import tempfile
+import time
+from unittest.mock import patch
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from reNgine.tasks import http_crawl
+from scanEngine.models import EngineType, Notification
+from startScan.models import ScanHistory
+from targetApp.models import Domain
+
+BENCHMARK_DOMAIN = 'benchmark.example.com'
+
+FAKE_HTTPX = '''#!/bin/sh
+cat {results_path}
+'''
+
+
+class Command(BaseCommand):
+    help = 'Counts the notification messages enqueued by an HTTP crawl, on synthetic httpx results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=10000, help='Number of synthetic httpx result lines')
+
+    def handle(self, *args, **options):
+        # Nothing is kept, the crawl results are rolled back
+        with tempfile.TemporaryDirectory() as tmp_dir, transaction.atomic():
+            self.benchmark(options['lines'], pathlib.Path(tmp_dir))
+            transaction.set_rollback(True)
+
+    def benchmark(self, line_count, tmp_dir):
+        results_path = tmp_dir / 'httpx.jsonl'
+        with open(results_path, 'w') as f:
+            for i in range(line_count):
+                f.write(json.dumps({
+                    'url': f'https://sub{i % 100}.{BENCHMARK_DOMAIN}/page{i}',
+                    'host': f'10.0.0.{i % 100}',
+                    'a': [f'10.0.0.{i % 100}'],
+                    'status_code': 200,
+                    'title': f'Page {i}',
+                    'content_length': i,
+                    'webserver': 'nginx',
+                    'time': '10ms',
+                    'tech': ['Nginx'],
+                }) + '\n')
+        httpx_path = tmp_dir / 'httpx'
+        httpx_path.write_text(FAKE_HTTPX.format(results_path=results_path))
+        httpx_path.chmod(httpx_path.stat().st_mode | stat.S_IEXEC)
+
+        domain = Domain.objects.create(name=BENCHMARK_DOMAIN, insert_date=timezone.now())
+        engine = EngineType.objects.first() or EngineType.objects.create(engine_name='Benchmark')
+        scan = ScanHistory.objects.create(domain=domain, scan_type=engine, start_scan_date=timezone.now(), scan_status=1)
+        Notification.objects.all().delete()
+        Notification.objects.create(send_scan_status_notif=True)
+        ctx = {
+            'scan_history_id': scan.id,
+            'domain_id': domain.id,
+            'results_dir': str(tmp_dir),
+            'yaml_configuration': {},
+        }
+
+        # Messages are counted instead of being enqueued
+        start = time.monotonic()
+        with patch('reNgine.tasks.send_task_notif') as mock_send_task_notif, \
+                patch('reNgine.tasks.get_countries', return_value={}), \
+                patch.dict(os.environ, {'PATH': f'{tmp_dir}:{os.environ["PATH"]}'}):
+            http_crawl.apply(kwargs={
+                'urls': [f'https://{BENCHMARK_DOMAIN}'],
+                'ctx': ctx,
+                'should_remove_duplicate_endpoints': False})
+        elapsed = time.monotonic() - start
+        self.stdout.write(
+            f'Crawled {line_count} lines in {elapsed:.1f}s, '
+            f'{mock_send_task_notif.delay.call_count} notification messages enqueued')
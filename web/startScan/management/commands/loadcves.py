@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from reNgine.common_func import load_cve_feed
+
+
+class Command(BaseCommand):
+    help = 'Loads CVE details from offline NVD / CVESearch JSON feeds into the local CVE store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('feeds', nargs='+', help='Feed files (.json, .jsonl or gzipped)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of CVEs saved per query')
+
+    def handle(self, *args, **options):
+        for feed in options['feeds']:
+            count = load_cve_feed(feed, batch_size=options['batch_size'])
+            self.stdout.write(f'Loaded {count} CVEs from {feed}')
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0057_auto_20231201_2354'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommandOutputChunk',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('seq', models.IntegerField(default=0)),
+                ('data', models.TextField(blank=True, default='')),
+                ('command', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='output_chunks', to='startScan.command')),
+            ],
+            options={
+                'ordering': ['seq'],
+            },
+        ),
+    ]
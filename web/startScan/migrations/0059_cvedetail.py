@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0058_commandoutputchunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CveDetail',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('cve_id', models.CharField(max_length=50, unique=True)),
+                ('data', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:26
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fingerprint(vuln):
+    key = '|'.join(
+        str(value or '') for value in (
+            vuln.scan_history_id,
+            vuln.template_id or vuln.name,
+            vuln.http_url,
+            vuln.matcher_name))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def set_fingerprints(apps, schema_editor):
+    # Duplicates of a vulnerability keep a null fingerprint
+    Vulnerability = apps.get_model('startScan', 'Vulnerability')
+    seen = set()
+    batch = []
+    vulns = (
+        Vulnerability.objects
+        .only('id', 'scan_history_id', 'template_id', 'name', 'http_url', 'matcher_name')
+        .order_by('id')
+    )
+    for vuln in vulns.iterator(chunk_size=2000):
+        vuln.fingerprint = fingerprint(vuln)
+        if vuln.fingerprint in seen:
+            continue
+        seen.add(vuln.fingerprint)
+        batch.append(vuln)
+        if len(batch) >= 2000:
+            Vulnerability.objects.bulk_update(batch, ['fingerprint'])
+            batch = []
+    Vulnerability.objects.bulk_update(batch, ['fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0059_cvedetail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vulnerability',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(set_fingerprints, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vulnerability',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+# Same hash as EndPoint.get_http_url_hash
+SET_HTTP_URL_HASHES = '''
+UPDATE "startScan_endpoint"
+SET http_url_hash = ('x' || left(encode(sha256(convert_to(http_url, 'UTF8')), 'hex'), 16))::bit(64)::bigint
+'''
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0060_vulnerability_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='endpoint',
+            name='http_url_hash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunSQL(SET_HTTP_URL_HASHES, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='endpoint',
+            index=models.Index(fields=['scan_history', 'http_url_hash'], name='startScan_e_scan_hi_4b9432_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='endpoint',
+            index=models.Index(fields=['target_domain', 'http_url_hash'], name='startScan_e_target__80e6c5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scanactivity',
+            index=models.Index(fields=['scan_of', 'status'], name='startScan_s_scan_of_3c4d7a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subdomain',
+            index=models.Index(fields=['scan_history', 'name'], name='startScan_s_scan_hi_c39f9c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vulnerability',
+            index=models.Index(fields=['scan_history', 'severity'], name='startScan_v_scan_hi_e1a3c9_idx'),
+        ),
+    ]
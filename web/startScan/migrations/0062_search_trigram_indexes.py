@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:02
+
+import logging
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+# Columns searched by UniversalSearch. icontains lookups compare
+# UPPER(column::text), so the indexes are on the same expression.
+SEARCHED_COLUMNS = {
+    'startScan_subdomain': ['name', 'cname', 'page_title', 'http_url'],
+    'startScan_endpoint': ['http_url', 'page_title'],
+    'startScan_vulnerability': ['name', 'http_url', 'description'],
+}
+
+
+def index_name(table, column):
+    return f'{table.lower()}_{column}_trgm'
+
+
+def create_indexes(apps, schema_editor):
+    # Search still works without the indexes, only slower
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if not cursor.fetchone():
+            logger.warning('pg_trgm extension is not available, search indexes are not created')
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, columns in SEARCHED_COLUMNS.items():
+        for column in columns:
+            schema_editor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{index_name(table, column)}" '
+                f'ON "{table}" USING gin (UPPER("{column}"::text) gin_trgm_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    for table, columns in SEARCHED_COLUMNS.items():
+        for column in columns:
+            schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name(table, column)}"')
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built without locking the tables for writes
+    atomic = False
+
+    dependencies = [
+        ('startScan', '0061_endpoint_http_url_hash_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
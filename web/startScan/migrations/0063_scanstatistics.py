@@ -0,0 +1,81 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:10
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+import django.db.models.deletion
+
+SEVERITY_FIELDS = {
+    -1: 'unknown_vulnerability_count',
+    0: 'info_vulnerability_count',
+    1: 'low_vulnerability_count',
+    2: 'medium_vulnerability_count',
+    3: 'high_vulnerability_count',
+    4: 'critical_vulnerability_count',
+}
+
+
+def count_by_scan(queryset, field, **counts):
+    return {
+        row[field]: row
+        for row in queryset.values(field).order_by().annotate(**counts)
+    }
+
+
+def create_statistics(apps, schema_editor):
+    ScanHistory = apps.get_model('startScan', 'ScanHistory')
+    ScanStatistics = apps.get_model('startScan', 'ScanStatistics')
+    Subdomain = apps.get_model('startScan', 'Subdomain')
+    EndPoint = apps.get_model('startScan', 'EndPoint')
+    Vulnerability = apps.get_model('startScan', 'Vulnerability')
+    ScanActivity = apps.get_model('startScan', 'ScanActivity')
+
+    subdomains = count_by_scan(Subdomain.objects.all(), 'scan_history', subdomain_count=Count('id'))
+    endpoints = count_by_scan(EndPoint.objects.all(), 'scan_history', endpoint_count=Count('id'))
+    activities = count_by_scan(ScanActivity.objects.all(), 'scan_of', activity_count=Count('id'))
+    vulns = count_by_scan(
+        Vulnerability.objects.all(),
+        'scan_history',
+        vulnerability_count=Count('id'),
+        **{
+            field: Count('id', filter=Q(severity=severity))
+            for severity, field in SEVERITY_FIELDS.items()
+        })
+    now = timezone.now()
+    statistics = []
+    for scan_id in ScanHistory.objects.values_list('id', flat=True).iterator():
+        counts = {}
+        for rows in (subdomains, endpoints, activities, vulns):
+            counts.update(rows.get(scan_id, {}))
+        counts.pop('scan_history', None)
+        counts.pop('scan_of', None)
+        statistics.append(ScanStatistics(scan_history_id=scan_id, reconciled_at=now, **counts))
+    ScanStatistics.objects.bulk_create(statistics, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0062_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanStatistics',
+            fields=[
+                ('scan_history', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics', serialize=False, to='startScan.scanhistory')),
+                ('subdomain_count', models.IntegerField(default=0)),
+                ('endpoint_count', models.IntegerField(default=0)),
+                ('vulnerability_count', models.IntegerField(default=0)),
+                ('unknown_vulnerability_count', models.IntegerField(default=0)),
+                ('info_vulnerability_count', models.IntegerField(default=0)),
+                ('low_vulnerability_count', models.IntegerField(default=0)),
+                ('medium_vulnerability_count', models.IntegerField(default=0)),
+                ('high_vulnerability_count', models.IntegerField(default=0)),
+                ('critical_vulnerability_count', models.IntegerField(default=0)),
+                ('activity_count', models.IntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(create_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0063_scanstatistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanReport',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('report_type', models.CharField(max_length=20)),
+                ('ignore_info_vuln', models.BooleanField(default=False)),
+                ('data_version', models.CharField(max_length=64)),
+                ('status', models.IntegerField(choices=[(-1, -1), (0, 0), (1, 1), (2, 2), (3, 3)], default=-1)),
+                ('progress', models.IntegerField(default=0)),
+                ('celery_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('file_path', models.CharField(blank=True, max_length=1000, null=True)),
+                ('error_message', models.CharField(blank=True, max_length=300, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('scan_history', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reports', to='startScan.scanhistory')),
+            ],
+            options={
+                'unique_together': {('scan_history', 'report_type', 'ignore_info_vuln', 'data_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0064_scanreport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanVisualisation',
+            fields=[
+                ('scan_history', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='visualisation', serialize=False, to='startScan.scanhistory')),
+                ('data_version', models.CharField(max_length=64)),
+                ('etag', models.CharField(max_length=64)),
+                ('data', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0065_scanvisualisation'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='vulnerability',
+            name='startScan_v_scan_hi_e1a3c9_idx',
+        ),
+        migrations.AddIndex(
+            model_name='endpoint',
+            index=models.Index(fields=['scan_history', 'id'], name='startScan_e_scan_hi_ea0240_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subdomain',
+            index=models.Index(fields=['scan_history', 'content_length', 'id'], name='startScan_s_scan_hi_223105_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vulnerability',
+            index=models.Index(fields=['scan_history', 'severity', 'id'], name='startScan_v_scan_hi_9e27c6_idx'),
+        ),
+    ]
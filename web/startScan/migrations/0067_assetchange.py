@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0066_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetChange',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('asset_type', models.CharField(max_length=20)),
+                ('change', models.CharField(choices=[('added', 'Added'), ('removed', 'Removed'), ('unchanged', 'Unchanged')], max_length=10)),
+                ('name_hash', models.CharField(max_length=64)),
+                ('endpoint', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='asset_changes', to='startScan.endpoint')),
+                ('previous_scan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='startScan.scanhistory')),
+                ('scan_history', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='asset_changes', to='startScan.scanhistory')),
+                ('subdomain', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='asset_changes', to='startScan.subdomain')),
+            ],
+            options={
+                'unique_together': {('scan_history', 'asset_type', 'name_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0067_assetchange'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='assetchange',
+            name='previous_scan',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='startScan.scanhistory'),
+        ),
+    ]
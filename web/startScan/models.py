@@ -1,8 +1,9 @@
+import hashlib
 from urllib.parse import urlparse
 from django.apps import apps
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 from reNgine.definitions import (CELERY_TASK_STATUSES,
 								 NUCLEI_REVERSE_SEVERITY_MAP)
@@ -53,8 +54,15 @@ class ScanHistory(models.Model):
 	def __str__(self):
 		return self.domain.name
 
+	def get_statistics(self):
+		try:
+			return self.statistics
+		except ScanStatistics.DoesNotExist:
+			self.statistics = ScanStatistics.reconcile(self.id)
+			return self.statistics
+
 	def get_subdomain_count(self):
-		return Subdomain.objects.filter(scan_history__id=self.id).count()
+		return self.get_statistics().subdomain_count
 
 	def get_subdomain_change_count(self):
 		last_scan = (
@@ -80,66 +88,28 @@ class ScanHistory(models.Model):
 
 
 	def get_endpoint_count(self):
-		return (
-			EndPoint.objects
-			.filter(scan_history__id=self.id)
-			.count()
-		)
+		return self.get_statistics().endpoint_count
 
 	def get_vulnerability_count(self):
-		return (
-			Vulnerability.objects
-			.filter(scan_history__id=self.id)
-			.count()
-		)
+		return self.get_statistics().vulnerability_count
 
 	def get_unknown_vulnerability_count(self):
-		return (
-			Vulnerability.objects
-			.filter(scan_history__id=self.id)
-			.filter(severity=-1)
-			.count()
-		)
+		return self.get_statistics().unknown_vulnerability_count
 
 	def get_info_vulnerability_count(self):
-		return (
-			Vulnerability.objects
-			.filter(scan_history__id=self.id)
-			.filter(severity=0)
-			.count()
-		)
+		return self.get_statistics().info_vulnerability_count
 
 	def get_low_vulnerability_count(self):
-		return (
-			Vulnerability.objects
-			.filter(scan_history__id=self.id)
-			.filter(severity=1)
-			.count()
-		)
+		return self.get_statistics().low_vulnerability_count
 
 	def get_medium_vulnerability_count(self):
-		return (
-			Vulnerability.objects
-			.filter(scan_history__id=self.id)
-			.filter(severity=2)
-			.count()
-		)
+		return self.get_statistics().medium_vulnerability_count
 
 	def get_high_vulnerability_count(self):
-		return (
-			Vulnerability.objects
-			.filter(scan_history__id=self.id)
-			.filter(severity=3)
-			.count()
-		)
+		return self.get_statistics().high_vulnerability_count
 
 	def get_critical_vulnerability_count(self):
-		return (
-			Vulnerability.objects
-			.filter(scan_history__id=self.id)
-			.filter(severity=4)
-			.count()
-		)
+		return self.get_statistics().critical_vulnerability_count
 
 	def get_progress(self):
 		"""Formulae to calculate count number of true things to do, for http
@@ -147,7 +117,7 @@ class ScanHistory(models.Model):
 		(start and stop).
 		"""
 		number_of_steps = len(self.tasks) if self.tasks else 0
-		steps_done = len(self.scanactivity_set.all())
+		steps_done = self.get_statistics().activity_count
 		if steps_done and number_of_steps:
 			return round((number_of_steps / (steps_done)) * 100, 2)
 
@@ -177,6 +147,94 @@ class ScanHistory(models.Model):
 		return f'{hours} hours {minutes} minutes'
 
 
+class ScanStatistics(models.Model):
+	"""Counters of the results of a scan, incremented while the results are
+	saved, and recounted by `reconcile` when the scan ends or results are
+	deleted.
+	"""
+	# Counter of the vulnerabilities of each severity
+	SEVERITY_FIELDS = {
+		-1: 'unknown_vulnerability_count',
+		0: 'info_vulnerability_count',
+		1: 'low_vulnerability_count',
+		2: 'medium_vulnerability_count',
+		3: 'high_vulnerability_count',
+		4: 'critical_vulnerability_count',
+	}
+
+	scan_history = models.OneToOneField(
+		ScanHistory,
+		on_delete=models.CASCADE,
+		primary_key=True,
+		related_name='statistics')
+	subdomain_count = models.IntegerField(default=0)
+	endpoint_count = models.IntegerField(default=0)
+	vulnerability_count = models.IntegerField(default=0)
+	unknown_vulnerability_count = models.IntegerField(default=0)
+	info_vulnerability_count = models.IntegerField(default=0)
+	low_vulnerability_count = models.IntegerField(default=0)
+	medium_vulnerability_count = models.IntegerField(default=0)
+	high_vulnerability_count = models.IntegerField(default=0)
+	critical_vulnerability_count = models.IntegerField(default=0)
+	activity_count = models.IntegerField(default=0)
+	reconciled_at = models.DateTimeField(null=True, blank=True)
+
+	def __str__(self):
+		return str(self.scan_history_id)
+
+	@classmethod
+	def increment(cls, scan_history_id, **counts):
+		"""Add to the counters of a scan with a single UPDATE. Statistics are
+		counted from the scan results if they do not exist yet.
+
+		Args:
+			scan_history_id (int): ScanHistory id.
+			counts (dict): Number to add to each counter.
+		"""
+		counts = {name: models.F(name) + count for name, count in counts.items() if count}
+		if not scan_history_id or not counts:
+			return
+		if not cls.objects.filter(scan_history_id=scan_history_id).update(**counts):
+			cls.reconcile(scan_history_id)
+
+	@classmethod
+	def increment_vulnerabilities(cls, scan_history_id, severity, count=1):
+		counts = {'vulnerability_count': count}
+		if severity in cls.SEVERITY_FIELDS:
+			counts[cls.SEVERITY_FIELDS[severity]] = count
+		cls.increment(scan_history_id, **counts)
+
+	@classmethod
+	def reconcile(cls, scan_history_id):
+		"""Count the results of a scan and save them.
+
+		Args:
+			scan_history_id (int): ScanHistory id.
+
+		Returns:
+			ScanStatistics: Scan statistics.
+		"""
+		counts = Vulnerability.objects.filter(scan_history_id=scan_history_id).aggregate(
+			vulnerability_count=models.Count('id'),
+			**{
+				field: models.Count('id', filter=models.Q(severity=severity))
+				for severity, field in cls.SEVERITY_FIELDS.items()
+			})
+		counts['subdomain_count'] = Subdomain.objects.filter(scan_history_id=scan_history_id).count()
+		counts['endpoint_count'] = EndPoint.objects.filter(scan_history_id=scan_history_id).count()
+		counts['activity_count'] = ScanActivity.objects.filter(scan_of_id=scan_history_id).count()
+		counts['reconciled_at'] = timezone.now()
+		statistics = cls(scan_history_id=scan_history_id, **counts)
+		if not cls.objects.filter(scan_history_id=scan_history_id).update(**counts):
+			try:
+				with transaction.atomic():
+					statistics.save(force_insert=True)
+			except IntegrityError:
+				# Created concurrently
+				statistics.save(force_update=True)
+		return statistics
+
+
 class Subdomain(models.Model):
 	# TODO: Add endpoint property instead of replicating endpoint fields here
 	id = models.AutoField(primary_key=True)
@@ -204,6 +262,11 @@ class Subdomain(models.Model):
 	waf = models.ManyToManyField('Waf', related_name='waf', blank=True)
 	attack_surface = models.TextField(null=True, blank=True)
 
+	class Meta:
+		indexes = [
+			models.Index(fields=['scan_history', 'name']),
+			models.Index(fields=['scan_history', 'content_length', 'id']),
+		]
 
 	def __str__(self):
 		return str(self.name)
@@ -358,6 +421,8 @@ class EndPoint(models.Model):
 		blank=True)
 	source = models.CharField(max_length=200, null=True, blank=True)
 	http_url = models.CharField(max_length=30000)
+	# indexed instead of http_url, see `get_http_url_hash`
+	http_url_hash = models.BigIntegerField(null=True, blank=True)
 	content_length = models.IntegerField(default=0, null=True, blank=True)
 	page_title = models.CharField(max_length=30000, null=True, blank=True)
 	http_status = models.IntegerField(default=0, null=True, blank=True)
@@ -371,13 +436,41 @@ class EndPoint(models.Model):
 	# used for subscans
 	endpoint_subscan_ids = models.ManyToManyField('SubScan', related_name='endpoint_subscan_ids', blank=True)
 
+	class Meta:
+		indexes = [
+			models.Index(fields=['scan_history', 'http_url_hash']),
+			models.Index(fields=['target_domain', 'http_url_hash']),
+			models.Index(fields=['scan_history', 'id']),
+		]
+
 	def __str__(self):
 		return self.http_url
 
+	def save(self, *args, **kwargs):
+		self.http_url_hash = self.get_http_url_hash(self.http_url)
+		super().save(*args, **kwargs)
+
 	@hybrid_property
 	def is_alive(self):
 		return self.http_status
 
+	@staticmethod
+	def get_http_url_hash(http_url):
+		"""64-bit hash of an HTTP URL. URLs are too long to be indexed, so
+		equality lookups filter on the hash, then on the URL.
+
+		The migration computes the same hash in SQL, keep them in sync.
+
+		Args:
+			http_url (str): HTTP URL.
+
+		Returns:
+			int: First 8 bytes of the URL SHA256 digest, as a signed integer.
+		"""
+		if http_url is None:
+			return None
+		return int.from_bytes(hashlib.sha256(http_url.encode()).digest()[:8], 'big', signed=True)
+
 
 class VulnerabilityTags(models.Model):
 	id = models.AutoField(primary_key=True)
@@ -403,6 +496,19 @@ class CveId(models.Model):
 		return self.name
 
 
+class CveDetail(models.Model):
+	"""Local mirror of CVE details, loaded from an offline feed with the
+	`loadcves` management command. `data` is stored in the CVESearch format.
+	"""
+	id = models.AutoField(primary_key=True)
+	cve_id = models.CharField(max_length=50, unique=True)
+	data = models.JSONField(default=dict)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	def __str__(self):
+		return self.cve_id
+
+
 class CweId(models.Model):
 	id = models.AutoField(primary_key=True)
 	name = models.CharField(max_length=100)
@@ -471,6 +577,13 @@ class Vulnerability(models.Model):
 	is_gpt_used = models.BooleanField(null=True, blank=True, default=False)
 	# used for subscans
 	vuln_subscan_ids = models.ManyToManyField('SubScan', related_name='vuln_subscan_ids', blank=True)
+	# identifies the vulnerability in its scan, see `get_fingerprint`
+	fingerprint = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['scan_history', 'severity', 'id']),
+		]
 
 	def __str__(self):
 		cve_str = ', '.join(f'`{cve.name}`' for cve in self.cve_ids.all())
@@ -495,6 +608,23 @@ class Vulnerability(models.Model):
 	def get_path(self):
 		return urlparse(self.http_url).path
 
+	@staticmethod
+	def get_fingerprint(scan_history_id, template_id, http_url, matcher_name):
+		"""Hash of the fields identifying a vulnerability found by a scan.
+
+		Args:
+			scan_history_id (int): ScanHistory id.
+			template_id (str): Nuclei template id, or vulnerability name for
+				other tools.
+			http_url (str): Matched URL.
+			matcher_name (str): Nuclei matcher name.
+
+		Returns:
+			str: SHA256 hex digest.
+		"""
+		key = '|'.join(str(value or '') for value in (scan_history_id, template_id, http_url, matcher_name))
+		return hashlib.sha256(key.encode()).hexdigest()
+
 
 class ScanActivity(models.Model):
 	id = models.AutoField(primary_key=True)
@@ -507,10 +637,100 @@ class ScanActivity(models.Model):
 	traceback = models.TextField(blank=True, null=True)
 	celery_id = models.CharField(max_length=100, blank=True, null=True)
 
+	class Meta:
+		indexes = [
+			models.Index(fields=['scan_of', 'status']),
+		]
+
 	def __str__(self):
 		return str(self.title)
 
 
+class ScanReport(models.Model):
+	"""PDF report of a scan, rendered by the `generate_report` task.
+
+	A report is reused as long as its `data_version` matches the scan results
+	and report settings (see `reNgine.reports.get_report_data_version`).
+	"""
+	id = models.AutoField(primary_key=True)
+	scan_history = models.ForeignKey(ScanHistory, on_delete=models.CASCADE, related_name='reports')
+	report_type = models.CharField(max_length=20)
+	ignore_info_vuln = models.BooleanField(default=False)
+	data_version = models.CharField(max_length=64)
+	status = models.IntegerField(choices=CELERY_TASK_STATUSES, default=-1)
+	progress = models.IntegerField(default=0)
+	celery_id = models.CharField(max_length=100, blank=True, null=True)
+	file_path = models.CharField(max_length=1000, blank=True, null=True)
+	error_message = models.CharField(max_length=300, blank=True, null=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	completed_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		unique_together = ('scan_history', 'report_type', 'ignore_info_vuln', 'data_version')
+
+	def __str__(self):
+		return f'{self.scan_history_id} {self.report_type}'
+
+
+class ScanVisualisation(models.Model):
+	"""Graph of the results of a scan shown on the visualisation page, stored
+	as gzip compressed JSON when the scan ends.
+
+	A graph is reused as long as its `data_version` matches the scan results
+	(see `reNgine.visualisation.get_visualisation_data_version`). `etag` is the
+	hash of the JSON document.
+	"""
+	scan_history = models.OneToOneField(
+		ScanHistory,
+		on_delete=models.CASCADE,
+		primary_key=True,
+		related_name='visualisation')
+	data_version = models.CharField(max_length=64)
+	etag = models.CharField(max_length=64)
+	data = models.BinaryField()
+	updated_at = models.DateTimeField(auto_now=True)
+
+	def __str__(self):
+		return str(self.scan_history_id)
+
+
+class AssetChange(models.Model):
+	"""Subdomain or endpoint added, removed or unchanged by a scan since the
+	previous scan of its target, stored by
+	`reNgine.asset_changes.save_asset_changes` when the scan ends.
+
+	Assets of both scans are matched on the hash of their name (subdomain name
+	or endpoint URL). Added and unchanged assets point to the rows of the scan,
+	removed assets to the rows of the previous scan.
+
+	Scans without a previous scan get a single row without `previous_scan`
+	nor asset, marking their changes as stored.
+	"""
+	ADDED = 'added'
+	REMOVED = 'removed'
+	UNCHANGED = 'unchanged'
+	CHANGES = (
+		(ADDED, 'Added'),
+		(REMOVED, 'Removed'),
+		(UNCHANGED, 'Unchanged'),
+	)
+
+	id = models.AutoField(primary_key=True)
+	scan_history = models.ForeignKey(ScanHistory, on_delete=models.CASCADE, related_name='asset_changes')
+	previous_scan = models.ForeignKey(ScanHistory, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+	asset_type = models.CharField(max_length=20)
+	change = models.CharField(max_length=10, choices=CHANGES)
+	name_hash = models.CharField(max_length=64)
+	subdomain = models.ForeignKey(Subdomain, on_delete=models.CASCADE, null=True, blank=True, related_name='asset_changes')
+	endpoint = models.ForeignKey(EndPoint, on_delete=models.CASCADE, null=True, blank=True, related_name='asset_changes')
+
+	class Meta:
+		unique_together = ('scan_history', 'asset_type', 'name_hash')
+
+	def __str__(self):
+		return f'{self.scan_history_id} {self.asset_type} {self.change}'
+
+
 class Command(models.Model):
 	id = models.AutoField(primary_key=True)
 	scan_history = models.ForeignKey(ScanHistory, on_delete=models.CASCADE, blank=True, null=True)
@@ -523,6 +743,27 @@ class Command(models.Model):
 	def __str__(self):
 		return str(self.command)
 
+	def get_output(self):
+		"""Return the command output. Streamed commands store their output as
+		CommandOutputChunk rows, which are assembled here on read.
+		"""
+		if self.output is not None:
+			return self.output
+		return ''.join(chunk.data for chunk in self.output_chunks.all())
+
+
+class CommandOutputChunk(models.Model):
+	id = models.AutoField(primary_key=True)
+	command = models.ForeignKey(Command, on_delete=models.CASCADE, related_name='output_chunks')
+	seq = models.IntegerField(default=0)
+	data = models.TextField(blank=True, default='')
+
+	class Meta:
+		ordering = ['seq']
+
+	def __str__(self):
+		return f'{self.command_id}#{self.seq}'
+
 
 class Waf(models.Model):
 	id = models.AutoField(primary_key=True)
@@ -1,14 +1,21 @@
 """
 This file contains the test cases for the startScan views and models.
 """
+import csv
+import gzip
+import io
 import json
-from unittest.mock import patch
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
 from django.urls import reverse
 from django.utils import timezone
 from django.test import override_settings
 from utils.test_base import BaseTestCase
 from utils.test_utils import MockTemplate
-from startScan.models import ScanHistory, Subdomain, EndPoint, Vulnerability, ScanActivity
+from startScan.models import ScanHistory, ScanReport, ScanStatistics, Subdomain, EndPoint, Vulnerability, ScanActivity, Command
+from reNgine.common_func import CommandOutputBuffer
+from reNgine.tasks import generate_report, stream_command
 
 __all__ = [
     'TestStartScanViews',
@@ -111,7 +118,59 @@ class TestStartScanViews(BaseTestCase):
         }))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'text/plain')
-        self.assertEqual(response.content.decode(), '')
+        self.assertEqual(b''.join(response.streaming_content).decode(), '')
+
+    def get_export(self, name, **params):
+        response = self.client.get(reverse(name, kwargs={
+            'scan_id': self.data_generator.scan_history.id,
+            'slug': self.data_generator.project.slug,
+        }), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    @patch('startScan.views.EXPORT_CHUNK_SIZE', 2)
+    def test_export_subdomains_streamed(self):
+        """Test subdomains are exported once each, in chunks."""
+        for i in range(4):
+            self.data_generator.create_subdomain(f'sub{i}.example.com')
+        response = self.client.get(reverse('export_subdomains', kwargs={
+            'scan_id': self.data_generator.scan_history.id,
+            'slug': self.data_generator.project.slug,
+        }))
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 3)
+        names = b''.join(chunks).decode().splitlines()
+        self.assertEqual(len(names), 5)
+        self.assertEqual(
+            set(names),
+            set(Subdomain.objects.filter(scan_history=self.data_generator.scan_history).values_list('name', flat=True)))
+        self.assertIn('.txt"', response['Content-Disposition'])
+
+    def test_export_formats(self):
+        """Test exports in CSV and NDJSON formats."""
+        response, content = self.get_export('export_endpoints', format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(rows[0]['http_url'], self.data_generator.endpoint.http_url)
+
+        response, content = self.get_export('export_subdomains', format='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(rows[0]['name'], self.data_generator.subdomain.name)
+        self.assertIn('http_status', rows[0])
+
+        response = self.client.get(reverse('export_subdomains', kwargs={
+            'scan_id': self.data_generator.scan_history.id,
+            'slug': self.data_generator.project.slug,
+        }), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_gzip(self):
+        """Test gzipped exports."""
+        response, content = self.get_export('export_endpoints', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.txt.gz"', response['Content-Disposition'])
+        self.assertEqual(gzip.decompress(content).decode(), f'{self.data_generator.endpoint.http_url}\n')
 
     def test_export_endpoints_view(self):
         """Test the export endpoints view."""
@@ -133,7 +192,76 @@ class TestStartScanViews(BaseTestCase):
         }))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'text/plain')
-        self.assertEqual(response.content.decode(), '')
+        self.assertEqual(b''.join(response.streaming_content).decode(), '')
+
+    def get_report(self, **params):
+        return self.client.get(reverse('create_report', kwargs={
+            'slug': self.data_generator.project.slug,
+            'id': self.data_generator.scan_history.id,
+        }), params)
+
+    def test_create_report(self):
+        """Test reports are rendered in the background, then reused."""
+        results_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(results_dir.cleanup)
+        self.data_generator.scan_history.results_dir = results_dir.name
+        self.data_generator.scan_history.save()
+        with patch('reNgine.tasks.generate_report.apply_async', return_value=MagicMock(id='task-id')) as apply_async:
+            response = self.get_report(report_type='recon')
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.json()['status'], 'INITITATED')
+            report = ScanReport.objects.get(id=response.json()['report_id'])
+            self.assertEqual(report.celery_id, 'task-id')
+
+            generate_report(report.id)
+            report.refresh_from_db()
+            response = self.get_report(report_type='recon', download='')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/octet-stream')
+            self.assertEqual(response['X-Report-Id'], str(report.id))
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+            self.assertEqual(apply_async.call_count, 1)
+
+            # New results make a new report, superseding the rendered one
+            self.data_generator.create_vulnerability()
+            ScanStatistics.reconcile(self.data_generator.scan_history.id)
+            response = self.get_report(report_type='recon')
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(apply_async.call_count, 2)
+            self.assertEqual(list(ScanReport.objects.values_list('id', flat=True)), [response.json()['report_id']])
+            self.assertTrue(report.file_path)
+            self.assertFalse(os.path.exists(report.file_path))
+
+    def test_poll_report(self):
+        """Test polling a report of a running scan does not queue reports for
+        its new results."""
+        with patch('reNgine.tasks.generate_report.apply_async', return_value=MagicMock(id='task-id')) as apply_async:
+            report_id = self.get_report().json()['report_id']
+            self.data_generator.create_vulnerability()
+            ScanStatistics.reconcile(self.data_generator.scan_history.id)
+            response = self.get_report(report_id=report_id)
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.json()['report_id'], report_id)
+            self.assertEqual(apply_async.call_count, 1)
+            self.assertEqual(ScanReport.objects.count(), 1)
+
+            # Reports being rendered are kept for their clients
+            self.assertNotEqual(self.get_report().json()['report_id'], report_id)
+            self.assertEqual(self.get_report(report_id=report_id).status_code, 202)
+            self.assertEqual(self.get_report(report_id=0).status_code, 404)
+
+    def test_failed_report(self):
+        """Test failed reports are queued again, but not while polling."""
+        with patch('reNgine.tasks.generate_report.apply_async', return_value=MagicMock(id='task-id')) as apply_async:
+            report_id = self.get_report().json()['report_id']
+            with patch('reNgine.tasks.render_report', side_effect=ValueError('Invalid template')):
+                generate_report(report_id)
+            response = self.get_report(report_id=report_id)
+            self.assertEqual(response.status_code, 500)
+            self.assertEqual(response.json()['error_message'], 'Invalid template')
+            self.assertEqual(apply_async.call_count, 1)
+            self.assertEqual(self.get_report().status_code, 202)
+            self.assertEqual(apply_async.call_count, 2)
 
 class TestStartScanModels(BaseTestCase):
     """Test cases for startScan models."""
@@ -225,3 +353,27 @@ class TestStartScanModels(BaseTestCase):
         self.assertIsInstance(minimal_scan_activity, ScanActivity)
         self.assertEqual(minimal_scan_activity.name, "Test Type")
         self.assertIsNone(minimal_scan_activity.error_message)
+
+    def test_command_output_buffer(self):
+        """Test that buffered command output is flushed in chunks and reassembled."""
+        command = self.data_generator.command
+        output_buffer = CommandOutputBuffer(command, flush_lines=2, flush_interval=3600)
+        lines = [f'line {i}\n' for i in range(5)]
+        for line in lines:
+            output_buffer.write(line)
+        self.assertEqual(command.output_chunks.count(), 2)
+        output_buffer.flush()
+        self.assertEqual(command.output_chunks.count(), 3)
+        self.assertEqual(command.get_output(), ''.join(lines))
+
+    def test_stream_command_output(self):
+        """Test that stream_command stores its output as chunks."""
+        results = list(stream_command(
+            'seq 1 5',
+            scan_id=self.data_generator.scan_history.id,
+            activity_id=self.data_generator.scan_activity.id))
+        self.assertEqual(results, [1, 2, 3, 4, 5])
+        command = Command.objects.latest('id')
+        self.assertEqual(command.return_code, 0)
+        self.assertIsNone(command.output)
+        self.assertEqual(command.get_output(), '1\n2\n3\n4\n5\n')
@@ -1,31 +1,40 @@
-import markdown, json
+import csv
+import io
+import json
+import os
+import zlib
 
 from celery import group
 from pathlib import Path
-from weasyprint import HTML
 from datetime import datetime, timedelta
 from django.contrib import messages
 from django.db.models import Count
-from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.http import FileResponse, HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
-from django.template.loader import get_template
 from django.urls import reverse
 from django.utils import timezone
 from django_celery_beat.models import ClockedSchedule, IntervalSchedule, PeriodicTask
 from rolepermissions.decorators import has_permission_decorator
 
+from dashboard.statistics import invalidate_project_statistics
 from reNgine.celery import app
-from reNgine.common_func import logger, get_interesting_subdomains, create_scan_object, safe_int_cast
-from reNgine.settings import RENGINE_RESULTS
-from reNgine.definitions import ABORTED_TASK, SUCCESS_TASK, RUNNING_TASK, LIVE_SCAN, SCHEDULED_SCAN, PERM_INITATE_SCANS_SUBSCANS, PERM_MODIFY_SCAN_RESULTS, PERM_MODIFY_SCAN_REPORT, PERM_MODIFY_SYSTEM_CONFIGURATIONS, FOUR_OH_FOUR_URL
-from reNgine.tasks import create_scan_activity, initiate_scan, run_command
-from scanEngine.models import EngineType, VulnerabilityReportSetting
-from startScan.models import ScanHistory, SubScan, Email, Employee, Subdomain, EndPoint, Vulnerability, VulnerabilityTags, IpAddress, CountryISO, ScanActivity, CveId, CweId
+from reNgine.common_func import logger, create_scan_object, safe_int_cast
+from reNgine.settings import EXPORT_CHUNK_SIZE, RENGINE_RESULTS
+from reNgine.definitions import ABORTED_TASK, CELERY_TASK_STATUS_MAP, FAILED_TASK, SUCCESS_TASK, RUNNING_TASK, LIVE_SCAN, SCHEDULED_SCAN, PERM_INITATE_SCANS_SUBSCANS, PERM_MODIFY_SCAN_RESULTS, PERM_MODIFY_SCAN_REPORT, PERM_MODIFY_SYSTEM_CONFIGURATIONS, FOUR_OH_FOUR_URL
+from reNgine.reports import REPORT_TYPES
+from reNgine.tasks import create_scan_activity, initiate_scan, queue_report, run_command
+from scanEngine.models import EngineType
+from startScan.models import ScanHistory, SubScan, Email, Employee, Subdomain, EndPoint, Vulnerability, VulnerabilityTags, IpAddress, CountryISO, ScanActivity, ScanReport, CveId, CweId
 from targetApp.models import Domain, Organization
 
 
 def scan_history(request, slug):
-    host = ScanHistory.objects.filter(domain__project__slug=slug).order_by('-start_scan_date')
+    host = (
+        ScanHistory.objects
+        .filter(domain__project__slug=slug)
+        .select_related('domain', 'scan_type', 'statistics')
+        .order_by('-start_scan_date')
+    )
     context = {'scan_history_active': 'active', "scan_history": host}
     return render(request, 'startScan/history.html', context)
 
@@ -39,7 +48,7 @@ def detail_scan(request, id, slug):
     ctx = {}
 
     # Get scan objects
-    scan = get_object_or_404(ScanHistory, id=id)
+    scan = get_object_or_404(ScanHistory.objects.select_related('statistics'), id=id)
     domain_id = safe_int_cast( scan.domain.id)
     scan_engines = EngineType.objects.order_by('engine_name').all()
     recent_scans = ScanHistory.objects.filter(domain__id=domain_id)
@@ -150,14 +159,15 @@ def detail_scan(request, id, slug):
         .order_by('-count')
         [:10]
     )
-    info_count = vulns.filter(severity=0).count()
-    low_count = vulns.filter(severity=1).count()
-    medium_count = vulns.filter(severity=2).count()
-    high_count = vulns.filter(severity=3).count()
-    critical_count = vulns.filter(severity=4).count()
-    unknown_count = vulns.filter(severity=-1).count()
-    total_count = vulns.count()
-    total_count_ignore_info = vulns.exclude(severity=0).count()
+    statistics = scan.get_statistics()
+    info_count = statistics.info_vulnerability_count
+    low_count = statistics.low_vulnerability_count
+    medium_count = statistics.medium_vulnerability_count
+    high_count = statistics.high_vulnerability_count
+    critical_count = statistics.critical_vulnerability_count
+    unknown_count = statistics.unknown_vulnerability_count
+    total_count = statistics.vulnerability_count
+    total_count_ignore_info = total_count - info_count
 
     # Emails
     exposed_count = emails.exclude(password__isnull=True).count()
@@ -388,50 +398,102 @@ def start_multiple_scan(request, slug):
     }
     return render(request, 'startScan/start_multiple_scan_ui.html', context)
 
-def export_subdomains(request, slug, scan_id):
-    subdomain_list = Subdomain.objects.filter(scan_history__id=scan_id)
-    scan = ScanHistory.objects.get(id=scan_id)
-    response_body = ""
-    for domain in subdomain_list:
-        response_body += response_body + domain.name + "\n"
-    scan_start_date_str = str(scan.start_scan_date.date())
-    domain_name = scan.domain.name
-    response = HttpResponse(response_body, content_type='text/plain')
-    response['Content-Disposition'] = (
-        f'attachment; filename="subdomains_{domain_name}_{scan_start_date_str}.txt"'
-    )
+# Content type and file extension by export format. Text exports have the
+# first field only, one per line.
+EXPORT_FORMATS = {
+    'txt': ('text/plain', 'txt'),
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def export_rows(queryset, fields, export_format):
+    """Export rows, fetched and encoded by chunks of EXPORT_CHUNK_SIZE rows.
+
+    Args:
+        queryset (django.db.models.QuerySet): Exported rows.
+        fields (list): Exported fields.
+        export_format (str): One of EXPORT_FORMATS.
+
+    Yields:
+        bytes: Encoded chunk of rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == 'csv':
+        writer.writerow(fields)
+    rows = queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for count, row in enumerate(rows, start=1):
+        if export_format == 'csv':
+            writer.writerow(row)
+        elif export_format == 'ndjson':
+            buffer.write(json.dumps(dict(zip(fields, row))) + '\n')
+        else:
+            buffer.write(f'{row[0]}\n')
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def gzip_chunks(chunks):
+    """Compress a stream of chunks in gzip format."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(request, scan_id, queryset, fields, name):
+    """Stream scan results as an attachment, in the format requested by the
+    `format` query parameter, and gzipped if `gzip` is set."""
+    export_format = request.GET.get('format', 'txt')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f'Unsupported export format {export_format}')
+    scan = get_object_or_404(ScanHistory.objects.select_related('domain'), id=scan_id)
+    content_type, extension = EXPORT_FORMATS[export_format]
+    if export_format == 'txt':
+        fields = fields[:1]
+    chunks = export_rows(queryset, fields, export_format)
+    filename = f'{name}_{scan.domain.name}_{scan.start_scan_date.date()}.{extension}'
+    if request.GET.get('gzip') in ('1', 'true'):
+        chunks = gzip_chunks(chunks)
+        content_type = 'application/gzip'
+        filename += '.gz'
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
 
+def export_subdomains(request, slug, scan_id):
+    return stream_export(
+        request,
+        scan_id,
+        Subdomain.objects.filter(scan_history__id=scan_id),
+        ['name', 'http_url', 'http_status', 'content_length', 'page_title', 'webserver', 'cname'],
+        'subdomains')
+
+
 def export_endpoints(request, slug, scan_id):
-    endpoint_list = EndPoint.objects.filter(scan_history__id=scan_id)
-    scan = ScanHistory.objects.get(id=scan_id)
-    response_body = ""
-    for endpoint in endpoint_list:
-        response_body += endpoint.http_url + "\n"
-    scan_start_date_str = str(scan.start_scan_date.date())
-    domain_name = scan.domain.name
-    response = HttpResponse(response_body, content_type='text/plain')
-    response['Content-Disposition'] = (
-        f'attachment; filename="endpoints_{domain_name}_{scan_start_date_str}.txt"'
-    )
-    return response
+    return stream_export(
+        request,
+        scan_id,
+        EndPoint.objects.filter(scan_history__id=scan_id),
+        ['http_url', 'http_status', 'content_length', 'content_type', 'page_title', 'webserver'],
+        'endpoints')
 
 
 def export_urls(request, slug, scan_id):
-    urls_list = Subdomain.objects.filter(scan_history__id=scan_id)
-    scan = ScanHistory.objects.get(id=scan_id)
-    response_body = ""
-    for url in urls_list:
-        if url.http_url:
-            response_body += response_body + url.http_url + "\n"
-    scan_start_date_str = str(scan.start_scan_date.date())
-    domain_name = scan.domain.name
-    response = HttpResponse(response_body, content_type='text/plain')
-    response['Content-Disposition'] = (
-        f'attachment; filename="urls_{domain_name}_{scan_start_date_str}.txt"'
-    )
-    return response
+    return stream_export(
+        request,
+        scan_id,
+        Subdomain.objects.filter(scan_history__id=scan_id).exclude(http_url__isnull=True).exclude(http_url=''),
+        ['http_url', 'name', 'http_status'],
+        'urls')
 
 
 @has_permission_decorator(PERM_MODIFY_SCAN_RESULTS, redirect_url=FOUR_OH_FOUR_URL)
@@ -441,6 +503,7 @@ def delete_scan(request, slug, id):
         delete_dir = obj.results_dir
         run_command('rm -rf ' + delete_dir)
         obj.delete()
+        invalidate_project_statistics(obj.domain.project_id)
         messageData = {'status': 'true'}
         messages.add_message(
             request,
@@ -830,6 +893,7 @@ def delete_scans(request, slug):
             delete_dir = scan.results_dir
             run_command('rm -rf ' + delete_dir)
             scan.delete()
+            invalidate_project_statistics(scan.domain.project_id)
         messages.add_message(
             request,
             messages.INFO,
@@ -849,130 +913,37 @@ def customize_report(request, id):
 
 @has_permission_decorator(PERM_MODIFY_SCAN_REPORT, redirect_url=FOUR_OH_FOUR_URL)
 def create_report(request, slug, id):
-    primary_color = '#FFB74D'
-    secondary_color = '#212121'
-    # get report type
-    report_type = request.GET['report_type'] if 'report_type' in request.GET  else 'full'
-    is_ignore_info_vuln = True if 'ignore_info_vuln' in request.GET else False
-    if report_type == 'recon':
-        show_recon = True
-        show_vuln = False
-        report_name = 'Reconnaissance Report'
-    elif report_type == 'vulnerability':
-        show_recon = False
-        show_vuln = True
-        report_name = 'Vulnerability Report'
+    """Get the PDF report of a scan.
+
+    The report is rendered by a Celery task. Until it is ready, the status of
+    the rendering is returned as JSON with a 202 status code. Clients poll the
+    queued report with `report_id`, which is neither queued again nor
+    superseded by newer results of a running scan.
+    """
+    scan = get_object_or_404(ScanHistory.objects.select_related('domain', 'statistics'), id=id)
+    report_id = safe_int_cast(request.GET.get('report_id'))
+    if report_id is not None:
+        report = get_object_or_404(ScanReport, id=report_id, scan_history=scan)
     else:
-        # default
-        show_recon = True
-        show_vuln = True
-        report_name = 'Full Scan Report'
-
-    scan = ScanHistory.objects.get(id=id)
-    vulns = (
-        Vulnerability.objects
-        .filter(scan_history=scan)
-        .order_by('-severity')
-    ) if not is_ignore_info_vuln else (
-        Vulnerability.objects
-        .filter(scan_history=scan)
-        .exclude(severity=0)
-        .order_by('-severity')
-    )
-    unique_vulns = (
-        Vulnerability.objects
-        .filter(scan_history=scan)
-        .values("name", "severity")
-        .annotate(count=Count('name'))
-        .order_by('-severity', '-count')
-    ) if not is_ignore_info_vuln else (
-        Vulnerability.objects
-        .filter(scan_history=scan)
-        .exclude(severity=0)
-        .values("name", "severity")
-        .annotate(count=Count('name'))
-        .order_by('-severity', '-count')
-    )
-
-    subdomains = (
-        Subdomain.objects
-        .filter(scan_history=scan)
-        .order_by('-content_length')
-    )
-    subdomain_alive_count = (
-        Subdomain.objects
-        .filter(scan_history__id=id)
-        .values('name')
-        .distinct()
-        .filter(http_status__gt=0)
-        .count()
-    )
-    interesting_subdomains = get_interesting_subdomains(scan_history=id)
-    ip_addresses = (
-        IpAddress.objects
-        .filter(ip_addresses__in=subdomains)
-        .distinct()
-    )
-    data = {
-        'scan_object': scan,
-        'unique_vulnerabilities': unique_vulns,
-        'all_vulnerabilities': vulns,
-        'all_vulnerabilities_count': vulns.count(),
-        'subdomain_alive_count': subdomain_alive_count,
-        'interesting_subdomains': interesting_subdomains,
-        'subdomains': subdomains,
-        'ip_addresses': ip_addresses,
-        'show_recon': show_recon,
-        'show_vuln': show_vuln,
-        'report_name': report_name,
-        'is_ignore_info_vuln': is_ignore_info_vuln,
-    }
-
-    # Get report related config
-    vuln_report_query = VulnerabilityReportSetting.objects.all()
-    if vuln_report_query.exists():
-        report = vuln_report_query[0]
-        data['company_name'] = report.company_name
-        data['company_address'] = report.company_address
-        data['company_email'] = report.company_email
-        data['company_website'] = report.company_website
-        data['show_rengine_banner'] = report.show_rengine_banner
-        data['show_footer'] = report.show_footer
-        data['footer_text'] = report.footer_text
-        data['show_executive_summary'] = report.show_executive_summary
-
-        # Replace executive_summary_description with template syntax
-        description = report.executive_summary_description
-        description = description.replace('{scan_date}', scan.start_scan_date.strftime('%d %B, %Y'))
-        description = description.replace('{company_name}', report.company_name)
-        description = description.replace('{target_name}', scan.domain.name)
-        description = description.replace('{subdomain_count}', str(subdomains.count()))
-        description = description.replace('{vulnerability_count}', str(vulns.count()))
-        description = description.replace('{critical_count}', str(vulns.filter(severity=4).count()))
-        description = description.replace('{high_count}', str(vulns.filter(severity=3).count()))
-        description = description.replace('{medium_count}', str(vulns.filter(severity=2).count()))
-        description = description.replace('{low_count}', str(vulns.filter(severity=1).count()))
-        description = description.replace('{info_count}', str(vulns.filter(severity=0).count()))
-        description = description.replace('{unknown_count}', str(vulns.filter(severity=-1).count()))
-        if scan.domain.description:
-            description = description.replace('{target_description}', scan.domain.description)
-
-        # Convert to Markdown
-        data['executive_summary_description'] = markdown.markdown(description)
-
-        primary_color = report.primary_color
-        secondary_color = report.secondary_color
-
-    data['primary_color'] = primary_color
-    data['secondary_color'] = secondary_color
-
-    template = get_template('report/template.html')
-    html = template.render(data)
-    pdf = HTML(string=html).write_pdf()
-
-    if 'download' in request.GET:
-        response = HttpResponse(pdf, content_type='application/octet-stream')
-    else:
-        response = HttpResponse(pdf, content_type='application/pdf')
-
+        report_type = request.GET.get('report_type', 'full')
+        if report_type not in REPORT_TYPES:
+            report_type = 'full'
+        is_ignore_info_vuln = 'ignore_info_vuln' in request.GET
+        report = queue_report(scan, report_type, is_ignore_info_vuln)
+
+    if report.status != SUCCESS_TASK or not os.path.exists(report.file_path or ''):
+        return JsonResponse({
+            'report_id': report.id,
+            'status': CELERY_TASK_STATUS_MAP.get(report.status),
+            'progress': report.progress,
+            'error_message': report.error_message,
+        }, status=500 if report.status == FAILED_TASK else 202)
+
+    download = 'download' in request.GET
+    response = FileResponse(
+        open(report.file_path, 'rb'),
+        as_attachment=download,
+        filename=f'{scan.domain.name}.pdf',
+        content_type='application/octet-stream' if download else 'application/pdf')
+    response['X-Report-Id'] = report.id
     return response
@@ -1485,13 +1485,54 @@ function get_and_render_subscan_history(endpoint, subdomain_id, subdomain_name)
 	});
 }
 
+function run_tool_job(jobs_url, tool, params) {
+	// this function will queue a toolbox job (whois, cms_detector, ...) and
+	// poll it until it completes, resolves with the result of the tool
+	return fetch(jobs_url, {
+		method: 'POST',
+		credentials: "same-origin",
+		headers: {
+			"X-CSRFToken": getCookie("csrftoken"),
+			"Content-Type": "application/json"
+		},
+		body: JSON.stringify({tool: tool, ...params})
+	}).then(response => response.json()).then(function(response) {
+		if (!response.status) {
+			return response;
+		}
+		return poll_tool_job(`${jobs_url}${response.job.id}/?format=json`);
+	});
+}
+
+function poll_tool_job(job_url, interval=2000, max_attempts=450) {
+	// jobs are failed by the server after TOOL_JOB_TIMEOUT, stop polling
+	// after max_attempts in case they are never updated
+	var attempts = 0;
+	return new Promise(function(resolve, reject) {
+		function poll() {
+			if (++attempts > max_attempts) {
+				resolve({status: false, message: 'Timed out'});
+				return;
+			}
+			fetch(job_url, {credentials: "same-origin"}).then(response => response.json()).then(function(response) {
+				if (!response.status) {
+					resolve(response);
+				} else if (response.job.status == 'SUCCESS') {
+					resolve(response.job.result);
+				} else if (response.job.status == 'FAILED') {
+					resolve({status: false, message: response.job.error_message});
+				} else {
+					setTimeout(poll, interval);
+				}
+			}).catch(reject);
+		}
+		poll();
+	});
+}
+
 function fetch_whois(endpoint_url, domain_name, force_reload_whois=false) {
 	// this function will fetch WHOIS record for any subdomain and also display
-	// snackbar once whois is fetched
-	var url = `${endpoint_url}?format=json&ip_domain=${domain_name}`;
-	if (force_reload_whois) {
-		url+='&is_reload=true'
-	}
+	// snackbar once whois is fetched, endpoint_url is the tool jobs API url
 	$('[data-toggle="tooltip"]').tooltip('hide');
 	Snackbar.show({
 		text: 'Fetching WHOIS...',
@@ -1500,7 +1541,7 @@ function fetch_whois(endpoint_url, domain_name, force_reload_whois=false) {
 	});
 	$("#whois_not_fetched_alert").hide();
 	$("#whois_fetching_alert").show();
-	fetch(url, {}).then(res => res.json())
+	run_tool_job(endpoint_url, 'whois', {ip_domain: domain_name, is_reload: force_reload_whois})
 		.then(function(response) {
 			$("#whois_fetching_alert").hide();
 			document.getElementById('domain_age').innerHTML = response['domain']['domain_age'] + ' ' + response['domain']['date_created'];
@@ -1531,41 +1572,19 @@ function fetch_whois(endpoint_url, domain_name, force_reload_whois=false) {
 }
 
 function get_target_whois(endpoint_url, domain_name) {
-	var url = `${endpoint_url}?format=json&ip_domain=${domain_name}`
 	Swal.fire({
 		title: `Fetching WHOIS details for ${domain_name}...`
 	});
 	swal.showLoading();
-	fetch(url, {
-		method: 'GET',
-		credentials: "same-origin",
-		headers: {
-			"X-CSRFToken": getCookie("csrftoken"),
-			'Content-Type': 'application/json'
-		},
-	}).then(response => response.json()).then(function(response) {
+	run_tool_job(endpoint_url, 'whois', {ip_domain: domain_name}).then(function(response) {
 		if (response.status) {
 			swal.close();
 			display_whois_on_modal(response);
 		} else {
-			fetch(`${endpoint_url}?format=json&ip_domain=${domain_name}`, {
-				method: 'GET',
-				credentials: "same-origin",
-				headers: {
-					"X-CSRFToken": getCookie("csrftoken"),
-					'Content-Type': 'application/json'
-				},
-			}).then(response => response.json()).then(function(response) {
-				if (response.status) {
-					swal.close();
-					display_whois_on_modal(response);
-				} else {
-					Swal.fire({
-						title: 'Oops!',
-						text: `reNgine could not fetch WHOIS records for ${domain_name}!`,
-						icon: 'error'
-					});
-				}
+			Swal.fire({
+				title: 'Oops!',
+				text: `reNgine could not fetch WHOIS records for ${domain_name}!`,
+				icon: 'error'
 			});
 		}
 	});
@@ -1574,20 +1593,12 @@ function get_target_whois(endpoint_url, domain_name) {
 function get_domain_whois(whoisLookupUrl, domain_name, addTargetUrl, project_slug, show_add_target_btn=false) {
 	// this function will get whois for domains that are not targets, this will
 	// not store whois into db nor create target
-	var url = `${whoisLookupUrl}?format=json&ip_domain=${domain_name}`
 	Swal.fire({
 		title: `Fetching WHOIS details for ${domain_name}...`
 	});
 	$('.modal').modal('hide');
 	swal.showLoading();
-	fetch(url, {
-		method: 'GET',
-		credentials: "same-origin",
-		headers: {
-			"X-CSRFToken": getCookie("csrftoken"),
-			'Content-Type': 'application/json'
-		},
-	}).then(response => response.json()).then(function(response) {
+	run_tool_job(whoisLookupUrl, 'whois', {ip_domain: domain_name}).then(function(response) {
 		swal.close();
 		if (response.status) {
 			display_whois_on_modal(response, addTargetUrl, project_slug, show_add_target_btn=show_add_target_btn);
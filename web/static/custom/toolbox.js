@@ -37,21 +37,13 @@ $(document).on('click', '#detect_cms_submit_btn', function(){
 
 
 function cms_detector_api_call(cmsDetectorUrl, url){
-	var api_url = `${cmsDetectorUrl}?format=json&url=${url}`
 	Swal.fire({
 		title: `Detecting CMS`,
 		text: `reNgine is detecting CMS on ${url} and this may take a while. Please wait...`,
 		allowOutsideClick: false
 	});
 	swal.showLoading();
-	fetch(api_url, {
-		method: 'GET',
-		credentials: "same-origin",
-		headers: {
-			"X-CSRFToken": getCookie("csrftoken"),
-			"Content-Type": "application/json"
-		},
-	}).then(response => response.json()).then(function(response) {
+	run_tool_job(cmsDetectorUrl, 'cms_detector', {url: url}).then(function(response) {
 		if (response.status) {
 			swal.close();
 			$('#cmsDetectorResultModal .modal-title').text('CMS Details for ' + url);
@@ -15,6 +15,7 @@ from django.urls import reverse
 from django.utils import timezone
 from django.utils.safestring import mark_safe
 from rolepermissions.decorators import has_permission_decorator
+from dashboard.statistics import invalidate_project_statistics
 from reNgine.definitions import (
     PERM_MODIFY_TARGETS,
     FOUR_OH_FOUR_URL,
@@ -190,6 +191,7 @@ def add_target(request, slug):
                         http_url = sanitize_url(http_url)
                         endpoint, created = EndPoint.objects.get_or_create(
                             target_domain=domain,
+                            http_url_hash=EndPoint.get_http_url_hash(http_url),
                             http_url=http_url)
                         if created:
                             logger.info('Added new endpoint %s', endpoint.http_url)
@@ -376,6 +378,7 @@ def delete_target(request, slug, id):
             run_command(f'rm -rf {settings.RENGINE_RESULTS}/{target.name}')
             run_command(f'rm -rf {settings.RENGINE_RESULTS}/{target.name}*') # for backward compatibility
             target.delete()
+            invalidate_project_statistics(target.project_id)
             responseData = {'status': 'true'}
             messages.add_message(
                 request,
@@ -414,6 +417,7 @@ def delete_targets(request, slug):
         for key, value in request.POST.items():
             if key != "list_target_table_length" and key != "csrfmiddlewaretoken":
                 Domain.objects.filter(id=value).delete()
+        invalidate_project_statistics(*Project.objects.filter(slug=slug).values_list('id', flat=True))
         messages.add_message(
             request,
             messages.INFO,
@@ -0,0 +1,96 @@
+"""
+This file contains the test cases for the local CVE store.
+"""
+import io
+import pathlib
+from unittest.mock import patch
+
+from django.core.management import call_command
+
+from reNgine.common_func import CVE_CACHE, get_cves_info
+from reNgine.tasks import parse_nmap_vulners_output
+from startScan.models import CveDetail
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestCveStore',
+]
+
+FIXTURES_DIR = pathlib.Path(__file__).parent / 'fixtures' / 'cve'
+
+VULNERS_OUTPUT = """
+  cpe:/a:apache:http_server:2.4.49:
+    	CVE-2021-41773	7.5	https://vulners.com/cve/CVE-2021-41773
+    	CVE-2014-0160	5.0	https://vulners.com/cve/CVE-2014-0160
+    	CVE-2021-41773	7.5	https://vulners.com/cve/CVE-2021-41773
+"""
+
+
+class TestCveStore(BaseTestCase):
+    """Test CVE lookups from the local CVE store."""
+
+    def setUp(self):
+        super().setUp()
+        CVE_CACHE.clear()
+        call_command('loadcves', str(FIXTURES_DIR / 'nvdcve-1.1-sample.json'), stdout=io.StringIO())
+
+    def tearDown(self):
+        CVE_CACHE.clear()
+        super().tearDown()
+
+    def test_load_nvd_feed(self):
+        """Test NVD feed items are converted to the CVESearch format."""
+        self.assertEqual(CveDetail.objects.count(), 2)
+        cve = CveDetail.objects.get(cve_id='CVE-2021-41773')
+        self.assertEqual(cve.data['cvss'], 7.5)
+        self.assertEqual(cve.data['cwe'], 'CWE-22')
+        self.assertEqual(cve.data['references'], ['https://httpd.apache.org/security/vulnerabilities_24.html'])
+
+        # Loading the feed again updates existing CVEs
+        call_command('loadcves', str(FIXTURES_DIR / 'nvdcve-1.1-sample.json'), stdout=io.StringIO())
+        self.assertEqual(CveDetail.objects.count(), 2)
+
+    @patch('reNgine.common_func.CVESearch')
+    def test_vulners_output_lookup_batched(self, mock_cvesearch):
+        """Test CVEs of a vulners output are fetched in one query, then cached."""
+        with self.assertNumQueries(1):
+            vulns = parse_nmap_vulners_output(VULNERS_OUTPUT)
+        with self.assertNumQueries(0):
+            parse_nmap_vulners_output(VULNERS_OUTPUT)
+        mock_cvesearch.assert_not_called()
+        self.assertEqual([vuln['cve_ids'] for vuln in vulns], [['CVE-2021-41773'], ['CVE-2014-0160']])
+        self.assertEqual(vulns[0]['cvss_score'], 7.5)
+        self.assertEqual(vulns[0]['cwe_ids'], ['CWE-22'])
+
+    @patch('reNgine.common_func.CVESearch')
+    def test_remote_fallback(self, mock_cvesearch):
+        """Test CVEs missing from the local store are fetched remotely and saved."""
+        mock_cvesearch.return_value.id.return_value = {
+            'id': 'CVE-2017-5638',
+            'summary': 'Apache Struts RCE',
+            'cvss': 10.0,
+            'cwe': 'CWE-20',
+        }
+        cves = get_cves_info(['CVE-2014-0160', 'CVE-2017-5638'])
+        self.assertEqual(sorted(cves), ['CVE-2014-0160', 'CVE-2017-5638'])
+        mock_cvesearch.return_value.id.assert_called_once_with('CVE-2017-5638')
+        self.assertTrue(CveDetail.objects.filter(cve_id='CVE-2017-5638').exists())
+
+        with patch('reNgine.common_func.CVE_REMOTE_LOOKUP', False):
+            self.assertEqual(get_cves_info(['CVE-2000-0001']), {})
+        mock_cvesearch.return_value.id.assert_called_once()
+
+    @patch('reNgine.common_func.CVESearch')
+    def test_remote_miss_cached(self, mock_cvesearch):
+        """Test CVEs unknown to the remote API are fetched once."""
+        mock_cvesearch.return_value.id.return_value = None
+        self.assertEqual(get_cves_info(['CVE-2000-0001']), {})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cves_info(['CVE-2000-0001']), {})
+        mock_cvesearch.return_value.id.assert_called_once_with('CVE-2000-0001')
+
+        # Failed lookups are retried
+        mock_cvesearch.return_value.id.side_effect = ConnectionError('Connection refused')
+        get_cves_info(['CVE-2000-0002'])
+        get_cves_info(['CVE-2000-0002'])
+        self.assertEqual(mock_cvesearch.return_value.id.call_count, 3)
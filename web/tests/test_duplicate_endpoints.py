@@ -0,0 +1,100 @@
+"""
+This file contains the test cases for duplicate endpoints removal.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from reNgine.settings import DELETE_DUPLICATES_THRESHOLD
+from reNgine.tasks import remove_duplicate_endpoints
+from startScan.models import EndPoint, ScanStatistics, SubScan, Technology, Vulnerability
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestRemoveDuplicateEndpoints',
+]
+
+
+class TestRemoveDuplicateEndpoints(BaseTestCase):
+    """Test duplicate endpoints are removed in bulk."""
+
+    def setUp(self):
+        super().setUp()
+        self.data_generator.create_project_base()
+        self.scan = self.data_generator.scan_history
+        ScanStatistics.reconcile(self.scan.id)
+        self.now = timezone.now()
+
+    def create_endpoints(self, count, prefix, content_length, page_title='Redirect'):
+        return EndPoint.objects.bulk_create([
+            EndPoint(
+                scan_history=self.scan,
+                target_domain=self.data_generator.domain,
+                subdomain=self.data_generator.subdomain,
+                http_url=f'https://admin.example.com/{prefix}{i}',
+                http_status=200,
+                content_length=content_length,
+                page_title=page_title,
+                discovered_date=self.now + timedelta(seconds=i))
+            for i in range(count)
+        ])
+
+    def remove_duplicates(self):
+        remove_duplicate_endpoints(self.scan.id, self.data_generator.domain.id)
+
+    def test_duplicates_removed(self):
+        """Test only the first discovered endpoint of large groups is kept."""
+        duplicates = self.create_endpoints(DELETE_DUPLICATES_THRESHOLD + 5, 'dup', 100)
+        small_group = self.create_endpoints(DELETE_DUPLICATES_THRESHOLD, 'small', 200)
+        other_title = self.create_endpoints(DELETE_DUPLICATES_THRESHOLD + 5, 'title', 100, page_title='Other')
+        root = EndPoint.objects.create(
+            scan_history=self.scan,
+            target_domain=self.data_generator.domain,
+            http_url='https://www.example.com/',
+            http_status=200,
+            content_length=100,
+            page_title='Redirect',
+            discovered_date=self.now + timedelta(days=1))
+
+        # Select duplicates, read their relations, cascade delete, then
+        # recount the scan results
+        with self.assertNumQueries(14):
+            self.remove_duplicates()
+
+        remaining = EndPoint.objects.filter(scan_history=self.scan)
+        self.assertEqual(
+            list(remaining.filter(http_url__contains='/dup').values_list('id', flat=True)),
+            [duplicates[0].id])
+        self.assertEqual(remaining.filter(http_url__contains='/small').count(), len(small_group))
+        self.assertEqual(remaining.filter(http_url__contains='/title').count(), 1)
+        self.assertTrue(remaining.filter(id=other_title[0].id).exists())
+        self.assertTrue(remaining.filter(id=root.id).exists())
+
+    def test_references_merged(self):
+        """Test techs and subscans of removed endpoints are merged onto the
+        kept endpoint, and their vulnerabilities are removed."""
+        duplicates = self.create_endpoints(DELETE_DUPLICATES_THRESHOLD + 2, 'dup', 100)
+        kept = duplicates[0]
+        nginx = Technology.objects.create(name='Nginx')
+        php = Technology.objects.create(name='PHP')
+        subscan = SubScan.objects.create(
+            start_scan_date=self.now,
+            scan_history=self.scan,
+            subdomain=self.data_generator.subdomain,
+            status=1)
+        kept.techs.add(nginx)
+        duplicates[1].techs.add(nginx, php)
+        duplicates[2].endpoint_subscan_ids.add(subscan)
+        Vulnerability.objects.create(
+            name='Vuln',
+            scan_history=self.scan,
+            target_domain=self.data_generator.domain,
+            endpoint=duplicates[3],
+            severity=1)
+
+        self.remove_duplicates()
+
+        self.assertEqual(EndPoint.objects.filter(http_url__contains='/dup').count(), 1)
+        self.assertEqual(sorted(kept.techs.values_list('name', flat=True)), ['Nginx', 'PHP'])
+        self.assertEqual(list(kept.endpoint_subscan_ids.all()), [subscan])
+        self.assertFalse(Vulnerability.objects.filter(name='Vuln').exists())
@@ -0,0 +1,53 @@
+"""
+This file contains the test cases for the endpoints URL hash.
+"""
+import importlib
+
+from django.db import connection
+
+from reNgine.tasks import save_endpoint
+from startScan.models import EndPoint
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestEndPointURLHash',
+]
+
+migration = importlib.import_module('startScan.migrations.0061_endpoint_http_url_hash_indexes')
+
+
+class TestEndPointURLHash(BaseTestCase):
+    """Test endpoints are looked up by the hash of their URL."""
+
+    def setUp(self):
+        super().setUp()
+        self.data_generator.create_project_base()
+        self.ctx = {
+            'scan_history_id': self.data_generator.scan_history.id,
+            'domain_id': self.data_generator.domain.id,
+        }
+
+    def test_hash_saved(self):
+        """Test the hash is set when endpoints are saved."""
+        endpoint, created = save_endpoint('https://admin.example.com/login?next=/', ctx=self.ctx)
+        self.assertTrue(created)
+        endpoint.refresh_from_db()
+        self.assertEqual(endpoint.http_url_hash, EndPoint.get_http_url_hash(endpoint.http_url))
+        self.assertEqual(save_endpoint('https://admin.example.com/login?next=/', ctx=self.ctx), (endpoint, False))
+
+        endpoint.http_url = 'https://admin.example.com/logout'
+        endpoint.save()
+        self.assertEqual(
+            EndPoint.objects.get(http_url_hash=EndPoint.get_http_url_hash('https://admin.example.com/logout')),
+            endpoint)
+
+    def test_migration_hash(self):
+        """Test the migration computes the same hash as the model."""
+        urls = ['https://admin.example.com/', 'https://admin.example.com/ünïcode?q=日本', 'x' * 20000]
+        EndPoint.objects.bulk_create([EndPoint(http_url=url) for url in urls])
+        with connection.cursor() as cursor:
+            cursor.execute(migration.SET_HTTP_URL_HASHES)
+        for url in urls:
+            self.assertEqual(
+                EndPoint.objects.filter(http_url=url).values_list('http_url_hash', flat=True).get(),
+                EndPoint.get_http_url_hash(url))
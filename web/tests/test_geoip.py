@@ -0,0 +1,81 @@
+"""
+This file contains the test cases for the in-process GeoIP lookups.
+"""
+import pathlib
+from unittest.mock import patch
+
+from reNgine.geoip import GeoIPDatabase
+from reNgine.tasks import geo_localize_ips
+from startScan.models import CountryISO, IpAddress
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestGeoIP',
+]
+
+FIXTURES_DIR = pathlib.Path(__file__).parent / 'fixtures' / 'geoip'
+
+
+class TestGeoIP(BaseTestCase):
+    """Test GeoIP lookups from local databases."""
+
+    def test_legacy_csv_lookup(self):
+        """Test lookups in a legacy MaxMind CSV database."""
+        database = GeoIPDatabase(str(FIXTURES_DIR / 'GeoIPCountryWhois.csv'))
+        self.assertEqual(database.lookup('1.0.0.0'), ('AU', 'Australia'))
+        self.assertEqual(database.lookup('1.0.2.10'), ('CN', 'China'))
+        self.assertEqual(database.lookup('8.8.8.8'), ('US', 'United States'))
+        self.assertIsNone(database.lookup('1.0.4.0'))
+        self.assertIsNone(database.lookup('0.0.0.1'))
+        self.assertIsNone(database.lookup('2001:db8::1'))
+
+    def test_cidr_csv_lookup(self):
+        """Test lookups in a CIDR CSV database, for IPv4 and IPv6."""
+        database = GeoIPDatabase(str(FIXTURES_DIR / 'country_networks.csv'))
+        self.assertEqual(database.lookup('81.2.69.160'), ('GB', 'United Kingdom'))
+        self.assertEqual(database.lookup('2001:db8::1'), ('FR', 'France'))
+        self.assertIsNone(database.lookup('81.2.70.1'))
+
+    @patch('reNgine.geoip.subprocess.run')
+    def test_lookups_are_cached(self, mock_run):
+        """Test the database is not read again for known IPs, and that no
+        process is spawned when a database is loaded."""
+        database = GeoIPDatabase(str(FIXTURES_DIR / 'GeoIPCountryWhois.csv'))
+        with patch.object(database, '_lookup_database', wraps=database._lookup_database) as mock_lookup:
+            for _ in range(3):
+                database.lookup('8.8.8.8')
+        mock_lookup.assert_called_once_with('8.8.8.8')
+        mock_run.assert_not_called()
+
+    @patch('reNgine.geoip.subprocess.run')
+    def test_missing_database(self, mock_run):
+        """Test no process is spawned when the database is missing, unless
+        the geoiplookup fallback is enabled."""
+        missing_path = str(FIXTURES_DIR / 'missing.mmdb')
+        self.assertIsNone(GeoIPDatabase(missing_path).lookup('8.8.8.8'))
+        mock_run.assert_not_called()
+
+        mock_run.return_value.stdout = 'GeoIP Country Edition: US, United States\n'
+        database = GeoIPDatabase(missing_path, lookup_command=True)
+        self.assertEqual(database.lookup('8.8.8.8'), ('US', 'United States'))
+        mock_run.assert_called_once()
+
+    def test_geo_localize_ips(self):
+        """Test countries of a batch of IPs are saved with a constant number
+        of queries."""
+        ips = IpAddress.objects.bulk_create([
+            IpAddress(address=address)
+            for address in ['1.0.0.1', '1.0.0.2', '1.0.1.1', '8.8.8.8', '10.0.0.1']
+        ])
+        database = GeoIPDatabase(str(FIXTURES_DIR / 'GeoIPCountryWhois.csv'))
+        with patch('reNgine.geoip.geoip_database', database), self.assertNumQueries(4):
+            self.assertEqual(geo_localize_ips(ips), 4)
+        self.assertEqual(
+            dict(IpAddress.objects.filter(geo_iso__isnull=False).values_list('address', 'geo_iso__iso')),
+            {'1.0.0.1': 'AU', '1.0.0.2': 'AU', '1.0.1.1': 'CN', '8.8.8.8': 'US'})
+        self.assertEqual(CountryISO.objects.filter(iso='AU').count(), 1)
+
+        # Countries are known, only the IPs are updated
+        ips = IpAddress.objects.bulk_create([IpAddress(address='1.0.0.3'), IpAddress(address='8.8.8.4')])
+        with patch('reNgine.geoip.geoip_database', database), self.assertNumQueries(1):
+            self.assertEqual(geo_localize_ips(ips), 2)
@@ -0,0 +1,96 @@
+"""
+This file contains the test cases for the batched http_crawl ingestion.
+"""
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reNgine.scan_cache import clear_scan_caches
+from reNgine.tasks import parse_httpx_result, save_httpx_results
+from startScan.models import CountryISO, EndPoint, IpAddress, ScanStatistics, Subdomain, Technology
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestHttpCrawlIngestion',
+]
+
+
+class TestHttpCrawlIngestion(BaseTestCase):
+    """Test saving httpx results by chunks."""
+
+    def setUp(self):
+        super().setUp()
+        self.data_generator.create_project_base()
+        ScanStatistics.reconcile(self.data_generator.scan_history.id)
+        self.ctx = {
+            'scan_history_id': self.data_generator.scan_history.id,
+            'domain_id': self.data_generator.domain.id,
+        }
+
+    def get_records(self, count):
+        """Build `count` parsed httpx records spread over a few subdomains."""
+        lines = [
+            {
+                'url': f'https://sub{i % 5}.example.com/page{i}',
+                'host': f'10.0.0.{i % 5}',
+                'a': [f'10.0.0.{i % 5}'],
+                'status_code': 200,
+                'title': f'Page {i}',
+                'content_length': 100 + i,
+                'webserver': 'nginx',
+                'content_type': 'text/html',
+                'time': '12ms',
+                'tech': ['Nginx', f'Tech{i % 3}'],
+            }
+            for i in range(count)
+        ]
+        return [parse_httpx_result(line, follow_redirect=False) for line in lines]
+
+    @patch('reNgine.tasks.get_countries', side_effect=lambda addresses: {address: ('US', 'United States') for address in addresses})
+    def test_save_httpx_results(self, mock_get_countries):
+        """Test subdomains, endpoints, techs and IPs are saved."""
+        saved = save_httpx_results(self.get_records(20), ctx=self.ctx, update_subdomain_metadatas=True)
+        self.assertEqual(len(saved), 20)
+        self.assertTrue(all(created for _, _, created in saved))
+
+        scan = self.data_generator.scan_history
+        self.assertEqual(Subdomain.objects.filter(scan_history=scan, name__startswith='sub').count(), 5)
+        endpoint = EndPoint.objects.get(scan_history=scan, http_url='https://sub1.example.com/page6')
+        self.assertEqual(endpoint.subdomain.name, 'sub1.example.com')
+        self.assertEqual(endpoint.page_title, 'Page 6')
+        self.assertEqual(endpoint.response_time, 0.012)
+        self.assertEqual(
+            sorted(endpoint.techs.values_list('name', flat=True)),
+            ['Nginx', 'Tech0'])
+        self.assertEqual(Technology.objects.filter(name__in=['Nginx', 'Tech0', 'Tech1', 'Tech2']).count(), 4)
+        self.assertEqual(
+            list(endpoint.subdomain.ip_addresses.values_list('address', flat=True)),
+            ['10.0.0.1'])
+        self.assertEqual(IpAddress.objects.filter(address__startswith='10.0.0.').count(), 5)
+        mock_get_countries.assert_called_once()
+        self.assertEqual(IpAddress.objects.filter(address__startswith='10.0.0.', geo_iso__iso='US').count(), 5)
+        self.assertEqual(endpoint.subdomain.http_status, 200)
+        self.assertEqual(endpoint.subdomain.technologies.count(), 4)
+
+        # Saving the same results again updates existing rows
+        saved = save_httpx_results(self.get_records(20), ctx=self.ctx)
+        self.assertFalse(any(created for _, _, created in saved))
+        self.assertEqual(EndPoint.objects.filter(scan_history=scan, http_url__startswith='https://sub').count(), 20)
+
+    @patch('reNgine.tasks.get_countries', side_effect=lambda addresses: {address: ('US', 'United States') for address in addresses})
+    def test_save_httpx_results_query_count(self, mock_get_countries):
+        """Test the number of queries does not depend on the chunk size."""
+        with CaptureQueriesContext(connection) as small_chunk:
+            save_httpx_results(self.get_records(10), ctx=self.ctx, update_subdomain_metadatas=True)
+        EndPoint.objects.filter(http_url__startswith='https://sub').delete()
+        Subdomain.objects.filter(name__startswith='sub').delete()
+        Technology.objects.filter(name__in=['Nginx', 'Tech0', 'Tech1', 'Tech2']).delete()
+        IpAddress.objects.filter(address__startswith='10.0.0.').delete()
+        CountryISO.objects.filter(iso='US').delete()
+        # Rows were deleted outside of a task
+        clear_scan_caches()
+        with CaptureQueriesContext(connection) as large_chunk:
+            save_httpx_results(self.get_records(200), ctx=self.ctx, update_subdomain_metadatas=True)
+        self.assertEqual(len(small_chunk.captured_queries), len(large_chunk.captured_queries))
+        self.assertLess(len(large_chunk.captured_queries), 25)
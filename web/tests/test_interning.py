@@ -0,0 +1,66 @@
+"""
+This file contains the test cases for the lookup tables interning.
+"""
+from reNgine.interning import intern_id, intern_ids, intern_tables
+from startScan.models import Port, Technology
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestInterning',
+]
+
+
+class TestInterning(BaseTestCase):
+    """Test lookup table ids are loaded once and missing rows created in bulk."""
+
+    def setUp(self):
+        super().setUp()
+        Technology.objects.bulk_create([Technology(name=f'tech{i}') for i in range(10)])
+
+    def test_known_ids_cached(self):
+        """Test the table is loaded once, then known ids are served from memory."""
+        with self.assertNumQueries(1):
+            ids = intern_ids(Technology, [f'tech{i}' for i in range(10)])
+        self.assertEqual(ids, dict(Technology.objects.filter(name__startswith='tech').values_list('name', 'id')))
+        with self.assertNumQueries(0):
+            for i in range(10):
+                self.assertEqual(intern_id(Technology, f'tech{i}'), ids[f'tech{i}'])
+            self.assertIsNone(intern_id(Technology, ''))
+
+    def test_missing_rows_created_in_bulk(self):
+        """Test missing rows are created with a constant number of queries,
+        and are not duplicated."""
+        intern_ids(Technology, ['tech0'])
+        names = [f'new{i}' for i in range(20)]
+        # Rows created by other processes, insert and select
+        with self.assertNumQueries(3):
+            ids = intern_ids(Technology, names + ['tech1'])
+        self.assertEqual(len(ids), 21)
+        self.assertEqual(Technology.objects.filter(name__in=names).count(), 20)
+
+        # Another process does not create them again
+        intern_tables[Technology].clear()
+        self.assertEqual(intern_ids(Technology, names), {name: ids[name] for name in names})
+        self.assertEqual(Technology.objects.filter(name__in=names).count(), 20)
+
+    def test_oldest_duplicate_used(self):
+        """Test the oldest row is used when the values are duplicated."""
+        duplicate = Technology.objects.create(name='tech0')
+        self.assertNotEqual(intern_id(Technology, 'tech0'), duplicate.id)
+        self.assertEqual(intern_id(Technology, 'tech0'), Technology.objects.filter(name='tech0').order_by('id')[0].id)
+
+    def test_multiple_fields(self):
+        """Test rows identified by several fields get their defaults."""
+        ids = intern_ids(Port, [(81, 'http', ''), (22, 'ssh', ''), (22, 'ssh2', '')])
+        self.assertEqual(len(set(ids.values())), 3)
+        self.assertTrue(Port.objects.get(id=ids[(81, 'http', '')]).is_uncommon)
+        self.assertFalse(Port.objects.get(id=ids[(22, 'ssh', '')]).is_uncommon)
+        self.assertEqual(intern_id(Port, (22, 'ssh', '')), ids[(22, 'ssh', '')])
+
+    def test_invalidated_on_delete(self):
+        """Test deleted rows are dropped from the table."""
+        tech_id = intern_id(Technology, 'tech0')
+        Technology.objects.filter(id=tech_id).delete()
+        new_id = intern_id(Technology, 'tech0')
+        self.assertNotEqual(new_id, tech_id)
+        self.assertTrue(Technology.objects.filter(id=new_id).exists())
@@ -0,0 +1,140 @@
+"""
+This file contains the test cases for task notifications coalescing.
+"""
+import json
+import os
+import pathlib
+import stat
+import tempfile
+import time
+from unittest.mock import patch
+
+from reNgine.celery_custom_task import RengineTask
+from reNgine.definitions import DISCORD_FIELD_MAX_LENGTH, RUNNING_TASK, SUCCESS_TASK
+from reNgine.tasks import http_crawl
+from scanEngine.models import Notification
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestTaskNotifications',
+]
+
+FAKE_HTTPX = """#!/bin/sh
+cat {results_path}
+"""
+
+
+@patch('reNgine.tasks.send_task_notif')
+class TestTaskNotifications(BaseTestCase):
+    """Test task notification fields are merged before being sent."""
+
+    def setUp(self):
+        super().setUp()
+        self.data_generator.create_project_base()
+        Notification.objects.all().delete()
+        Notification.objects.create(send_scan_status_notif=True)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.ctx = {
+            'scan_history_id': self.data_generator.scan_history.id,
+            'domain_id': self.data_generator.domain.id,
+            'results_dir': self.tmp_dir.name,
+            'yaml_configuration': {},
+        }
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def get_task(self):
+        task = RengineTask()
+        task.task_name = 'http_crawl'
+        task.status = RUNNING_TASK
+        task.result = ['https://admin.example.com']
+        task.traceback = None
+        task.output_path = None
+        task.scan_id = task.engine_id = task.subscan_id = None
+        task.notification = None
+        task.pending_fields = {}
+        task.pending_meta_info = False
+        task.last_notify_flush = time.time()
+        return task
+
+    def test_notify_fields_are_merged(self, mock_send_task_notif):
+        """Test field updates are merged and sent along with the task status."""
+        task = self.get_task()
+        for i in range(100):
+            task.notify(fields={'Alive endpoint': f'• https://sub{i % 10}.example.com'}, add_meta_info=False)
+            task.notify(fields={'Technologies': '`Nginx`'}, add_meta_info=False)
+        mock_send_task_notif.delay.assert_not_called()
+
+        task.status = SUCCESS_TASK
+        task.notify()
+        mock_send_task_notif.delay.assert_called_once()
+        kwargs = mock_send_task_notif.delay.call_args.kwargs
+        self.assertEqual(kwargs['update_fields']['Technologies'], '`Nginx`')
+        self.assertEqual(len(kwargs['update_fields']['Alive endpoint'].splitlines()), 10)
+        self.assertIs(kwargs['result'], True)
+
+    def test_notify_fields_flushed_periodically(self, mock_send_task_notif):
+        """Test merged fields are sent once the flush interval has elapsed."""
+        task = self.get_task()
+        start = task.last_notify_flush
+        with patch('reNgine.celery_custom_task.time.time') as mock_time:
+            for i in range(20):
+                mock_time.return_value = start + i
+                task.notify(fields={'IPs': f'• `10.0.0.{i}`'})
+        # Flushed at t=5, t=10, t=15
+        self.assertEqual(mock_send_task_notif.delay.call_count, 3)
+
+    def test_notify_disabled(self, mock_send_task_notif):
+        """Test no message is enqueued when task notifications are disabled."""
+        Notification.objects.update(send_scan_status_notif=False)
+        task = self.get_task()
+        task.status = SUCCESS_TASK
+        task.notify(fields={'IPs': '• `10.0.0.1`'})
+        mock_send_task_notif.delay.assert_not_called()
+
+    def test_merged_fields_are_truncated(self, mock_send_task_notif):
+        """Test merged fields are cut at the Discord embed field limit."""
+        task = self.get_task()
+        for i in range(100):
+            task.notify(fields={'Alive endpoint': f'• https://sub{i}.example.com'}, add_meta_info=False)
+        task.status = SUCCESS_TASK
+        task.notify()
+        value = mock_send_task_notif.delay.call_args.kwargs['update_fields']['Alive endpoint']
+        self.assertEqual(len(value), DISCORD_FIELD_MAX_LENGTH - 2)
+        self.assertTrue(value.endswith('\n[...]'))
+
+    @patch('reNgine.tasks.get_countries', return_value={})
+    @patch('reNgine.celery_custom_task.time.time', return_value=0)
+    def test_http_crawl_notifications(self, mock_time, mock_get_countries, mock_send_task_notif):
+        """Test a crawl sends its running notifications merged, instead of a
+        few messages per line."""
+        results_path = pathlib.Path(self.tmp_dir.name) / 'httpx.jsonl'
+        with open(results_path, 'w') as f:
+            for i in range(50):
+                f.write(json.dumps({
+                    'url': f'https://sub{i % 5}.example.com/page{i}',
+                    'host': f'10.0.0.{i % 5}',
+                    'a': [f'10.0.0.{i % 5}'],
+                    'status_code': 200,
+                    'title': f'Page {i}',
+                    'content_length': i,
+                    'webserver': 'nginx',
+                    'time': '10ms',
+                    'tech': ['Nginx'],
+                }) + '\n')
+        httpx_path = pathlib.Path(self.tmp_dir.name) / 'httpx'
+        httpx_path.write_text(FAKE_HTTPX.format(results_path=results_path))
+        httpx_path.chmod(httpx_path.stat().st_mode | stat.S_IEXEC)
+
+        with patch.dict(os.environ, {'PATH': f'{self.tmp_dir.name}:{os.environ["PATH"]}'}):
+            http_crawl.apply(kwargs={
+                'urls': ['https://admin.example.com', 'https://www.example.com'],
+                'ctx': self.ctx,
+                'should_remove_duplicate_endpoints': False})
+
+        # The clock does not move: task start and end notifications only
+        self.assertEqual(mock_send_task_notif.delay.call_count, 2)
+        update_fields = mock_send_task_notif.delay.call_args.kwargs['update_fields']
+        self.assertEqual(update_fields['Technologies'], '`Nginx`')
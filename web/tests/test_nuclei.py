@@ -0,0 +1,103 @@
+"""
+This file contains the test cases for the nuclei vulnerability scan tasks.
+"""
+import os
+import pathlib
+import stat
+import tempfile
+from unittest.mock import patch
+
+from reNgine.definitions import NUCLEI_SEVERITY_MAP
+from reNgine.tasks import nuclei_individual_severity_module
+from scanEngine.models import Notification
+from startScan.models import Vulnerability
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestNucleiScan',
+]
+
+FIXTURES_DIR = pathlib.Path(__file__).parent / 'fixtures' / 'nuclei'
+
+FAKE_NUCLEI = """#!/bin/sh
+echo "$@" >> {calls_path}
+cat {results_path}
+"""
+
+
+class TestNucleiScan(BaseTestCase):
+    """Test nuclei runs once and its output is split by severity."""
+
+    def setUp(self):
+        super().setUp()
+        self.data_generator.create_project_base()
+        Notification.objects.all().delete()
+        Notification.objects.create(send_vuln_notif=True, send_scan_status_notif=False)
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.calls_path = pathlib.Path(self.tmp_dir.name) / 'calls.txt'
+        nuclei_path = pathlib.Path(self.tmp_dir.name) / 'nuclei'
+        nuclei_path.write_text(FAKE_NUCLEI.format(
+            calls_path=self.calls_path,
+            results_path=FIXTURES_DIR / 'nuclei_results.jsonl'))
+        nuclei_path.chmod(nuclei_path.stat().st_mode | stat.S_IEXEC)
+        self.path_patcher = patch.dict(os.environ, {'PATH': f'{self.tmp_dir.name}:{os.environ["PATH"]}'})
+        self.path_patcher.start()
+
+    def tearDown(self):
+        self.path_patcher.stop()
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    @patch('reNgine.celery_custom_task.RENGINE_RAISE_ON_ERROR', True)
+    @patch('reNgine.celery_custom_task.RengineTask.notify')
+    def test_single_nuclei_run_demultiplexed_by_severity(self, mock_notify):
+        """Test all severities are scanned in a single nuclei run."""
+        severities = ['info', 'low', 'medium', 'high', 'critical']
+        ctx = {
+            'scan_history_id': self.data_generator.scan_history.id,
+            'domain_id': self.data_generator.domain.id,
+            'results_dir': self.tmp_dir.name,
+            'yaml_configuration': {},
+        }
+        nuclei_individual_severity_module.apply(
+            args=['nuclei -j -silent', severities, False, False],
+            kwargs={'ctx': ctx})
+
+        calls = self.calls_path.read_text().splitlines()
+        self.assertEqual(len(calls), 1)
+        self.assertIn('-severity info,low,medium,high,critical', calls[0])
+
+        vulns = Vulnerability.objects.filter(scan_history=self.data_generator.scan_history)
+        self.assertEqual(vulns.count(), 6)
+        for severity, count in [('info', 2), ('low', 1), ('medium', 1), ('high', 1), ('critical', 1)]:
+            self.assertEqual(vulns.filter(severity=NUCLEI_SEVERITY_MAP[severity]).count(), count)
+
+        vuln_notifs = [
+            call for call in mock_notify.call_args_list
+            if call.args and str(call.args[0]).startswith('vulnerability_scan_#')
+        ]
+        self.assertEqual(len(vuln_notifs), 4)
+        self.assertEqual(
+            sorted(call.args[2]['Severity'] for call in vuln_notifs),
+            sorted(f'**{severity.upper()}**' for severity in ['low', 'medium', 'high', 'critical']))
+
+    @patch('reNgine.celery_custom_task.RENGINE_RAISE_ON_ERROR', True)
+    @patch('reNgine.celery_custom_task.RengineTask.notify')
+    def test_duplicates_skipped_before_endpoints(self, mock_notify):
+        """Test vulnerabilities found again are skipped before their endpoint
+        is looked up or crawled."""
+        ctx = {
+            'scan_history_id': self.data_generator.scan_history.id,
+            'domain_id': self.data_generator.domain.id,
+            'results_dir': self.tmp_dir.name,
+            'yaml_configuration': {},
+        }
+        args = ['nuclei -j -silent', ['info', 'low', 'medium', 'high', 'critical'], True, False]
+        with patch('reNgine.tasks.save_endpoint', return_value=(None, False)) as mock_save_endpoint:
+            nuclei_individual_severity_module.apply(args=args, kwargs={'ctx': dict(ctx)})
+            self.assertEqual(mock_save_endpoint.call_count, 6)
+            mock_save_endpoint.reset_mock()
+            nuclei_individual_severity_module.apply(args=args, kwargs={'ctx': dict(ctx)})
+            mock_save_endpoint.assert_not_called()
+        self.assertEqual(Vulnerability.objects.filter(scan_history=self.data_generator.scan_history).count(), 6)
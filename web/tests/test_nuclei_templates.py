@@ -0,0 +1,132 @@
+"""
+This file contains the test cases for the nuclei templates updates.
+"""
+import os
+import pathlib
+import stat
+import tempfile
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.utils import timezone
+
+from reNgine.common_func import nuclei_templates_need_update
+from reNgine.tasks import update_nuclei_templates
+from scanEngine.models import NucleiTemplatesUpdate
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestNucleiTemplatesUpdate',
+]
+
+FAKE_NUCLEI = """#!/bin/sh
+echo run >> {runs_path}
+mkdir -p {templates_path}
+echo "id: {template_id}" > {templates_path}/template.yaml
+"""
+
+
+class FakeLock:
+    """Non-reentrant lock with the redis lock interface."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.blocking_calls = 0
+
+    def acquire(self, blocking=True, blocking_timeout=None):
+        if blocking:
+            self.blocking_calls += 1
+            return self.lock.acquire(timeout=blocking_timeout or -1)
+        return self.lock.acquire(blocking)
+
+    def release(self):
+        self.lock.release()
+
+
+class TestNucleiTemplatesUpdate(BaseTestCase):
+    """Test nuclei templates are updated at most once per TTL."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.templates_path = pathlib.Path(self.tmp_dir.name) / 'nuclei-templates'
+        self.runs_path = pathlib.Path(self.tmp_dir.name) / 'runs.txt'
+        self.set_templates('template-1')
+        self.lock = FakeLock()
+        patchers = [
+            patch('reNgine.common_func.NUCLEI_DEFAULT_TEMPLATES_PATH', str(self.templates_path)),
+            patch('reNgine.tasks.get_redis_lock', return_value=self.lock),
+            patch.dict(os.environ, {'PATH': f'{self.tmp_dir.name}:{os.environ["PATH"]}'}),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def set_templates(self, template_id):
+        nuclei_path = pathlib.Path(self.tmp_dir.name) / 'nuclei'
+        nuclei_path.write_text(FAKE_NUCLEI.format(
+            runs_path=self.runs_path,
+            templates_path=self.templates_path,
+            template_id=template_id))
+        nuclei_path.chmod(nuclei_path.stat().st_mode | stat.S_IEXEC)
+
+    def get_runs(self):
+        if not self.runs_path.exists():
+            return 0
+        return len(self.runs_path.read_text().splitlines())
+
+    def test_update_once_per_ttl(self):
+        """Test templates are updated once, then not before the TTL expired."""
+        self.assertTrue(nuclei_templates_need_update())
+        self.assertTrue(update_nuclei_templates())
+        self.assertEqual(self.get_runs(), 1)
+        templates_update = NucleiTemplatesUpdate.objects.get()
+        self.assertIsNotNone(templates_update.checksum)
+        self.assertEqual(templates_update.updated_at, templates_update.checked_at)
+
+        self.assertFalse(nuclei_templates_need_update())
+        self.assertFalse(update_nuclei_templates())
+        self.assertEqual(self.get_runs(), 1)
+
+    def test_checksum_changes(self):
+        """Test the checksum and update time only change with templates."""
+        update_nuclei_templates()
+        templates_update = NucleiTemplatesUpdate.objects.get()
+
+        # Same templates
+        self.assertFalse(update_nuclei_templates(force=True))
+        same = NucleiTemplatesUpdate.objects.get()
+        self.assertEqual(same.checksum, templates_update.checksum)
+        self.assertEqual(same.updated_at, templates_update.updated_at)
+        self.assertGreater(same.checked_at, templates_update.checked_at)
+
+        # New templates, once the TTL expired
+        NucleiTemplatesUpdate.objects.update(checked_at=timezone.now() - timedelta(days=2))
+        self.set_templates('template-2')
+        self.assertTrue(update_nuclei_templates())
+        changed = NucleiTemplatesUpdate.objects.get()
+        self.assertNotEqual(changed.checksum, templates_update.checksum)
+        self.assertGreater(changed.updated_at, templates_update.updated_at)
+        self.assertEqual(self.get_runs(), 3)
+
+    def test_concurrent_update_skipped(self):
+        """Test templates are not updated while another worker updates them."""
+        self.lock.acquire()
+        self.assertFalse(update_nuclei_templates(force=True))
+        self.assertEqual(self.get_runs(), 0)
+        self.lock.release()
+        self.assertTrue(update_nuclei_templates())
+        self.assertEqual(self.get_runs(), 1)
+
+    def test_wait_for_concurrent_update(self):
+        """Test waiting for another worker updating templates, and that
+        templates are not updated again once it is done."""
+        self.assertTrue(update_nuclei_templates())
+        self.assertFalse(update_nuclei_templates(wait=True))
+        self.assertEqual(self.lock.blocking_calls, 1)
+        self.assertEqual(self.get_runs(), 1)
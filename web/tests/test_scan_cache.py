@@ -0,0 +1,94 @@
+"""
+This file contains the test cases for the scan-scoped rows cache.
+"""
+from reNgine.scan_cache import clear_scan_caches, get_scan_cache
+from reNgine.tasks import save_endpoint, save_subdomain, save_subdomain_metadata
+from startScan.models import EndPoint, Subdomain
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestScanCache',
+]
+
+
+class TestScanCache(BaseTestCase):
+    """Test lookups of scan rows are served from the scan cache."""
+
+    def setUp(self):
+        super().setUp()
+        self.data_generator.create_project_base()
+        self.ctx = {
+            'scan_history_id': self.data_generator.scan_history.id,
+            'domain_id': self.data_generator.domain.id,
+        }
+        Subdomain.objects.bulk_create([
+            Subdomain(
+                scan_history=self.data_generator.scan_history,
+                target_domain=self.data_generator.domain,
+                name=f'sub{i}.example.com')
+            for i in range(20)
+        ])
+
+    def test_save_subdomain(self):
+        """Test existing subdomains are found with a single row read once the
+        scan subdomains are loaded, and new subdomains are registered."""
+        # Domain, scan subdomain ids and subdomain row
+        with self.assertNumQueries(3):
+            subdomain, created = save_subdomain('sub0.example.com', ctx=self.ctx)
+        self.assertFalse(created)
+        self.assertEqual(subdomain.name, 'sub0.example.com')
+        with self.assertNumQueries(20):
+            for i in range(20):
+                save_subdomain(f'sub{i}.example.com', ctx=self.ctx)
+
+        subdomain, created = save_subdomain('new.example.com', ctx=self.ctx)
+        self.assertTrue(created)
+        with self.assertNumQueries(1):
+            self.assertEqual(save_subdomain('new.example.com', ctx=self.ctx), (subdomain, False))
+        self.assertEqual(Subdomain.objects.filter(name='new.example.com').count(), 1)
+
+    def test_concurrent_updates_kept(self):
+        """Test subdomains are read fresh, and only the columns a task sets
+        are written, so updates from other tasks are kept."""
+        scan_cache = get_scan_cache(self.ctx)
+        subdomain_id = scan_cache.get_subdomain_id('sub0.example.com')
+        subdomain = scan_cache.get_subdomain('sub0.example.com')
+
+        # Screenshot saved by another task meanwhile
+        Subdomain.objects.filter(id=subdomain_id).update(screenshot_path='/screenshots/sub0.png')
+        self.assertEqual(scan_cache.get_subdomain('sub0.example.com').screenshot_path, '/screenshots/sub0.png')
+
+        endpoint = EndPoint.objects.create(
+            scan_history=self.data_generator.scan_history,
+            target_domain=self.data_generator.domain,
+            subdomain_id=subdomain_id,
+            http_url='https://sub0.example.com',
+            http_status=200,
+            page_title='Sub 0')
+        save_subdomain_metadata(subdomain, endpoint)
+        subdomain.refresh_from_db()
+        self.assertEqual(subdomain.page_title, 'Sub 0')
+        self.assertEqual(subdomain.screenshot_path, '/screenshots/sub0.png')
+
+    def test_missing_subdomain_queried_once(self):
+        """Test subdomains missing from the scan are queried only once."""
+        scan_cache = get_scan_cache(self.ctx)
+        scan_cache.get_subdomain('sub0.example.com')
+        with self.assertNumQueries(1):
+            for _ in range(10):
+                self.assertIsNone(scan_cache.get_subdomain('missing.example.com'))
+
+    def test_save_endpoint(self):
+        """Test the domain and scan are looked up once for many endpoints."""
+        save_endpoint('https://sub0.example.com/', ctx=self.ctx)
+        # Endpoint lookup, insert, statistics and endpoint update only
+        with self.assertNumQueries(40):
+            for i in range(10):
+                save_endpoint(f'https://sub0.example.com/page{i}', ctx=self.ctx)
+
+    def test_caches_cleared(self):
+        """Test caches are dropped before tasks run."""
+        scan_cache = get_scan_cache(self.ctx)
+        self.assertIs(get_scan_cache(self.ctx), scan_cache)
+        clear_scan_caches()
+        self.assertIsNot(get_scan_cache(self.ctx), scan_cache)
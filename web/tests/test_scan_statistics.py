@@ -0,0 +1,108 @@
+"""
+This file contains the test cases for the scan statistics.
+"""
+from django.urls import reverse
+
+from reNgine.tasks import create_scan_activity, save_endpoint, save_subdomain, save_vulnerability
+from startScan.models import ScanHistory, ScanStatistics
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestScanStatistics',
+]
+
+COUNT_FIELDS = [
+    'subdomain_count',
+    'endpoint_count',
+    'vulnerability_count',
+    *ScanStatistics.SEVERITY_FIELDS.values(),
+    'activity_count',
+]
+
+
+class TestScanStatistics(BaseTestCase):
+    """Test scan statistics are kept up to date with the scan results."""
+
+    def setUp(self):
+        super().setUp()
+        self.data_generator.create_project_base()
+        self.scan = self.data_generator.scan_history
+        self.ctx = {
+            'scan_history_id': self.scan.id,
+            'domain_id': self.data_generator.domain.id,
+        }
+
+    def get_counts(self, statistics):
+        return {field: getattr(statistics, field) for field in COUNT_FIELDS}
+
+    def get_statistics(self):
+        return ScanStatistics.objects.get(scan_history=self.scan)
+
+    def test_results_counted(self):
+        """Test counters are incremented as results are saved."""
+        self.assertEqual(self.scan.get_subdomain_count(), 1)
+        self.assertEqual(self.scan.get_endpoint_count(), 1)
+
+        save_subdomain('new.example.com', ctx=self.ctx)
+        save_subdomain('new.example.com', ctx=self.ctx)
+        save_endpoint('https://new.example.com/login', ctx=self.ctx)
+        for severity, matcher_name in [(3, 'a'), (3, 'b'), (-1, 'c')]:
+            save_vulnerability(
+                scan_history=self.scan,
+                target_domain=self.data_generator.domain,
+                http_url='https://new.example.com/login',
+                name='Login Exposed',
+                matcher_name=matcher_name,
+                severity=severity)
+        create_scan_activity(self.scan.id, 'Task', 2)
+
+        statistics = self.get_statistics()
+        self.assertEqual(statistics.subdomain_count, 2)
+        self.assertEqual(statistics.endpoint_count, 2)
+        self.assertEqual(statistics.vulnerability_count, 3)
+        self.assertEqual(statistics.high_vulnerability_count, 2)
+        self.assertEqual(statistics.unknown_vulnerability_count, 1)
+        self.assertEqual(statistics.activity_count, 1)
+        self.assertEqual(
+            self.get_counts(statistics),
+            self.get_counts(ScanStatistics.reconcile(self.scan.id)))
+
+    def test_reconcile(self):
+        """Test reconciliation fixes counters drift."""
+        ScanStatistics.reconcile(self.scan.id)
+        ScanStatistics.objects.filter(scan_history=self.scan).update(subdomain_count=10, endpoint_count=-1)
+        statistics = ScanStatistics.reconcile(self.scan.id)
+        self.assertEqual(statistics.subdomain_count, 1)
+        self.assertEqual(statistics.endpoint_count, 1)
+        self.assertEqual(self.get_counts(self.get_statistics()), self.get_counts(statistics))
+        self.assertIsNotNone(self.get_statistics().reconciled_at)
+
+    def test_deleted_results_recounted(self):
+        """Test results deleted by users are not counted anymore."""
+        vulnerability = self.data_generator.create_vulnerability()[-1]
+        self.assertEqual(self.scan.get_low_vulnerability_count(), 1)
+        response = self.client.post(reverse('api:delete_vulnerability'), {'vulnerability_ids': [vulnerability.id]})
+        self.assertTrue(response.data['status'])
+        self.assertEqual(self.get_statistics().low_vulnerability_count, 0)
+
+        response = self.client.post(
+            reverse('api:delete_subdomain'),
+            {'subdomain_ids': [str(self.data_generator.subdomain.id)]})
+        self.assertTrue(response.data['status'])
+        self.assertEqual(self.get_statistics().subdomain_count, 0)
+
+    def test_query_count(self):
+        """Test counts of listed scans are read without extra queries."""
+        ScanStatistics.reconcile(self.scan.id)
+        for _ in range(3):
+            scan = ScanHistory.objects.get(pk=self.scan.pk)
+            scan.pk = None
+            scan.save()
+            ScanStatistics.reconcile(scan.id)
+        with self.assertNumQueries(1):
+            scans = list(ScanHistory.objects.filter(domain=self.data_generator.domain).select_related('statistics'))
+        with self.assertNumQueries(0):
+            for scan in scans:
+                scan.get_subdomain_count()
+                scan.get_vulnerability_count()
+                scan.get_progress()
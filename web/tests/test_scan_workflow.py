@@ -0,0 +1,155 @@
+"""
+This file contains the test cases for tasks running their sub-tasks as chords.
+"""
+import os
+import pathlib
+import stat
+import tempfile
+from unittest.mock import PropertyMock, patch
+
+from celery import Celery, chord
+from celery.backends.cache import CacheBackend
+from celery.exceptions import Ignore
+
+from reNgine.celery_custom_task import ChordSafeTask
+from reNgine.definitions import FAILED_TASK, RUNNING_TASK, SUCCESS_TASK
+from reNgine.tasks import nuclei_scan, vulnerability_scan
+from startScan.models import ScanActivity, ScanHistory, Vulnerability
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestScanWorkflow',
+]
+
+FIXTURES_DIR = pathlib.Path(__file__).parent / 'fixtures' / 'nuclei'
+
+FAKE_NUCLEI = """#!/bin/sh
+cat {results_path}
+"""
+
+
+@vulnerability_scan.app.task(name='failing_chord_part', base=ChordSafeTask)
+def failing_chord_part():
+    raise ValueError('Tool failed')
+
+
+@patch('reNgine.celery_custom_task.RENGINE_RAISE_ON_ERROR', True)
+@patch('reNgine.celery_custom_task.RengineTask.notify')
+@patch('reNgine.tasks.send_task_notif')
+@patch('reNgine.tasks.update_nuclei_templates')
+@patch('reNgine.tasks.time.sleep', side_effect=AssertionError('Tasks must not poll their sub-tasks'))
+class TestScanWorkflow(BaseTestCase):
+    """Test tasks release their worker slot while their sub-tasks run."""
+
+    def setUp(self):
+        super().setUp()
+        self.data_generator.create_project_base()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        # In-memory result backend storing the chords state
+        self.backend_patcher = patch.object(Celery, 'backend', new_callable=PropertyMock)
+        self.backend_patcher.start().return_value = CacheBackend(app=vulnerability_scan.app, backend='memory')
+        self.ctx = {
+            'scan_history_id': self.data_generator.scan_history.id,
+            'domain_id': self.data_generator.domain.id,
+            'results_dir': self.tmp_dir.name,
+            'yaml_configuration': {
+                'vulnerability_scan': {
+                    'run_s3scanner': False,
+                    'intensity': 'aggressive',
+                }
+            },
+        }
+
+    def tearDown(self):
+        self.backend_patcher.stop()
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def test_concurrent_scans_release_worker_slots(self, *mocks):
+        """Test many concurrent vulnerability scans do not hold a worker slot
+        each while nuclei is running."""
+        sent = []
+        scans = []
+        for _ in range(20):
+            scan = ScanHistory.objects.get(pk=self.data_generator.scan_history.pk)
+            scan.pk = None
+            scan.save()
+            scans.append(scan)
+
+        with patch('celery.canvas.Signature.delay', autospec=True, side_effect=lambda sig: sent.append(sig)):
+            for scan in scans:
+                ctx = dict(self.ctx, scan_history_id=scan.id)
+                # Replaced tasks are acknowledged by the worker which can
+                # pick the next message straight away.
+                with self.assertRaises(Ignore):
+                    vulnerability_scan(urls=['https://admin.example.com'], ctx=ctx)
+
+        # One chord waiting on nuclei per scan, no worker is busy
+        self.assertEqual(len(sent), len(scans))
+        for sig in sent:
+            self.assertIsInstance(sig, chord)
+            self.assertEqual([task.name for task in sig.tasks.tasks], ['nuclei_scan'])
+        activities = ScanActivity.objects.filter(name='vulnerability_scan', scan_of__in=scans)
+        self.assertEqual(activities.count(), len(scans))
+        self.assertFalse(activities.exclude(status=RUNNING_TASK).exists())
+
+        # Chord callbacks mark the tasks as done once nuclei is done
+        for sig in sent:
+            sig.body.apply()
+        self.assertEqual(activities.filter(status=SUCCESS_TASK).count(), len(scans))
+
+    def test_vulnerability_scan_eager(self, *mocks):
+        """Test the vulnerability scan chords run to completion eagerly."""
+        nuclei_path = pathlib.Path(self.tmp_dir.name) / 'nuclei'
+        nuclei_path.write_text(FAKE_NUCLEI.format(results_path=FIXTURES_DIR / 'nuclei_results.jsonl'))
+        nuclei_path.chmod(nuclei_path.stat().st_mode | stat.S_IEXEC)
+        with patch.dict(os.environ, {'PATH': f'{self.tmp_dir.name}:{os.environ["PATH"]}'}), \
+                patch('reNgine.tasks.NUCLEI_DEFAULT_TEMPLATES_PATH', self.tmp_dir.name):
+            vulnerability_scan.apply(
+                kwargs={'urls': ['https://admin.example.com'], 'ctx': self.ctx})
+
+        scan = self.data_generator.scan_history
+        self.assertEqual(Vulnerability.objects.filter(scan_history=scan).count(), 6)
+        activities = ScanActivity.objects.filter(scan_of=scan)
+        self.assertEqual(
+            sorted(activities.values_list('name', flat=True)),
+            ['nuclei_individual_severity_module', 'nuclei_scan', 'vulnerability_scan'])
+        self.assertFalse(activities.filter(status__in=[RUNNING_TASK, FAILED_TASK]).exists())
+
+    def test_missing_nuclei_templates(self, mock_sleep, mock_update_nuclei_templates, *mocks):
+        """Test nuclei waits for templates being downloaded, and does not run
+        without them."""
+        missing_path = os.path.join(self.tmp_dir.name, 'nuclei-templates')
+        with patch('reNgine.tasks.NUCLEI_DEFAULT_TEMPLATES_PATH', missing_path):
+            with self.assertRaises(FileNotFoundError):
+                nuclei_scan(urls=['https://admin.example.com'], ctx=dict(self.ctx))
+        mock_update_nuclei_templates.assert_called_once_with(wait=True)
+
+    def test_failing_chord_part(self, *mocks):
+        """Test a task failing in a chord header does not stop the chord."""
+        with self.assertRaises(ValueError):
+            failing_chord_part()
+
+        failing_chord_part.push_request(chord={'task': 'finish_task'})
+        try:
+            self.assertIsNone(failing_chord_part())
+        finally:
+            failing_chord_part.pop_request()
+
+    def test_failing_rengine_task_in_chord(self, *mocks):
+        """Test a RengineTask failing in a chord header is marked as failed
+        without raising, even with RENGINE_RAISE_ON_ERROR."""
+        ctx = dict(self.ctx, yaml_configuration={})
+        with patch.object(vulnerability_scan, 'run', side_effect=ValueError('Tool failed')):
+            with self.assertRaises(ValueError):
+                vulnerability_scan(urls=[], ctx=dict(ctx))
+
+            vulnerability_scan.push_request(chord={'task': 'finish_task'})
+            try:
+                result = vulnerability_scan(urls=[], ctx=dict(ctx))
+                self.assertIn('Tool failed', result)
+            finally:
+                vulnerability_scan.pop_request()
+
+        activities = ScanActivity.objects.filter(name='vulnerability_scan', scan_of=self.data_generator.scan_history)
+        self.assertEqual(activities.filter(status=FAILED_TASK).count(), 2)
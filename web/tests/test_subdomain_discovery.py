@@ -0,0 +1,75 @@
+"""
+This file contains the test cases for the subdomain discovery task.
+"""
+import tempfile
+import time
+from unittest.mock import MagicMock, patch
+
+from reNgine.tasks import subdomain_discovery
+from scanEngine.models import InstalledExternalTool
+from startScan.models import Subdomain
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestSubdomainDiscovery',
+]
+
+
+@patch('reNgine.celery_custom_task.RengineTask.notify')
+@patch('reNgine.tasks.send_task_notif')
+@patch('reNgine.tasks.create_command_object', return_value=MagicMock())
+class TestSubdomainDiscovery(BaseTestCase):
+    """Test subdomain discovery tools run concurrently."""
+
+    def setUp(self):
+        super().setUp()
+        self.data_generator.create_project_base()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tools = {
+            'slow1': 'sleep 1 && printf "a.{TARGET}\\nb.{TARGET}\\n" > {OUTPUT}',
+            'slow2': 'sleep 1 && printf "b.{TARGET}\\nc.{TARGET}\\n" > {OUTPUT}',
+            'slow3': 'sleep 1 && printf "invalid_name\\n" > {OUTPUT}',
+            'hanging': 'printf "d.{TARGET}\\n" > {OUTPUT} && sleep 30',
+        }
+        InstalledExternalTool.objects.bulk_create([
+            InstalledExternalTool(
+                name=name,
+                description=name,
+                github_url='',
+                install_command='',
+                is_subdomain_gathering=True,
+                subdomain_gathering_command=command)
+            for name, command in self.tools.items()
+        ])
+        self.ctx = {
+            'scan_history_id': self.data_generator.scan_history.id,
+            'domain_id': self.data_generator.domain.id,
+            'results_dir': self.tmp_dir.name,
+            'yaml_configuration': {
+                'subdomain_discovery': {
+                    'uses_tools': list(self.tools),
+                    'enable_http_crawl': False,
+                }
+            },
+        }
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    @patch('reNgine.tasks.SUBDOMAIN_DISCOVERY_TOOL_TIMEOUT', 2)
+    def test_tools_run_concurrently(self, *mocks):
+        """Test wall time is the one of the slowest tool, results of all tools
+        are merged, and hanging tools are killed."""
+        start = time.time()
+        subdomain_discovery(host='example.com', ctx=self.ctx)
+        elapsed = time.time() - start
+
+        # Sequentially, tools would take 5s
+        self.assertLess(elapsed, 4)
+        self.assertEqual(
+            sorted(Subdomain.objects
+                .filter(scan_history_id=self.ctx['scan_history_id'], name__endswith='.example.com')
+                .exclude(name='admin.example.com')
+                .values_list('name', flat=True)),
+            ['a.example.com', 'b.example.com', 'c.example.com', 'd.example.com'])
@@ -0,0 +1,90 @@
+"""
+This file contains the test cases for the vulnerabilities deduplication.
+"""
+from unittest.mock import patch
+
+from reNgine.tasks import save_vulnerability
+from startScan.models import ScanHistory, Vulnerability
+from utils.test_base import BaseTestCase
+
+__all__ = [
+    'TestVulnerabilityFingerprint',
+]
+
+
+class TestVulnerabilityFingerprint(BaseTestCase):
+    """Test vulnerabilities are identified by their fingerprint."""
+
+    def setUp(self):
+        super().setUp()
+        self.data_generator.create_project_base()
+        self.scan = self.data_generator.scan_history
+
+    def get_vuln_data(self, tag_count=3, **kwargs):
+        vuln_data = {
+            'scan_history': self.scan,
+            'target_domain': self.data_generator.domain,
+            'subdomain': self.data_generator.subdomain,
+            'http_url': 'https://admin.example.com/.git/config',
+            'name': 'Git Config Disclosure',
+            'template_id': 'git-config',
+            'matcher_name': 'git',
+            'severity': 2,
+            'response': 'HTTP/1.1 200 OK\r\n\r\n[core]',
+            'tags': [f'tag{i}' for i in range(tag_count)],
+            'cve_ids': ['CVE-2021-41773'],
+            'cwe_ids': ['CWE-200'],
+            'references': ['https://example.com/git'],
+        }
+        vuln_data.update(kwargs)
+        return vuln_data
+
+    def test_duplicates_skipped(self):
+        """Test a vulnerability found again by the scan is not saved twice."""
+        vuln, created = save_vulnerability(**self.get_vuln_data())
+        self.assertTrue(created)
+        self.assertIsNotNone(vuln.discovered_date)
+        self.assertEqual(vuln.tags.count(), 3)
+        self.assertEqual(list(vuln.cve_ids.values_list('name', flat=True)), ['CVE-2021-41773'])
+
+        # The response changes but it is the same vulnerability
+        same_vuln, created = save_vulnerability(**self.get_vuln_data(response='HTTP/1.1 200 OK', tags=['new']))
+        self.assertFalse(created)
+        self.assertEqual(same_vuln.id, vuln.id)
+        self.assertEqual(vuln.tags.count(), 4)
+        self.assertEqual(Vulnerability.objects.count(), 1)
+
+        # Another matcher is another vulnerability
+        _, created = save_vulnerability(**self.get_vuln_data(matcher_name='svn'))
+        self.assertTrue(created)
+
+        # And so is the same vulnerability found by another scan
+        other_scan = ScanHistory.objects.get(pk=self.scan.pk)
+        other_scan.pk = None
+        other_scan.save()
+        _, created = save_vulnerability(**self.get_vuln_data(scan_history=other_scan))
+        self.assertTrue(created)
+        self.assertEqual(Vulnerability.objects.count(), 3)
+
+    @patch('reNgine.tasks.ScanStatistics.increment_vulnerabilities')
+    def test_concurrent_duplicates(self, mock_increment_vulnerabilities):
+        """Test only the task inserting a vulnerability found concurrently
+        handles it as new."""
+        vuln, created = save_vulnerability(**self.get_vuln_data())
+        self.assertTrue(created)
+
+        # Another task did not see the vulnerability before inserting it
+        with patch('reNgine.tasks.Vulnerability.objects.filter') as mock_filter:
+            mock_filter.return_value.first.return_value = None
+            same_vuln, created = save_vulnerability(**self.get_vuln_data(tags=['new']))
+        self.assertFalse(created)
+        self.assertEqual(same_vuln.id, vuln.id)
+        self.assertEqual(vuln.tags.count(), 4)
+        self.assertEqual(Vulnerability.objects.count(), 1)
+        mock_increment_vulnerabilities.assert_called_once_with(self.scan.id, 2)
+
+    def test_query_count(self):
+        """Test the number of queries does not depend on the number of tags."""
+        save_vulnerability(**self.get_vuln_data(tag_count=1))
+        with self.assertNumQueries(10):
+            save_vulnerability(**self.get_vuln_data(tag_count=20, http_url='https://admin.example.com/'))
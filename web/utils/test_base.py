@@ -4,6 +4,8 @@ from utils.test_utils import TestDataGenerator, TestValidation
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from dashboard.views import on_user_logged_in
+from reNgine.interning import clear_intern_tables
+from reNgine.scan_cache import clear_scan_caches
 
 __all__ = [
     'BaseTestCase',
@@ -49,6 +51,10 @@ class BaseTestCase(TestCase):
         self.data_generator = TestDataGenerator()
         self.test_validation = TestValidation()
 
+        # Scan caches are dropped before each task run by workers
+        clear_scan_caches()
+        clear_intern_tables()
+
         # Disable logging for tests
         logging.disable(logging.CRITICAL)
 
@@ -527,3 +527,20 @@ class MockTemplate:
             return wrapper
 
         return decorator
+
+
+class FakeRedis:
+    """In-memory stand-in for the few redis commands used by the caches."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key) or 0) + 1
+        return self.values[key]